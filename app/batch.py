@@ -0,0 +1,394 @@
+"""
+Ejecución por lotes (sin interfaz) de tareas de generación, corrección y resumen.
+
+Lee un archivo JSONL con una tarea por línea, las procesa de forma concurrente
+con LangChainAgent, guarda cada resultado con IOManager (igual que la app) y
+escribe un reporte JSONL con la latencia y los tokens de cada tarea.
+
+Uso:
+    python -m app.batch tareas.jsonl
+    python -m app.batch tareas.jsonl --concurrencia 8 --reporte reporte.jsonl
+    python -m app.batch tareas.jsonl --empresa marca-b
+
+Formato de cada línea del archivo de tareas:
+    {"id": "navidad-01", "accion": "generar", "tema": "Campaña de Navidad",
+     "max_palabras": 200, "provider": "gemini", "model": "gemini-flash-latest"}
+
+Campos:
+    accion: generar, corregir o resumir (por defecto generar)
+    tema / texto: Tema (generar) o texto original (corregir y resumir)
+    max_palabras, instrucciones, provider, model, temperatura: opcionales
+    empresa: opcional; configuración de config/empresas/<empresa>.json (por defecto --empresa)
+    id: opcional; si no se indica, se calcula a partir del contenido de la tarea
+
+Si el proceso se interrumpe, al volver a ejecutarlo con el mismo reporte se
+omiten las tareas que ya terminaron correctamente.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+# Agregar el directorio raíz del proyecto al path de Python
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from app.utils.env_loader import load_environment_variables
+from app.utils import LangChainAgent, IOManager, FeedbackManager, contar_palabras
+from app.utils.logger import logger
+from app.utils.usage_ledger import extraer_metricas
+from app.utils.text_tools import combinar_textos_referencia
+from app.utils.empresa_config import normalizar_empresa
+
+
+ACCIONES = ["generar", "corregir", "resumir"]
+
+# Valores por defecto de max_palabras por acción (los mismos que LangChainAgent)
+MAX_PALABRAS_POR_DEFECTO = {"generar": 200, "resumir": 100}
+
+
+def cargar_tareas(ruta: Path) -> List[Dict]:
+    """
+    Lee el archivo JSONL de tareas.
+    
+    Args:
+        ruta: Ruta al archivo de tareas
+    
+    Returns:
+        Lista de tareas (Dict) con 'id' asignado
+    """
+    tareas = []
+    with open(ruta, 'r', encoding='utf-8') as f:
+        for numero, linea in enumerate(f, start=1):
+            linea = linea.strip()
+            if not linea or linea.startswith("#"):
+                continue
+            try:
+                tarea = json.loads(linea)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Línea {numero} de {ruta} no es JSON válido: {e}")
+            if not isinstance(tarea, dict):
+                raise ValueError(f"Línea {numero} de {ruta} debe ser un objeto JSON")
+            if "id" not in tarea:
+                contenido = json.dumps(tarea, ensure_ascii=False, sort_keys=True)
+                tarea["id"] = hashlib.sha256(contenido.encode("utf-8")).hexdigest()[:12]
+            tarea["id"] = str(tarea["id"])
+            tareas.append(tarea)
+    return tareas
+
+
+def cargar_completadas(ruta_reporte: Path) -> Set[str]:
+    """
+    Obtiene los IDs de las tareas que ya terminaron bien en un reporte anterior.
+    
+    Args:
+        ruta_reporte: Ruta al reporte JSONL
+    
+    Returns:
+        Conjunto de IDs de tareas completadas
+    """
+    completadas = set()
+    if not ruta_reporte.exists():
+        return completadas
+    with open(ruta_reporte, 'r', encoding='utf-8') as f:
+        for linea in f:
+            try:
+                registro = json.loads(linea)
+            except json.JSONDecodeError:
+                # Última línea cortada por una interrupción
+                continue
+            if registro.get("estado") == "ok":
+                completadas.add(str(registro.get("tarea_id")))
+    return completadas
+
+
+class EjecutorLote:
+    """Procesa tareas de forma concurrente y registra su resultado."""
+    
+    def __init__(
+        self,
+        ruta_reporte: Path,
+        concurrencia: int = 4,
+        provider: str = "gemini",
+        model_name: str = "gemini-flash-latest",
+        temperature: float = 0.7,
+        usar_cache: bool = True,
+        base_dir: str = "data",
+        empresa: Optional[str] = None
+    ):
+        """
+        Inicializa el ejecutor.
+        
+        Args:
+            ruta_reporte: Ruta del reporte JSONL (se agregan líneas al final)
+            concurrencia: Número máximo de tareas en curso a la vez
+            provider: Proveedor por defecto para tareas que no lo indican
+            model_name: Modelo por defecto para tareas que no lo indican
+            temperature: Temperatura por defecto
+            usar_cache: Si es False, ignora la caché de respuestas
+            base_dir: Directorio base de datos para IOManager
+            empresa: Empresa por defecto para tareas que no la indican (None = la principal)
+        """
+        self.ruta_reporte = ruta_reporte
+        self.concurrencia = max(1, concurrencia)
+        self.provider = provider
+        self.model_name = model_name
+        self.temperature = temperature
+        self.usar_cache = usar_cache
+        self.base_dir = base_dir
+        self.empresa = normalizar_empresa(empresa)
+        
+        # Un gestor de IO (archivos de referencia y textos aprobados) por empresa
+        self._io_managers: Dict[str, IOManager] = {}
+        self._agentes: Dict[tuple, LangChainAgent] = {}
+        self._textos_referencia: Dict[str, List[str]] = {}
+    
+    def _get_io_manager(self, empresa: str) -> IOManager:
+        """Obtiene (o crea) el gestor de IO de una empresa."""
+        if empresa not in self._io_managers:
+            self._io_managers[empresa] = IOManager(base_dir=self.base_dir, empresa=empresa)
+        return self._io_managers[empresa]
+    
+    def _get_textos_referencia(self, empresa: str) -> List[str]:
+        """Textos de referencia guardados más textos aprobados de la empresa (igual que la app)."""
+        if empresa not in self._textos_referencia:
+            io_manager = self._get_io_manager(empresa)
+            textos = io_manager.cargar_archivos_referencia_guardados()
+            textos_aprobados = FeedbackManager(io_manager).obtener_textos_aprobados(limite=5)
+            self._textos_referencia[empresa] = combinar_textos_referencia(textos, textos_aprobados)
+        return self._textos_referencia[empresa]
+    
+    def _get_agente(self, provider: str, model_name: str, temperature: float, empresa: str) -> LangChainAgent:
+        """Obtiene (o crea) el agente para una combinación de proveedor, modelo, temperatura y empresa."""
+        clave = (provider, model_name, temperature, empresa)
+        if clave not in self._agentes:
+            agente = LangChainAgent(
+                provider=provider,
+                model_name=model_name,
+                temperature=temperature,
+                usuario=os.getenv("APP_USUARIO", "lote"),
+                empresa=empresa
+            )
+            agente.set_reference_texts(self._get_textos_referencia(empresa))
+            self._agentes[clave] = agente
+        return self._agentes[clave]
+    
+    def _escribir_reporte(self, registro: Dict):
+        """Agrega una línea al reporte y la escribe a disco de inmediato."""
+        with open(self.ruta_reporte, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            f.flush()
+    
+    async def _ejecutar_accion(self, agente: LangChainAgent, accion: str, tarea: Dict) -> Dict:
+        """Llama al método asíncrono del agente correspondiente a la acción."""
+        instrucciones = tarea.get("instrucciones", "")
+        if accion == "generar":
+            return await agente.agenerar_texto(
+                tema=tarea.get("tema", ""),
+                max_palabras=int(tarea.get("max_palabras", MAX_PALABRAS_POR_DEFECTO["generar"])),
+                instrucciones_adicionales=instrucciones,
+                usar_cache=self.usar_cache
+            )
+        if accion == "corregir":
+            return await agente.acorregir_texto(
+                texto=tarea.get("texto", ""),
+                instrucciones_adicionales=instrucciones,
+                usar_cache=self.usar_cache
+            )
+        return await agente.aresumir_texto(
+            texto=tarea.get("texto", ""),
+            max_palabras=int(tarea.get("max_palabras", MAX_PALABRAS_POR_DEFECTO["resumir"])),
+            instrucciones_adicionales=instrucciones,
+            usar_cache=self.usar_cache
+        )
+    
+    async def procesar_tarea(self, tarea: Dict, semaforo: asyncio.Semaphore) -> Dict:
+        """
+        Procesa una tarea, guarda su resultado y la registra en el reporte.
+        
+        Args:
+            tarea: Tarea leída del archivo JSONL
+            semaforo: Semáforo que limita las tareas en curso
+        
+        Returns:
+            Registro escrito en el reporte
+        """
+        accion = tarea.get("accion", "generar")
+        provider = tarea.get("provider", self.provider)
+        model_name = tarea.get("model")
+        if not model_name:
+            # Si la tarea cambia de proveedor sin indicar modelo, usar el primero de ese proveedor
+            modelos = LangChainAgent.get_available_models(provider) if provider != self.provider else {}
+            model_name = next(iter(modelos.values()), self.model_name)
+        temperature = float(tarea.get("temperatura", self.temperature))
+        empresa = tarea.get("empresa") or self.empresa
+        
+        registro = {
+            "tarea_id": tarea["id"],
+            "accion": accion,
+            "provider": provider,
+            "modelo": model_name,
+            "estado": "error",
+            "resultado_id": None,
+            "latencia_segundos": 0.0,
+            "tokens_usados": 0,
+            "costo": 0.0,
+            "cache_hit": False,
+            "proveedor_usado": None,
+            "error": None
+        }
+        
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                if accion not in ACCIONES:
+                    raise ValueError(f"Acción '{accion}' no válida. Usa: {', '.join(ACCIONES)}")
+                contenido = tarea.get("tema") if accion == "generar" else tarea.get("texto")
+                if not contenido or not str(contenido).strip():
+                    campo = "tema" if accion == "generar" else "texto"
+                    raise ValueError(f"La tarea no tiene '{campo}'")
+                
+                empresa = normalizar_empresa(empresa)
+                agente = self._get_agente(provider, model_name, temperature, empresa)
+                resultado = await self._ejecutar_accion(agente, accion, tarea)
+            except Exception as e:
+                registro["error"] = str(e)
+                registro["latencia_segundos"] = round(time.perf_counter() - inicio, 3)
+                logger.error(f"❌ Tarea {tarea['id']} falló: {e}")
+                self._escribir_reporte(registro)
+                return registro
+            registro["latencia_segundos"] = round(time.perf_counter() - inicio, 3)
+        
+        registro["tokens_usados"] = resultado.get("tokens_usados", 0)
+        registro["costo"] = resultado.get("costo", 0.0)
+        registro["cache_hit"] = resultado.get("cache_hit", False)
+        registro["proveedor_usado"] = resultado.get("proveedor_usado", f"{provider}/{model_name}")
+        texto = resultado.get("texto", "")
+        
+        if not texto:
+            registro["error"] = "El modelo no devolvió texto"
+            logger.error(f"❌ Tarea {tarea['id']} falló: {registro['error'][:200]}")
+            self._escribir_reporte(registro)
+            return registro
+        
+        original = tarea.get("tema") if accion == "generar" else tarea.get("texto")
+        config = {
+            "provider": provider,
+            "temperature": temperature,
+            "lote": True,
+            "tarea_id": tarea["id"]
+        }
+        if accion != "corregir":
+            config["max_palabras"] = int(tarea.get("max_palabras", MAX_PALABRAS_POR_DEFECTO[accion]))
+        if tarea.get("instrucciones"):
+            config["instrucciones"] = tarea["instrucciones"]
+        
+        registro["resultado_id"] = self._get_io_manager(empresa).guardar_resultado(
+            accion=accion,
+            tema=original[:100] + "..." if accion != "generar" and len(original) > 100 else original,
+            resultado=texto,
+            palabras=contar_palabras(texto),
+            modelo=resultado.get("proveedor_usado", f"{provider}/{model_name}"),
+            config=config,
+            metricas=extraer_metricas(resultado)
+        )
+        registro["estado"] = "ok"
+        logger.info(f"✅ Tarea {tarea['id']} completada en {registro['latencia_segundos']}s")
+        self._escribir_reporte(registro)
+        return registro
+    
+    async def ejecutar(self, tareas: List[Dict]) -> Dict:
+        """
+        Procesa todas las tareas pendientes.
+        
+        Args:
+            tareas: Lista de tareas
+        
+        Returns:
+            Dict con el resumen de la ejecución
+        """
+        completadas = cargar_completadas(self.ruta_reporte)
+        pendientes = [t for t in tareas if t["id"] not in completadas]
+        omitidas = len(tareas) - len(pendientes)
+        if omitidas:
+            logger.info(f"Reanudando: {omitidas} tareas ya completadas se omiten")
+        
+        semaforo = asyncio.Semaphore(self.concurrencia)
+        inicio = time.perf_counter()
+        registros = await asyncio.gather(*(self.procesar_tarea(t, semaforo) for t in pendientes))
+        
+        return {
+            "total": len(tareas),
+            "omitidas": omitidas,
+            "ok": sum(1 for r in registros if r["estado"] == "ok"),
+            "errores": sum(1 for r in registros if r["estado"] != "ok"),
+            "tokens_usados": sum(r["tokens_usados"] or 0 for r in registros),
+            "costo": sum(r["costo"] or 0.0 for r in registros),
+            "duracion_segundos": round(time.perf_counter() - inicio, 3)
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Punto de entrada de la línea de comandos."""
+    parser = argparse.ArgumentParser(
+        prog="python -m app.batch",
+        description="Procesa por lotes un archivo JSONL de tareas (generar, corregir, resumir)."
+    )
+    parser.add_argument("tareas", help="Archivo JSONL con una tarea por línea")
+    parser.add_argument("--reporte", help="Archivo JSONL del reporte (por defecto <tareas>.reporte.jsonl)")
+    parser.add_argument("--concurrencia", type=int, default=4, help="Tareas en curso a la vez (por defecto 4)")
+    parser.add_argument("--provider", default="gemini", help="Proveedor por defecto (por defecto gemini)")
+    parser.add_argument("--model", default="gemini-flash-latest", help="Modelo por defecto")
+    parser.add_argument("--temperatura", type=float, default=0.7, help="Temperatura por defecto (por defecto 0.7)")
+    parser.add_argument("--sin-cache", action="store_true", help="No usar la caché de respuestas")
+    parser.add_argument("--data-dir", default="data", help="Directorio de datos (por defecto data)")
+    parser.add_argument(
+        "--empresa",
+        default=os.getenv("APP_EMPRESA"),
+        help="Empresa por defecto (config/empresas/<empresa>.json; por defecto la principal)"
+    )
+    args = parser.parse_args(argv)
+    
+    load_environment_variables()
+    # Sin un límite por proveedor configurado, el agente usa el mismo valor que el lote
+    os.environ.setdefault("LLM_MAX_CONCURRENCIA", str(args.concurrencia))
+    
+    ruta_tareas = Path(args.tareas)
+    if not ruta_tareas.exists():
+        parser.error(f"No existe el archivo de tareas: {ruta_tareas}")
+    ruta_reporte = Path(args.reporte) if args.reporte else ruta_tareas.with_suffix(".reporte.jsonl")
+    
+    try:
+        tareas = cargar_tareas(ruta_tareas)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    try:
+        ejecutor = EjecutorLote(
+            ruta_reporte=ruta_reporte,
+            concurrencia=args.concurrencia,
+            provider=args.provider,
+            model_name=args.model,
+            temperature=args.temperatura,
+            usar_cache=not args.sin_cache,
+            base_dir=args.data_dir,
+            empresa=args.empresa
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    resumen = asyncio.run(ejecutor.ejecutar(tareas))
+    
+    print(json.dumps(resumen, ensure_ascii=False, indent=2))
+    print(f"Reporte: {ruta_reporte}")
+    return 0 if resumen["errores"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,20 @@
 """Componentes de la aplicación Streamlit."""
 
 from app.components.sidebar import render_sidebar
-from app.components.result_display import render_result_display
+from app.components.result_display import (
+    render_result_display,
+    render_resultado_stream,
+    render_aviso_cancelacion,
+    render_estimacion
+)
 from app.components.uploader import render_file_uploader
 
 __all__ = [
     "render_sidebar",
     "render_result_display",
+    "render_resultado_stream",
+    "render_aviso_cancelacion",
+    "render_estimacion",
     "render_file_uploader"
 ]
 
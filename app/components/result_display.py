@@ -2,12 +2,174 @@
 Componente para mostrar resultados y gestionar feedback.
 """
 
+import time
+import queue
+import threading
 import streamlit as st
-from typing import Dict, Optional, Callable
+from typing import Dict, Optional, Callable, Iterable, Iterator, Union
 from app.utils.logger import logger
+from app.utils.deadlines import TokenCancelacion
+from app.utils.langchain_agent import AvanceStream
+from app.utils.model_pricing import revisar_presupuesto
 from app.components.help_modal import titulo_con_ayuda, AYUDA_FEEDBACK
 
 
+# Cada cuánto se actualiza la pantalla mientras no llega nada del stream
+INTERVALO_ESPERA_SEGUNDOS = 0.5
+
+# Marca de fin del stream en la cola de _consumir_stream
+_FIN_STREAM = object()
+
+
+class _ErrorStream:
+    """Error que lanzó el stream, para relanzarlo en el hilo de la interfaz."""
+    
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _consumir_stream(iterador: Iterator, cola: queue.Queue, detener: threading.Event):
+    """
+    Recorre el stream en un hilo aparte y pasa cada elemento a la cola.
+    
+    Args:
+        iterador: Iterador del stream del agente
+        cola: Cola donde se ponen los elementos, el error (_ErrorStream) y al final _FIN_STREAM
+        detener: Si se activa, se deja de leer el stream y se cierra
+    """
+    try:
+        for elemento in iterador:
+            if detener.is_set():
+                break
+            cola.put(elemento)
+    except BaseException as e:
+        cola.put(_ErrorStream(e))
+    finally:
+        if hasattr(iterador, "close"):
+            # Cerrar el stream libera la conexión con el proveedor
+            iterador.close()
+        cola.put(_FIN_STREAM)
+
+
+def render_resultado_stream(
+    stream: Iterable[Union[str, Dict, AvanceStream]],
+    mensaje_espera: str = "⏳ Procesando...",
+    token: Optional[TokenCancelacion] = None
+) -> Optional[Dict]:
+    """
+    Muestra progresivamente el texto que produce un stream del agente.
+    
+    El stream se recorre en un hilo aparte y la pantalla se actualiza cada medio
+    segundo aunque no llegue nada (turno en la cola, reintentos, espera del primer
+    fragmento): así el botón "Cancelar" detiene la solicitud en cualquier momento.
+    
+    Args:
+        stream: Generador del agente (fragmentos de texto, avisos de avance y, al final, el Dict del resultado)
+        mensaje_espera: Mensaje mientras llega el primer fragmento
+        token: Token de cancelación de la solicitud; si se indica, se muestra el botón "Cancelar"
+    
+    Returns:
+        Dict con el resultado final del stream, o None si el stream no lo produjo
+    """
+    if token is not None:
+        # Al presionarlo, Streamlit interrumpe esta ejecución en la siguiente actualización
+        # de la pantalla y la solicitud se cancela abajo
+        st.button(
+            "⏹️ Cancelar",
+            key="cancelar_solicitud",
+            on_click=lambda: st.session_state.update(solicitud_cancelada=True)
+        )
+    placeholder = st.empty()
+    cola: queue.Queue = queue.Queue()
+    detener = threading.Event()
+    threading.Thread(target=_consumir_stream, args=(iter(stream), cola, detener), daemon=True).start()
+    
+    texto_parcial = ""
+    aviso = mensaje_espera
+    resultado_final = None
+    inicio = time.monotonic()
+    
+    try:
+        placeholder.caption(aviso)
+        while True:
+            try:
+                elemento = cola.get(timeout=INTERVALO_ESPERA_SEGUNDOS)
+            except queue.Empty:
+                # Actualizar la pantalla permite que Streamlit atienda el botón "Cancelar"
+                if texto_parcial:
+                    placeholder.markdown(texto_parcial + "▌")
+                else:
+                    placeholder.caption(f"{aviso} ({time.monotonic() - inicio:.0f} s)")
+                continue
+            
+            if elemento is _FIN_STREAM:
+                break
+            if isinstance(elemento, _ErrorStream):
+                raise elemento.error
+            if isinstance(elemento, dict):
+                resultado_final = elemento
+            elif isinstance(elemento, AvanceStream):
+                # Pasos previos al texto (resúmenes parciales): mostrar el avance
+                aviso = elemento.mensaje
+                placeholder.caption(aviso)
+            elif elemento:
+                texto_parcial += str(elemento)
+                placeholder.markdown(texto_parcial + "▌")
+    except BaseException as e:
+        if not isinstance(e, Exception):
+            # Streamlit interrumpió la ejecución (botón "Cancelar" u otra interacción)
+            if token is not None:
+                token.cancelar()
+            if texto_parcial:
+                st.session_state.texto_parcial_cancelado = texto_parcial.strip()
+        raise
+    finally:
+        # Si no terminó, el hilo deja de leer y cierra el stream
+        detener.set()
+    
+    # El resultado definitivo se muestra con render_result_display
+    placeholder.empty()
+    
+    if resultado_final is None and texto_parcial:
+        resultado_final = {"texto": texto_parcial.strip(), "tokens_usados": 0, "costo": 0.0}
+    return resultado_final
+
+
+def render_aviso_cancelacion():
+    """Muestra el aviso (y el texto recibido) de una solicitud cancelada con el botón "Cancelar"."""
+    if not st.session_state.pop("solicitud_cancelada", False):
+        return
+    st.warning("⏹️ Solicitud cancelada.")
+    texto_parcial = st.session_state.pop("texto_parcial_cancelado", "")
+    if texto_parcial:
+        with st.expander("Texto recibido antes de cancelar"):
+            st.markdown(texto_parcial)
+
+
+def render_estimacion(estimacion: Dict):
+    """
+    Muestra la predicción de tokens, costo y latencia de una solicitud antes de enviarla
+    y avisa si supera la ventana de contexto del modelo o el presupuesto configurado.
+    
+    Args:
+        estimacion: Dict de `LangChainAgent.estimar_solicitud`
+    """
+    costo = estimacion.get("costo")
+    texto_costo = f"${costo:.4f}" if costo is not None else "costo desconocido"
+    st.caption(
+        f"🔮 Estimación: ~{estimacion['tokens_entrada']} tokens de entrada + ~{estimacion['tokens_salida']} de salida | "
+        f"{texto_costo} | ~{estimacion['latencia_segundos']:.0f} s"
+        + (f" | 🧩 {estimacion['fragmentos']} fragmentos" if estimacion.get("fragmentos") else "")
+    )
+    if estimacion.get("excede_contexto"):
+        st.warning(
+            f"⚠️ La solicitud (~{estimacion['tokens_entrada'] + estimacion['tokens_salida']} tokens) supera "
+            f"la ventana de contexto del modelo ({estimacion['contexto']} tokens)."
+        )
+    for aviso in revisar_presupuesto(costo):
+        st.warning(f"💸 {aviso}")
+
+
 def render_result_display(
     resultado: str,
     resultado_id: Optional[str] = None,
@@ -7,6 +7,7 @@ import streamlit as st
 import os
 import base64
 from pathlib import Path
+from datetime import datetime, timedelta
 from typing import Dict, Optional
 from app.components.help_modal import titulo_con_ayuda, AYUDA_CONFIGURACION
 from app.utils.logger import logger
@@ -145,6 +146,22 @@ def render_sidebar() -> Dict:
         
         st.divider()
         
+        # Selección de empresa (solo si hay más de una en config/empresas)
+        from app.utils.empresa_config import EMPRESA_PRINCIPAL, listar_empresas
+        empresas = listar_empresas()
+        empresa = EMPRESA_PRINCIPAL
+        if len(empresas) > 1:
+            st.subheader("🏢 Empresa")
+            empresa_inicial = os.getenv("APP_EMPRESA", EMPRESA_PRINCIPAL)
+            empresa = st.selectbox(
+                "Empresa o marca:",
+                empresas,
+                index=empresas.index(empresa_inicial) if empresa_inicial in empresas else 0,
+                key="empresa_seleccionada",
+                help="Cada empresa tiene su propia configuración y sus propios archivos de referencia"
+            )
+            st.divider()
+        
         # Selección de acción
         st.subheader("📋 Acción")
         accion = st.selectbox(
@@ -160,9 +177,11 @@ def render_sidebar() -> Dict:
         
         # Importar para obtener proveedores disponibles
         from app.utils.langchain_agent import LangChainAgent
+        from app.utils.model_catalog import get_model_catalog
+        catalogo = get_model_catalog()
         
-        # Obtener proveedores disponibles (el método ya verifica Groq dinámicamente)
-        providers_available = LangChainAgent.get_available_providers()
+        # Obtener proveedores disponibles (se revisan una sola vez por proceso, sin importar los paquetes)
+        providers_available = catalogo.get_proveedores_disponibles()
         if not providers_available:
             st.error("❌ No hay proveedores disponibles. Instala las dependencias necesarias.")
             st.stop()
@@ -178,42 +197,17 @@ def render_sidebar() -> Dict:
             "huggingface": "Hugging Face"
         }
         
-        if "openai" in providers_available and openai_key:
-            providers_with_key.append("openai")
-        if "gemini" in providers_available and google_key:
-            providers_with_key.append("gemini")
-        
-        # Verificar proveedores adicionales dinámicamente
-        def check_provider_package(package_name, class_name=None):
-            """Verifica si un paquete de proveedor está disponible."""
-            try:
-                __import__(package_name)
-                return True
-            except ImportError:
-                if class_name:
-                    try:
-                        from langchain_community import chat_models
-                        if hasattr(chat_models, class_name):
-                            return True
-                    except (ImportError, AttributeError):
-                        pass
-                return False
-        
-        # Verificar y agregar proveedores adicionales
-        additional_providers = [
-            ("groq", "langchain_groq", "ChatGroq", groq_key),
-            ("together", "langchain_together", "ChatTogether", together_key),
-            ("cohere", "langchain_cohere", "ChatCohere", cohere_key),
-            ("huggingface", "langchain_huggingface", "ChatHuggingFace", huggingface_key)
-        ]
-        
-        for provider_id, package_name, class_name, api_key in additional_providers:
-            if api_key and check_provider_package(package_name, class_name):
-                if provider_id not in providers_with_key:
-                    providers_with_key.append(provider_id)
-                if provider_id not in providers_available:
-                    providers_available.append(provider_id)
-        
+        api_keys_por_proveedor = {
+            "openai": openai_key,
+            "gemini": google_key,
+            "groq": groq_key,
+            "together": together_key,
+            "cohere": cohere_key,
+            "huggingface": huggingface_key
+        }
+        for provider_id in providers_available:
+            if api_keys_por_proveedor.get(provider_id):
+                providers_with_key.append(provider_id)
         
         if not providers_with_key:
             st.warning("⚠️ Configura al menos una API key para usar la aplicación.")
@@ -252,8 +246,9 @@ def render_sidebar() -> Dict:
             
             # Para Gemini, solo mostrar modelos GRATUITOS
             if provider_real == "gemini":
-                # Obtener solo modelos gratuitos disponibles dinámicamente
-                available_gemini_models = LangChainAgent.list_available_gemini_models()
+                # Obtener solo modelos gratuitos disponibles dinámicamente (desde la caché del
+                # catálogo; la consulta a la API de Google se hace en segundo plano)
+                available_gemini_models = catalogo.get_modelos_remotos("gemini")
                 if available_gemini_models:
                     # Crear un diccionario con los modelos gratuitos disponibles
                     modelos_dinamicos = {model: model for model in available_gemini_models}
@@ -284,6 +279,17 @@ def render_sidebar() -> Dict:
                 modelo = "gpt-4o-mini"  # Fallback
                 st.warning(f"No hay modelos disponibles para {provider_selected}")
         
+            # Estado del circuito del proveedor/modelo elegido (ver circuit_breaker)
+            from app.utils.circuit_breaker import get_estados_circuitos, ABIERTO, SEMIABIERTO
+            estado_circuito = get_estados_circuitos().get(f"{provider_real}/{modelo}")
+            if estado_circuito and estado_circuito["estado"] == ABIERTO:
+                st.warning(
+                    f"🔴 {provider_selected} falló varias veces seguidas: las solicitudes fallan de inmediato "
+                    f"(o usan la cadena de respaldo). Próxima prueba en {estado_circuito['proxima_prueba']:.0f} s."
+                )
+            elif estado_circuito and estado_circuito["estado"] == SEMIABIERTO:
+                st.info(f"🟡 Probando de nuevo {provider_selected} con una solicitud.")
+        
         # Guardar selección anterior
         st.session_state.provider_previo = provider_real
         st.session_state.modelo_previo = modelo
@@ -314,6 +320,108 @@ def render_sidebar() -> Dict:
         
         st.divider()
         
+        # Caché de respuestas
+        st.subheader("⚡ Caché")
+        usar_cache = st.checkbox(
+            "Reutilizar respuestas idénticas",
+            value=True,
+            help="Si ya se generó exactamente la misma solicitud con la misma configuración, se reutiliza sin volver a llamar al modelo",
+            key="usar_cache"
+        )
+        cache_semantico = st.checkbox(
+            "Reutilizar respuestas de temas similares",
+            value=False,
+            disabled=not usar_cache,
+            help="Si se pidió antes un tema casi igual (por ejemplo, con otras palabras), se ofrece esa respuesta sin llamar al modelo",
+            key="cache_semantico"
+        )
+        from app.utils.response_cache import get_response_cache
+        response_cache = get_response_cache()
+        if response_cache is not None:
+            metricas_cache = response_cache.get_metricas()
+            st.caption(
+                f"Aciertos: {metricas_cache['hits']} | Fallos: {metricas_cache['misses']} | "
+                f"Entradas: {metricas_cache['entradas']}"
+            )
+        from app.utils.concurrency_limiter import get_limites_actuales
+        limites = get_limites_actuales()
+        if limites:
+            st.caption("Llamadas simultáneas: " + " | ".join(
+                f"{nombre}: {estado['en_curso']}/{estado['limite']}" for nombre, estado in limites.items()
+            ))
+        
+        from app.utils.hedging import get_gestor_cobertura
+        cobertura = get_gestor_cobertura()
+        if cobertura.activa:
+            metricas_cobertura = cobertura.get_metricas()
+            st.caption(
+                f"Cobertura: {metricas_cobertura['coberturas']} de {metricas_cobertura['solicitudes']} "
+                f"({metricas_cobertura['tasa_cobertura']:.1%}), "
+                f"ganó el duplicado en {metricas_cobertura['tasa_victoria']:.0%}"
+            )
+        
+        from app.utils.single_flight import get_grupo_llamadas
+        metricas_compartidas = get_grupo_llamadas().get_metricas()
+        if metricas_compartidas["compartidas"]:
+            st.caption(
+                f"Solicitudes idénticas simultáneas unificadas: {metricas_compartidas['compartidas']} "
+                f"(llamadas hechas: {metricas_compartidas['llamadas']})"
+            )
+        
+        st.divider()
+        
+        # Registro de uso: tokens, costo y latencia de las solicitudes
+        from app.utils.usage_ledger import get_registro_uso
+        registro_uso = get_registro_uso()
+        if registro_uso is not None:
+            st.subheader("📊 Uso")
+            hoy = datetime.now().strftime("%Y-%m-%d")
+            resumen_hoy = registro_uso.resumir(por="dia", desde=hoy)
+            if resumen_hoy:
+                dia = resumen_hoy[0]
+                st.caption(
+                    f"Hoy: {dia['solicitudes']} solicitudes | {dia['tokens_usados']} tokens | "
+                    f"${dia['costo']:.4f} | {dia['latencia_media']:.1f} s en promedio"
+                )
+            else:
+                st.caption("Hoy todavía no hay solicitudes registradas.")
+            
+            with st.expander("Últimos 30 días", expanded=False):
+                agrupaciones = {"dia": "Día", "modelo": "Modelo", "usuario": "Usuario", "accion": "Acción", "empresa": "Empresa"}
+                agrupacion = st.radio(
+                    "Agrupar por:",
+                    list(agrupaciones.keys()),
+                    format_func=lambda clave: agrupaciones[clave],
+                    horizontal=True,
+                    key="uso_agrupacion"
+                )
+                desde = (datetime.now() - timedelta(days=29)).strftime("%Y-%m-%d")
+                filas = registro_uso.resumir(por=agrupacion, desde=desde)
+                if filas:
+                    st.dataframe(
+                        [
+                            {
+                                agrupaciones[agrupacion]: fila[agrupacion],
+                                "Solicitudes": fila["solicitudes"],
+                                "Caché": fila["aciertos_cache"],
+                                "Errores": fila["errores"],
+                                "Tokens entrada": fila["tokens_entrada"],
+                                "Tokens salida": fila["tokens_salida"],
+                                "Tokens en caché del proveedor": fila["tokens_cache"],
+                                "Costo (USD)": round(fila["costo"], 4),
+                                "Latencia media (s)": round(fila["latencia_media"], 2),
+                                "Latencia p95 (s)": round(fila["latencia_p95"], 2)
+                            }
+                            for fila in filas
+                        ],
+                        hide_index=True,
+                        use_container_width=True
+                    )
+                else:
+                    st.caption("Sin solicitudes en este período.")
+        
+        st.divider()
+        
         # Información
         st.subheader("ℹ️ Información")
         st.info(
@@ -322,10 +430,13 @@ def render_sidebar() -> Dict:
         )
     
     return {
+        "empresa": empresa,
         "accion": accion.lower(),
         "provider": provider_real,
         "modelo": modelo,
         "temperatura": temperatura,
-        "max_palabras": max_palabras
+        "max_palabras": max_palabras,
+        "usar_cache": usar_cache,
+        "cache_semantico": usar_cache and cache_semantico
     }
 
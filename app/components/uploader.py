@@ -141,7 +141,8 @@ Puedes incluir múltiples párrafos, listas, o cualquier formato de texto plano.
         st.caption("💡 **Tip:** Los archivos .txt se leen completos. Los .json se procesan buscando campos de texto comunes.")
     
     from app.utils.io_manager import IOManager
-    io_manager = IOManager()
+    # El de la sesión usa la carpeta de referencias de la empresa seleccionada
+    io_manager = st.session_state.get("io_manager") or IOManager()
     
     # Inicializar session_state para archivos a eliminar
     # Inicializar estado (optimizado para Streamlit 1.28+)
@@ -16,7 +16,10 @@ if str(project_root) not in sys.path:
 
 # Importar módulos principales PRIMERO (antes del logger para evitar importación circular)
 try:
-    from app.utils import LangChainAgent, IOManager, FeedbackManager, contar_palabras
+    from app.utils import (
+        LangChainAgent, IOManager, FeedbackManager, LLMError, TokenCancelacion, crear_plazo,
+        contar_palabras, generar_titulo_resumido
+    )
 except Exception as e:
     # Si falla la importación, mostrar error pero continuar
     print(f"❌ Error al importar utils: {e}")
@@ -26,6 +29,9 @@ except Exception as e:
 
 # Configurar logging DESPUÉS de importar los módulos principales
 from app.utils.logger import logger
+from app.utils.usage_ledger import extraer_metricas
+from app.utils.text_tools import combinar_textos_referencia
+from app.utils.empresa_config import EMPRESA_PRINCIPAL
 
 logger.info("=" * 80)
 logger.info("Iniciando aplicación Chatbot CL-AB")
@@ -34,7 +40,10 @@ logger.info("=" * 80)
 logger.info("✅ Módulos de utils importados correctamente")
 
 try:
-    from app.components import render_sidebar, render_result_display, render_file_uploader
+    from app.components import (
+        render_sidebar, render_result_display, render_resultado_stream, render_aviso_cancelacion, render_estimacion,
+        render_file_uploader
+    )
     from app.components.help_modal import titulo_con_ayuda, AYUDA_GENERAR, AYUDA_CORREGIR, AYUDA_RESUMIR, AYUDA_HISTORIAL
     logger.info("✅ Módulos de components importados correctamente")
 except Exception as e:
@@ -88,6 +97,17 @@ def obtener_ruta_logo():
             return ruta
     return None
 
+def obtener_usuario() -> str:
+    """Usuario de la sesión para el registro de uso (login de Streamlit, APP_USUARIO o 'anonimo')."""
+    try:
+        usuario = getattr(st, "user", None)
+        if usuario is not None and usuario.get("email"):
+            return usuario.get("email")
+    except Exception:
+        # Versiones de Streamlit sin st.user o sin autenticación configurada
+        pass
+    return os.getenv("APP_USUARIO", "anonimo")
+
 # Obtener ruta del logo
 logo_path = obtener_ruta_logo()
 
@@ -202,6 +222,16 @@ except Exception as e:
     st.error("❌ Error al cargar la configuración. Por favor, recarga la página.")
     st.stop()
 
+# Al cambiar de empresa, los archivos de referencia, los textos aprobados y el agente son los de la nueva empresa
+empresa = config.get("empresa", EMPRESA_PRINCIPAL)
+if st.session_state.setdefault("empresa", EMPRESA_PRINCIPAL) != empresa:
+    logger.info(f"🏢 Cambio de empresa: {st.session_state.empresa} -> {empresa}")
+    st.session_state.empresa = empresa
+    st.session_state.io_manager = IOManager(empresa=empresa)
+    st.session_state.feedback_manager = FeedbackManager(st.session_state.io_manager)
+    st.session_state.textos_referencia = []
+    st.session_state.agent = None
+
 # Verificar que el proveedor seleccionado tenga API key configurada
 from app.utils.env_loader import get_env
 provider = config.get("provider", "openai")
@@ -226,7 +256,9 @@ try:
         st.session_state.agent = LangChainAgent(
             provider=config.get("provider", "openai"),
             model_name=config["modelo"],
-            temperature=config["temperatura"]
+            temperature=config["temperatura"],
+            usuario=obtener_usuario(),
+            empresa=empresa
         )
 except ValueError as e:
     st.error(f"❌ Error de configuración: {str(e)}")
@@ -254,7 +286,7 @@ elif "textos_referencia" not in st.session_state or not st.session_state.textos_
 # También cargar textos aprobados
 textos_aprobados = st.session_state.feedback_manager.obtener_textos_aprobados(limite=5)
 if textos_aprobados:
-    textos_combinados = list(set(st.session_state.textos_referencia + textos_aprobados))
+    textos_combinados = combinar_textos_referencia(st.session_state.textos_referencia, textos_aprobados)
     st.session_state.agent.set_reference_texts(textos_combinados)
 
 # Contenido principal según la acción
@@ -277,7 +309,13 @@ if accion == "generar":
         key="instrucciones_generar"
     )
     
-    if st.button("🚀 Generar Texto", type="primary", use_container_width=True):
+    # Si el usuario rechazó una respuesta reutilizada, volver a pedirla sin caché
+    forzar_nueva = st.session_state.pop("forzar_nueva_respuesta", None) == "generar"
+    render_aviso_cancelacion()
+    if tema:
+        render_estimacion(st.session_state.agent.estimar_solicitud("generar", tema, config["max_palabras"], instrucciones_adicionales))
+    
+    if st.button("🚀 Generar Texto", type="primary", use_container_width=True) or forzar_nueva:
         logger.info("=" * 80)
         logger.info("BOTÓN PRESIONADO: Generar Texto")
         logger.info(f"Tema: {tema}")
@@ -290,21 +328,34 @@ if accion == "generar":
                 st.error("❌ Por favor, ingresa un tema o prompt.")
             else:
                 logger.info("Iniciando generación de texto...")
-                with st.spinner("⏳ Generando texto..."):
-                    try:
-                        resultado = st.session_state.agent.generar_texto(
+                resultado = None
+                token = TokenCancelacion()
+                try:
+                    resultado = render_resultado_stream(
+                        st.session_state.agent.generar_texto_stream(
                             tema=tema,
                             max_palabras=config["max_palabras"],
-                            instrucciones_adicionales=instrucciones_adicionales
-                        )
-                        logger.info("✅ Texto generado exitosamente")
-                        logger.info(f"Resultado keys: {resultado.keys() if isinstance(resultado, dict) else 'No es dict'}")
-                    except Exception as e:
-                        logger.error(f"❌ Error al generar texto: {e}", exc_info=True)
-                        st.exception(e)
-                        st.error(f"❌ Error al generar texto: {str(e)}")
-                        raise
-                    
+                            instrucciones_adicionales=instrucciones_adicionales,
+                            usar_cache=config.get("usar_cache", True) and not forzar_nueva,
+                            cache_semantico=config.get("cache_semantico", False),
+                            plazo=crear_plazo("generar", token)
+                        ),
+                        mensaje_espera="⏳ Generando texto...",
+                        token=token
+                    )
+                    logger.info("✅ Texto generado exitosamente")
+                    logger.info(f"Resultado keys: {resultado.keys() if isinstance(resultado, dict) else 'No es dict'}")
+                except LLMError as e:
+                    # Un error del proveedor no se guarda como resultado
+                    logger.warning(f"⚠️ No se pudo generar el texto ({type(e).__name__}): {e}")
+                    st.error(f"❌ {e}")
+                except Exception as e:
+                    logger.error(f"❌ Error al generar texto: {e}", exc_info=True)
+                    st.exception(e)
+                    st.error(f"❌ Error al generar texto: {str(e)}")
+                    raise
+                
+                if resultado is not None:
                     try:
                         texto_generado = resultado.get("texto", "") if isinstance(resultado, dict) else str(resultado)
                         logger.info(f"Texto generado (primeros 100 chars): {texto_generado[:100]}")
@@ -319,12 +370,13 @@ if accion == "generar":
                             tema=tema,
                             resultado=texto_generado,
                             palabras=palabras,
-                            modelo=f"{config.get('provider', 'openai')}/{config['modelo']}",
+                            modelo=resultado.get("proveedor_usado", f"{config.get('provider', 'openai')}/{config['modelo']}"),
                             config={
                                 "provider": config.get("provider", "openai"),
                                 "temperature": config["temperatura"],
                                 "max_palabras": config["max_palabras"]
-                            }
+                            },
+                            metricas=extraer_metricas(resultado)
                         )
                         logger.info(f"✅ Resultado guardado con ID: {resultado_id}")
                         
@@ -334,9 +386,39 @@ if accion == "generar":
                         
                         st.success("✅ Texto generado exitosamente!")
                         
+                        if resultado.get("parcial"):
+                            st.warning(
+                                "⏱️ Se alcanzó el tiempo máximo de la solicitud: se muestra la respuesta parcial."
+                            )
+                        
+                        if resultado.get("proveedor_solicitado"):
+                            st.info(
+                                f"🔁 {resultado['proveedor_solicitado']} no estaba disponible; "
+                                f"respondió {resultado['proveedor_usado']} (cadena de respaldo)."
+                            )
+                        
                         # Mostrar información de tokens
-                        if resultado.get("tokens_usados"):
-                            st.info(f"📊 Tokens usados: {resultado['tokens_usados']} | Costo: ${resultado.get('costo', 0):.4f}")
+                        if resultado.get("cache_semantico"):
+                            coincidencia = resultado["cache_semantico"]
+                            st.info(
+                                f"♻️ Se reutilizó la respuesta de una solicitud similar "
+                                f"(\"{generar_titulo_resumido(coincidencia['consulta_original'], max_caracteres=60)}\", "
+                                f"similitud {coincidencia['similitud']:.0%}), sin llamar al modelo."
+                            )
+                            st.button(
+                                "🔄 Generar una respuesta nueva",
+                                key="forzar_nueva_generar",
+                                on_click=lambda: st.session_state.update(forzar_nueva_respuesta="generar")
+                            )
+                        elif resultado.get("cache_hit"):
+                            st.info("⚡ Respuesta recuperada de la caché (sin costo adicional)")
+                        elif resultado.get("tokens_usados"):
+                            st.info(
+                                f"📊 Tokens usados: {resultado['tokens_usados']}"
+                                + (f" ({resultado['tokens_cache']} de entrada en caché del proveedor)" if resultado.get("tokens_cache") else "")
+                                + f" | Costo: ${resultado.get('costo', 0):.4f} | "
+                                f"Tiempo: {resultado.get('latencia_segundos', 0):.1f} s"
+                            )
                         logger.info("✅ Proceso de generación completado")
                     except Exception as e:
                         logger.error(f"❌ Error al procesar resultado: {e}", exc_info=True)
@@ -363,7 +445,13 @@ elif accion == "corregir":
         key="instrucciones_corregir"
     )
     
-    if st.button("🔧 Corregir Texto", type="primary", use_container_width=True):
+    # Si el usuario rechazó una respuesta reutilizada, volver a pedirla sin caché
+    forzar_nueva = st.session_state.pop("forzar_nueva_respuesta", None) == "corregir"
+    render_aviso_cancelacion()
+    if texto_original:
+        render_estimacion(st.session_state.agent.estimar_solicitud("corregir", texto_original, instrucciones_adicionales=instrucciones_adicionales))
+    
+    if st.button("🔧 Corregir Texto", type="primary", use_container_width=True) or forzar_nueva:
         logger.info("=" * 80)
         logger.info("BOTÓN PRESIONADO: Corregir Texto")
         logger.info(f"Texto original (primeros 100 chars): {texto_original[:100] if texto_original else 'None'}")
@@ -375,19 +463,32 @@ elif accion == "corregir":
                 st.error("❌ Por favor, ingresa un texto para corregir.")
             else:
                 logger.info("Iniciando corrección de texto...")
-                with st.spinner("⏳ Corrigiendo texto..."):
-                    try:
-                        resultado = st.session_state.agent.corregir_texto(
+                resultado = None
+                token = TokenCancelacion()
+                try:
+                    resultado = render_resultado_stream(
+                        st.session_state.agent.corregir_texto_stream(
                             texto=texto_original,
-                            instrucciones_adicionales=instrucciones_adicionales
-                        )
-                        logger.info("✅ Texto corregido exitosamente")
-                    except Exception as e:
-                        logger.error(f"❌ Error al corregir texto: {e}", exc_info=True)
-                        st.exception(e)
-                        st.error(f"❌ Error al corregir texto: {str(e)}")
-                        raise
-                    
+                            instrucciones_adicionales=instrucciones_adicionales,
+                            usar_cache=config.get("usar_cache", True) and not forzar_nueva,
+                            cache_semantico=config.get("cache_semantico", False),
+                            plazo=crear_plazo("corregir", token)
+                        ),
+                        mensaje_espera="⏳ Corrigiendo texto...",
+                        token=token
+                    )
+                    logger.info("✅ Texto corregido exitosamente")
+                except LLMError as e:
+                    # Un error del proveedor no se guarda como resultado
+                    logger.warning(f"⚠️ No se pudo corregir el texto ({type(e).__name__}): {e}")
+                    st.error(f"❌ {e}")
+                except Exception as e:
+                    logger.error(f"❌ Error al corregir texto: {e}", exc_info=True)
+                    st.exception(e)
+                    st.error(f"❌ Error al corregir texto: {str(e)}")
+                    raise
+                
+                if resultado is not None:
                     try:
                         texto_corregido = resultado.get("texto", "") if isinstance(resultado, dict) else str(resultado)
                         logger.info(f"Texto corregido (primeros 100 chars): {texto_corregido[:100]}")
@@ -402,12 +503,13 @@ elif accion == "corregir":
                             tema=texto_original[:100] + "..." if len(texto_original) > 100 else texto_original,
                             resultado=texto_corregido,
                             palabras=palabras,
-                            modelo=f"{config.get('provider', 'openai')}/{config['modelo']}",
+                            modelo=resultado.get("proveedor_usado", f"{config.get('provider', 'openai')}/{config['modelo']}"),
                             config={
                                 "provider": config.get("provider", "openai"),
                                 "temperature": config["temperatura"],
                                 "instrucciones": instrucciones_adicionales
-                            }
+                            },
+                            metricas=extraer_metricas(resultado)
                         )
                         logger.info(f"✅ Resultado guardado con ID: {resultado_id}")
                         
@@ -417,9 +519,39 @@ elif accion == "corregir":
                         
                         st.success("✅ Texto corregido exitosamente!")
                         
+                        if resultado.get("parcial"):
+                            st.warning(
+                                "⏱️ Se alcanzó el tiempo máximo de la solicitud: se muestra la respuesta parcial."
+                            )
+                        
+                        if resultado.get("proveedor_solicitado"):
+                            st.info(
+                                f"🔁 {resultado['proveedor_solicitado']} no estaba disponible; "
+                                f"respondió {resultado['proveedor_usado']} (cadena de respaldo)."
+                            )
+                        
                         # Mostrar información de tokens
-                        if resultado.get("tokens_usados"):
-                            st.info(f"📊 Tokens usados: {resultado['tokens_usados']} | Costo: ${resultado.get('costo', 0):.4f}")
+                        if resultado.get("cache_semantico"):
+                            coincidencia = resultado["cache_semantico"]
+                            st.info(
+                                f"♻️ Se reutilizó la respuesta de una solicitud similar "
+                                f"(\"{generar_titulo_resumido(coincidencia['consulta_original'], max_caracteres=60)}\", "
+                                f"similitud {coincidencia['similitud']:.0%}), sin llamar al modelo."
+                            )
+                            st.button(
+                                "🔄 Generar una respuesta nueva",
+                                key="forzar_nueva_corregir",
+                                on_click=lambda: st.session_state.update(forzar_nueva_respuesta="corregir")
+                            )
+                        elif resultado.get("cache_hit"):
+                            st.info("⚡ Respuesta recuperada de la caché (sin costo adicional)")
+                        elif resultado.get("tokens_usados"):
+                            st.info(
+                                f"📊 Tokens usados: {resultado['tokens_usados']}"
+                                + (f" ({resultado['tokens_cache']} de entrada en caché del proveedor)" if resultado.get("tokens_cache") else "")
+                                + f" | Costo: ${resultado.get('costo', 0):.4f} | "
+                                f"Tiempo: {resultado.get('latencia_segundos', 0):.1f} s"
+                            )
                         logger.info("✅ Proceso de corrección completado")
                     except Exception as e:
                         logger.error(f"❌ Error al procesar resultado: {e}", exc_info=True)
@@ -446,7 +578,13 @@ elif accion == "resumir":
         key="instrucciones_resumir"
     )
     
-    if st.button("📝 Resumir Texto", type="primary", use_container_width=True):
+    # Si el usuario rechazó una respuesta reutilizada, volver a pedirla sin caché
+    forzar_nueva = st.session_state.pop("forzar_nueva_respuesta", None) == "resumir"
+    render_aviso_cancelacion()
+    if texto_original:
+        render_estimacion(st.session_state.agent.estimar_solicitud("resumir", texto_original, config["max_palabras"], instrucciones_adicionales))
+    
+    if st.button("📝 Resumir Texto", type="primary", use_container_width=True) or forzar_nueva:
         logger.info("=" * 80)
         logger.info("BOTÓN PRESIONADO: Resumir Texto")
         logger.info(f"Texto original (primeros 100 chars): {texto_original[:100] if texto_original else 'None'}")
@@ -458,20 +596,33 @@ elif accion == "resumir":
                 st.error("❌ Por favor, ingresa un texto para resumir.")
             else:
                 logger.info("Iniciando resumen de texto...")
-                with st.spinner("⏳ Resumiendo texto..."):
-                    try:
-                        resultado = st.session_state.agent.resumir_texto(
+                resultado = None
+                token = TokenCancelacion()
+                try:
+                    resultado = render_resultado_stream(
+                        st.session_state.agent.resumir_texto_stream(
                             texto=texto_original,
                             max_palabras=config["max_palabras"],
-                            instrucciones_adicionales=instrucciones_adicionales
-                        )
-                        logger.info("✅ Texto resumido exitosamente")
-                    except Exception as e:
-                        logger.error(f"❌ Error al resumir texto: {e}", exc_info=True)
-                        st.exception(e)
-                        st.error(f"❌ Error al resumir texto: {str(e)}")
-                        raise
-                    
+                            instrucciones_adicionales=instrucciones_adicionales,
+                            usar_cache=config.get("usar_cache", True) and not forzar_nueva,
+                            cache_semantico=config.get("cache_semantico", False),
+                            plazo=crear_plazo("resumir", token)
+                        ),
+                        mensaje_espera="⏳ Resumiendo texto...",
+                        token=token
+                    )
+                    logger.info("✅ Texto resumido exitosamente")
+                except LLMError as e:
+                    # Un error del proveedor no se guarda como resultado
+                    logger.warning(f"⚠️ No se pudo resumir el texto ({type(e).__name__}): {e}")
+                    st.error(f"❌ {e}")
+                except Exception as e:
+                    logger.error(f"❌ Error al resumir texto: {e}", exc_info=True)
+                    st.exception(e)
+                    st.error(f"❌ Error al resumir texto: {str(e)}")
+                    raise
+                
+                if resultado is not None:
                     try:
                         texto_resumido = resultado.get("texto", "") if isinstance(resultado, dict) else str(resultado)
                         logger.info(f"Texto resumido (primeros 100 chars): {texto_resumido[:100]}")
@@ -486,13 +637,14 @@ elif accion == "resumir":
                             tema=texto_original[:100] + "..." if len(texto_original) > 100 else texto_original,
                             resultado=texto_resumido,
                             palabras=palabras,
-                            modelo=f"{config.get('provider', 'openai')}/{config['modelo']}",
+                            modelo=resultado.get("proveedor_usado", f"{config.get('provider', 'openai')}/{config['modelo']}"),
                             config={
                                 "provider": config.get("provider", "openai"),
                                 "temperature": config["temperatura"],
                                 "max_palabras": config["max_palabras"],
                                 "instrucciones": instrucciones_adicionales
-                            }
+                            },
+                            metricas=extraer_metricas(resultado)
                         )
                         logger.info(f"✅ Resultado guardado con ID: {resultado_id}")
                         
@@ -502,9 +654,44 @@ elif accion == "resumir":
                         
                         st.success("✅ Texto resumido exitosamente!")
                         
+                        if resultado.get("parcial"):
+                            st.warning(
+                                "⏱️ Se alcanzó el tiempo máximo de la solicitud: se muestra la respuesta parcial."
+                            )
+                        
+                        if resultado.get("proveedor_solicitado"):
+                            st.info(
+                                f"🔁 {resultado['proveedor_solicitado']} no estaba disponible; "
+                                f"respondió {resultado['proveedor_usado']} (cadena de respaldo)."
+                            )
+                        
                         # Mostrar información de tokens
-                        if resultado.get("tokens_usados"):
-                            st.info(f"📊 Tokens usados: {resultado['tokens_usados']} | Costo: ${resultado.get('costo', 0):.4f}")
+                        if resultado.get("cache_semantico"):
+                            coincidencia = resultado["cache_semantico"]
+                            st.info(
+                                f"♻️ Se reutilizó la respuesta de una solicitud similar "
+                                f"(\"{generar_titulo_resumido(coincidencia['consulta_original'], max_caracteres=60)}\", "
+                                f"similitud {coincidencia['similitud']:.0%}), sin llamar al modelo."
+                            )
+                            st.button(
+                                "🔄 Generar una respuesta nueva",
+                                key="forzar_nueva_resumir",
+                                on_click=lambda: st.session_state.update(forzar_nueva_respuesta="resumir")
+                            )
+                        elif resultado.get("cache_hit"):
+                            st.info("⚡ Respuesta recuperada de la caché (sin costo adicional)")
+                        elif resultado.get("tokens_usados"):
+                            st.info(
+                                f"📊 Tokens usados: {resultado['tokens_usados']}"
+                                + (f" ({resultado['tokens_cache']} de entrada en caché del proveedor)" if resultado.get("tokens_cache") else "")
+                                + f" | Costo: ${resultado.get('costo', 0):.4f} | "
+                                f"Tiempo: {resultado.get('latencia_segundos', 0):.1f} s"
+                            )
+                        if resultado.get("fragmentos"):
+                            st.caption(
+                                f"🧩 Texto largo resumido por partes: {resultado['fragmentos']} resúmenes parciales "
+                                f"({resultado.get('fragmentos_reutilizados', 0)} reutilizados de la caché)"
+                            )
                         logger.info("✅ Proceso de resumen completado")
                     except Exception as e:
                         logger.error(f"❌ Error al procesar resultado: {e}", exc_info=True)
@@ -610,6 +797,16 @@ def mostrar_registro(registro: Dict, es_rechazado: bool = False, tab_prefix: str
     # Formatear el título del expander: Acción - Título Resumido - ID
     titulo_expander = f"{icono} {accion.capitalize()} - {titulo_resumido} - {resultado_id}"
     
+    # Métricas de la solicitud (solo en los resultados guardados con el registro de uso)
+    metricas = registro.get("metricas") or {}
+    uso_html = ""
+    if metricas:
+        uso = "Caché" if metricas.get("cache_hit") else f"{metricas.get('tokens_usados', 0)} tokens · ${metricas.get('costo', 0):.4f}"
+        uso_html = (
+            f'<p style="margin: 0.25rem 0;"><strong>Uso:</strong> {uso} · '
+            f'{metricas.get("latencia_segundos", 0):.1f} s</p>'
+        )
+    
     with st.expander(titulo_expander, expanded=False):
         col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
         
@@ -625,6 +822,7 @@ def mostrar_registro(registro: Dict, es_rechazado: bool = False, tab_prefix: str
                 <p style="margin: 0.25rem 0;"><strong>Tema:</strong> {registro['tema']}</p>
                 <p style="margin: 0.25rem 0;"><strong>Palabras:</strong> {registro['palabras']}</p>
                 <p style="margin: 0.25rem 0;"><strong>Modelo:</strong> {registro['modelo']}</p>
+                {uso_html}
                 </div>
                 """,
                 unsafe_allow_html=True
@@ -4,6 +4,8 @@
 from app.utils.langchain_agent import LangChainAgent
 from app.utils.io_manager import IOManager
 from app.utils.feedback_manager import FeedbackManager
+from app.utils.llm_errors import LLMError
+from app.utils.deadlines import TokenCancelacion, crear_plazo
 
 # Importación robusta de empresa_config para evitar errores en Streamlit Cloud
 try:
@@ -14,8 +16,11 @@ except (ImportError, KeyError, ModuleNotFoundError):
         """Clase stub cuando empresa_config no está disponible."""
         def get_contexto_completo(self):
             return ""
+        
+        def get_version(self):
+            return ""
     
-    def get_empresa_config(config_path=None):
+    def get_empresa_config(config_path=None, empresa=None):
         """Función stub cuando empresa_config no está disponible."""
         return EmpresaConfig()
 
@@ -32,6 +37,9 @@ __all__ = [
     "LangChainAgent",
     "IOManager",
     "FeedbackManager",
+    "LLMError",
+    "TokenCancelacion",
+    "crear_plazo",
     "EmpresaConfig",
     "get_empresa_config",
     "contar_palabras",
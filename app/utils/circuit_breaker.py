@@ -0,0 +1,232 @@
+"""
+Módulo de cortocircuito (circuit breaker) por proveedor y modelo.
+Si un proveedor/modelo acumula demasiadas fallas en poco tiempo, el circuito se
+abre y las llamadas fallan de inmediato en lugar de esperar el timeout del SDK.
+Pasado un tiempo, una sola llamada de prueba decide si se vuelve a cerrar.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional
+
+from app.utils.llm_errors import LLMError
+from app.utils.rate_limiter import EsperaExcedidaError
+from app.utils.deadlines import CanceladoError, PlazoVencidoError
+
+
+# Estados del circuito
+CERRADO = "cerrado"
+ABIERTO = "abierto"
+SEMIABIERTO = "semiabierto"
+
+
+class CircuitoAbiertoError(LLMError):
+    """El proveedor/modelo falló repetidamente y no se llama hasta la próxima prueba."""
+    # Otro proveedor de la cadena de respaldo sí puede responder
+    cambiar_proveedor = True
+
+
+# Errores que se producen antes de llegar al proveedor: no dicen nada de su estado
+_ERRORES_LOCALES = (CircuitoAbiertoError, EsperaExcedidaError, CanceladoError, PlazoVencidoError)
+
+
+def cuenta_como_falla(error: Optional[BaseException]) -> bool:
+    """
+    Indica si un error muestra que el proveedor no puede responder.
+    
+    Args:
+        error: Error de la llamada (None si fue exitosa)
+    
+    Returns:
+        True para caídas, timeouts, límites de uso, cuota agotada y modelo no disponible.
+        Los errores de la propia solicitud (API key, contenido) y los locales (esperas, cancelación) no cuentan.
+    """
+    if not isinstance(error, LLMError) or isinstance(error, _ERRORES_LOCALES):
+        return False
+    return error.cambiar_proveedor
+
+
+class Circuito:
+    """Circuito de un proveedor/modelo: cerrado, abierto o semiabierto."""
+    
+    def __init__(
+        self,
+        nombre: str,
+        umbral_fallas: int = 5,
+        ventana_segundos: float = 60.0,
+        espera_segundos: float = 30.0
+    ):
+        """
+        Inicializa el circuito (cerrado).
+        
+        Args:
+            nombre: 'proveedor/modelo' (para los mensajes)
+            umbral_fallas: Fallas dentro de la ventana que abren el circuito
+            ventana_segundos: Período en que se cuentan las fallas
+            espera_segundos: Tiempo que el circuito queda abierto antes de la llamada de prueba
+        """
+        self.nombre = nombre
+        self.umbral_fallas = umbral_fallas
+        self.ventana_segundos = ventana_segundos
+        self.espera_segundos = espera_segundos
+        
+        self.estado = CERRADO
+        self._fallas: Deque[float] = deque()
+        self._abierto_desde = 0.0
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+        
+        self.aperturas = 0
+        self.rechazadas = 0
+    
+    def permitir(self, provider: str = "") -> bool:
+        """
+        Verifica que se pueda llamar al proveedor. Con el circuito abierto, la primera
+        llamada después de la espera pasa como prueba (semiabierto) y el resto se rechaza.
+        
+        Cada llamada permitida debe informar su resultado con `registrar`.
+        
+        Args:
+            provider: Proveedor (para el error)
+        
+        Returns:
+            True si la llamada es la prueba del circuito semiabierto
+        
+        Raises:
+            CircuitoAbiertoError: Si el circuito está abierto o ya hay una prueba en curso
+        """
+        with self._lock:
+            if self.estado == CERRADO:
+                return False
+            restante = self.espera_segundos - (time.monotonic() - self._abierto_desde)
+            if self.estado == ABIERTO and restante <= 0:
+                self.estado = SEMIABIERTO
+            if self.estado == SEMIABIERTO and not self._prueba_en_curso:
+                self._prueba_en_curso = True
+                return True
+            self.rechazadas += 1
+        raise CircuitoAbiertoError(
+            f"{self.nombre} falló varias veces seguidas; se volverá a probar en {max(restante, 0):.0f} segundos",
+            provider=provider,
+            retry_after=max(restante, 0.0)
+        )
+    
+    def registrar(self, error: Optional[BaseException] = None, prueba: bool = False):
+        """
+        Registra el resultado de una llamada permitida.
+        
+        Args:
+            error: Error de la llamada, o None si fue exitosa
+            prueba: Lo que retornó `permitir` para esta llamada
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            if prueba:
+                self._prueba_en_curso = False
+            if cuenta_como_falla(error):
+                self._fallas.append(ahora)
+                while self._fallas and ahora - self._fallas[0] > self.ventana_segundos:
+                    self._fallas.popleft()
+                if self.estado == SEMIABIERTO or len(self._fallas) >= self.umbral_fallas:
+                    if self.estado != ABIERTO:
+                        self.aperturas += 1
+                    self.estado = ABIERTO
+                    self._abierto_desde = ahora
+            elif prueba and (error is None or isinstance(error, LLMError)) and not isinstance(error, _ERRORES_LOCALES):
+                # El proveedor respondió a la prueba (aunque sea con un error de la solicitud)
+                self.estado = CERRADO
+                self._fallas.clear()
+            # Otras excepciones (cancelación) solo liberan la prueba en curso
+    
+    @contextmanager
+    def proteger(self, provider: str = "") -> Iterator[None]:
+        """
+        Envuelve una llamada: la rechaza si el circuito está abierto y registra su resultado.
+        
+        Args:
+            provider: Proveedor (para el error)
+        
+        Raises:
+            CircuitoAbiertoError: Si el circuito está abierto o ya hay una prueba en curso
+        """
+        prueba = self.permitir(provider)
+        try:
+            yield
+        except BaseException as e:
+            self.registrar(e, prueba)
+            raise
+        self.registrar(None, prueba)
+    
+    def disponible(self) -> bool:
+        """Indica si una llamada ahora sería permitida (sin consumir la prueba)."""
+        with self._lock:
+            if self.estado == ABIERTO:
+                return time.monotonic() - self._abierto_desde >= self.espera_segundos
+            return not (self.estado == SEMIABIERTO and self._prueba_en_curso)
+    
+    def get_estado(self) -> Dict:
+        """Retorna el estado, las fallas recientes y los segundos hasta la próxima prueba."""
+        with self._lock:
+            restante = 0.0
+            if self.estado == ABIERTO:
+                restante = max(0.0, self.espera_segundos - (time.monotonic() - self._abierto_desde))
+            return {
+                "estado": self.estado,
+                "fallas": len(self._fallas),
+                "proxima_prueba": restante,
+                "aperturas": self.aperturas,
+                "rechazadas": self.rechazadas
+            }
+
+
+# Un circuito por proveedor/modelo, compartido por todo el proceso
+_circuitos: Dict[str, Circuito] = {}
+_circuitos_lock = threading.Lock()
+
+
+def get_circuito(provider: str, model_name: str) -> Circuito:
+    """
+    Obtiene el circuito de un proveedor/modelo.
+    
+    Se configura con LLM_CIRCUITO_FALLAS, LLM_CIRCUITO_VENTANA_SEGUNDOS y
+    LLM_CIRCUITO_ESPERA_SEGUNDOS.
+    
+    Args:
+        provider: Proveedor de IA
+        model_name: Modelo
+    
+    Returns:
+        Instancia de Circuito
+    """
+    clave = f"{provider}/{model_name}"
+    if clave not in _circuitos:
+        with _circuitos_lock:
+            if clave not in _circuitos:
+                try:
+                    umbral_fallas = max(1, int(os.getenv("LLM_CIRCUITO_FALLAS", "5")))
+                    ventana = float(os.getenv("LLM_CIRCUITO_VENTANA_SEGUNDOS", "60"))
+                    espera = float(os.getenv("LLM_CIRCUITO_ESPERA_SEGUNDOS", "30"))
+                except ValueError:
+                    umbral_fallas, ventana, espera = 5, 60.0, 30.0
+                _circuitos[clave] = Circuito(
+                    clave,
+                    umbral_fallas=umbral_fallas,
+                    ventana_segundos=ventana,
+                    espera_segundos=espera
+                )
+    return _circuitos[clave]
+
+
+def get_estados_circuitos() -> Dict[str, Dict]:
+    """
+    Retorna el estado del circuito de cada proveedor/modelo usado hasta ahora.
+    
+    Returns:
+        Dict {'proveedor/modelo': {estado, fallas, proxima_prueba, ...}}
+    """
+    with _circuitos_lock:
+        circuitos = dict(_circuitos)
+    return {clave: circuito.get_estado() for clave, circuito in circuitos.items()}
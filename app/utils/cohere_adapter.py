@@ -0,0 +1,241 @@
+"""
+Adaptador directo del SDK de Cohere.
+Se usa cuando langchain-cohere no es compatible con la versión instalada del SDK
+(error conocido con `token_count` / `NonStreamedChatResponse`). Comparte un solo
+cliente de Cohere (y sus conexiones HTTP) por proceso, convierte los mensajes de
+LangChain al formato de chat de Cohere y reporta el uso real de tokens.
+"""
+
+import os
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from app.utils.provider_registry import importar_modulo
+from app.utils.deadlines import get_plazo_maximo
+
+
+# Fragmentos del mensaje del error conocido de langchain-cohere
+_SENALES_INCOMPATIBILIDAD = ("token_count", "NonStreamedChatResponse")
+
+# Roles de LangChain en el historial de chat de Cohere
+_ROLES = {"human": "USER", "ai": "CHATBOT"}
+
+_clientes: Dict[str, Any] = {}
+_clientes_lock = threading.Lock()
+
+# Se activa con el primer error de compatibilidad (o con COHERE_SDK_DIRECTO=true)
+_sdk_directo = os.getenv("COHERE_SDK_DIRECTO", "false").lower() in ("true", "1", "si", "yes")
+
+
+def es_error_compatibilidad(e: BaseException) -> bool:
+    """Indica si la excepción es el error conocido de langchain-cohere con la respuesta del SDK."""
+    return isinstance(e, (AttributeError, TypeError)) and any(senal in str(e) for senal in _SENALES_INCOMPATIBILIDAD)
+
+
+def usar_sdk_directo() -> bool:
+    """Indica si las llamadas a Cohere deben ir directo al SDK en lugar de langchain-cohere."""
+    return _sdk_directo
+
+
+def marcar_incompatible():
+    """
+    Registra que langchain-cohere falló con el SDK instalado.
+    
+    langchain-cohere falla después de recibir la respuesta (ya cobrada); a partir de
+    aquí el resto de las llamadas del proceso van directo al SDK.
+    """
+    global _sdk_directo
+    _sdk_directo = True
+
+
+def get_cliente_cohere(api_key: Optional[str] = None):
+    """
+    Obtiene el cliente de Cohere compartido por el proceso, creándolo la primera vez.
+    
+    Args:
+        api_key: API key (por defecto COHERE_API_KEY)
+    
+    Returns:
+        Instancia de cohere.Client
+    
+    Raises:
+        ValueError: Si no hay API key configurada
+    """
+    api_key = api_key or os.getenv("COHERE_API_KEY")
+    if not api_key:
+        raise ValueError("COHERE_API_KEY no está configurada. Por favor, configura tu API key.")
+    
+    if api_key not in _clientes:
+        with _clientes_lock:
+            if api_key not in _clientes:
+                cohere = importar_modulo("cohere")
+                # Las llamadas acotan su propio timeout con `request_options`
+                _clientes[api_key] = cohere.Client(api_key=api_key, timeout=get_plazo_maximo())
+    return _clientes[api_key]
+
+
+def _texto_mensaje(mensaje) -> str:
+    contenido = getattr(mensaje, "content", mensaje)
+    if isinstance(contenido, list):
+        return "".join(
+            str(parte.get("text", "")) if isinstance(parte, dict) else str(parte)
+            for parte in contenido
+        )
+    return str(contenido or "")
+
+
+def convertir_mensajes(messages: List) -> Dict[str, Any]:
+    """
+    Convierte mensajes de LangChain a los parámetros de `chat` de Cohere.
+    
+    Los mensajes de sistema forman el `preamble`, el último mensaje del usuario es
+    `message` y los anteriores van en `chat_history`.
+    
+    Args:
+        messages: Lista de mensajes de LangChain
+    
+    Returns:
+        Dict con 'message' y, si corresponde, 'preamble' y 'chat_history'
+    """
+    sistema = []
+    historial = []
+    for mensaje in messages:
+        tipo = str(getattr(mensaje, "type", "human")).lower()
+        if tipo == "system":
+            sistema.append(_texto_mensaje(mensaje))
+        else:
+            historial.append({"role": _ROLES.get(tipo, "USER"), "message": _texto_mensaje(mensaje)})
+    
+    # Cohere espera que el mensaje actual sea del usuario
+    indice = next((i for i in range(len(historial) - 1, -1, -1) if historial[i]["role"] == "USER"), None)
+    actual = historial.pop(indice)["message"] if indice is not None else ""
+    
+    parametros = {"message": actual}
+    if sistema:
+        parametros["preamble"] = "\n\n".join(sistema)
+    if historial:
+        parametros["chat_history"] = historial
+    return parametros
+
+
+def extraer_uso(respuesta) -> Optional[Dict[str, int]]:
+    """
+    Obtiene el uso de tokens de una respuesta de Cohere.
+    
+    Args:
+        respuesta: NonStreamedChatResponse (o el `response` del evento 'stream-end')
+    
+    Returns:
+        Dict con input_tokens, output_tokens y total_tokens, o None si no viene
+    """
+    meta = getattr(respuesta, "meta", None)
+    for origen in (getattr(meta, "billed_units", None), getattr(meta, "tokens", None)):
+        entrada = int(getattr(origen, "input_tokens", 0) or 0)
+        salida = int(getattr(origen, "output_tokens", 0) or 0)
+        if entrada or salida:
+            return {"input_tokens": entrada, "output_tokens": salida, "total_tokens": entrada + salida}
+    return None
+
+
+def _opciones(temperature: float, timeout: Optional[float]) -> Dict[str, Any]:
+    opciones: Dict[str, Any] = {"temperature": temperature}
+    if timeout:
+        opciones["request_options"] = {"timeout_in_seconds": max(1, math.ceil(timeout))}
+    return opciones
+
+
+def invocar(model_name: str, messages: List, temperature: float, timeout: Optional[float] = None) -> AIMessage:
+    """
+    Hace una llamada de chat con el cliente compartido.
+    
+    Args:
+        model_name: Modelo de Cohere
+        messages: Lista de mensajes de LangChain
+        temperature: Temperatura
+        timeout: Segundos máximos para la respuesta
+    
+    Returns:
+        AIMessage con el texto y `usage_metadata` (como el de cualquier cliente de LangChain)
+    """
+    respuesta = get_cliente_cohere().chat(
+        model=model_name,
+        **convertir_mensajes(messages),
+        **_opciones(temperature, timeout)
+    )
+    texto = getattr(respuesta, "text", None)
+    return AIMessage(
+        content=texto if texto is not None else str(respuesta),
+        usage_metadata=extraer_uso(respuesta),
+        response_metadata={"finish_reason": getattr(respuesta, "finish_reason", None)}
+    )
+
+
+def stream(
+    model_name: str,
+    messages: List,
+    temperature: float,
+    timeout: Optional[float] = None
+) -> Iterator[AIMessageChunk]:
+    """
+    Hace una llamada de chat en streaming con el cliente compartido.
+    
+    Args:
+        model_name: Modelo de Cohere
+        messages: Lista de mensajes de LangChain
+        temperature: Temperatura
+        timeout: Segundos máximos para la respuesta
+    
+    Yields:
+        AIMessageChunk con cada fragmento de texto; el último trae `usage_metadata`
+    """
+    eventos = get_cliente_cohere().chat_stream(
+        model=model_name,
+        **convertir_mensajes(messages),
+        **_opciones(temperature, timeout)
+    )
+    for evento in eventos:
+        tipo = getattr(evento, "event_type", None)
+        if tipo == "text-generation":
+            yield AIMessageChunk(content=getattr(evento, "text", "") or "")
+        elif tipo == "stream-end":
+            respuesta = getattr(evento, "response", None)
+            yield AIMessageChunk(
+                content="",
+                usage_metadata=extraer_uso(respuesta),
+                response_metadata={"finish_reason": getattr(evento, "finish_reason", None)}
+            )
+
+
+def invocar_lote(
+    model_name: str,
+    lote_mensajes: List[List],
+    temperature: float,
+    max_concurrencia: int = 4,
+    timeout: Optional[float] = None
+) -> List[Union[AIMessage, Exception]]:
+    """
+    Responde un lote de conversaciones en paralelo con el cliente compartido.
+    
+    Args:
+        model_name: Modelo de Cohere
+        lote_mensajes: Una lista de mensajes por conversación
+        temperature: Temperatura
+        max_concurrencia: Llamadas simultáneas
+        timeout: Segundos máximos para cada respuesta
+    
+    Returns:
+        Un AIMessage o la excepción de cada conversación, en el mismo orden
+        (como `llm.batch(..., return_exceptions=True)`)
+    """
+    def responder(messages: List) -> Union[AIMessage, Exception]:
+        try:
+            return invocar(model_name, messages, temperature, timeout)
+        except Exception as e:
+            return e
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrencia, len(lote_mensajes) or 1))) as ejecutor:
+        return list(ejecutor.map(responder, lote_mensajes))
@@ -0,0 +1,324 @@
+"""
+Módulo de control adaptativo de concurrencia.
+Ajusta cuántas llamadas simultáneas se hacen a cada proveedor con AIMD
+(aumento aditivo, disminución multiplicativa): sube el límite mientras las
+respuestas son sanas y lo reduce a la mitad ante errores 429, 5xx o timeouts.
+Sirve tanto a llamadas síncronas (hilos) como asíncronas (asyncio).
+"""
+
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, Optional, Union
+
+from app.utils.llm_errors import LLMError
+from app.utils.rate_limiter import EsperaExcedidaError
+from app.utils.deadlines import CanceladoError, TokenCancelacion
+
+
+# Cada cuánto revisa una llamada en espera si se canceló
+INTERVALO_REVISION_SEGUNDOS = 0.5
+
+# Resultado de una llamada, tal como lo clasifica `clasificar_resultado`
+RESULTADO_OK = "ok"
+RESULTADO_SOBRECARGA = "sobrecarga"
+RESULTADO_ERROR = "error"
+
+
+def clasificar_resultado(resultado: Union[Dict, BaseException, None]) -> str:
+    """
+    Clasifica el resultado de una llamada al LLM para el control de concurrencia.
+    
+    Args:
+        resultado: Dict retornado por el agente, el LLMError que lanzó o None si la llamada no terminó
+    
+    Returns:
+        RESULTADO_OK, RESULTADO_SOBRECARGA (429, 5xx o timeout) o RESULTADO_ERROR
+    """
+    if isinstance(resultado, BaseException):
+        return RESULTADO_SOBRECARGA if getattr(resultado, "sobrecarga", False) else RESULTADO_ERROR
+    if not resultado or resultado.get("error"):
+        return RESULTADO_ERROR
+    return RESULTADO_OK
+
+
+def _leer_entero(variables, por_defecto: int) -> int:
+    """Lee el primer entero válido de una lista de variables de entorno."""
+    for variable in variables:
+        valor = os.getenv(variable)
+        if valor:
+            try:
+                return max(1, int(valor))
+            except ValueError:
+                pass
+    return por_defecto
+
+
+class LimitadorAdaptativo:
+    """Límite de llamadas en curso de un proveedor, ajustado con AIMD."""
+    
+    def __init__(
+        self,
+        limite_inicial: int = 4,
+        limite_minimo: int = 1,
+        limite_maximo: int = 16,
+        max_espera_segundos: float = 60.0,
+        factor_latencia: float = 3.0
+    ):
+        """
+        Inicializa el limitador.
+        
+        Args:
+            limite_inicial: Llamadas simultáneas permitidas al comenzar
+            limite_minimo: El límite nunca baja de este valor
+            limite_maximo: El límite nunca sube de este valor
+            max_espera_segundos: Tiempo máximo que una llamada espera un lugar
+            factor_latencia: Una latencia mayor que factor × la mínima observada no hace crecer el límite
+        """
+        self.limite_minimo = limite_minimo
+        self.limite_maximo = max(limite_maximo, limite_minimo)
+        self.limite = float(min(max(limite_inicial, limite_minimo), self.limite_maximo))
+        self.max_espera_segundos = max_espera_segundos
+        self.factor_latencia = factor_latencia
+        
+        self.en_curso = 0
+        self.latencia_minima: Optional[float] = None
+        self._ultimo_recorte = 0.0
+        # Llamadas en espera, en orden de llegada: (lugares, threading.Event o (loop, Future))
+        self._espera: deque = deque()
+        self._lock = threading.Lock()
+        
+        self.exitosas = 0
+        self.sobrecargas = 0
+        self.recortes = 0
+    
+    def _capacidad(self) -> int:
+        return max(self.limite_minimo, int(self.limite))
+    
+    def _cabe(self, cantidad: int) -> bool:
+        """
+        Indica si hay lugar para `cantidad` llamadas más (con el lock tomado). Sin nada
+        en curso siempre hay lugar, aunque se pidan más lugares que el límite.
+        """
+        return self.en_curso == 0 or self.en_curso + cantidad <= self._capacidad()
+    
+    def _despachar(self):
+        """Da lugar a las llamadas en espera, en orden, mientras haya capacidad (con el lock tomado)."""
+        while self._espera and self._cabe(self._espera[0][0]):
+            cantidad, senal = self._espera.popleft()
+            self.en_curso += cantidad
+            if isinstance(senal, threading.Event):
+                senal.set()
+            else:
+                loop, futuro = senal
+                loop.call_soon_threadsafe(_resolver_futuro, futuro)
+    
+    def _error_espera(self, provider: str, cancelado: bool = False) -> LLMError:
+        if cancelado:
+            return CanceladoError("Se canceló la solicitud", provider=provider)
+        return EsperaExcedidaError(
+            f"Demasiadas solicitudes en curso para {provider}. Intenta de nuevo en unos momentos."
+        )
+    
+    @staticmethod
+    def _intervalo(segundos: float, token: Optional[TokenCancelacion]) -> float:
+        """Acota una espera para revisar la cancelación cada tanto."""
+        return segundos if token is None else min(segundos, INTERVALO_REVISION_SEGUNDOS)
+    
+    def adquirir(
+        self,
+        provider: str = "",
+        timeout: Optional[float] = None,
+        token: Optional[TokenCancelacion] = None,
+        cantidad: int = 1
+    ):
+        """
+        Espera un lugar para hacer una llamada (versión síncrona).
+        
+        Args:
+            provider: Proveedor (solo para el mensaje de error)
+            timeout: Segundos máximos de espera (por defecto max_espera_segundos)
+            token: Token de cancelación; interrumpe la espera
+            cantidad: Lugares que se ocupan (un envío por lotes ocupa uno por llamada simultánea)
+        
+        Raises:
+            EsperaExcedidaError: Si no hubo lugar dentro del tiempo máximo
+            CanceladoError: Si se canceló la solicitud mientras esperaba
+        """
+        with self._lock:
+            if not self._espera and self._cabe(cantidad):
+                self.en_curso += cantidad
+                return
+            evento = threading.Event()
+            esperando = (cantidad, evento)
+            self._espera.append(esperando)
+        
+        fin = time.monotonic() + (self.max_espera_segundos if timeout is None else timeout)
+        while True:
+            restante = fin - time.monotonic()
+            if evento.wait(self._intervalo(max(0.0, restante), token)):
+                return
+            cancelado = token is not None and token.cancelado
+            if restante <= 0 or cancelado:
+                with self._lock:
+                    if esperando in self._espera:
+                        self._espera.remove(esperando)
+                        # La siguiente en la fila quizás pide menos lugares
+                        self._despachar()
+                        raise self._error_espera(provider, cancelado)
+                # Se le dio lugar justo al vencer la espera
+                return
+    
+    async def aadquirir(
+        self,
+        provider: str = "",
+        timeout: Optional[float] = None,
+        token: Optional[TokenCancelacion] = None,
+        cantidad: int = 1
+    ):
+        """
+        Espera un lugar para hacer una llamada (versión asíncrona).
+        
+        Args:
+            provider: Proveedor (solo para el mensaje de error)
+            timeout: Segundos máximos de espera (por defecto max_espera_segundos)
+            token: Token de cancelación; interrumpe la espera
+            cantidad: Lugares que se ocupan (un envío por lotes ocupa uno por llamada simultánea)
+        
+        Raises:
+            EsperaExcedidaError: Si no hubo lugar dentro del tiempo máximo
+            CanceladoError: Si se canceló la solicitud mientras esperaba
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._espera and self._cabe(cantidad):
+                self.en_curso += cantidad
+                return
+            futuro = loop.create_future()
+            esperando = (cantidad, (loop, futuro))
+            self._espera.append(esperando)
+        
+        fin = time.monotonic() + (self.max_espera_segundos if timeout is None else timeout)
+        try:
+            while True:
+                restante = fin - time.monotonic()
+                cancelado = token is not None and token.cancelado
+                if restante <= 0 or cancelado:
+                    with self._lock:
+                        if esperando in self._espera:
+                            self._espera.remove(esperando)
+                            self._despachar()
+                            raise self._error_espera(provider, cancelado)
+                    # Se le dio lugar justo al vencer la espera
+                    return
+                try:
+                    await asyncio.wait_for(asyncio.shield(futuro), self._intervalo(restante, token))
+                    return
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            with self._lock:
+                if esperando in self._espera:
+                    self._espera.remove(esperando)
+                    self._despachar()
+                    raise
+            # Ya se le había dado lugar: devolverlo
+            self.liberar(0.0, RESULTADO_ERROR, cantidad)
+            raise
+    
+    def liberar(self, latencia: float, resultado: str, cantidad: int = 1):
+        """
+        Libera el lugar de una llamada terminada y ajusta el límite.
+        
+        Args:
+            latencia: Segundos que tardó la llamada
+            resultado: RESULTADO_OK, RESULTADO_SOBRECARGA o RESULTADO_ERROR
+            cantidad: Lugares que se ocuparon (los mismos que en `adquirir`)
+        """
+        with self._lock:
+            self.en_curso = max(0, self.en_curso - cantidad)
+            ahora = time.monotonic()
+            
+            if resultado == RESULTADO_SOBRECARGA:
+                self.sobrecargas += 1
+                # Un solo recorte por ráfaga: las llamadas que ya estaban en curso
+                # cuando empezó la sobrecarga no vuelven a reducir el límite
+                ventana = self.latencia_minima or 1.0
+                if ahora - self._ultimo_recorte > ventana:
+                    self.limite = max(float(self.limite_minimo), self.limite / 2)
+                    self._ultimo_recorte = ahora
+                    self.recortes += 1
+            elif resultado == RESULTADO_OK and latencia > 0:
+                self.exitosas += cantidad
+                if self.latencia_minima is None or latencia < self.latencia_minima:
+                    self.latencia_minima = latencia
+                else:
+                    # La mínima sube lentamente para adaptarse a cambios del proveedor
+                    self.latencia_minima *= 1.01
+                if latencia <= self.latencia_minima * self.factor_latencia:
+                    # Aumento aditivo: +1 por cada "límite" de llamadas sanas
+                    self.limite = min(float(self.limite_maximo), self.limite + cantidad / self.limite)
+            
+            self._despachar()
+    
+    def get_estado(self) -> Dict:
+        """Retorna el límite actual y los contadores del limitador."""
+        with self._lock:
+            return {
+                "limite": self._capacidad(),
+                "en_curso": self.en_curso,
+                "en_espera": len(self._espera),
+                "exitosas": self.exitosas,
+                "sobrecargas": self.sobrecargas,
+                "recortes": self.recortes,
+                "latencia_minima": self.latencia_minima
+            }
+
+
+def _resolver_futuro(futuro: asyncio.Future):
+    if not futuro.done():
+        futuro.set_result(None)
+
+
+# Un limitador por proveedor, compartido por todo el proceso
+_limitadores: Dict[str, LimitadorAdaptativo] = {}
+_limitadores_lock = threading.Lock()
+
+
+def get_limitador_concurrencia(provider: str) -> LimitadorAdaptativo:
+    """
+    Obtiene el limitador adaptativo de un proveedor.
+    
+    El límite inicial se configura con LLM_MAX_CONCURRENCIA_<PROVEEDOR> o
+    LLM_MAX_CONCURRENCIA, y el máximo con LLM_CONCURRENCIA_TOPE_<PROVEEDOR> o
+    LLM_CONCURRENCIA_TOPE.
+    
+    Args:
+        provider: Proveedor de IA
+    
+    Returns:
+        Instancia de LimitadorAdaptativo
+    """
+    if provider not in _limitadores:
+        with _limitadores_lock:
+            if provider not in _limitadores:
+                sufijo = provider.upper()
+                _limitadores[provider] = LimitadorAdaptativo(
+                    limite_inicial=_leer_entero([f"LLM_MAX_CONCURRENCIA_{sufijo}", "LLM_MAX_CONCURRENCIA"], 4),
+                    limite_maximo=_leer_entero([f"LLM_CONCURRENCIA_TOPE_{sufijo}", "LLM_CONCURRENCIA_TOPE"], 16)
+                )
+    return _limitadores[provider]
+
+
+def get_limites_actuales() -> Dict[str, Dict]:
+    """
+    Retorna el estado del limitador de cada proveedor usado hasta ahora.
+    
+    Returns:
+        Dict {proveedor: {limite, en_curso, en_espera, ...}}
+    """
+    with _limitadores_lock:
+        limitadores = dict(_limitadores)
+    return {provider: limitador.get_estado() for provider, limitador in limitadores.items()}
@@ -0,0 +1,217 @@
+"""
+Módulo de plazos y cancelación de las llamadas al LLM.
+Cada acción (generar, corregir, resumir) tiene un plazo total que limita el
+timeout del cliente, los reintentos y la espera de la respuesta. Un token de
+cancelación permite que la interfaz detenga una solicitud en curso.
+"""
+
+import os
+import time
+import asyncio
+import threading
+from typing import Dict, Optional
+
+from app.utils.llm_errors import LLMError, TiempoAgotadoError
+
+
+# Plazo total por acción, en segundos (se puede cambiar con LLM_PLAZO_<ACCION>_SEGUNDOS)
+PLAZOS_POR_DEFECTO: Dict[str, float] = {
+    "generar": 30.0,
+    "corregir": 30.0,
+    "resumir": 60.0
+}
+
+
+class CanceladoError(LLMError):
+    """El usuario canceló la solicitud."""
+
+
+class PlazoVencidoError(TiempoAgotadoError):
+    """Se agotó el plazo de la acción: ya no se reintenta ni se prueba otro proveedor."""
+    reintentable = False
+    sobrecarga = False
+    cambiar_proveedor = False
+
+
+class TokenCancelacion:
+    """Señal de cancelación compartida entre la interfaz y la llamada en curso."""
+    
+    def __init__(self):
+        """Inicializa el token sin cancelar."""
+        self._evento = threading.Event()
+        self._derivados = []
+        self._lock = threading.Lock()
+    
+    def cancelar(self):
+        """Pide que la solicitud (y las partes con un token derivado) se detenga lo antes posible."""
+        with self._lock:
+            self._evento.set()
+            derivados, self._derivados = self._derivados, []
+        for derivado in derivados:
+            derivado.cancelar()
+    
+    def derivar(self) -> "TokenCancelacion":
+        """
+        Crea un token para una parte de la solicitud: se cancela junto con este,
+        pero también se puede cancelar solo (sin cancelar este).
+        
+        Returns:
+            Token derivado (ya cancelado si este lo está)
+        """
+        derivado = TokenCancelacion()
+        with self._lock:
+            if not self._evento.is_set():
+                self._derivados.append(derivado)
+                return derivado
+        derivado.cancelar()
+        return derivado
+    
+    @property
+    def cancelado(self) -> bool:
+        """Indica si se pidió cancelar."""
+        return self._evento.is_set()
+    
+    def esperar(self, segundos: float) -> bool:
+        """
+        Espera hasta `segundos` o hasta que se cancele.
+        
+        Returns:
+            True si se canceló durante la espera
+        """
+        return self._evento.wait(max(0.0, segundos))
+
+
+class Plazo:
+    """Plazo total de una solicitud y su token de cancelación."""
+    
+    def __init__(self, segundos: Optional[float] = None, token: Optional[TokenCancelacion] = None):
+        """
+        Inicializa el plazo; empieza a correr al crearlo.
+        
+        Args:
+            segundos: Tiempo total de la solicitud (None = sin plazo)
+            token: Token de cancelación (por defecto uno nuevo)
+        """
+        self.segundos = segundos
+        self.vence = time.monotonic() + segundos if segundos else None
+        self.token = token or TokenCancelacion()
+    
+    def derivar(self) -> "Plazo":
+        """
+        Crea un plazo para una parte de la solicitud, con el mismo vencimiento y un token
+        derivado (ver `TokenCancelacion.derivar`).
+        
+        Returns:
+            Plazo derivado
+        """
+        derivado = Plazo(token=self.token.derivar())
+        derivado.segundos = self.segundos
+        derivado.vence = self.vence
+        return derivado
+    
+    def restante(self) -> Optional[float]:
+        """Segundos que quedan (0 si ya venció), o None si no hay plazo."""
+        if self.vence is None:
+            return None
+        return max(0.0, self.vence - time.monotonic())
+    
+    @property
+    def vencido(self) -> bool:
+        """Indica si ya se agotó el plazo."""
+        return self.vence is not None and time.monotonic() >= self.vence
+    
+    @property
+    def cancelado(self) -> bool:
+        """Indica si se canceló la solicitud."""
+        return self.token.cancelado
+    
+    def limitar(self, segundos: Optional[float]) -> Optional[float]:
+        """
+        Acota un timeout al tiempo que queda.
+        
+        Args:
+            segundos: Timeout propuesto (None = sin límite propio)
+        
+        Returns:
+            El menor entre `segundos` y lo que queda del plazo
+        """
+        restante = self.restante()
+        if restante is None:
+            return segundos
+        return restante if segundos is None else min(segundos, restante)
+    
+    def verificar(self, provider: str = ""):
+        """
+        Verifica que la solicitud pueda seguir.
+        
+        Args:
+            provider: Proveedor (para el error)
+        
+        Raises:
+            CanceladoError: Si se canceló
+            PlazoVencidoError: Si se agotó el plazo
+        """
+        if self.cancelado:
+            raise CanceladoError("Se canceló la solicitud", provider=provider)
+        if self.vencido:
+            raise PlazoVencidoError(
+                f"No hubo respuesta dentro del plazo de {self.segundos:g} segundos",
+                provider=provider
+            )
+    
+    def dormir(self, segundos: float, provider: str = ""):
+        """
+        Espera antes de un reintento; se interrumpe si se cancela la solicitud.
+        
+        Raises:
+            CanceladoError: Si se canceló durante la espera
+        """
+        if self.token.esperar(segundos):
+            raise CanceladoError("Se canceló la solicitud", provider=provider)
+    
+    async def adormir(self, segundos: float, provider: str = ""):
+        """Versión asíncrona de `dormir` (revisa la cancelación cada medio segundo)."""
+        fin = time.monotonic() + segundos
+        while True:
+            if self.cancelado:
+                raise CanceladoError("Se canceló la solicitud", provider=provider)
+            restante = fin - time.monotonic()
+            if restante <= 0:
+                return
+            await asyncio.sleep(min(restante, 0.5))
+
+
+def get_plazo_accion(accion: str) -> float:
+    """
+    Retorna el plazo total de una acción.
+    
+    Args:
+        accion: 'generar', 'corregir' o 'resumir'
+    
+    Returns:
+        Segundos de LLM_PLAZO_<ACCION>_SEGUNDOS o el valor por defecto
+    """
+    por_defecto = PLAZOS_POR_DEFECTO.get(accion, max(PLAZOS_POR_DEFECTO.values()))
+    try:
+        return max(1.0, float(os.getenv(f"LLM_PLAZO_{accion.upper()}_SEGUNDOS", por_defecto)))
+    except ValueError:
+        return por_defecto
+
+
+def get_plazo_maximo() -> float:
+    """Retorna el mayor plazo configurado (timeout de los clientes de cada proveedor)."""
+    return max(get_plazo_accion(accion) for accion in PLAZOS_POR_DEFECTO)
+
+
+def crear_plazo(accion: str, token: Optional[TokenCancelacion] = None) -> Plazo:
+    """
+    Crea el plazo de una solicitud según su acción.
+    
+    Args:
+        accion: 'generar', 'corregir' o 'resumir'
+        token: Token de cancelación (por ejemplo, el del botón "Cancelar")
+    
+    Returns:
+        Instancia de Plazo que empieza a correr ahora
+    """
+    return Plazo(get_plazo_accion(accion), token)
@@ -1,22 +1,50 @@
 """
 Módulo para cargar y gestionar la configuración de la empresa.
+El contexto para los prompts se arma una sola vez por versión del archivo, y el
+archivo se vuelve a leer solo cuando cambia su fecha de modificación (revisada
+como máximo una vez por intervalo), sin reiniciar la aplicación.
+
+Además de la empresa principal (config/empresa_config.json), un mismo despliegue
+puede atender varias marcas con un archivo por empresa en config/empresas/<empresa>.json.
 """
 
+import os
+import re
 import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
+
+
+# Segundos mínimos entre dos revisiones de la fecha de modificación del archivo
+INTERVALO_REVISION_SEGUNDOS = 5.0
+
+# Empresa de config/empresa_config.json; las demás viven en config/empresas/<empresa>.json
+EMPRESA_PRINCIPAL = "principal"
+DIRECTORIO_EMPRESAS = Path(__file__).parent.parent.parent / "config" / "empresas"
+
+# Configuraciones de empresas (distintas de la principal) que se mantienen cargadas a la vez
+MAX_EMPRESAS_CARGADAS = 16
+
+# Nombres válidos de empresa: también se usan como nombre de archivo y de carpeta
+_PATRON_EMPRESA = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
 
 
 class EmpresaConfig:
     """Gestiona la configuración de la empresa desde un archivo JSON."""
     
-    def __init__(self, config_path: Optional[str] = None):
+    def __init__(self, config_path: Optional[str] = None, empresa: str = EMPRESA_PRINCIPAL):
         """
         Inicializa el gestor de configuración de la empresa.
         
         Args:
             config_path: Ruta al archivo de configuración. Si es None, busca en config/empresa_config.json
+            empresa: Nombre de la empresa a la que corresponde la configuración
         """
+        self.empresa = empresa
         if config_path is None:
             # Buscar el archivo de configuración relativo al proyecto
             project_root = Path(__file__).parent.parent.parent
@@ -24,6 +52,20 @@ class EmpresaConfig:
         
         self.config_path = Path(config_path)
         self.config: Dict = {}
+        
+        try:
+            self.intervalo_revision = max(0.0, float(os.getenv(
+                "EMPRESA_CONFIG_REVISION_SEGUNDOS", INTERVALO_REVISION_SEGUNDOS
+            )))
+        except ValueError:
+            self.intervalo_revision = INTERVALO_REVISION_SEGUNDOS
+        self._lock = threading.RLock()
+        self._mtime: Optional[float] = None
+        self._ultima_revision = time.monotonic()
+        # Contexto armado y su versión (se descartan al recargar)
+        self._contexto: Optional[str] = None
+        self._version: Optional[str] = None
+        
         self.load_config()
     
     def load_config(self) -> bool:
@@ -33,22 +75,59 @@ class EmpresaConfig:
         Returns:
             True si se cargó correctamente, False en caso contrario
         """
-        try:
-            if not self.config_path.exists():
-                print(f"⚠️ Advertencia: No se encontró el archivo de configuración en {self.config_path}")
-                print(f"💡 Creando archivo de configuración por defecto...")
-                self._create_default_config()
+        with self._lock:
+            # El contexto armado corresponde a la configuración anterior
+            self._contexto = None
+            self._version = None
+            try:
+                if not self.config_path.exists():
+                    print(f"⚠️ Advertencia: No se encontró el archivo de configuración en {self.config_path}")
+                    print(f"💡 Creando archivo de configuración por defecto...")
+                    self._create_default_config()
+                    self._mtime = self.config_path.stat().st_mtime
+                    return False
+                
+                # La fecha se toma antes de leer: una edición durante la lectura se detecta en la
+                # próxima revisión, y un JSON inválido no se vuelve a leer hasta que el archivo cambie
+                self._mtime = self.config_path.stat().st_mtime
+                with open(self.config_path, 'r', encoding='utf-8') as f:
+                    self.config = json.load(f)
+                return True
+            except json.JSONDecodeError as e:
+                # Se mantiene la última configuración válida
+                print(f"❌ Error al parsear el archivo JSON: {e}")
                 return False
-            
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                self.config = json.load(f)
-            return True
-        except json.JSONDecodeError as e:
-            print(f"❌ Error al parsear el archivo JSON: {e}")
-            return False
-        except Exception as e:
-            print(f"❌ Error al cargar la configuración: {e}")
+            except Exception as e:
+                print(f"❌ Error al cargar la configuración: {e}")
+                return False
+    
+    def revisar_cambios(self) -> bool:
+        """
+        Recarga el archivo si cambió su fecha de modificación.
+        
+        Solo consulta el sistema de archivos una vez cada `intervalo_revision` segundos;
+        el resto de las llamadas retornan de inmediato.
+        
+        Returns:
+            True si el archivo cambió y se recargó
+        """
+        ahora = time.monotonic()
+        if ahora - self._ultima_revision < self.intervalo_revision:
             return False
+        with self._lock:
+            if ahora - self._ultima_revision < self.intervalo_revision:
+                return False
+            self._ultima_revision = ahora
+            try:
+                mtime = self.config_path.stat().st_mtime
+            except OSError:
+                mtime = None
+            # Si el archivo no está (por ejemplo, a mitad de un guardado), se sigue con la configuración actual
+            if mtime is None or mtime == self._mtime:
+                return False
+            print(f"🔄 {self.config_path.name} cambió: recargando la configuración de la empresa")
+            self.load_config()
+            return True
     
     def _create_default_config(self):
         """Crea un archivo de configuración por defecto si no existe."""
@@ -127,9 +206,36 @@ class EmpresaConfig:
         """
         Genera un contexto completo formateado para usar en prompts.
         
+        El texto se arma una vez y se reutiliza hasta que el archivo cambie.
+        
         Returns:
             String con toda la información de la empresa formateada
         """
+        return self._get_contexto_versionado()[0]
+    
+    def get_version(self) -> str:
+        """
+        Retorna un identificador corto del contexto vigente.
+        
+        Cambia solo cuando cambia el texto del contexto, así que sirve como parte de la
+        clave de cualquier caché que dependa de la configuración de la empresa.
+        
+        Returns:
+            Hash (16 caracteres hexadecimales) del contexto completo
+        """
+        return self._get_contexto_versionado()[1]
+    
+    def _get_contexto_versionado(self) -> Tuple[str, str]:
+        """Retorna el contexto y su versión, armándolos si la configuración cambió."""
+        self.revisar_cambios()
+        with self._lock:
+            if self._contexto is None:
+                self._contexto = self._armar_contexto()
+                self._version = hashlib.sha256(self._contexto.encode("utf-8")).hexdigest()[:16]
+            return self._contexto, self._version
+    
+    def _armar_contexto(self) -> str:
+        """Arma el texto del contexto a partir de la configuración cargada."""
         partes = []
         
         # Información básica
@@ -196,22 +302,102 @@ class EmpresaConfig:
         return self.load_config()
 
 
+def normalizar_empresa(empresa: Optional[str]) -> str:
+    """
+    Valida el nombre de una empresa.
+    
+    Args:
+        empresa: Nombre de la empresa (None o vacío = la principal)
+    
+    Returns:
+        El nombre en minúsculas
+    
+    Raises:
+        ValueError: Si el nombre no es válido (solo letras, números, '-' y '_')
+    """
+    empresa = (empresa or EMPRESA_PRINCIPAL).strip().lower()
+    if not _PATRON_EMPRESA.match(empresa):
+        raise ValueError(f"Nombre de empresa '{empresa}' no válido. Usa solo letras, números, '-' y '_'")
+    return empresa
+
+
+def listar_empresas() -> List[str]:
+    """
+    Lista las empresas configuradas.
+    
+    Returns:
+        La principal seguida de las de config/empresas/*.json, en orden alfabético
+    """
+    empresas = [EMPRESA_PRINCIPAL]
+    if DIRECTORIO_EMPRESAS.is_dir():
+        for archivo in sorted(DIRECTORIO_EMPRESAS.glob("*.json")):
+            # Los archivos con nombres no válidos (mayúsculas, espacios...) se ignoran
+            if _PATRON_EMPRESA.match(archivo.stem) and archivo.stem != EMPRESA_PRINCIPAL:
+                empresas.append(archivo.stem)
+    return empresas
+
+
 # Instancia global para uso en toda la aplicación
 _empresa_config_instance: Optional[EmpresaConfig] = None
 
+# Configuraciones de las demás empresas, de la menos a la más usada recientemente
+_empresas_cargadas: "OrderedDict[str, EmpresaConfig]" = OrderedDict()
+_empresas_lock = threading.Lock()
+
 
-def get_empresa_config(config_path: Optional[str] = None) -> EmpresaConfig:
+def get_empresa_config(config_path: Optional[str] = None, empresa: Optional[str] = None) -> EmpresaConfig:
     """
     Obtiene la instancia global de configuración de la empresa.
     
+    La empresa principal es una sola instancia para todo el proceso. Las demás se
+    cargan la primera vez que se piden y se mantienen en una caché LRU de hasta
+    EMPRESA_CONFIG_MAX_CARGADAS empresas (cada una con su contexto ya armado).
+    
     Args:
-        config_path: Ruta opcional al archivo de configuración
+        config_path: Ruta opcional al archivo de configuración (solo empresa principal)
+        empresa: Nombre de la empresa (None = la principal)
         
     Returns:
         Instancia de EmpresaConfig
+    
+    Raises:
+        ValueError: Si el nombre no es válido o la empresa no tiene archivo de configuración
     """
     global _empresa_config_instance
+    empresa = normalizar_empresa(empresa)
+    if empresa != EMPRESA_PRINCIPAL:
+        return _get_config_empresa(empresa)
     if _empresa_config_instance is None:
-        _empresa_config_instance = EmpresaConfig(config_path)
+        with _empresas_lock:
+            if _empresa_config_instance is None:
+                _empresa_config_instance = EmpresaConfig(config_path)
     return _empresa_config_instance
 
+
+def _get_max_empresas_cargadas() -> int:
+    """Tamaño de la caché de empresas (EMPRESA_CONFIG_MAX_CARGADAS)."""
+    try:
+        return max(1, int(os.getenv("EMPRESA_CONFIG_MAX_CARGADAS", MAX_EMPRESAS_CARGADAS)))
+    except ValueError:
+        return MAX_EMPRESAS_CARGADAS
+
+
+def _get_config_empresa(empresa: str) -> EmpresaConfig:
+    """Obtiene la configuración de una empresa de config/empresas, cargándola si no está en la caché."""
+    with _empresas_lock:
+        config = _empresas_cargadas.get(empresa)
+        if config is not None:
+            _empresas_cargadas.move_to_end(empresa)
+            return config
+        
+        ruta = DIRECTORIO_EMPRESAS / f"{empresa}.json"
+        if not ruta.exists():
+            # A diferencia de la principal, no se crea un archivo por defecto (evita empresas por error de tipeo)
+            raise ValueError(f"No existe la configuración de la empresa '{empresa}' ({ruta})")
+        config = EmpresaConfig(str(ruta), empresa=empresa)
+        _empresas_cargadas[empresa] = config
+        while len(_empresas_cargadas) > _get_max_empresas_cargadas():
+            descartada, _ = _empresas_cargadas.popitem(last=False)
+            print(f"♻️ Configuración de la empresa '{descartada}' descargada (caché llena)")
+        return config
+
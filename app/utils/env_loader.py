@@ -60,6 +60,14 @@ def load_environment_variables():
                 except Exception:
                     # Si falla, continuar con la siguiente
                     pass
+            
+            # Cargar también la configuración del LLM (caché, límites de uso, etc.)
+            try:
+                for key in secrets.keys():
+                    if key.startswith("LLM_"):
+                        os.environ[key] = str(secrets[key])
+            except Exception:
+                pass
         except Exception:
             # Si hay error accediendo a secrets, continuar sin ellos
             pass
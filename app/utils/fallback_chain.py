@@ -0,0 +1,59 @@
+"""
+Cadena de proveedores de respaldo.
+Si el proveedor elegido no puede responder (cuota agotada, caída, timeout...),
+la solicitud se envía automáticamente al siguiente proveedor/modelo configurado
+en LLM_FALLBACK_CHAIN, sin que el usuario tenga que cambiarlo en el sidebar.
+"""
+
+import os
+from typing import List, Tuple
+
+from app.utils.llm_errors import LLMError
+
+
+# Cadena que se usa si LLM_FALLBACK_CHAIN no está definida (vacía = sin respaldo)
+CADENA_POR_DEFECTO = ""
+
+
+def parsear_cadena(texto: str) -> List[Tuple[str, str]]:
+    """
+    Interpreta una cadena de respaldo.
+    
+    Args:
+        texto: Eslabones separados por coma o por '→', cada uno 'proveedor/modelo' o
+            solo 'proveedor' (se usa su primer modelo). Ej: 'openai/gpt-4o-mini, gemini, groq/llama-3.1-8b-instant'
+    
+    Returns:
+        Lista de tuplas (proveedor, modelo); el modelo es "" si no se indicó
+    """
+    cadena = []
+    for eslabon in texto.replace("→", ",").split(","):
+        eslabon = eslabon.strip()
+        if not eslabon:
+            continue
+        provider, _, model_name = eslabon.partition("/")
+        cadena.append((provider.strip().lower(), model_name.strip()))
+    return cadena
+
+
+def get_cadena_respaldo() -> List[Tuple[str, str]]:
+    """
+    Retorna la cadena de respaldo configurada en LLM_FALLBACK_CHAIN.
+    
+    Returns:
+        Lista de tuplas (proveedor, modelo) en orden de preferencia
+    """
+    return parsear_cadena(os.getenv("LLM_FALLBACK_CHAIN", CADENA_POR_DEFECTO))
+
+
+def permite_respaldo(error: BaseException) -> bool:
+    """
+    Indica si un error justifica pasar al siguiente proveedor de la cadena.
+    
+    Args:
+        error: Error final de la llamada (ya reintentada)
+    
+    Returns:
+        True para cuota agotada, proveedor o modelo no disponible y timeouts
+    """
+    return isinstance(error, LLMError) and error.cambiar_proveedor
@@ -0,0 +1,182 @@
+"""
+Módulo de solicitudes con cobertura (hedging).
+Si una llamada tarda más que el percentil configurado de las latencias recientes
+de su proveedor y modelo, se envía un duplicado a un segundo proveedor/modelo y
+se usa la primera respuesta. Las coberturas consumen créditos de un presupuesto
+para que el costo adicional quede acotado.
+"""
+
+import os
+import math
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, Optional
+
+
+class GestorCobertura:
+    """Umbrales adaptativos, presupuesto y métricas de las solicitudes con cobertura."""
+    
+    def __init__(
+        self,
+        activa: bool = False,
+        percentil: float = 95.0,
+        presupuesto: float = 0.05,
+        rafaga: float = 5.0,
+        umbral_inicial_segundos: float = 8.0,
+        umbral_minimo_segundos: float = 0.5,
+        muestras_minimas: int = 20,
+        ventana: int = 200
+    ):
+        """
+        Inicializa el gestor.
+        
+        Args:
+            activa: Si las llamadas usan cobertura
+            percentil: Percentil de las latencias recientes a partir del cual se envía el duplicado
+            presupuesto: Coberturas permitidas por solicitud (0.05 = como máximo un 5% de llamadas extra)
+            rafaga: Créditos que se pueden acumular para cubrir varias solicitudes seguidas
+            umbral_inicial_segundos: Umbral mientras no hay suficientes latencias registradas
+            umbral_minimo_segundos: El umbral nunca baja de este valor
+            muestras_minimas: Latencias necesarias para calcular el percentil
+            ventana: Latencias recientes que se guardan por proveedor y modelo
+        """
+        self.activa = activa
+        self.percentil = percentil
+        self.presupuesto = presupuesto
+        self.rafaga = rafaga
+        self.umbral_inicial_segundos = umbral_inicial_segundos
+        self.umbral_minimo_segundos = umbral_minimo_segundos
+        self.muestras_minimas = muestras_minimas
+        self.ventana = ventana
+        
+        self._latencias: Dict[str, Deque[float]] = {}
+        self._creditos = 0.0
+        self._lock = threading.Lock()
+        
+        self.solicitudes = 0
+        self.coberturas = 0
+        self.sin_presupuesto = 0
+        self.ganadas = 0
+    
+    def umbral(self, clave: str) -> float:
+        """
+        Retorna cuántos segundos esperar la respuesta antes de enviar la cobertura.
+        
+        Args:
+            clave: 'proveedor/modelo' de la llamada principal
+        
+        Returns:
+            Percentil configurado de las latencias recientes (o el umbral inicial)
+        """
+        with self._lock:
+            latencias = sorted(self._latencias.get(clave, ()))
+        if len(latencias) < self.muestras_minimas:
+            return self.umbral_inicial_segundos
+        indice = max(0, math.ceil(self.percentil / 100 * len(latencias)) - 1)
+        return max(self.umbral_minimo_segundos, latencias[indice])
+    
+    def registrar_latencia(self, clave: str, segundos: float):
+        """Registra la latencia de una llamada completa (las respuestas de caché no cuentan)."""
+        with self._lock:
+            if clave not in self._latencias:
+                self._latencias[clave] = deque(maxlen=self.ventana)
+            self._latencias[clave].append(segundos)
+    
+    def registrar_solicitud(self):
+        """Cuenta una solicitud y suma su parte del presupuesto de coberturas."""
+        with self._lock:
+            self.solicitudes += 1
+            self._creditos = min(self.rafaga, self._creditos + self.presupuesto)
+    
+    def autorizar(self) -> bool:
+        """
+        Consume un crédito para enviar una cobertura, si hay presupuesto.
+        
+        Returns:
+            True si se puede enviar el duplicado
+        """
+        with self._lock:
+            if self._creditos < 1.0:
+                self.sin_presupuesto += 1
+                return False
+            self._creditos -= 1.0
+            self.coberturas += 1
+            return True
+    
+    def registrar_ganador(self, gano_cobertura: bool):
+        """Registra si, en una solicitud cubierta, respondió primero el duplicado."""
+        if gano_cobertura:
+            with self._lock:
+                self.ganadas += 1
+    
+    def get_metricas(self) -> Dict:
+        """
+        Retorna las métricas de cobertura.
+        
+        Returns:
+            Dict con solicitudes, coberturas, tasa de cobertura, tasa de victoria y umbrales actuales
+        """
+        with self._lock:
+            claves = list(self._latencias)
+            metricas = {
+                "solicitudes": self.solicitudes,
+                "coberturas": self.coberturas,
+                "sin_presupuesto": self.sin_presupuesto,
+                "ganadas": self.ganadas,
+                "tasa_cobertura": self.coberturas / self.solicitudes if self.solicitudes else 0.0,
+                "tasa_victoria": self.ganadas / self.coberturas if self.coberturas else 0.0
+            }
+        metricas["umbrales"] = {clave: self.umbral(clave) for clave in claves}
+        return metricas
+
+
+# Instancia global compartida por todas las sesiones del proceso
+_gestor_cobertura_instance: Optional[GestorCobertura] = None
+_gestor_cobertura_lock = threading.Lock()
+
+
+def get_gestor_cobertura() -> GestorCobertura:
+    """
+    Obtiene la instancia global del gestor de cobertura.
+    
+    Se configura con LLM_COBERTURA (true/false), LLM_COBERTURA_PERCENTIL,
+    LLM_COBERTURA_PRESUPUESTO y LLM_COBERTURA_UMBRAL_INICIAL_SEGUNDOS. El destino
+    de los duplicados es LLM_COBERTURA_DESTINO o, si no está, el primer eslabón
+    de LLM_FALLBACK_CHAIN distinto del proveedor usado.
+    
+    Returns:
+        Instancia de GestorCobertura
+    """
+    global _gestor_cobertura_instance
+    if _gestor_cobertura_instance is None:
+        with _gestor_cobertura_lock:
+            if _gestor_cobertura_instance is None:
+                activa = os.getenv("LLM_COBERTURA", "false").lower() in ("true", "1", "si", "yes")
+                try:
+                    percentil = float(os.getenv("LLM_COBERTURA_PERCENTIL", "95"))
+                    presupuesto = float(os.getenv("LLM_COBERTURA_PRESUPUESTO", "0.05"))
+                    umbral_inicial = float(os.getenv("LLM_COBERTURA_UMBRAL_INICIAL_SEGUNDOS", "8"))
+                except ValueError:
+                    percentil, presupuesto, umbral_inicial = 95.0, 0.05, 8.0
+                _gestor_cobertura_instance = GestorCobertura(
+                    activa=activa,
+                    percentil=min(max(percentil, 1.0), 100.0),
+                    presupuesto=max(0.0, presupuesto),
+                    umbral_inicial_segundos=umbral_inicial
+                )
+    return _gestor_cobertura_instance
+
+
+_ejecutor_cobertura: Optional[ThreadPoolExecutor] = None
+_ejecutor_cobertura_lock = threading.Lock()
+
+
+def get_ejecutor_cobertura() -> ThreadPoolExecutor:
+    """Retorna el pool de hilos donde corren las llamadas síncronas con cobertura."""
+    global _ejecutor_cobertura
+    if _ejecutor_cobertura is None:
+        with _ejecutor_cobertura_lock:
+            if _ejecutor_cobertura is None:
+                _ejecutor_cobertura = ThreadPoolExecutor(max_workers=16, thread_name_prefix="cobertura")
+    return _ejecutor_cobertura
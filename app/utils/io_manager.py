@@ -9,21 +9,28 @@ from datetime import datetime
 from typing import Dict, List, Optional
 from pathlib import Path
 
+from app.utils.empresa_config import EMPRESA_PRINCIPAL
+
 
 class IOManager:
     """Gestor de entrada/salida de archivos."""
     
-    def __init__(self, base_dir: str = "data"):
+    def __init__(self, base_dir: str = "data", empresa: Optional[str] = None):
         """
         Inicializa el gestor de IO.
         
         Args:
             base_dir: Directorio base para almacenar datos
+            empresa: Empresa cuyos archivos de referencia y textos aprobados se usan
+                (None = la principal; las demás tienen su propia carpeta de referencias)
         """
         self.base_dir = Path(base_dir)
+        self.empresa = empresa or EMPRESA_PRINCIPAL
         self.resultados_dir = self.base_dir / "resultados"
         self.rechazados_dir = self.base_dir / "rechazados"
         self.archivos_referencia_dir = self.base_dir / "archivos_referencia"
+        if self.empresa != EMPRESA_PRINCIPAL:
+            self.archivos_referencia_dir = self.archivos_referencia_dir / self.empresa
         
         # Crear directorios si no existen
         self.resultados_dir.mkdir(parents=True, exist_ok=True)
@@ -91,7 +98,8 @@ class IOManager:
         palabras: int,
         modelo: str,
         config: Dict,
-        feedback: Optional[Dict] = None
+        feedback: Optional[Dict] = None,
+        metricas: Optional[Dict] = None
     ) -> str:
         """
         Guarda un resultado en el archivo JSON del mes.
@@ -104,6 +112,7 @@ class IOManager:
             modelo: Modelo usado
             config: Configuración usada
             feedback: Feedback del usuario (opcional)
+            metricas: Tokens, latencia, costo y caché de la solicitud (opcional)
         
         Returns:
             ID del resultado guardado
@@ -111,6 +120,14 @@ class IOManager:
         datos = self.cargar_datos_mes()
         resultado_id = self.generar_id()
         
+        # El ID tiene resolución de segundos: si ya existe (p. ej. en ejecuciones por lote), agregar un sufijo
+        ids_existentes = {registro["id"] for registro in datos["datos"]}
+        if resultado_id in ids_existentes:
+            sufijo = 2
+            while f"{resultado_id}-{sufijo}" in ids_existentes:
+                sufijo += 1
+            resultado_id = f"{resultado_id}-{sufijo}"
+        
         nuevo_registro = {
             "id": resultado_id,
             "accion": accion,
@@ -121,6 +138,10 @@ class IOManager:
             "config": config,
             "feedback": feedback or {}
         }
+        if metricas:
+            nuevo_registro["metricas"] = metricas
+        if self.empresa != EMPRESA_PRINCIPAL:
+            nuevo_registro["empresa"] = self.empresa
         
         datos["datos"].append(nuevo_registro)
         
@@ -260,12 +281,14 @@ class IOManager:
             limite: Número máximo de textos a obtener
         
         Returns:
-            Lista de textos aprobados
+            Lista de textos aprobados (solo los de la empresa de este gestor)
         """
         textos = []
         datos = self.cargar_datos_mes()
         
         for registro in datos["datos"]:
+            if registro.get("empresa", EMPRESA_PRINCIPAL) != self.empresa:
+                continue
             if registro.get("feedback", {}).get("aprobado") == True:
                 textos.append(registro["resultado"])
                 if len(textos) >= limite:
@@ -378,8 +401,8 @@ class IOManager:
                 except:
                     pass
         
-        # Ordenar por fecha de modificación (más recientes primero)
-        archivos.sort(key=lambda x: x["fecha_modificacion"], reverse=True)
+        # Ordenar por fecha de modificación (más recientes primero); a igual fecha, por nombre
+        archivos.sort(key=lambda x: (x["fecha_modificacion"], x["nombre"]), reverse=True)
         return archivos
     
     def cargar_archivos_referencia_guardados(self) -> List[str]:
@@ -6,97 +6,75 @@ Los proveedores se habilitan automáticamente si tienen una API key válida conf
 """
 
 import os
-from typing import Optional, Dict, List
+import time
+import asyncio
+import math
+import hashlib
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    TimeoutError as FuturesTimeoutError,
+    as_completed,
+    wait
+)
+from typing import Optional, Dict, Generator, List, Tuple, Iterator, Union
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.language_models.chat_models import BaseChatModel
+from app.utils.text_tools import comprimir_referencia, contar_palabras, dividir_en_fragmentos
+from app.utils.response_cache import ResponseCache, get_response_cache
+from app.utils.semantic_cache import get_semantic_cache
+from app.utils.llm_pool import get_llm_pool
+from app.utils.rate_limiter import get_rate_limiter
+from app.utils.concurrency_limiter import (
+    LimitadorAdaptativo,
+    RESULTADO_ERROR,
+    RESULTADO_OK,
+    RESULTADO_SOBRECARGA,
+    clasificar_resultado,
+    get_limitador_concurrencia
+)
+from app.utils.retry_policy import get_politica_reintentos
+from app.utils.llm_errors import LLMError, TiempoAgotadoError, SolicitudInvalidaError, clasificar_error
+from app.utils.fallback_chain import get_cadena_respaldo, parsear_cadena, permite_respaldo
+from app.utils.hedging import get_gestor_cobertura, get_ejecutor_cobertura
+from app.utils.circuit_breaker import Circuito, get_circuito
+from app.utils.single_flight import get_grupo_llamadas
+from app.utils.deadlines import CanceladoError, Plazo, crear_plazo, get_plazo_maximo
+from app.utils.usage_ledger import get_registro_uso
+from app.utils.model_pricing import (
+    TOKENS_POR_PALABRA,
+    calcular_costo,
+    estimar_solicitud,
+    estimar_tokens,
+    estimar_tokens_mensajes,
+    get_info_modelo,
+    velocidad_observada
+)
+from app.utils import cohere_adapter
+from app.utils.logger import logger
+from app.utils.provider_registry import (
+    cargar_adaptador,
+    importar_clase,
+    importar_modulo,
+    paquete_instalado,
+    get_proveedores_disponibles
+)
 
 # Importación robusta de empresa_config para evitar errores en Streamlit Cloud
 try:
     from app.utils.empresa_config import get_empresa_config
 except (ImportError, KeyError, ModuleNotFoundError) as e:
     # Si falla la importación, crear una función stub
-    def get_empresa_config(config_path: Optional[str] = None):
+    def get_empresa_config(config_path: Optional[str] = None, empresa: Optional[str] = None):
         """Función stub cuando empresa_config no está disponible."""
         class StubEmpresaConfig:
             def get_contexto_completo(self):
                 return ""
+            
+            def get_version(self):
+                return ""
         return StubEmpresaConfig()
 
-# Importar OpenAI
-try:
-    from langchain_openai import ChatOpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
-
-# Importar Google Gemini
-try:
-    from langchain_google_genai import ChatGoogleGenerativeAI
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
-
-# Intentar importar google-generativeai para listar modelos
-try:
-    import google.generativeai as genai
-    GEMINI_GENAI_AVAILABLE = True
-except ImportError:
-    GEMINI_GENAI_AVAILABLE = False
-
-# Importar Groq
-GROQ_AVAILABLE = False
-try:
-    from langchain_groq import ChatGroq
-    GROQ_AVAILABLE = True
-except ImportError:
-    try:
-        from langchain_community.chat_models import ChatGroq
-        GROQ_AVAILABLE = True
-    except ImportError:
-        GROQ_AVAILABLE = False
-
-# Importar Together AI
-try:
-    from langchain_together import ChatTogether
-    TOGETHER_AVAILABLE = True
-except ImportError:
-    try:
-        from langchain_community.chat_models import ChatTogether
-        TOGETHER_AVAILABLE = True
-    except ImportError:
-        TOGETHER_AVAILABLE = False
-
-# Importar Cohere
-try:
-    from langchain_cohere import ChatCohere
-    COHERE_AVAILABLE = True
-except ImportError:
-    try:
-        from langchain_community.chat_models import ChatCohere
-        COHERE_AVAILABLE = True
-    except ImportError:
-        COHERE_AVAILABLE = False
-
-# Importar Hugging Face
-try:
-    from langchain_huggingface import ChatHuggingFace
-    from langchain_community.llms import HuggingFaceHub
-    HUGGINGFACE_AVAILABLE = True
-except ImportError:
-    try:
-        from langchain_community.chat_models import ChatHuggingFace
-        from langchain_community.llms import HuggingFaceHub
-        HUGGINGFACE_AVAILABLE = True
-    except ImportError:
-        HUGGINGFACE_AVAILABLE = False
-
-# Intentar importar requests para API REST directa
-try:
-    import requests
-    REQUESTS_AVAILABLE = True
-except ImportError:
-    REQUESTS_AVAILABLE = False
-
 # Intentar importar callback para OpenAI
 try:
     from langchain_community.callbacks import get_openai_callback
@@ -115,6 +93,20 @@ except ImportError:
                 pass
 
 
+class AvanceStream:
+    """
+    Aviso de avance de un stream antes de su primer fragmento de texto (por ejemplo,
+    los resúmenes parciales de un texto largo). Devuelve el control a la interfaz
+    para que muestre el avance y atienda el botón "Cancelar".
+    """
+    
+    def __init__(self, mensaje: str):
+        self.mensaje = mensaje
+    
+    def __repr__(self) -> str:
+        return f"AvanceStream({self.mensaje!r})"
+
+
 class LangChainAgent:
     """
     Agente LangChain para operaciones de texto con soporte multi-proveedor.
@@ -168,12 +160,46 @@ class LangChainAgent:
         "microsoft/DialoGPT-large": "microsoft/DialoGPT-large"
     }
     
+    # Longitud objetivo (en palabras) de cada texto de referencia dentro del prompt
+    MAX_PALABRAS_REFERENCIA = 120
+    
+    # Proveedores cuyo cliente de LangChain permite recibir la respuesta por fragmentos
+    PROVEEDORES_STREAMING = ["openai", "gemini", "groq", "together", "cohere"]
+    
+    # Proveedores cuyo SDK acepta un timeout por llamada (el resto usa el del cliente)
+    PROVEEDORES_TIMEOUT_POR_LLAMADA = ["openai", "groq", "together"]
+    
+    # Tiempo máximo (en segundos) de cada llamada asíncrona al proveedor
+    TIMEOUT_ASYNC_SEGUNDOS = 60.0
+    
+    # Consumo de una respuesta que ya estaba pagada (caché o llamada compartida)
+    SIN_CONSUMO = {"tokens_usados": 0, "tokens_entrada": 0, "tokens_salida": 0, "tokens_cache": 0, "costo": 0.0}
+    
+    # Tokens de salida que se reservan al estimar una llamada para el límite de tokens por minuto
+    # (luego se corrige con el uso real que informa el proveedor)
+    TOKENS_SALIDA_ESTIMADOS = 500
+    
+    # Tokens a partir de los cuales un texto se resume por fragmentos (map-reduce) en lugar de
+    # en una sola llamada (se puede cambiar con LLM_RESUMEN_FRAGMENTAR_TOKENS; 0 = solo si no cabe en el contexto)
+    UMBRAL_FRAGMENTAR_TOKENS = 6000
+    
+    # Palabras máximas de cada fragmento de un texto largo
+    PALABRAS_POR_FRAGMENTO = 1500
+    
+    # Veces que se vuelven a resumir los resúmenes parciales si juntos siguen siendo demasiado largos
+    MAX_NIVELES_FRAGMENTOS = 3
+    
+    # Campos de consumo que se suman entre los resúmenes parciales y el resumen final
+    CAMPOS_CONSUMO = ("tokens_usados", "tokens_entrada", "tokens_salida", "tokens_cache", "costo")
+    
     def __init__(
         self, 
         provider: str = "openai",
         model_name: str = "gpt-4o-mini", 
         temperature: float = 0.7,
-        empresa_config_path: Optional[str] = None
+        empresa_config_path: Optional[str] = None,
+        usuario: Optional[str] = None,
+        empresa: Optional[str] = None
     ):
         """
         Inicializa el agente LangChain.
@@ -183,15 +209,24 @@ class LangChainAgent:
             model_name: Nombre del modelo a usar
             temperature: Temperatura para la generación (0.0 a 1.0)
             empresa_config_path: Ruta opcional al archivo de configuración de la empresa
+            usuario: Quién usa el agente (para el registro de uso)
+            empresa: Empresa cuya configuración se usa en los prompts (None = la principal,
+                config/empresa_config.json; las demás están en config/empresas/<empresa>.json)
+        
+        Raises:
+            ValueError: Si el proveedor no es válido o la empresa no existe
         """
         self.provider = provider.lower()
         self.model_name = model_name
         self.temperature = temperature
+        self.usuario = usuario
         self.reference_texts: List[str] = []
+        # Agentes de la cadena de respaldo, creados la primera vez que se necesitan
+        self._alternativos: Dict[Tuple[str, str], "LangChainAgent"] = {}
         
         # Inicializar empresa_config de manera robusta
         try:
-            self.empresa_config = get_empresa_config(empresa_config_path)
+            self.empresa_config = get_empresa_config(empresa_config_path, empresa=empresa)
         except (ImportError, KeyError, ModuleNotFoundError, AttributeError) as e:
             # Si falla, crear una instancia stub
             class StubEmpresaConfig:
@@ -204,10 +239,27 @@ class LangChainAgent:
         if self.provider not in valid_providers:
             raise ValueError(f"Proveedor '{provider}' no soportado. Use uno de: {', '.join(valid_providers)}")
         
-        # Inicializar LLM según el proveedor
+        # Cliente del LLM compartido entre sesiones (ver llm_pool)
+        self.llm = get_llm_pool().obtener(
+            self.provider,
+            model_name,
+            temperature,
+            lambda temperatura: self._crear_llm(model_name, temperatura)
+        )
+    
+    def _crear_llm(self, model_name: str, temperature: float) -> BaseChatModel:
+        """
+        Crea el cliente de LangChain del proveedor configurado.
+        
+        Args:
+            model_name: Nombre del modelo a usar
+            temperature: Temperatura para la generación
+        
+        Returns:
+            Cliente de chat de LangChain
+        """
         if self.provider == "openai":
-            if not OPENAI_AVAILABLE:
-                raise ImportError("langchain-openai no está instalado. Instálelo con: pip install langchain-openai")
+            ChatOpenAI = cargar_adaptador("openai")
             api_key = os.getenv("OPENAI_API_KEY")
             if not api_key:
                 raise ValueError("OPENAI_API_KEY no está configurada. Por favor, configura tu API key.")
@@ -215,10 +267,21 @@ class LangChainAgent:
             # ChatOpenAI acepta cualquier modelo válido de OpenAI
             # Validamos que el modelo esté en nuestra lista recomendada, pero LangChain puede aceptar otros
             try:
-                self.llm = ChatOpenAI(
+                opciones = {}
+                # Que el streaming también informe el uso (incluidos los tokens del prefijo en caché);
+                # las versiones antiguas de langchain-openai no tienen esta opción
+                campos = getattr(ChatOpenAI, "model_fields", None) or getattr(ChatOpenAI, "__fields__", {})
+                if "stream_usage" in campos:
+                    opciones["stream_usage"] = True
+                return ChatOpenAI(
                     model=model_name,
                     temperature=temperature,
-                    openai_api_key=api_key
+                    openai_api_key=api_key,
+                    # Los reintentos los hace la política de reintentos (retry_policy)
+                    max_retries=0,
+                    # Ninguna llamada espera más que el plazo de la acción más larga (deadlines)
+                    timeout=get_plazo_maximo(),
+                    **opciones
                 )
             except Exception as e:
                 # Si el modelo no es válido, LangChain lanzará un error
@@ -234,8 +297,7 @@ class LangChainAgent:
         elif self.provider == "gemini":
             # Usar ChatGoogleGenerativeAI de LangChain según documentación oficial
             # https://docs.langchain.com/oss/python/integrations/chat/google_generative_ai
-            if not GEMINI_AVAILABLE:
-                raise ImportError("langchain-google-genai no está instalado. Instálelo con: pip install langchain-google-genai")
+            ChatGoogleGenerativeAI = cargar_adaptador("gemini")
             
             api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
             if not api_key:
@@ -243,10 +305,14 @@ class LangChainAgent:
             
             try:
                 # Usar ChatGoogleGenerativeAI de LangChain (método correcto según documentación)
-                self.llm = ChatGoogleGenerativeAI(
+                return ChatGoogleGenerativeAI(
                     model=model_name,
                     temperature=temperature,
-                    google_api_key=api_key
+                    google_api_key=api_key,
+                    # Los reintentos los hace la política de reintentos (retry_policy)
+                    max_retries=0,
+                    # Ninguna llamada espera más que el plazo de la acción más larga (deadlines)
+                    timeout=get_plazo_maximo()
                 )
             except Exception as e:
                 error_msg = str(e)
@@ -268,22 +334,17 @@ class LangChainAgent:
             if not api_key:
                 raise ValueError("GROQ_API_KEY no está configurada. Por favor, configura tu API key.")
             
-            # Intentar importar ChatGroq directamente
-            try:
-                from langchain_groq import ChatGroq
-                groq_class = ChatGroq
-            except ImportError:
-                try:
-                    from langchain_community.chat_models import ChatGroq
-                    groq_class = ChatGroq
-                except ImportError:
-                    raise ImportError("langchain-groq no está instalado. Instálelo con: pip install langchain-groq")
+            groq_class = cargar_adaptador("groq")
             
             try:
-                self.llm = groq_class(
+                return groq_class(
                     model=model_name,
                     temperature=temperature,
-                    groq_api_key=api_key
+                    groq_api_key=api_key,
+                    # Los reintentos los hace la política de reintentos (retry_policy)
+                    max_retries=0,
+                    # Ninguna llamada espera más que el plazo de la acción más larga (deadlines)
+                    timeout=get_plazo_maximo()
                 )
             except Exception as e:
                 error_msg = str(e)
@@ -296,22 +357,17 @@ class LangChainAgent:
             if not api_key:
                 raise ValueError("TOGETHER_API_KEY no está configurada. Por favor, configura tu API key.")
             
-            # Intentar importar ChatTogether directamente
-            try:
-                from langchain_together import ChatTogether
-                together_class = ChatTogether
-            except ImportError:
-                try:
-                    from langchain_community.chat_models import ChatTogether
-                    together_class = ChatTogether
-                except ImportError:
-                    raise ImportError("langchain-together no está instalado. Instálelo con: pip install langchain-together")
+            together_class = cargar_adaptador("together")
             
             try:
-                self.llm = together_class(
+                return together_class(
                     model=model_name,
                     temperature=temperature,
-                    together_api_key=api_key
+                    together_api_key=api_key,
+                    # Los reintentos los hace la política de reintentos (retry_policy)
+                    max_retries=0,
+                    # Ninguna llamada espera más que el plazo de la acción más larga (deadlines)
+                    timeout=get_plazo_maximo()
                 )
             except Exception as e:
                 error_msg = str(e)
@@ -324,29 +380,14 @@ class LangChainAgent:
             if not api_key:
                 raise ValueError("COHERE_API_KEY no está configurada. Por favor, configura tu API key.")
             
-            # Intentar importar ChatCohere directamente
-            # Primero verificar que el paquete cohere esté disponible
-            try:
-                import cohere
-            except ImportError:
+            # Primero verificar que el paquete cohere esté instalado (sin importarlo)
+            if not paquete_instalado("cohere"):
                 raise ImportError("El paquete 'cohere' no está instalado. Instálelo con: pip install cohere")
             
-            try:
-                from langchain_cohere import ChatCohere
-                cohere_class = ChatCohere
-            except ImportError as e:
-                try:
-                    from langchain_community.chat_models import ChatCohere
-                    cohere_class = ChatCohere
-                except ImportError:
-                    raise ImportError(
-                        f"langchain-cohere no está instalado o no puede importar 'cohere'. "
-                        f"Instálelo con: pip install langchain-cohere cohere\n"
-                        f"Error original: {str(e)}"
-                    )
+            cohere_class = cargar_adaptador("cohere")
             
             try:
-                self.llm = cohere_class(
+                return cohere_class(
                     model=model_name,
                     temperature=temperature,
                     cohere_api_key=api_key
@@ -367,8 +408,7 @@ class LangChainAgent:
                     f"Error: {error_msg}"
                 )
         elif self.provider == "huggingface":
-            if not HUGGINGFACE_AVAILABLE:
-                raise ImportError("langchain-community o langchain-huggingface no está instalado. Instálelo con: pip install langchain-community langchain-huggingface")
+            ChatHuggingFace = cargar_adaptador("huggingface")
             api_key = os.getenv("HUGGINGFACE_API_KEY")
             if not api_key:
                 raise ValueError("HUGGINGFACE_API_KEY no está configurada. Por favor, configura tu API key.")
@@ -376,14 +416,15 @@ class LangChainAgent:
             try:
                 # Intentar primero con ChatHuggingFace (para modelos de chat)
                 try:
-                    self.llm = ChatHuggingFace(
+                    return ChatHuggingFace(
                         model=model_name,
                         huggingface_api_key=api_key,
                         temperature=temperature
                     )
                 except:
                     # Si ChatHuggingFace falla, usar HuggingFaceHub
-                    self.llm = HuggingFaceHub(
+                    HuggingFaceHub = importar_clase("langchain_community.llms", "HuggingFaceHub")
+                    return HuggingFaceHub(
                         repo_id=model_name,
                         huggingfacehub_api_token=api_key,
                         model_kwargs={"temperature": temperature}
@@ -402,14 +443,21 @@ class LangChainAgent:
     def set_reference_texts(self, texts: List[str]):
         """Establece textos de referencia para mejorar el estilo."""
         self.reference_texts = texts
+        for alternativo in self._alternativos.values():
+            alternativo.reference_texts = texts
     
     def _get_style_context(self) -> str:
-        """Genera contexto de estilo a partir de textos de referencia."""
+        """
+        Genera contexto de estilo a partir de textos de referencia.
+        Cada referencia se comprime localmente (sin llamar al LLM) porque solo
+        interesa su estilo, no su contenido completo.
+        """
         if not self.reference_texts:
             return ""
         
         context = "\n\n--- Textos de Referencia (estilo deseado) ---\n"
         for i, text in enumerate(self.reference_texts[:3], 1):  # Máximo 3 textos
+            text = comprimir_referencia(text, self.MAX_PALABRAS_REFERENCIA)
             context += f"\nEjemplo {i}:\n{text}\n"
         return context
     
@@ -424,457 +472,2526 @@ class LangChainAgent:
         
         return f"\n\n--- CONTEXTO Y VALORES EMPRESARIALES ---\n{contexto_completo}\n\nIMPORTANTE: El texto generado debe estar alineado con estos valores, misión, visión y contexto empresarial. Usa el tono de comunicación especificado.\n"
     
-    def _invoke_llm(self, messages: List, use_callback: bool = True) -> Dict[str, any]:
+    def _mensajes_con_prefijo(self, instrucciones_fijas: str, solicitud: str, con_estilo: bool = True) -> List:
         """
-        Invoca el LLM con los mensajes proporcionados.
+        Arma los mensajes con la parte fija al comienzo y la parte variable al final.
+        
+        El mensaje de sistema (rol, requisitos, contexto empresarial y textos de referencia)
+        es idéntico en todas las solicitudes de una acción, así que los proveedores con
+        caché de prefijos (OpenAI, Gemini, Groq...) pueden reutilizarlo y cobrar esos
+        tokens más baratos. El tema o el texto del usuario va solo en el último mensaje.
         
         Args:
-            messages: Lista de mensajes para el LLM
-            use_callback: Si usar callback para tracking (solo OpenAI)
+            instrucciones_fijas: Rol y requisitos de la acción (no deben incluir datos de la solicitud)
+            solicitud: Parte variable (tema o texto, longitud, instrucciones adicionales)
+            con_estilo: Si es True, agrega los textos de referencia al prefijo
         
         Returns:
-            Dict con el texto generado y metadata
+            Lista [SystemMessage, HumanMessage]
         """
+        partes = [instrucciones_fijas, self._get_empresa_context().strip()]
+        if con_estilo:
+            partes.append(self._get_style_context().strip())
+        return [
+            SystemMessage(content="\n\n".join(parte for parte in partes if parte)),
+            HumanMessage(content=solicitud)
+        ]
+    
+    def _get_config_version(self) -> str:
+        """Retorna un identificador corto del contexto empresarial vigente (ver EmpresaConfig.get_version)."""
         try:
-            # Proveedores adicionales (Groq, Together, Cohere, HuggingFace)
-            if self.provider in ["groq", "together", "cohere", "huggingface"]:
-                try:
-                    response = self.llm.invoke(messages)
-                except (AttributeError, TypeError) as e:
-                    # Manejo especial para error conocido de langchain-cohere con token_count
-                    error_msg = str(e)
-                    if self.provider == "cohere" and ("token_count" in error_msg or "NonStreamedChatResponse" in error_msg):
-                        # Fallback: usar SDK de Cohere directamente
-                        try:
-                            import cohere as cohere_sdk
-                            api_key = os.getenv("COHERE_API_KEY")
-                            client = cohere_sdk.Client(api_key=api_key)
-                            
-                            # Convertir mensajes de LangChain a formato Cohere
-                            prompt_parts = []
-                            system_prompt = None
-                            for msg in messages:
-                                if hasattr(msg, 'content'):
-                                    content = msg.content
-                                    msg_type = str(getattr(msg, 'type', '')).lower()
-                                    if 'system' in msg_type:
-                                        system_prompt = content
-                                    elif 'human' in msg_type or 'user' in msg_type:
-                                        prompt_parts.append(content)
-                            
-                            full_prompt = "\n".join(prompt_parts)
-                            if system_prompt:
-                                full_prompt = f"{system_prompt}\n\n{full_prompt}"
-                            
-                            cohere_response = client.chat(
-                                model=self.model_name,
-                                message=full_prompt,
-                                temperature=self.temperature
-                            )
-                            
-                            texto = cohere_response.text if hasattr(cohere_response, 'text') else str(cohere_response)
-                            return {
-                                "texto": texto.strip() if texto else "",
-                                "tokens_usados": 0,
-                                "costo": 0.0
-                            }
-                        except Exception as inner_e:
-                            inner_error_msg = str(inner_e)
-                            if "404" in inner_error_msg or "was removed" in inner_error_msg.lower():
-                                raise ValueError(
-                                    f"El modelo '{self.model_name}' de Cohere no está disponible.\n\n"
-                                    f"💡 Usa 'command-nightly' (los modelos 'command' y 'command-light' fueron removidos).\n"
-                                    f"Error: {inner_error_msg}"
-                                )
-                            raise ValueError(f"Error con Cohere: {error_msg}\nError interno: {str(inner_e)}")
-                    raise ValueError(f"Error al procesar con {self.provider}: {error_msg}")
-                except Exception as e:
-                    raise ValueError(f"Error al procesar con {self.provider}: {str(e)}")
-                
-                # Extraer texto de forma segura
-                texto = ""
-                try:
-                    if hasattr(response, 'content'):
-                        contenido = response.content
-                        if callable(contenido):
-                            contenido = contenido()
-                        texto = str(contenido) if contenido else ""
-                    else:
-                        texto = str(response)
-                except Exception as e:
-                    # Si hay error extrayendo el contenido, usar str(response)
-                    texto = str(response)
-                
-                # Intentar extraer tokens de forma segura (si están disponibles)
-                tokens_usados = 0
-                try:
-                    # Cohere puede tener response_metadata con información de tokens
-                    if hasattr(response, 'response_metadata'):
-                        metadata = response.response_metadata
-                        if isinstance(metadata, dict):
-                            # Intentar diferentes formatos de token info
-                            tokens_usados = metadata.get('token_count', 0) or metadata.get('tokens', 0) or 0
-                    # Algunos proveedores tienen usage_metadata
-                    if tokens_usados == 0 and hasattr(response, 'usage_metadata'):
-                        usage = response.usage_metadata
-                        if usage:
-                            if isinstance(usage, dict):
-                                tokens_usados = usage.get('total_tokens', 0) or 0
-                            else:
-                                tokens_usados = getattr(usage, 'total_tokens', 0) or 0
-                except (AttributeError, TypeError, KeyError):
-                    # Si hay cualquier error, simplemente usar 0
-                    tokens_usados = 0
-                
-                return {
-                    "texto": texto.strip() if texto else "",
-                    "tokens_usados": tokens_usados,
-                    "costo": 0.0  # La mayoría son gratuitos o tienen límites generosos
-                }
-            elif self.provider == "gemini":
-                # Usar ChatGoogleGenerativeAI de LangChain (método correcto)
-                response = self.llm.invoke(messages)
-                
-                # Extraer el texto de la respuesta de Gemini
-                # Según la documentación de LangChain, usar response.content directamente
-                texto = ""
-                
-                try:
-                    # Intentar obtener el contenido directamente
-                    if hasattr(response, 'content'):
-                        contenido = response.content
-                        
-                        # Verificar que no sea una función
-                        if callable(contenido):
-                            # Si es una función, no podemos usarla directamente
-                            # Intentar obtener el texto de otra manera
-                            contenido = str(response)
-                        elif isinstance(contenido, list):
-                            # Si es una lista (Gemini 3), extraer el texto de cada elemento
-                            textos = []
-                            for item in contenido:
-                                if isinstance(item, dict):
-                                    # Si tiene 'text', usarlo
-                                    if 'text' in item:
-                                        textos.append(str(item['text']))
-                                    # Si tiene 'type' y 'text'
-                                    elif item.get('type') == 'text' and 'text' in item:
-                                        textos.append(str(item['text']))
-                                    else:
-                                        textos.append(str(item))
-                                else:
-                                    textos.append(str(item))
-                            texto = " ".join(textos)
-                        elif isinstance(contenido, str):
-                            texto = contenido
-                        else:
-                            texto = str(contenido)
-                    else:
-                        # Si no tiene content, convertir toda la respuesta a string
-                        texto = str(response)
-                    
-                    # Asegurar que texto sea un string válido y no una función
-                    if callable(texto):
-                        texto = str(response)
-                    
-                    if not isinstance(texto, str):
-                        texto = str(texto)
-                    
-                    # Limpiar el texto
-                    texto = texto.strip()
-                    
-                except Exception as e:
-                    # Si hay algún error al extraer el texto, usar str(response)
-                    texto = str(response)
-                    if callable(texto):
-                        texto = f"Error al extraer texto: {str(e)}"
-                
-                return {
-                    "texto": texto,
-                    "tokens_usados": response.usage_metadata.get('total_tokens', 0) if hasattr(response, 'usage_metadata') and response.usage_metadata else 0,
-                    "costo": 0.0  # Gemini gratuito
-                }
-            elif self.provider == "openai" and use_callback:
-                with get_openai_callback() as cb:
-                    response = self.llm.invoke(messages)
-                    texto = response.content
-                    return {
-                        "texto": texto,
-                        "tokens_usados": cb.total_tokens if cb else 0,
-                        "costo": cb.total_cost if cb else 0.0
-                    }
-            else:
-                # OpenAI sin callback
-                response = self.llm.invoke(messages)
-                texto = response.content
-                return {
-                    "texto": texto,
-                    "tokens_usados": 0,
-                    "costo": 0.0
-                }
-        except Exception as e:
-            error_msg = str(e)
-            # Mejorar mensajes de error para Gemini
-            if self.provider == "gemini":
-                if "404" in error_msg or "not found" in error_msg.lower() or "not supported" in error_msg.lower():
-                    sugerencia = (
-                        f"\n\n💡 El modelo '{self.model_name}' no está disponible.\n\n"
-                        f"Verifica que:\n"
-                        f"1. Tu API key (GOOGLE_API_KEY) sea válida\n"
-                        f"2. La API de Gemini esté habilitada en Google Cloud\n"
-                        f"3. El modelo 'gemini-flash-latest' esté disponible en tu cuenta\n"
-                        f"4. Actualiza langchain-google-genai: pip install --upgrade langchain-google-genai\n"
-                        f"5. Revisa la documentación: https://docs.langchain.com/oss/python/integrations/chat/google_generative_ai"
-                    )
-                    
-                    return {
-                        "texto": f"Error al procesar con Gemini: {error_msg}{sugerencia}",
-                        "tokens_usados": 0,
-                        "costo": 0.0
-                    }
-            # Detectar errores específicos de OpenAI
-            if self.provider == "openai":
-                if "429" in error_msg or "quota" in error_msg.lower() or "insufficient_quota" in error_msg.lower():
-                    sugerencia = (
-                        f"\n\n⚠️ Has excedido tu cuota de OpenAI.\n\n"
-                        f"💡 Soluciones:\n"
-                        f"1. **Usa Gemini (GRATUITO)**: Cambia al proveedor 'Google Gemini' en el sidebar\n"
-                        f"   - Gemini es completamente gratuito y no tiene límites de cuota\n"
-                        f"   - Modelos disponibles: gemini-1.5-flash (recomendado), gemini-1.5-pro, gemini-pro\n\n"
-                        f"2. **Espera**: Espera unos minutos y vuelve a intentar con OpenAI\n\n"
-                        f"3. **Verifica tu cuenta**: Revisa tu plan y facturación en https://platform.openai.com/account/billing\n\n"
-                        f"💡 Recomendación: Usa Gemini para evitar problemas de cuota."
-                    )
-                    return {
-                        "texto": f"Error al procesar con OpenAI: {error_msg}{sugerencia}",
-                        "tokens_usados": 0,
-                        "costo": 0.0
-                    }
-                elif "model_not_found" in error_msg.lower() or "does not exist" in error_msg.lower():
-                    sugerencia = (
-                        f"\n\n⚠️ El modelo seleccionado no está disponible.\n\n"
-                        f"💡 Soluciones:\n"
-                        f"1. Cambia a otro modelo de OpenAI en el sidebar (gpt-4o-mini o gpt-3.5-turbo)\n"
-                        f"2. Usa Gemini (GRATUITO) cambiando al proveedor 'Google Gemini' en el sidebar\n"
-                    )
-                    return {
-                        "texto": f"Error al procesar con OpenAI: {error_msg}{sugerencia}",
-                        "tokens_usados": 0,
-                        "costo": 0.0
-                    }
-            
-            return {
-                "texto": f"Error al procesar: {error_msg}",
-                "tokens_usados": 0,
-                "costo": 0.0
-            }
+            return self.empresa_config.get_version()
+        except (AttributeError, KeyError, TypeError):
+            return ""
     
-    def generar_texto(
-        self, 
-        tema: str, 
-        max_palabras: int = 200,
-        instrucciones_adicionales: str = ""
-    ) -> Dict[str, any]:
+    def _get_ambito_semantico(self, accion: str, parametros: Optional[Dict] = None) -> str:
+        """Identifica la configuración dentro de la cual dos consultas parecidas son intercambiables."""
+        payload = "|".join([
+            self.provider,
+            self.model_name,
+            str(round(float(self.temperature), 3)),
+            self._get_config_version(),
+            accion,
+            repr(sorted((parametros or {}).items()))
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _consultar_caches(
+        self,
+        messages: List,
+        usar_cache: bool = True,
+        semantica: Optional[Dict] = None
+    ) -> Tuple[Optional[Dict], Dict]:
         """
-        Genera un nuevo texto a partir de un tema.
+        Busca la respuesta en la caché exacta y, si se pide, en la semántica.
         
         Args:
-            tema: Tema o prompt para generar el texto
-            max_palabras: Número máximo de palabras
-            instrucciones_adicionales: Instrucciones adicionales opcionales
-            
+            messages: Lista de mensajes para el LLM
+            usar_cache: Si es False, no consulta ninguna caché
+            semantica: Dict con 'accion', 'consulta' y 'parametros' para la caché semántica
+        
         Returns:
-            Dict con el texto generado y metadata
+            Tupla (resultado guardado o None, contexto necesario para guardar después)
         """
-        style_context = self._get_style_context()
-        empresa_context = self._get_empresa_context()
-        
-        prompt = f"""Eres un asistente experto en comunicación empresarial. 
-Tu tarea es generar un texto profesional, claro y coherente sobre el siguiente tema:
-
-TEMA: {tema}
-
-{empresa_context}
-
-REQUISITOS:
-- El texto debe tener aproximadamente {max_palabras} palabras (puede variar ligeramente, pero intenta mantenerte cerca de este número)
-- Debe ser profesional pero cercano
-- Debe mantener un tono empresarial apropiado
-- Estructura clara con párrafos bien organizados
-- Debe reflejar y alinearse con los valores, misión y visión proporcionados
-{instrucciones_adicionales if instrucciones_adicionales else ''}
-
-{style_context}
-
-Por favor, genera el texto completo asegurándote de que esté alineado con la identidad y valores proporcionados y que se acerque al objetivo de aproximadamente {max_palabras} palabras:"""
+        contexto = {"cache": None, "clave": None, "cache_semantica": None, "ambito": None, "semantica": semantica}
+        if not usar_cache:
+            return None, contexto
         
-        system_content = f"Eres un experto en comunicación empresarial y redacción profesional. Generas textos que reflejan los valores, misión y cultura empresarial de manera natural y coherente. Intentas respetar los límites de longitud especificados cuando es posible."
-        
-        messages = [
-            SystemMessage(content=system_content),
-            HumanMessage(content=prompt)
-        ]
+        cache = get_response_cache()
+        if cache is not None:
+            clave = cache.generar_clave(
+                self.provider,
+                self.model_name,
+                self.temperature,
+                messages,
+                self._get_config_version()
+            )
+            contexto.update(cache=cache, clave=clave)
+            guardado = cache.obtener(clave)
+            if guardado is not None:
+                # La respuesta ya estaba pagada: no se consumen tokens de nuevo
+                return {**guardado, **self.SIN_CONSUMO, "cache_hit": True}, contexto
         
-        resultado = self._invoke_llm(messages)
+        # Caché semántica (opcional): reutiliza la respuesta de una consulta casi igual
+        cache_semantica = get_semantic_cache() if semantica else None
+        if cache_semantica is not None:
+            ambito = self._get_ambito_semantico(semantica["accion"], semantica.get("parametros"))
+            contexto.update(cache_semantica=cache_semantica, ambito=ambito)
+            coincidencia = cache_semantica.buscar(ambito, semantica["accion"], semantica["consulta"])
+            if coincidencia is not None:
+                return {
+                    **coincidencia["resultado"],
+                    **self.SIN_CONSUMO,
+                    "cache_hit": True,
+                    "cache_semantico": {
+                        "similitud": coincidencia["similitud"],
+                        "consulta_original": coincidencia["consulta_original"]
+                    }
+                }, contexto
         
+        return None, contexto
+    
+    def _guardar_en_caches(self, contexto: Dict, resultado: Dict) -> Dict:
+        """Guarda un resultado nuevo en las cachés consultadas (nunca los errores ni las respuestas parciales)."""
+        resultado.setdefault("proveedor_usado", f"{self.provider}/{self.model_name}")
+        if not resultado.get("error") and not resultado.get("parcial"):
+            if contexto["cache"] is not None:
+                contexto["cache"].guardar(contexto["clave"], resultado)
+            if contexto["cache_semantica"] is not None:
+                semantica = contexto["semantica"]
+                contexto["cache_semantica"].guardar(
+                    contexto["ambito"], semantica["accion"], semantica["consulta"], resultado
+                )
+        resultado["cache_hit"] = False
         return resultado
     
-    def corregir_texto(
-        self, 
-        texto: str,
-        instrucciones_adicionales: str = ""
-    ) -> Dict[str, any]:
+    def _clave_llamada(self, messages: List, contexto: Dict) -> str:
+        """Clave que identifica llamadas idénticas: la de la caché de respuestas (aunque esté deshabilitada)."""
+        return contexto["clave"] or ResponseCache.generar_clave(
+            self.provider,
+            self.model_name,
+            self.temperature,
+            messages,
+            self._get_config_version()
+        )
+    
+    @classmethod
+    def _marcar_compartida(cls, resultado: Dict) -> Dict:
+        """Copia el resultado de otra solicitud idéntica: esta no consumió tokens."""
+        return {**resultado, **cls.SIN_CONSUMO, "llamada_compartida": True}
+    
+    def _opciones_llamada(self, plazo: Optional[Plazo]) -> Dict:
+        """Opciones por llamada del SDK: el timeout acotado a lo que queda del plazo."""
+        if plazo is None or plazo.restante() is None or self.provider not in self.PROVEEDORES_TIMEOUT_POR_LLAMADA:
+            return {}
+        return {"timeout": max(1.0, plazo.restante())}
+    
+    @staticmethod
+    def _timeout_directo(plazo: Optional[Plazo]) -> float:
+        """Timeout de una llamada directa al SDK: lo que queda del plazo o el plazo máximo."""
+        if plazo is None:
+            return get_plazo_maximo()
+        return max(1.0, plazo.limitar(get_plazo_maximo()))
+    
+    def _cohere_directo(self) -> bool:
+        """Indica si las llamadas a Cohere van directo al SDK (ver cohere_adapter)."""
+        return self.provider == "cohere" and cohere_adapter.usar_sdk_directo()
+    
+    @staticmethod
+    def _plazo_agotado(plazo: Optional[Plazo]) -> bool:
+        """Indica si ya no vale la pena probar la cadena de respaldo (plazo vencido o cancelado)."""
+        return plazo is not None and (plazo.vencido or plazo.cancelado)
+    
+    def _tokens_estimados(self, messages: List) -> int:
+        """Tokens que se descuentan del limitador de tasa por una llamada (entrada y salida estimadas)."""
+        return estimar_tokens_mensajes(messages, self.provider, self.model_name) + self.TOKENS_SALIDA_ESTIMADOS
+    
+    def _esperar_turno(self, lote_mensajes: List[List], plazo: Optional[Plazo] = None) -> int:
         """
-        Corrige y mejora un texto existente.
+        Espera turno en el limitador de tasa del proveedor y modelo antes de llamar al LLM.
         
         Args:
-            texto: Texto a corregir
-            instrucciones_adicionales: Instrucciones específicas de corrección
-            
+            lote_mensajes: Lista con los mensajes de cada llamada que se va a hacer
+            plazo: Plazo de la solicitud; acota la espera y permite cancelarla
+        
         Returns:
-            Dict con el texto corregido y metadata
+            Tokens estimados que se descontaron (para corregirlos con `_ajustar_tokens`)
+        
+        Raises:
+            EsperaExcedidaError: Si el turno no llegaría dentro del tiempo máximo de espera (o del plazo)
+            CanceladoError: Si se canceló la solicitud mientras esperaba
+        """
+        tokens_estimados = sum(self._tokens_estimados(messages) for messages in lote_mensajes)
+        limitador = get_rate_limiter()
+        limitador.adquirir(
+            self.provider,
+            self.model_name,
+            solicitudes=len(lote_mensajes),
+            tokens=tokens_estimados,
+            max_espera=plazo.limitar(limitador.max_espera_segundos) if plazo is not None else None,
+            token=plazo.token if plazo is not None else None
+        )
+        return tokens_estimados
+    
+    def _ajustar_tokens(self, tokens_estimados: int, resultados: List[Dict]):
+        """Corrige en el limitador de tasa los tokens estimados con los tokens reales usados."""
+        tokens_reales = sum(r.get("tokens_usados", 0) or 0 for r in resultados if not r.get("cache_hit"))
+        get_rate_limiter().ajustar_tokens(self.provider, self.model_name, tokens_estimados, tokens_reales)
+    
+    def _ocupar_lugar(self, limitador: LimitadorAdaptativo, tokens_estimados: int, plazo: Optional[Plazo] = None):
         """
-        style_context = self._get_style_context()
-        empresa_context = self._get_empresa_context()
+        Espera un lugar en el limitador de concurrencia, acotado por el plazo de la solicitud.
+        Si no lo consigue, devuelve al limitador de tasa el turno que ya se había tomado.
         
-        prompt = f"""Eres un editor experto en comunicación empresarial.
-Tu tarea es corregir y mejorar el siguiente texto, mejorando:
-- Ortografía y gramática
-- Claridad y fluidez
-- Estilo profesional
-- Estructura y organización
-- Coherencia
-- Alineación con los valores y contexto proporcionados
-
-{empresa_context}
-
-TEXTO ORIGINAL:
-{texto}
-
-{instrucciones_adicionales if instrucciones_adicionales else ''}
-
-{style_context}
-
-Por favor, proporciona el texto corregido y mejorado, asegurándote de que esté alineado con los valores proporcionados:"""
+        Args:
+            limitador: Limitador de concurrencia del proveedor
+            tokens_estimados: Tokens que descontó `_esperar_turno`
+            plazo: Plazo de la solicitud; acota la espera y permite cancelarla
         
-        system_content = "Eres un editor experto en comunicación empresarial y redacción profesional. Mejoras textos manteniendo la alineación con los valores y la identidad empresarial de manera natural."
+        Raises:
+            EsperaExcedidaError: Si no hubo lugar dentro del tiempo máximo de espera (o del plazo)
+            CanceladoError: Si se canceló la solicitud antes o durante la espera
+            PlazoVencidoError: Si se agotó el plazo antes o durante la espera
+        """
+        try:
+            if plazo is None:
+                limitador.adquirir(self.provider)
+                return
+            plazo.verificar(self.provider)
+            limitador.adquirir(
+                self.provider,
+                timeout=plazo.limitar(limitador.max_espera_segundos),
+                token=plazo.token
+            )
+        except LLMError:
+            get_rate_limiter().devolver(self.provider, self.model_name, tokens=tokens_estimados)
+            raise
+        self._verificar_con_lugar(limitador, tokens_estimados, plazo)
+    
+    async def _aocupar_lugar(self, limitador: LimitadorAdaptativo, tokens_estimados: int, plazo: Optional[Plazo] = None):
+        """Versión asíncrona de `_ocupar_lugar`."""
+        try:
+            if plazo is None:
+                await limitador.aadquirir(self.provider)
+                return
+            plazo.verificar(self.provider)
+            await limitador.aadquirir(
+                self.provider,
+                timeout=plazo.limitar(limitador.max_espera_segundos),
+                token=plazo.token
+            )
+        except LLMError:
+            get_rate_limiter().devolver(self.provider, self.model_name, tokens=tokens_estimados)
+            raise
+        self._verificar_con_lugar(limitador, tokens_estimados, plazo)
+    
+    def _verificar_con_lugar(self, limitador: LimitadorAdaptativo, tokens_estimados: int, plazo: Plazo):
+        """Verifica el plazo después de conseguir lugar; si ya no se puede seguir, libera el lugar y el turno."""
+        try:
+            plazo.verificar(self.provider)
+        except LLMError:
+            limitador.liberar(0.0, RESULTADO_ERROR)
+            get_rate_limiter().devolver(self.provider, self.model_name, tokens=tokens_estimados)
+            raise
+    
+    def _get_alternativos(self, error: LLMError) -> Iterator["LangChainAgent"]:
+        """
+        Produce los agentes de la cadena de respaldo que pueden atender una solicitud fallida.
         
-        messages = [
-            SystemMessage(content=system_content),
-            HumanMessage(content=prompt)
-        ]
+        Args:
+            error: Error final (ya reintentado) del proveedor configurado
+        
+        Yields:
+            Agentes de los proveedores/modelos de LLM_FALLBACK_CHAIN en orden, sin el actual
+            ni los que no se pueden crear (por ejemplo, por falta de API key o del paquete)
+        """
+        if not permite_respaldo(error):
+            return
         
-        return self._invoke_llm(messages)
+        for provider, model_name in get_cadena_respaldo():
+            alternativo = self._get_agente_alternativo(provider, model_name)
+            if alternativo is None:
+                continue
+            logger.warning(
+                f"🔁 {self.provider}/{self.model_name} no disponible ({type(error).__name__}), "
+                f"usando {alternativo.provider}/{alternativo.model_name}"
+            )
+            yield alternativo
     
-    def resumir_texto(
-        self, 
-        texto: str,
-        max_palabras: int = 100,
-        instrucciones_adicionales: str = ""
-    ) -> Dict[str, any]:
+    def _get_agente_alternativo(self, provider: str, model_name: str = "") -> Optional["LangChainAgent"]:
         """
-        Resume un texto manteniendo las ideas principales.
+        Obtiene (o crea la primera vez) un agente con la misma configuración para otro proveedor/modelo.
         
         Args:
-            texto: Texto a resumir
-            max_palabras: Número máximo de palabras para el resumen
-            instrucciones_adicionales: Instrucciones específicas de resumen
-            
+            provider: Proveedor de IA
+            model_name: Modelo (si está vacío, el primero del proveedor)
+        
         Returns:
-            Dict con el texto resumido y metadata
+            El agente, o None si es el mismo proveedor/modelo, su circuito está abierto
+            o no se puede crear (por ejemplo, por falta de API key o del paquete)
         """
-        empresa_context = self._get_empresa_context()
-        
-        prompt = f"""Eres un experto en comunicación empresarial.
-Tu tarea es crear un resumen conciso y profesional del siguiente texto:
-
-{empresa_context}
-
-TEXTO ORIGINAL:
-{texto}
-
-REQUISITOS:
-- El resumen debe tener aproximadamente {max_palabras} palabras
-- Debe mantener las ideas principales y el mensaje clave
-- Debe ser claro y profesional
-- Mantener el tono original y alineado con la identidad proporcionada
-{instrucciones_adicionales if instrucciones_adicionales else ''}
-
-Por favor, proporciona el resumen:"""
+        model_name = model_name or next(iter(self.get_available_models(provider).values()), "")
+        clave = (provider, model_name)
+        if not model_name or clave == (self.provider, self.model_name):
+            return None
+        if not get_circuito(provider, model_name).disponible():
+            # Viene fallando: no vale la pena esperar su error
+            return None
+        if clave not in self._alternativos:
+            try:
+                alternativo = LangChainAgent(provider=provider, model_name=model_name, temperature=self.temperature)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo usar {provider}/{model_name} como alternativa: {e}")
+                return None
+            alternativo.empresa_config = self.empresa_config
+            alternativo.reference_texts = self.reference_texts
+            self._alternativos[clave] = alternativo
+        return self._alternativos[clave]
+    
+    def _get_destino_cobertura(self) -> Optional["LangChainAgent"]:
+        """
+        Obtiene el agente al que se envían los duplicados de las solicitudes lentas.
         
-        system_content = "Eres un experto en comunicación empresarial y creación de resúmenes profesionales."
+        Returns:
+            Agente de LLM_COBERTURA_DESTINO o del primer eslabón utilizable de
+            LLM_FALLBACK_CHAIN, o None si no hay cobertura activa o no hay destino
+        """
+        if not get_gestor_cobertura().activa:
+            return None
+        destinos = parsear_cadena(os.getenv("LLM_COBERTURA_DESTINO", "")) or get_cadena_respaldo()
+        for provider, model_name in destinos:
+            destino = self._get_agente_alternativo(provider, model_name)
+            if destino is not None:
+                return destino
+        return None
+    
+    def _registrar_uso(
+        self,
+        accion: str,
+        inicio: float,
+        resultado: Optional[Dict] = None,
+        error: Optional[BaseException] = None
+    ) -> Optional[Dict]:
+        """
+        Agrega la solicitud al registro de uso (ver usage_ledger).
         
-        messages = [
-            SystemMessage(content=system_content),
-            HumanMessage(content=prompt)
-        ]
+        Args:
+            accion: Acción de la solicitud
+            inicio: `time.monotonic()` al empezar la solicitud
+            resultado: Dict de resultado (None si falló)
+            error: Error de la solicitud, si falló
         
-        return self._invoke_llm(messages)
+        Returns:
+            Copia del resultado con 'latencia_segundos', o None si no hay resultado
+        """
+        latencia = time.monotonic() - inicio
+        if resultado is not None:
+            resultado = {**resultado, "latencia_segundos": round(latencia, 3)}
+        registro = get_registro_uso()
+        if registro is not None:
+            registro.registrar(
+                accion, self.provider, self.model_name, resultado, latencia, self.usuario, error,
+                empresa=getattr(self.empresa_config, "empresa", None)
+            )
+        return resultado
     
-    @staticmethod
-    def get_available_providers() -> List[str]:
-        """Retorna la lista de proveedores disponibles (solo los que tienen paquetes instalados)."""
-        providers = []
-        if OPENAI_AVAILABLE:
-            providers.append("openai")
-        if GEMINI_AVAILABLE:
-            providers.append("gemini")
-        
-        # Verificar Groq - siempre intentar importar de nuevo para asegurar detección
-        # Esto evita problemas con caché de módulos en Streamlit
-        groq_available = False
-        try:
-            from langchain_groq import ChatGroq
-            groq_available = True
-        except ImportError:
-            # Si falla, verificar la variable global
-            groq_available = GROQ_AVAILABLE
-        if groq_available:
-            providers.append("groq")
-        
-        # Verificar Together AI - importación dinámica
-        together_available = False
-        try:
-            from langchain_together import ChatTogether
-            together_available = True
-        except ImportError:
-            try:
-                from langchain_community.chat_models import ChatTogether
-                together_available = True
-            except ImportError:
-                together_available = TOGETHER_AVAILABLE
-        if together_available:
-            providers.append("together")
-        
-        # Verificar Cohere - importación dinámica
-        cohere_available = False
-        try:
-            from langchain_cohere import ChatCohere
-            cohere_available = True
-        except ImportError:
-            try:
-                from langchain_community.chat_models import ChatCohere
-                cohere_available = True
-            except ImportError:
-                cohere_available = COHERE_AVAILABLE
-        if cohere_available:
-            providers.append("cohere")
-        
-        # Verificar Hugging Face - importación dinámica
-        huggingface_available = False
+    def _marcar_respaldo(self, resultado: Dict, error: LLMError) -> Dict:
+        """Anota en un resultado servido por la cadena de respaldo qué proveedor se había pedido y por qué no respondió."""
+        return {
+            **resultado,
+            "proveedor_solicitado": f"{self.provider}/{self.model_name}",
+            "motivo_respaldo": type(error).__name__
+        }
+    
+    def _invoke_llm(
+        self,
+        messages: List,
+        use_callback: bool = True,
+        usar_cache: bool = True,
+        semantica: Optional[Dict] = None,
+        plazo: Optional[Plazo] = None,
+        accion: str = ""
+    ) -> Dict[str, any]:
+        """
+        Invoca el LLM con los mensajes proporcionados, usando la caché de respuestas.
+        
+        Los errores transitorios (429, 5xx y timeouts) se reintentan según la
+        política de reintentos del proveedor (ver retry_policy). Si aun así el
+        proveedor no puede responder, se usa la cadena de respaldo (ver fallback_chain).
+        Con la cobertura activa, las llamadas lentas se duplican en otro proveedor (ver hedging).
+        
+        Args:
+            messages: Lista de mensajes para el LLM
+            use_callback: Si usar callback para tracking (solo OpenAI)
+            usar_cache: Si es False, ignora la caché y siempre llama al proveedor
+            semantica: Si se indica, activa la caché semántica. Dict con 'accion',
+                'consulta' (tema o texto) y 'parametros' (resto de opciones de la solicitud)
+            plazo: Plazo total y token de cancelación; acota el timeout de cada intento,
+                los reintentos y el respaldo (ver deadlines)
+            accion: Acción de la solicitud, para el registro de uso (ver usage_ledger)
+        
+        Returns:
+            Dict con el texto generado y metadata ('proveedor_usado' indica quién respondió
+            y 'latencia_segundos' cuánto tardó la solicitud)
+        
+        Raises:
+            LLMError: Si la llamada falla y no se puede (o ya no vale la pena) reintentar
+        """
+        inicio = time.monotonic()
+        try:
+            resultado = self._invoke_llm_con_respaldo(messages, use_callback, usar_cache, semantica, plazo)
+        except LLMError as e:
+            self._registrar_uso(accion, inicio, error=e)
+            raise
+        return self._registrar_uso(accion, inicio, resultado)
+    
+    def _invoke_llm_con_respaldo(
+        self,
+        messages: List,
+        use_callback: bool = True,
+        usar_cache: bool = True,
+        semantica: Optional[Dict] = None,
+        plazo: Optional[Plazo] = None
+    ) -> Dict[str, any]:
+        """Invoca el proveedor configurado y, si no puede responder, la cadena de respaldo."""
+        try:
+            return self._invoke_llm_con_cobertura(messages, use_callback, usar_cache, semantica, plazo)
+        except LLMError as e:
+            error = e
+        
+        if self._plazo_agotado(plazo):
+            raise error
+        for alternativo in self._get_alternativos(error):
+            try:
+                resultado = alternativo._invoke_llm_proveedor(messages, use_callback, usar_cache, semantica, plazo)
+            except LLMError as e:
+                logger.warning(f"⚠️ El respaldo {alternativo.provider}/{alternativo.model_name} también falló: {e}")
+                continue
+            return self._marcar_respaldo(resultado, error)
+        raise error
+    
+    def _invoke_llm_con_cobertura(
+        self,
+        messages: List,
+        use_callback: bool = True,
+        usar_cache: bool = True,
+        semantica: Optional[Dict] = None,
+        plazo: Optional[Plazo] = None
+    ) -> Dict[str, any]:
+        """
+        Invoca el proveedor configurado y, si tarda más que el umbral de cobertura,
+        envía un duplicado al destino de cobertura y usa la primera respuesta exitosa.
+        
+        La llamada perdedora no se puede interrumpir en un hilo: se cancela si aún
+        no empezó y, si no, su respuesta se descarta (queda en la caché).
+        
+        Raises:
+            LLMError: Si fallan la llamada principal y la cobertura
+        """
+        destino = self._get_destino_cobertura()
+        if destino is None:
+            return self._invoke_llm_proveedor(messages, use_callback, usar_cache, semantica, plazo)
+        
+        gestor = get_gestor_cobertura()
+        gestor.registrar_solicitud()
+        clave = f"{self.provider}/{self.model_name}"
+        inicio = time.monotonic()
+        principal = get_ejecutor_cobertura().submit(
+            self._invoke_llm_proveedor, messages, use_callback, usar_cache, semantica, plazo
+        )
+        try:
+            resultado = principal.result(timeout=gestor.umbral(clave))
+        except FuturesTimeoutError:
+            pass
+        else:
+            if not resultado.get("cache_hit"):
+                gestor.registrar_latencia(clave, time.monotonic() - inicio)
+            return resultado
+        
+        if not gestor.autorizar():
+            resultado = principal.result()
+            gestor.registrar_latencia(clave, time.monotonic() - inicio)
+            return resultado
+        
+        logger.info(f"🪂 {clave} lleva {time.monotonic() - inicio:.1f}s: cobertura con {destino.provider}/{destino.model_name}")
+        cobertura = get_ejecutor_cobertura().submit(
+            destino._invoke_llm_proveedor, messages, use_callback, usar_cache, semantica, plazo
+        )
+        pendientes = {principal, cobertura}
+        while pendientes:
+            terminadas, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in terminadas:
+                if futuro.exception() is not None:
+                    continue
+                for perdedor in pendientes:
+                    perdedor.cancel()
+                # Si ganó la cobertura, la latencia de la principal es al menos la transcurrida
+                gestor.registrar_latencia(clave, time.monotonic() - inicio)
+                gestor.registrar_ganador(futuro is cobertura)
+                if futuro is cobertura:
+                    return {**futuro.result(), "cobertura": True}
+                return futuro.result()
+        raise principal.exception()
+    
+    async def _ainvoke_llm_con_cobertura(
+        self,
+        messages: List,
+        usar_cache: bool = True,
+        semantica: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        plazo: Optional[Plazo] = None
+    ) -> Dict[str, any]:
+        """
+        Versión asíncrona de `_invoke_llm_con_cobertura`: la llamada perdedora se cancela.
+        
+        Raises:
+            LLMError: Si fallan la llamada principal y la cobertura
+        """
+        destino = self._get_destino_cobertura()
+        if destino is None:
+            return await self._ainvoke_llm_proveedor(messages, usar_cache, semantica, timeout, plazo)
+        
+        gestor = get_gestor_cobertura()
+        gestor.registrar_solicitud()
+        clave = f"{self.provider}/{self.model_name}"
+        inicio = time.monotonic()
+        principal = asyncio.ensure_future(self._ainvoke_llm_proveedor(messages, usar_cache, semantica, timeout, plazo))
+        tareas = [principal]
+        try:
+            terminadas, _ = await asyncio.wait({principal}, timeout=gestor.umbral(clave))
+            if terminadas or not gestor.autorizar():
+                resultado = await principal
+                if not resultado.get("cache_hit"):
+                    gestor.registrar_latencia(clave, time.monotonic() - inicio)
+                return resultado
+            
+            logger.info(f"🪂 {clave} lleva {time.monotonic() - inicio:.1f}s: cobertura con {destino.provider}/{destino.model_name}")
+            cobertura = asyncio.ensure_future(destino._ainvoke_llm_proveedor(messages, usar_cache, semantica, timeout, plazo))
+            tareas.append(cobertura)
+            pendientes = {principal, cobertura}
+            while pendientes:
+                terminadas, pendientes = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+                for tarea in terminadas:
+                    if tarea.exception() is not None:
+                        continue
+                    gestor.registrar_latencia(clave, time.monotonic() - inicio)
+                    gestor.registrar_ganador(tarea is cobertura)
+                    if tarea is cobertura:
+                        return {**tarea.result(), "cobertura": True}
+                    return tarea.result()
+            raise principal.exception()
+        finally:
+            # La llamada perdedora (o ambas, si esta se canceló) se cancela
+            for tarea in tareas:
+                if not tarea.done():
+                    tarea.cancel()
+    
+    def _invoke_llm_proveedor(
+        self,
+        messages: List,
+        use_callback: bool = True,
+        usar_cache: bool = True,
+        semantica: Optional[Dict] = None,
+        plazo: Optional[Plazo] = None
+    ) -> Dict[str, any]:
+        """
+        Invoca el LLM del proveedor configurado (con caché y reintentos, sin respaldo).
+        
+        Si ya hay una llamada idéntica en curso (otra sesión o un doble clic), espera
+        su resultado en lugar de hacer otra (ver single_flight).
+        """
+        guardado, contexto = self._consultar_caches(messages, usar_cache, semantica)
+        if guardado is not None:
+            return guardado
+        
+        def llamar() -> Dict[str, any]:
+            resultado = get_politica_reintentos(self.provider).ejecutar(
+                lambda: self._intentar_llamada(messages, use_callback, plazo),
+                plazo
+            )
+            return self._guardar_en_caches(contexto, resultado)
+        
+        resultado, compartida = get_grupo_llamadas().ejecutar(
+            self._clave_llamada(messages, contexto), llamar, plazo, self.provider
+        )
+        return self._marcar_compartida(resultado) if compartida else resultado
+    
+    def _intentar_llamada(
+        self,
+        messages: List,
+        use_callback: bool = True,
+        plazo: Optional[Plazo] = None
+    ) -> Dict[str, any]:
+        """
+        Hace un intento de llamada: espera turno y lugar, llama al proveedor y los libera.
+        Si el proveedor/modelo viene fallando, el circuito rechaza la llamada de inmediato
+        (ver circuit_breaker).
+        
+        Raises:
+            LLMError: Si se canceló o venció el plazo, el circuito está abierto, no hubo turno
+                o la llamada falló
+        """
+        if plazo is not None:
+            plazo.verificar(self.provider)
+        with get_circuito(self.provider, self.model_name).proteger(self.provider):
+            limitador = get_limitador_concurrencia(self.provider)
+            tokens_estimados = self._esperar_turno([messages], plazo)
+            self._ocupar_lugar(limitador, tokens_estimados, plazo)
+            
+            inicio = time.monotonic()
+            resultado = None
+            try:
+                resultado = self._invocar_proveedor(messages, use_callback, plazo)
+            except LLMError as e:
+                resultado = e
+                raise
+            finally:
+                limitador.liberar(time.monotonic() - inicio, clasificar_resultado(resultado))
+            self._ajustar_tokens(tokens_estimados, [resultado])
+            return resultado
+    
+    async def _ainvoke_llm(
+        self,
+        messages: List,
+        usar_cache: bool = True,
+        semantica: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        plazo: Optional[Plazo] = None,
+        accion: str = ""
+    ) -> Dict[str, any]:
+        """
+        Versión asíncrona de `_invoke_llm`.
+        
+        Las llamadas de un mismo proveedor comparten un límite de concurrencia
+        adaptativo (ver concurrency_limiter) y cada intento tiene un tiempo máximo.
+        Usa los mismos reintentos y la misma cadena de respaldo.
+        
+        Args:
+            messages: Lista de mensajes para el LLM
+            usar_cache: Si es False, ignora la caché y siempre llama al proveedor
+            semantica: Dict con 'accion', 'consulta' y 'parametros' para la caché semántica
+            timeout: Segundos máximos de espera por intento (por defecto TIMEOUT_ASYNC_SEGUNDOS)
+            plazo: Plazo total y token de cancelación (acota también `timeout`)
+            accion: Acción de la solicitud, para el registro de uso
+        
+        Returns:
+            Dict con el texto generado y metadata (mismo formato que `_invoke_llm`)
+        
+        Raises:
+            LLMError: Si la llamada falla y no se puede (o ya no vale la pena) reintentar
+        """
+        inicio = time.monotonic()
+        try:
+            resultado = await self._ainvoke_llm_con_respaldo(messages, usar_cache, semantica, timeout, plazo)
+        except LLMError as e:
+            self._registrar_uso(accion, inicio, error=e)
+            raise
+        return self._registrar_uso(accion, inicio, resultado)
+    
+    async def _ainvoke_llm_con_respaldo(
+        self,
+        messages: List,
+        usar_cache: bool = True,
+        semantica: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        plazo: Optional[Plazo] = None
+    ) -> Dict[str, any]:
+        """Versión asíncrona de `_invoke_llm_con_respaldo`."""
+        try:
+            return await self._ainvoke_llm_con_cobertura(messages, usar_cache, semantica, timeout, plazo)
+        except LLMError as e:
+            error = e
+        
+        if self._plazo_agotado(plazo):
+            raise error
+        for alternativo in self._get_alternativos(error):
+            try:
+                resultado = await alternativo._ainvoke_llm_proveedor(messages, usar_cache, semantica, timeout, plazo)
+            except LLMError as e:
+                logger.warning(f"⚠️ El respaldo {alternativo.provider}/{alternativo.model_name} también falló: {e}")
+                continue
+            return self._marcar_respaldo(resultado, error)
+        raise error
+    
+    async def _ainvoke_llm_proveedor(
+        self,
+        messages: List,
+        usar_cache: bool = True,
+        semantica: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        plazo: Optional[Plazo] = None
+    ) -> Dict[str, any]:
+        """Versión asíncrona de `_invoke_llm_proveedor`."""
+        guardado, contexto = self._consultar_caches(messages, usar_cache, semantica)
+        if guardado is not None:
+            return guardado
+        
+        if timeout is None:
+            timeout = self.TIMEOUT_ASYNC_SEGUNDOS
+        
+        async def llamar() -> Dict[str, any]:
+            resultado = await get_politica_reintentos(self.provider).aejecutar(
+                lambda: self._aintentar_llamada(messages, timeout, plazo),
+                plazo
+            )
+            return self._guardar_en_caches(contexto, resultado)
+        
+        resultado, compartida = await get_grupo_llamadas().aejecutar(
+            self._clave_llamada(messages, contexto), llamar, plazo, self.provider
+        )
+        return self._marcar_compartida(resultado) if compartida else resultado
+    
+    async def _aintentar_llamada(
+        self,
+        messages: List,
+        timeout: float,
+        plazo: Optional[Plazo] = None
+    ) -> Dict[str, any]:
+        """
+        Versión asíncrona de `_intentar_llamada`, con un tiempo máximo para la respuesta.
+        
+        Raises:
+            LLMError: Si se canceló o venció el plazo, el circuito está abierto, no hubo turno,
+                la llamada falló o no respondió a tiempo
+        """
+        if plazo is not None:
+            plazo.verificar(self.provider)
+            timeout = plazo.limitar(timeout)
+        with get_circuito(self.provider, self.model_name).proteger(self.provider):
+            limitador = get_limitador_concurrencia(self.provider)
+            # La espera del limitador de tasa bloquea, por eso se hace en un hilo aparte
+            tokens_estimados = await asyncio.to_thread(self._esperar_turno, [messages], plazo)
+            await self._aocupar_lugar(limitador, tokens_estimados, plazo)
+            
+            inicio = time.monotonic()
+            resultado = None
+            try:
+                try:
+                    if self.provider == "openai":
+                        with get_openai_callback() as cb:
+                            response = await self._allamar_cliente(messages, timeout, plazo)
+                            resultado = self._procesar_respuesta(response, cb)
+                    elif self._cohere_directo():
+                        resultado = await asyncio.wait_for(
+                            asyncio.to_thread(self._invocar_proveedor, messages, True, plazo), timeout
+                        )
+                    else:
+                        response = await self._allamar_cliente(messages, timeout, plazo)
+                        resultado = self._procesar_respuesta(response)
+                except asyncio.TimeoutError as e:
+                    raise TiempoAgotadoError(
+                        f"{self.provider} no respondió en {timeout:.3g} segundos",
+                        provider=self.provider
+                    ) from e
+                except Exception as e:
+                    raise self._error_tipado(e) from e
+            except LLMError as e:
+                resultado = e
+                raise
+            finally:
+                limitador.liberar(time.monotonic() - inicio, clasificar_resultado(resultado))
+            
+            self._ajustar_tokens(tokens_estimados, [resultado])
+            return resultado
+    
+    async def _allamar_cliente(self, messages: List, timeout: float, plazo: Optional[Plazo] = None):
+        """
+        Llama a `ainvoke` del cliente con un tiempo máximo.
+        
+        Solo la llamada tiene alternativa: si el cliente no implementa `ainvoke`, se usa
+        `invoke` en un hilo aparte y, ante el error conocido de langchain-cohere, el SDK de
+        Cohere directamente. Un error al procesar la respuesta no repite la llamada (ya pagada).
+        
+        Returns:
+            Respuesta del cliente (AIMessage)
+        
+        Raises:
+            asyncio.TimeoutError: Si no respondió a tiempo
+        """
+        ainvoke = getattr(self.llm, "ainvoke", None)
+        try:
+            if ainvoke is None:
+                raise NotImplementedError
+            return await asyncio.wait_for(ainvoke(messages), timeout)
+        except NotImplementedError:
+            return await asyncio.wait_for(
+                asyncio.to_thread(self.llm.invoke, messages, **self._opciones_llamada(plazo)), timeout
+            )
+        except (AttributeError, TypeError) as e:
+            if not (self.provider == "cohere" and cohere_adapter.es_error_compatibilidad(e)):
+                raise
+            logger.warning(f"⚠️ langchain-cohere no es compatible con el SDK instalado; se usa el SDK de Cohere directamente: {e}")
+            cohere_adapter.marcar_incompatible()
+            return await asyncio.wait_for(
+                asyncio.to_thread(cohere_adapter.invocar, self.model_name, messages, self.temperature, timeout),
+                timeout
+            )
+    
+    @staticmethod
+    def _extraer_texto_fragmento(contenido) -> str:
+        """Extrae el texto de un fragmento de streaming (str o lista de partes, como en Gemini)."""
+        if contenido is None or callable(contenido):
+            return ""
+        if isinstance(contenido, str):
+            return contenido
+        if isinstance(contenido, list):
+            textos = []
+            for item in contenido:
+                if isinstance(item, dict):
+                    if 'text' in item:
+                        textos.append(str(item['text']))
+                elif isinstance(item, str):
+                    textos.append(item)
+            return "".join(textos)
+        return str(contenido)
+    
+    def _stream_llm(
+        self,
+        messages: List,
+        usar_cache: bool = True,
+        semantica: Optional[Dict] = None,
+        plazo: Optional[Plazo] = None,
+        accion: str = ""
+    ) -> Iterator[Union[str, Dict]]:
+        """
+        Invoca el LLM en modo streaming.
+        
+        Produce fragmentos de texto (str) a medida que llegan y, como último
+        elemento, un Dict con el mismo formato que `_invoke_llm` (texto completo,
+        tokens y costo). Si el proveedor no soporta streaming, produce el texto
+        completo en un solo fragmento. Un error se reintenta (o pasa a la cadena
+        de respaldo) solo si todavía no se produjo ningún fragmento. El streaming
+        no usa cobertura: el usuario ya ve la respuesta mientras se genera.
+        
+        Si el plazo vence o se cancela la solicitud después del primer fragmento,
+        el Dict final trae el texto recibido hasta ese momento, con 'parcial' en
+        True y 'motivo_corte' ('plazo' o 'cancelado'); ese resultado no se guarda en la caché.
+        
+        Args:
+            messages: Lista de mensajes para el LLM
+            usar_cache: Si es False, ignora la caché y siempre llama al proveedor
+            semantica: Dict con 'accion', 'consulta' y 'parametros' para la caché semántica
+            plazo: Plazo total y token de cancelación (se revisan entre fragmentos)
+            accion: Acción de la solicitud, para el registro de uso
+        
+        Yields:
+            Fragmentos de texto y, al final, el Dict con el resultado (con
+            'latencia_segundos' y 'primer_fragmento_segundos')
+        
+        Raises:
+            LLMError: Si la llamada falla y no se puede (o ya no vale la pena) reintentar
+        """
+        inicio = time.monotonic()
+        primer_fragmento = None
+        registrado = False
+        try:
+            for elemento in self._stream_llm_con_respaldo(messages, usar_cache, semantica, plazo):
+                if isinstance(elemento, dict):
+                    registrado = True
+                    if primer_fragmento is not None:
+                        elemento = {**elemento, "primer_fragmento_segundos": round(primer_fragmento, 3)}
+                    elemento = self._registrar_uso(accion, inicio, elemento)
+                elif elemento and primer_fragmento is None:
+                    primer_fragmento = time.monotonic() - inicio
+                yield elemento
+        except BaseException as e:
+            if not registrado:
+                # Si quien consume el stream lo cierra (por ejemplo, al cancelar), se registra como cancelada
+                self._registrar_uso(
+                    accion, inicio,
+                    error=e if isinstance(e, Exception) else CanceladoError("Se canceló la solicitud", provider=self.provider)
+                )
+            raise
+    
+    def _stream_llm_con_respaldo(
+        self,
+        messages: List,
+        usar_cache: bool = True,
+        semantica: Optional[Dict] = None,
+        plazo: Optional[Plazo] = None
+    ) -> Iterator[Union[str, Dict]]:
+        """Invoca en streaming al proveedor configurado y, si falla antes del primer fragmento, a la cadena de respaldo."""
+        emitido = False
+        try:
+            for elemento in self._stream_llm_proveedor(messages, usar_cache, semantica, plazo):
+                emitido = emitido or (isinstance(elemento, str) and bool(elemento))
+                yield elemento
+            return
+        except LLMError as e:
+            if emitido:
+                raise
+            error = e
+        
+        if self._plazo_agotado(plazo):
+            raise error
+        for alternativo in self._get_alternativos(error):
+            emitido = False
+            try:
+                for elemento in alternativo._stream_llm_proveedor(messages, usar_cache, semantica, plazo):
+                    emitido = emitido or (isinstance(elemento, str) and bool(elemento))
+                    yield self._marcar_respaldo(elemento, error) if isinstance(elemento, dict) else elemento
+                return
+            except LLMError as e:
+                if emitido:
+                    raise
+                logger.warning(f"⚠️ El respaldo {alternativo.provider}/{alternativo.model_name} también falló: {e}")
+        raise error
+    
+    def _stream_llm_proveedor(
+        self,
+        messages: List,
+        usar_cache: bool = True,
+        semantica: Optional[Dict] = None,
+        plazo: Optional[Plazo] = None
+    ) -> Iterator[Union[str, Dict]]:
+        """Invoca en streaming al proveedor configurado (con caché y reintentos, sin respaldo)."""
+        guardado, contexto = self._consultar_caches(messages, usar_cache, semantica)
+        if guardado is not None:
+            yield guardado.get("texto", "")
+            yield guardado
+            return
+        
+        politica = get_politica_reintentos(self.provider)
+        inicio = time.monotonic()
+        intento = 0
+        while True:
+            intento += 1
+            emitido = False
+            try:
+                for elemento in self._intentar_stream(messages, contexto, plazo):
+                    emitido = emitido or (isinstance(elemento, str) and bool(elemento))
+                    yield elemento
+                return
+            except LLMError as e:
+                # Con texto ya mostrado, reintentar lo duplicaría
+                if emitido or not politica.esperar_reintento(intento, e, inicio, plazo):
+                    raise
+    
+    def _intentar_stream(
+        self,
+        messages: List,
+        contexto: Dict,
+        plazo: Optional[Plazo] = None
+    ) -> Iterator[Union[str, Dict]]:
+        """
+        Hace un intento de llamada en streaming: espera turno y lugar, y los libera al terminar.
+        
+        Raises:
+            LLMError: Si se canceló o venció el plazo, el circuito está abierto, no hubo turno
+                o la llamada falló
+        """
+        if plazo is not None:
+            plazo.verificar(self.provider)
+        with get_circuito(self.provider, self.model_name).proteger(self.provider):
+            limitador = get_limitador_concurrencia(self.provider)
+            tokens_estimados = self._esperar_turno([messages], plazo)
+            self._ocupar_lugar(limitador, tokens_estimados, plazo)
+            
+            inicio = time.monotonic()
+            resultado = None
+            try:
+                for elemento in self._stream_proveedor(messages, contexto, tokens_estimados, plazo):
+                    if isinstance(elemento, dict):
+                        resultado = elemento
+                    yield elemento
+            except LLMError as e:
+                resultado = e
+                raise
+            finally:
+                limitador.liberar(time.monotonic() - inicio, clasificar_resultado(resultado))
+    
+    def _stream_proveedor(
+        self,
+        messages: List,
+        contexto: Dict,
+        tokens_estimados: int,
+        plazo: Optional[Plazo] = None
+    ) -> Iterator[Union[str, Dict]]:
+        """Hace la llamada en streaming al proveedor (ya con turno y lugar asignados)."""
+        if self.provider not in self.PROVEEDORES_STREAMING:
+            resultado = self._guardar_en_caches(contexto, self._invocar_proveedor(messages, True, plazo))
+            yield resultado.get("texto", "")
+            yield resultado
+            return
+        
+        # OpenAI solo envía el uso de tokens en streaming si se pide explícitamente
+        stream_kwargs = {"stream_options": {"include_usage": True}} if self.provider == "openai" else {}
+        stream_kwargs.update(self._opciones_llamada(plazo))
+        partes = []
+        acumulado = None
+        costo = 0.0
+        motivo_corte = None
+        if self._cohere_directo():
+            fragmentos = cohere_adapter.stream(self.model_name, messages, self.temperature, self._timeout_directo(plazo))
+        else:
+            fragmentos = self.llm.stream(messages, **stream_kwargs)
+        try:
+            with get_openai_callback() as cb:
+                for fragmento in fragmentos:
+                    acumulado = fragmento if acumulado is None else acumulado + fragmento
+                    texto = self._extraer_texto_fragmento(getattr(fragmento, 'content', fragmento))
+                    if texto:
+                        partes.append(texto)
+                        yield texto
+                    if plazo is not None and (plazo.cancelado or plazo.vencido):
+                        # Cortar el stream (cierra la conexión) y entregar lo recibido
+                        motivo_corte = "cancelado" if plazo.cancelado else "plazo"
+                        break
+            if self.provider == "openai" and cb:
+                costo = cb.total_cost or 0.0
+        except (AttributeError, TypeError, NotImplementedError) as e:
+            if partes:
+                raise self._error_tipado(e) from e
+            if self.provider == "cohere" and cohere_adapter.es_error_compatibilidad(e):
+                # Error conocido de langchain-cohere: seguir en streaming con el SDK de Cohere
+                cohere_adapter.marcar_incompatible()
+                yield from self._stream_proveedor(messages, contexto, tokens_estimados, plazo)
+                return
+            # No llegó ningún fragmento y el cliente no soporta bien el streaming: usar la
+            # llamada normal, que ya maneja los casos especiales de cada proveedor (por ejemplo, Cohere)
+            resultado = self._guardar_en_caches(contexto, self._invocar_proveedor(messages, True, plazo))
+            yield resultado.get("texto", "")
+            yield resultado
+            return
+        except Exception as e:
+            error = self._error_tipado(e)
+            if not (partes and isinstance(error, TiempoAgotadoError)):
+                raise error from e
+            # El proveedor dejó de enviar fragmentos: entregar lo recibido
+            motivo_corte = "plazo"
+        
+        tokens_usados = 0
+        usage = getattr(acumulado, 'usage_metadata', None)
+        if usage:
+            tokens_usados = (usage.get('total_tokens', 0) if isinstance(usage, dict) else getattr(usage, 'total_tokens', 0)) or 0
+        
+        resultado = {
+            "texto": "".join(partes).strip(),
+            "tokens_usados": tokens_usados,
+            **self._desglose_tokens(acumulado),
+            "costo": costo or self._calcular_costo(acumulado)
+        }
+        if motivo_corte:
+            logger.warning(f"⏱️ Stream de {self.provider}/{self.model_name} cortado ({motivo_corte}): se entrega la respuesta parcial")
+            resultado.update(parcial=True, motivo_corte=motivo_corte)
+        self._ajustar_tokens(tokens_estimados, [resultado])
+        yield self._guardar_en_caches(contexto, resultado)
+    
+    def _invocar_proveedor(
+        self,
+        messages: List,
+        use_callback: bool = True,
+        plazo: Optional[Plazo] = None
+    ) -> Dict[str, any]:
+        """
+        Invoca directamente al proveedor configurado con los mensajes proporcionados.
+        
+        Args:
+            messages: Lista de mensajes para el LLM
+            use_callback: Si usar callback para tracking (solo OpenAI)
+            plazo: Plazo de la acción (acota el timeout de la llamada, si el SDK lo permite)
+        
+        Returns:
+            Dict con el texto generado y metadata
+        
+        Raises:
+            LLMError: Si el proveedor falla (con el tipo que corresponde al error)
+        """
+        opciones = self._opciones_llamada(plazo)
+        try:
+            if self._cohere_directo():
+                response = cohere_adapter.invocar(
+                    self.model_name, messages, self.temperature, self._timeout_directo(plazo)
+                )
+                return self._procesar_respuesta(response)
+            # Proveedores adicionales (Groq, Together, Cohere, HuggingFace)
+            if self.provider in ["groq", "together", "cohere", "huggingface"]:
+                try:
+                    response = self.llm.invoke(messages, **opciones)
+                except (AttributeError, TypeError) as e:
+                    if self.provider == "cohere" and cohere_adapter.es_error_compatibilidad(e):
+                        # Error conocido de langchain-cohere con token_count: usar el SDK directamente
+                        logger.warning(f"⚠️ langchain-cohere no es compatible con el SDK instalado; se usa el SDK de Cohere directamente: {e}")
+                        cohere_adapter.marcar_incompatible()
+                        return self._invocar_proveedor(messages, use_callback, plazo)
+                    raise ValueError(f"Error al procesar con {self.provider}: {str(e)}")
+                
+                return self._procesar_respuesta(response)
+            elif self.provider == "gemini":
+                # Usar ChatGoogleGenerativeAI de LangChain (método correcto)
+                response = self.llm.invoke(messages, **opciones)
+                
+                return self._procesar_respuesta(response)
+            elif self.provider == "openai" and use_callback:
+                with get_openai_callback() as cb:
+                    response = self.llm.invoke(messages, **opciones)
+                    return self._procesar_respuesta(response, cb)
+            else:
+                # OpenAI sin callback
+                response = self.llm.invoke(messages, **opciones)
+                return self._procesar_respuesta(response)
+        except Exception as e:
+            raise self._error_tipado(e) from e
+    
+    def _procesar_respuesta(self, response, cb=None) -> Dict[str, any]:
+        """
+        Convierte la respuesta de LangChain en el Dict de resultado (texto, tokens y costo).
+        
+        Args:
+            response: Respuesta del LLM (invoke o ainvoke)
+            cb: Callback de OpenAI con el conteo de tokens y costo (opcional)
+        
+        Returns:
+            Dict con el texto generado y metadata
+        """
+        if self.provider == "openai":
+            return {
+                "texto": response.content,
+                "tokens_usados": cb.total_tokens if cb else 0,
+                **self._desglose_tokens(response, cb),
+                "costo": self._calcular_costo(response, cb)
+            }
+        
+        if self.provider == "gemini":
+            # Extraer el texto de la respuesta de Gemini
+            # Según la documentación de LangChain, usar response.content directamente
+            texto = ""
+            
+            try:
+                # Intentar obtener el contenido directamente
+                if hasattr(response, 'content'):
+                    contenido = response.content
+                    
+                    # Verificar que no sea una función
+                    if callable(contenido):
+                        # Si es una función, no podemos usarla directamente
+                        # Intentar obtener el texto de otra manera
+                        contenido = str(response)
+                    elif isinstance(contenido, list):
+                        # Si es una lista (Gemini 3), extraer el texto de cada elemento
+                        textos = []
+                        for item in contenido:
+                            if isinstance(item, dict):
+                                # Si tiene 'text', usarlo
+                                if 'text' in item:
+                                    textos.append(str(item['text']))
+                                # Si tiene 'type' y 'text'
+                                elif item.get('type') == 'text' and 'text' in item:
+                                    textos.append(str(item['text']))
+                                else:
+                                    textos.append(str(item))
+                            else:
+                                textos.append(str(item))
+                        texto = " ".join(textos)
+                    elif isinstance(contenido, str):
+                        texto = contenido
+                    else:
+                        texto = str(contenido)
+                else:
+                    # Si no tiene content, convertir toda la respuesta a string
+                    texto = str(response)
+                
+                # Asegurar que texto sea un string válido y no una función
+                if callable(texto):
+                    texto = str(response)
+                
+                if not isinstance(texto, str):
+                    texto = str(texto)
+                
+                # Limpiar el texto
+                texto = texto.strip()
+            
+            except Exception as e:
+                # Si hay algún error al extraer el texto, usar str(response)
+                texto = str(response)
+                if callable(texto):
+                    texto = f"Error al extraer texto: {str(e)}"
+            
+            return {
+                "texto": texto,
+                "tokens_usados": response.usage_metadata.get('total_tokens', 0) if hasattr(response, 'usage_metadata') and response.usage_metadata else 0,
+                **self._desglose_tokens(response),
+                "costo": self._calcular_costo(response)
+            }
+        
+        # Proveedores adicionales (Groq, Together, Cohere, HuggingFace)
+        # Extraer texto de forma segura
+        texto = ""
+        try:
+            if hasattr(response, 'content'):
+                contenido = response.content
+                if callable(contenido):
+                    contenido = contenido()
+                texto = str(contenido) if contenido else ""
+            else:
+                texto = str(response)
+        except Exception as e:
+            # Si hay error extrayendo el contenido, usar str(response)
+            texto = str(response)
+        
+        # Intentar extraer tokens de forma segura (si están disponibles)
+        tokens_usados = 0
+        try:
+            # Cohere puede tener response_metadata con información de tokens
+            if hasattr(response, 'response_metadata'):
+                metadata = response.response_metadata
+                if isinstance(metadata, dict):
+                    # Intentar diferentes formatos de token info
+                    tokens_usados = metadata.get('token_count', 0) or metadata.get('tokens', 0) or 0
+            # Algunos proveedores tienen usage_metadata
+            if tokens_usados == 0 and hasattr(response, 'usage_metadata'):
+                usage = response.usage_metadata
+                if usage:
+                    if isinstance(usage, dict):
+                        tokens_usados = usage.get('total_tokens', 0) or 0
+                    else:
+                        tokens_usados = getattr(usage, 'total_tokens', 0) or 0
+        except (AttributeError, TypeError, KeyError):
+            # Si hay cualquier error, simplemente usar 0
+            tokens_usados = 0
+        
+        return {
+            "texto": texto.strip() if texto else "",
+            "tokens_usados": tokens_usados,
+            **self._desglose_tokens(response),
+            "costo": self._calcular_costo(response)
+        }
+    
+    @staticmethod
+    def _desglose_tokens(response, cb=None) -> Dict[str, int]:
+        """
+        Obtiene los tokens de entrada (prompt) y de salida (respuesta) de una llamada.
+        
+        Args:
+            response: Respuesta o fragmento acumulado del LLM (con `usage_metadata`)
+            cb: Callback de OpenAI (opcional)
+        
+        Returns:
+            Dict con 'tokens_entrada', 'tokens_salida' y 'tokens_cache' (tokens de entrada que el
+            proveedor tomó de su caché de prefijos; 0 si el proveedor no los informa)
+        """
+        if cb is not None and getattr(cb, "total_tokens", 0):
+            return {
+                "tokens_entrada": cb.prompt_tokens or 0,
+                "tokens_salida": cb.completion_tokens or 0,
+                "tokens_cache": getattr(cb, "prompt_tokens_cached", 0) or 0
+            }
+        usage = getattr(response, "usage_metadata", None) or {}
+        if not isinstance(usage, dict):
+            usage = {
+                "input_tokens": getattr(usage, "input_tokens", 0),
+                "output_tokens": getattr(usage, "output_tokens", 0),
+                "input_token_details": getattr(usage, "input_token_details", None)
+            }
+        detalle_entrada = usage.get("input_token_details") or {}
+        return {
+            "tokens_entrada": usage.get("input_tokens", 0) or 0,
+            "tokens_salida": usage.get("output_tokens", 0) or 0,
+            "tokens_cache": detalle_entrada.get("cache_read", 0) or 0
+        }
+    
+    def _calcular_costo(self, response, cb=None) -> float:
+        """Costo de una llamada: el que informa el proveedor (OpenAI) o, si no, el del catálogo de precios."""
+        if cb is not None and getattr(cb, "total_cost", 0):
+            return cb.total_cost
+        desglose = self._desglose_tokens(response, cb)
+        return calcular_costo(
+            self.provider, self.model_name,
+            desglose["tokens_entrada"], desglose["tokens_salida"], desglose["tokens_cache"]
+        )
+    
+    def _error_tipado(self, e: Exception) -> LLMError:
+        """
+        Convierte una excepción del proveedor en un LLMError tipado con un mensaje útil.
+        
+        Args:
+            e: Excepción lanzada por el proveedor
+        
+        Returns:
+            LLMError de la subclase que corresponde (reintentable o no)
+        """
+        if isinstance(e, LLMError):
+            return e
+        error_msg = str(e)
+        # Mejorar mensajes de error para Gemini
+        if self.provider == "gemini":
+            if "404" in error_msg or "not found" in error_msg.lower() or "not supported" in error_msg.lower():
+                sugerencia = (
+                    f"\n\n💡 El modelo '{self.model_name}' no está disponible.\n\n"
+                    f"Verifica que:\n"
+                    f"1. Tu API key (GOOGLE_API_KEY) sea válida\n"
+                    f"2. La API de Gemini esté habilitada en Google Cloud\n"
+                    f"3. El modelo 'gemini-flash-latest' esté disponible en tu cuenta\n"
+                    f"4. Actualiza langchain-google-genai: pip install --upgrade langchain-google-genai\n"
+                    f"5. Revisa la documentación: https://docs.langchain.com/oss/python/integrations/chat/google_generative_ai"
+                )
+                
+                return clasificar_error(e, self.provider, f"Error al procesar con Gemini: {error_msg}{sugerencia}")
+        # Detectar errores específicos de OpenAI
+        if self.provider == "openai":
+            if "429" in error_msg or "quota" in error_msg.lower() or "insufficient_quota" in error_msg.lower():
+                sugerencia = (
+                    f"\n\n⚠️ Has excedido tu cuota de OpenAI.\n\n"
+                    f"💡 Soluciones:\n"
+                    f"1. **Usa Gemini (GRATUITO)**: Cambia al proveedor 'Google Gemini' en el sidebar\n"
+                    f"   - Gemini es completamente gratuito y no tiene límites de cuota\n"
+                    f"   - Modelos disponibles: gemini-1.5-flash (recomendado), gemini-1.5-pro, gemini-pro\n\n"
+                    f"2. **Espera**: Espera unos minutos y vuelve a intentar con OpenAI\n\n"
+                    f"3. **Verifica tu cuenta**: Revisa tu plan y facturación en https://platform.openai.com/account/billing\n\n"
+                    f"💡 Recomendación: Usa Gemini para evitar problemas de cuota."
+                )
+                return clasificar_error(e, self.provider, f"Error al procesar con OpenAI: {error_msg}{sugerencia}")
+            elif "model_not_found" in error_msg.lower() or "does not exist" in error_msg.lower():
+                sugerencia = (
+                    f"\n\n⚠️ El modelo seleccionado no está disponible.\n\n"
+                    f"💡 Soluciones:\n"
+                    f"1. Cambia a otro modelo de OpenAI en el sidebar (gpt-4o-mini o gpt-3.5-turbo)\n"
+                    f"2. Usa Gemini (GRATUITO) cambiando al proveedor 'Google Gemini' en el sidebar\n"
+                )
+                return clasificar_error(e, self.provider, f"Error al procesar con OpenAI: {error_msg}{sugerencia}")
+        if self.provider == "cohere":
+            if "404" in error_msg or "was removed" in error_msg.lower():
+                sugerencia = (
+                    f"\n\n💡 El modelo '{self.model_name}' de Cohere no está disponible. "
+                    f"Usa 'command-nightly' (los modelos 'command' y 'command-light' fueron removidos)."
+                )
+                return clasificar_error(e, self.provider, f"Error al procesar con Cohere: {error_msg}{sugerencia}")
+        
+        return clasificar_error(e, self.provider, f"Error al procesar con {self.provider}: {error_msg}")
+    
+    def _preparar_generar(
+        self,
+        tema: str,
+        max_palabras: int,
+        instrucciones_adicionales: str,
+        cache_semantico: bool
+    ) -> Tuple[List, Optional[Dict]]:
+        """Construye los mensajes (y la consulta semántica) para generar un texto."""
+        instrucciones_fijas = """Eres un experto en comunicación empresarial y redacción profesional. Generas textos que reflejan los valores, misión y cultura empresarial de manera natural y coherente. Intentas respetar los límites de longitud especificados cuando es posible.
+Tu tarea es generar un texto profesional, claro y coherente sobre el tema que se te indique.
+
+REQUISITOS:
+- Debe ser profesional pero cercano
+- Debe mantener un tono empresarial apropiado
+- Estructura clara con párrafos bien organizados
+- Debe reflejar y alinearse con los valores, misión y visión proporcionados"""
+
+        solicitud = f"""TEMA: {tema}
+
+- El texto debe tener aproximadamente {max_palabras} palabras (puede variar ligeramente, pero intenta mantenerte cerca de este número)
+{instrucciones_adicionales if instrucciones_adicionales else ''}
+
+Por favor, genera el texto completo asegurándote de que esté alineado con la identidad y valores proporcionados y que se acerque al objetivo de aproximadamente {max_palabras} palabras:"""
+        
+        messages = self._mensajes_con_prefijo(instrucciones_fijas, solicitud)
+        
+        semantica = None
+        if cache_semantico:
+            semantica = {
+                "accion": "generar",
+                "consulta": tema,
+                "parametros": {"max_palabras": max_palabras, "instrucciones": instrucciones_adicionales}
+            }
+        
+        return messages, semantica
+    
+    def generar_texto(
+        self, 
+        tema: str, 
+        max_palabras: int = 200,
+        instrucciones_adicionales: str = "",
+        usar_cache: bool = True,
+        cache_semantico: bool = False,
+        plazo: Optional[Plazo] = None
+    ) -> Dict[str, any]:
+        """
+        Genera un nuevo texto a partir de un tema.
+        
+        Args:
+            tema: Tema o prompt para generar el texto
+            max_palabras: Número máximo de palabras
+            instrucciones_adicionales: Instrucciones adicionales opcionales
+            usar_cache: Si es False, ignora la caché de respuestas
+            cache_semantico: Si es True, reutiliza respuestas de solicitudes muy parecidas
+            plazo: Plazo total y token de cancelación (por defecto, el plazo de la acción)
+            
+        Returns:
+            Dict con el texto generado y metadata
+        
+        Raises:
+            LLMError: Si la llamada al proveedor falla (después de los reintentos)
+        """
+        messages, semantica = self._preparar_generar(
+            tema=tema,
+            max_palabras=max_palabras,
+            instrucciones_adicionales=instrucciones_adicionales,
+            cache_semantico=cache_semantico
+        )
+        return self._invoke_llm(
+            messages, usar_cache=usar_cache, semantica=semantica,
+            plazo=plazo or crear_plazo("generar"), accion="generar"
+        )
+    
+    def generar_texto_stream(
+        self, 
+        tema: str, 
+        max_palabras: int = 200,
+        instrucciones_adicionales: str = "",
+        usar_cache: bool = True,
+        cache_semantico: bool = False,
+        plazo: Optional[Plazo] = None
+    ) -> Iterator[Union[str, Dict]]:
+        """
+        Genera un nuevo texto a partir de un tema, en modo streaming.
+        
+        Args:
+            tema: Tema o prompt para generar el texto
+            max_palabras: Número máximo de palabras
+            instrucciones_adicionales: Instrucciones adicionales opcionales
+            usar_cache: Si es False, ignora la caché de respuestas
+            cache_semantico: Si es True, reutiliza respuestas de solicitudes muy parecidas
+            plazo: Plazo total y token de cancelación (por defecto, el plazo de la acción)
+        
+        Yields:
+            Fragmentos de texto y, al final, el Dict con el texto generado y metadata
+        
+        Raises:
+            LLMError: Si la llamada al proveedor falla (después de los reintentos)
+        """
+        messages, semantica = self._preparar_generar(
+            tema=tema,
+            max_palabras=max_palabras,
+            instrucciones_adicionales=instrucciones_adicionales,
+            cache_semantico=cache_semantico
+        )
+        yield from self._stream_llm(
+            messages, usar_cache=usar_cache, semantica=semantica,
+            plazo=plazo or crear_plazo("generar"), accion="generar"
+        )
+    
+    async def agenerar_texto(
+        self, 
+        tema: str, 
+        max_palabras: int = 200,
+        instrucciones_adicionales: str = "",
+        usar_cache: bool = True,
+        cache_semantico: bool = False,
+        timeout: Optional[float] = None,
+        plazo: Optional[Plazo] = None
+    ) -> Dict[str, any]:
+        """
+        Genera un nuevo texto a partir de un tema, de forma asíncrona.
+        
+        Args:
+            tema: Tema o prompt para generar el texto
+            max_palabras: Número máximo de palabras
+            instrucciones_adicionales: Instrucciones adicionales opcionales
+            usar_cache: Si es False, ignora la caché de respuestas
+            cache_semantico: Si es True, reutiliza respuestas de solicitudes muy parecidas
+            timeout: Segundos máximos de la llamada (por defecto TIMEOUT_ASYNC_SEGUNDOS)
+            plazo: Plazo total y token de cancelación (por defecto, el plazo de la acción)
+        
+        Returns:
+            Dict con el texto generado y metadata
+        
+        Raises:
+            LLMError: Si la llamada al proveedor falla (después de los reintentos)
+        """
+        messages, semantica = self._preparar_generar(
+            tema=tema,
+            max_palabras=max_palabras,
+            instrucciones_adicionales=instrucciones_adicionales,
+            cache_semantico=cache_semantico
+        )
+        return await self._ainvoke_llm(
+            messages, usar_cache=usar_cache, semantica=semantica, timeout=timeout,
+            plazo=plazo or crear_plazo("generar"), accion="generar"
+        )
+    
+    def _preparar_corregir(
+        self,
+        texto: str,
+        instrucciones_adicionales: str,
+        cache_semantico: bool
+    ) -> Tuple[List, Optional[Dict]]:
+        """Construye los mensajes (y la consulta semántica) para corregir un texto."""
+        instrucciones_fijas = """Eres un editor experto en comunicación empresarial y redacción profesional. Mejoras textos manteniendo la alineación con los valores y la identidad empresarial de manera natural.
+Tu tarea es corregir y mejorar el texto que se te entregue, mejorando:
+- Ortografía y gramática
+- Claridad y fluidez
+- Estilo profesional
+- Estructura y organización
+- Coherencia
+- Alineación con los valores y contexto proporcionados"""
+
+        solicitud = f"""TEXTO ORIGINAL:
+{texto}
+
+{instrucciones_adicionales if instrucciones_adicionales else ''}
+
+Por favor, proporciona el texto corregido y mejorado, asegurándote de que esté alineado con los valores proporcionados:"""
+        
+        messages = self._mensajes_con_prefijo(instrucciones_fijas, solicitud)
+        
+        semantica = None
+        if cache_semantico:
+            semantica = {
+                "accion": "corregir",
+                "consulta": texto,
+                "parametros": {"instrucciones": instrucciones_adicionales}
+            }
+        
+        return messages, semantica
+    
+    def corregir_texto(
+        self, 
+        texto: str,
+        instrucciones_adicionales: str = "",
+        usar_cache: bool = True,
+        cache_semantico: bool = False,
+        plazo: Optional[Plazo] = None
+    ) -> Dict[str, any]:
+        """
+        Corrige y mejora un texto existente.
+        
+        Args:
+            texto: Texto a corregir
+            instrucciones_adicionales: Instrucciones específicas de corrección
+            usar_cache: Si es False, ignora la caché de respuestas
+            cache_semantico: Si es True, reutiliza respuestas de solicitudes muy parecidas
+            plazo: Plazo total y token de cancelación (por defecto, el plazo de la acción)
+            
+        Returns:
+            Dict con el texto corregido y metadata
+        
+        Raises:
+            LLMError: Si la llamada al proveedor falla (después de los reintentos)
+        """
+        messages, semantica = self._preparar_corregir(
+            texto=texto,
+            instrucciones_adicionales=instrucciones_adicionales,
+            cache_semantico=cache_semantico
+        )
+        return self._invoke_llm(
+            messages, usar_cache=usar_cache, semantica=semantica,
+            plazo=plazo or crear_plazo("corregir"), accion="corregir"
+        )
+    
+    def corregir_texto_stream(
+        self, 
+        texto: str,
+        instrucciones_adicionales: str = "",
+        usar_cache: bool = True,
+        cache_semantico: bool = False,
+        plazo: Optional[Plazo] = None
+    ) -> Iterator[Union[str, Dict]]:
+        """
+        Corrige y mejora un texto existente, en modo streaming.
+        
+        Args:
+            texto: Texto a corregir
+            instrucciones_adicionales: Instrucciones específicas de corrección
+            usar_cache: Si es False, ignora la caché de respuestas
+            cache_semantico: Si es True, reutiliza respuestas de solicitudes muy parecidas
+            plazo: Plazo total y token de cancelación (por defecto, el plazo de la acción)
+        
+        Yields:
+            Fragmentos de texto y, al final, el Dict con el texto corregido y metadata
+        
+        Raises:
+            LLMError: Si la llamada al proveedor falla (después de los reintentos)
+        """
+        messages, semantica = self._preparar_corregir(
+            texto=texto,
+            instrucciones_adicionales=instrucciones_adicionales,
+            cache_semantico=cache_semantico
+        )
+        yield from self._stream_llm(
+            messages, usar_cache=usar_cache, semantica=semantica,
+            plazo=plazo or crear_plazo("corregir"), accion="corregir"
+        )
+    
+    async def acorregir_texto(
+        self, 
+        texto: str,
+        instrucciones_adicionales: str = "",
+        usar_cache: bool = True,
+        cache_semantico: bool = False,
+        timeout: Optional[float] = None,
+        plazo: Optional[Plazo] = None
+    ) -> Dict[str, any]:
+        """
+        Corrige y mejora un texto existente, de forma asíncrona.
+        
+        Args:
+            texto: Texto a corregir
+            instrucciones_adicionales: Instrucciones específicas de corrección
+            usar_cache: Si es False, ignora la caché de respuestas
+            cache_semantico: Si es True, reutiliza respuestas de solicitudes muy parecidas
+            timeout: Segundos máximos de la llamada (por defecto TIMEOUT_ASYNC_SEGUNDOS)
+            plazo: Plazo total y token de cancelación (por defecto, el plazo de la acción)
+        
+        Returns:
+            Dict con el texto corregido y metadata
+        
+        Raises:
+            LLMError: Si la llamada al proveedor falla (después de los reintentos)
+        """
+        messages, semantica = self._preparar_corregir(
+            texto=texto,
+            instrucciones_adicionales=instrucciones_adicionales,
+            cache_semantico=cache_semantico
+        )
+        return await self._ainvoke_llm(
+            messages, usar_cache=usar_cache, semantica=semantica, timeout=timeout,
+            plazo=plazo or crear_plazo("corregir"), accion="corregir"
+        )
+    
+    def _preparar_resumir(
+        self,
+        texto: str,
+        max_palabras: int,
+        instrucciones_adicionales: str,
+        cache_semantico: bool
+    ) -> Tuple[List, Optional[Dict]]:
+        """Construye los mensajes (y la consulta semántica) para resumir un texto."""
+        instrucciones_fijas = """Eres un experto en comunicación empresarial y creación de resúmenes profesionales.
+Tu tarea es crear un resumen conciso y profesional del texto que se te entregue.
+
+REQUISITOS:
+- Debe mantener las ideas principales y el mensaje clave
+- Debe ser claro y profesional
+- Mantener el tono original y alineado con la identidad proporcionada"""
+
+        solicitud = f"""TEXTO ORIGINAL:
+{texto}
+
+- El resumen debe tener aproximadamente {max_palabras} palabras
+{instrucciones_adicionales if instrucciones_adicionales else ''}
+
+Por favor, proporciona el resumen:"""
+        
+        messages = self._mensajes_con_prefijo(instrucciones_fijas, solicitud, con_estilo=False)
+        
+        semantica = None
+        if cache_semantico:
+            semantica = {
+                "accion": "resumir",
+                "consulta": texto,
+                "parametros": {"max_palabras": max_palabras, "instrucciones": instrucciones_adicionales}
+            }
+        
+        return messages, semantica
+    
+    def _plan_fragmentos(self, texto: str) -> Optional[int]:
+        """
+        Decide si un texto se resume por fragmentos.
+        
+        Args:
+            texto: Texto a resumir
+        
+        Returns:
+            Palabras máximas de cada fragmento, o None si el texto se resume en una sola llamada
+        """
+        try:
+            umbral = int(os.getenv("LLM_RESUMEN_FRAGMENTAR_TOKENS", self.UMBRAL_FRAGMENTAR_TOKENS))
+        except ValueError:
+            umbral = self.UMBRAL_FRAGMENTAR_TOKENS
+        contexto = get_info_modelo(self.provider, self.model_name)["contexto"]
+        if contexto:
+            # El prompt, el contexto empresarial y la respuesta también ocupan la ventana
+            umbral = min(umbral, contexto // 2) if umbral > 0 else contexto // 2
+        if umbral <= 0 or estimar_tokens(texto, self.provider, self.model_name) <= umbral:
+            return None
+        return max(100, min(self.PALABRAS_POR_FRAGMENTO, int(umbral / TOKENS_POR_PALABRA)))
+    
+    def _preparar_resumen_parcial(self, fragmento: str, instrucciones_adicionales: str) -> List:
+        """
+        Construye los mensajes para resumir un fragmento de un texto largo (paso 'map').
+        
+        El prompt depende solo del fragmento (no de su posición ni de la longitud del resumen
+        final), así que su respuesta queda en la caché por el contenido del fragmento.
+        """
+        max_palabras = max(60, min(250, contar_palabras(fragmento) // 4))
+        instrucciones_fijas = """Eres un experto en comunicación empresarial y creación de resúmenes profesionales.
+Tu tarea es resumir un fragmento de un documento más largo. Tu resumen se combinará con los de los demás fragmentos para escribir el resumen final.
+
+REQUISITOS:
+- Conserva los hechos, cifras, nombres y conclusiones del fragmento
+- No agregues introducciones ni conclusiones propias
+- No menciones que se trata de un fragmento"""
+
+        solicitud = f"""FRAGMENTO:
+{fragmento}
+
+- El resumen debe tener como máximo {max_palabras} palabras
+{instrucciones_adicionales if instrucciones_adicionales else ''}
+
+Por favor, proporciona el resumen del fragmento:"""
+
+        return [SystemMessage(content=instrucciones_fijas), HumanMessage(content=solicitud)]
+    
+    def _resumir_fragmentos(
+        self,
+        texto: str,
+        palabras_fragmento: int,
+        instrucciones_adicionales: str,
+        plazo: Plazo,
+        usar_cache: bool = True
+    ) -> Generator[AvanceStream, None, Tuple[str, List[Dict]]]:
+        """
+        Paso 'map': resume en paralelo los fragmentos de un texto largo.
+        
+        Cada resumen parcial pasa por la caché de respuestas (su clave incluye el hash del
+        fragmento): al volver a resumir un documento editado solo se llama al proveedor
+        por los fragmentos que cambiaron.
+        
+        Args:
+            texto: Texto a resumir
+            palabras_fragmento: Palabras máximas de cada fragmento (ver `_plan_fragmentos`)
+            instrucciones_adicionales: Instrucciones específicas de resumen
+            plazo: Plazo total de la acción (su token cancela los resúmenes pendientes)
+            usar_cache: Si es False, ignora la caché de respuestas también en los resúmenes parciales
+        
+        Si falla un fragmento se cancelan los demás: los que esperan turno no se envían y los
+        que están en curso no se reintentan.
+        
+        Yields:
+            Un AvanceStream por cada resumen parcial terminado
+        
+        Returns:
+            Tupla (resúmenes parciales unidos, resultado de cada resumen parcial)
+        
+        Raises:
+            LLMError: Si falla el resumen de algún fragmento
+        """
+        parciales = []
+        for _ in range(self.MAX_NIVELES_FRAGMENTOS):
+            fragmentos = dividir_en_fragmentos(texto, palabras_fragmento)
+            limite = get_limitador_concurrencia(self.provider).get_estado()["limite"]
+            ejecutor = ThreadPoolExecutor(max_workers=max(1, min(limite, len(fragmentos))))
+            # Un token propio para cancelar los fragmentos sin cancelar la solicitud
+            plazo_fragmentos = plazo.derivar()
+            try:
+                futuros = [
+                    ejecutor.submit(
+                        self._invoke_llm,
+                        self._preparar_resumen_parcial(fragmento, instrucciones_adicionales),
+                        usar_cache=usar_cache, plazo=plazo_fragmentos, accion="resumir_fragmento"
+                    )
+                    for fragmento in fragmentos
+                ]
+                for hechos, futuro in enumerate(as_completed(futuros), start=1):
+                    futuro.result()
+                    yield AvanceStream(f"🧩 Resumiendo el texto por partes: {hechos} de {len(fragmentos)}")
+            finally:
+                # Si falla un fragmento o se cierra el stream, no se espera al resto: los que
+                # no empezaron se descartan y los que están en curso se cortan con el token
+                plazo_fragmentos.token.cancelar()
+                ejecutor.shutdown(wait=False, cancel_futures=True)
+            resultados = [futuro.result() for futuro in futuros]
+            parciales.extend(resultados)
+            texto = "\n\n".join(resultado.get("texto", "") for resultado in resultados)
+            palabras_fragmento = self._plan_fragmentos(texto)
+            if palabras_fragmento is None:
+                break
+        logger.info(f"🧩 Resumen por fragmentos: {len(parciales)} resúmenes parciales")
+        return texto, parciales
+    
+    @staticmethod
+    def _agotar(generador: Generator) -> any:
+        """Consume un generador sin usar lo que produce y retorna su valor final."""
+        while True:
+            try:
+                next(generador)
+            except StopIteration as fin:
+                return fin.value
+    
+    async def _aresumir_fragmentos(
+        self,
+        texto: str,
+        palabras_fragmento: int,
+        instrucciones_adicionales: str,
+        plazo: Plazo,
+        timeout: Optional[float] = None,
+        usar_cache: bool = True
+    ) -> Tuple[str, List[Dict]]:
+        """Versión asíncrona de `_resumir_fragmentos` (sin avisos de avance)."""
+        parciales = []
+        for _ in range(self.MAX_NIVELES_FRAGMENTOS):
+            fragmentos = dividir_en_fragmentos(texto, palabras_fragmento)
+            plazo_fragmentos = plazo.derivar()
+            tareas = [
+                asyncio.ensure_future(self._ainvoke_llm(
+                    self._preparar_resumen_parcial(fragmento, instrucciones_adicionales),
+                    usar_cache=usar_cache, timeout=timeout, plazo=plazo_fragmentos, accion="resumir_fragmento"
+                ))
+                for fragmento in fragmentos
+            ]
+            try:
+                await asyncio.wait(tareas, return_when=asyncio.FIRST_EXCEPTION)
+            finally:
+                # Si falla un fragmento (o se cancela esta tarea), los demás no siguen gastando tokens
+                plazo_fragmentos.token.cancelar()
+                for tarea in tareas:
+                    tarea.cancel()
+            errores = [tarea.exception() for tarea in tareas if tarea.done() and not tarea.cancelled()]
+            error = next((e for e in errores if e is not None), None)
+            if error is not None:
+                raise error
+            resultados = [tarea.result() for tarea in tareas]
+            parciales.extend(resultados)
+            texto = "\n\n".join(resultado.get("texto", "") for resultado in resultados)
+            palabras_fragmento = self._plan_fragmentos(texto)
+            if palabras_fragmento is None:
+                break
+        logger.info(f"🧩 Resumen por fragmentos: {len(parciales)} resúmenes parciales")
+        return texto, parciales
+    
+    def _sumar_parciales(self, resultado: Dict, parciales: List[Dict], inicio: float) -> Dict:
+        """
+        Agrega al resultado final el consumo de los resúmenes parciales.
+        
+        Args:
+            resultado: Resultado del paso 'reduce'
+            parciales: Resultados de los resúmenes parciales
+            inicio: `time.monotonic()` al comenzar el resumen
+        
+        Returns:
+            Copia del resultado con los tokens y el costo totales, la latencia total,
+            'fragmentos' y 'fragmentos_reutilizados' (los que vinieron de la caché)
+        """
+        total = dict(resultado)
+        for campo in self.CAMPOS_CONSUMO:
+            total[campo] = (total.get(campo, 0) or 0) + sum(parcial.get(campo, 0) or 0 for parcial in parciales)
+        total["fragmentos"] = len(parciales)
+        total["fragmentos_reutilizados"] = sum(1 for parcial in parciales if parcial.get("cache_hit"))
+        total["latencia_segundos"] = round(time.monotonic() - inicio, 3)
+        return total
+    
+    def resumir_texto(
+        self, 
+        texto: str,
+        max_palabras: int = 100,
+        instrucciones_adicionales: str = "",
+        usar_cache: bool = True,
+        cache_semantico: bool = False,
+        plazo: Optional[Plazo] = None
+    ) -> Dict[str, any]:
+        """
+        Resume un texto manteniendo las ideas principales.
+        
+        Args:
+            texto: Texto a resumir
+            max_palabras: Número máximo de palabras para el resumen
+            instrucciones_adicionales: Instrucciones específicas de resumen
+            usar_cache: Si es False, ignora la caché de respuestas
+            cache_semantico: Si es True, reutiliza respuestas de solicitudes muy parecidas
+            plazo: Plazo total y token de cancelación (por defecto, el plazo de la acción)
+        
+        Returns:
+            Dict con el texto resumido y metadata (en textos largos, también 'fragmentos'
+            y 'fragmentos_reutilizados')
+        
+        Raises:
+            LLMError: Si la llamada al proveedor falla (después de los reintentos)
+        """
+        plazo = plazo or crear_plazo("resumir")
+        inicio = time.monotonic()
+        parciales = []
+        palabras_fragmento = self._plan_fragmentos(texto)
+        if palabras_fragmento:
+            # Texto largo: resumir los fragmentos y luego resumir sus resúmenes (map-reduce)
+            texto, parciales = self._agotar(self._resumir_fragmentos(
+                texto, palabras_fragmento, instrucciones_adicionales, plazo, usar_cache
+            ))
+        
+        messages, semantica = self._preparar_resumir(
+            texto=texto,
+            max_palabras=max_palabras,
+            instrucciones_adicionales=instrucciones_adicionales,
+            cache_semantico=cache_semantico
+        )
+        resultado = self._invoke_llm(
+            messages, usar_cache=usar_cache, semantica=semantica,
+            plazo=plazo, accion="resumir"
+        )
+        return self._sumar_parciales(resultado, parciales, inicio) if parciales else resultado
+    
+    def resumir_texto_stream(
+        self, 
+        texto: str,
+        max_palabras: int = 100,
+        instrucciones_adicionales: str = "",
+        usar_cache: bool = True,
+        cache_semantico: bool = False,
+        plazo: Optional[Plazo] = None
+    ) -> Iterator[Union[str, Dict, AvanceStream]]:
+        """
+        Resume un texto manteniendo las ideas principales, en modo streaming.
+        
+        Args:
+            texto: Texto a resumir
+            max_palabras: Número máximo de palabras para el resumen
+            instrucciones_adicionales: Instrucciones específicas de resumen
+            usar_cache: Si es False, ignora la caché de respuestas
+            cache_semantico: Si es True, reutiliza respuestas de solicitudes muy parecidas
+            plazo: Plazo total y token de cancelación (por defecto, el plazo de la acción)
+        
+        Yields:
+            Fragmentos de texto y, al final, el Dict con el texto resumido y metadata.
+            En textos largos, antes del primer fragmento, un AvanceStream por cada resumen parcial.
+        
+        Raises:
+            LLMError: Si la llamada al proveedor falla (después de los reintentos)
+        """
+        plazo = plazo or crear_plazo("resumir")
+        inicio = time.monotonic()
+        parciales = []
+        palabras_fragmento = self._plan_fragmentos(texto)
+        if palabras_fragmento:
+            texto, parciales = yield from self._resumir_fragmentos(
+                texto, palabras_fragmento, instrucciones_adicionales, plazo, usar_cache
+            )
+        
+        messages, semantica = self._preparar_resumir(
+            texto=texto,
+            max_palabras=max_palabras,
+            instrucciones_adicionales=instrucciones_adicionales,
+            cache_semantico=cache_semantico
+        )
+        for fragmento in self._stream_llm(
+            messages, usar_cache=usar_cache, semantica=semantica,
+            plazo=plazo, accion="resumir"
+        ):
+            if isinstance(fragmento, dict) and parciales:
+                fragmento = self._sumar_parciales(fragmento, parciales, inicio)
+            yield fragmento
+    
+    async def aresumir_texto(
+        self, 
+        texto: str,
+        max_palabras: int = 100,
+        instrucciones_adicionales: str = "",
+        usar_cache: bool = True,
+        cache_semantico: bool = False,
+        timeout: Optional[float] = None,
+        plazo: Optional[Plazo] = None
+    ) -> Dict[str, any]:
+        """
+        Resume un texto manteniendo las ideas principales, de forma asíncrona.
+        
+        Args:
+            texto: Texto a resumir
+            max_palabras: Número máximo de palabras para el resumen
+            instrucciones_adicionales: Instrucciones específicas de resumen
+            usar_cache: Si es False, ignora la caché de respuestas
+            cache_semantico: Si es True, reutiliza respuestas de solicitudes muy parecidas
+            timeout: Segundos máximos de la llamada (por defecto TIMEOUT_ASYNC_SEGUNDOS)
+            plazo: Plazo total y token de cancelación (por defecto, el plazo de la acción)
+        
+        Returns:
+            Dict con el texto resumido y metadata (en textos largos, también 'fragmentos'
+            y 'fragmentos_reutilizados')
+        
+        Raises:
+            LLMError: Si la llamada al proveedor falla (después de los reintentos)
+        """
+        plazo = plazo or crear_plazo("resumir")
+        inicio = time.monotonic()
+        parciales = []
+        palabras_fragmento = self._plan_fragmentos(texto)
+        if palabras_fragmento:
+            texto, parciales = await self._aresumir_fragmentos(
+                texto, palabras_fragmento, instrucciones_adicionales, plazo, timeout, usar_cache
+            )
+        
+        messages, semantica = self._preparar_resumir(
+            texto=texto,
+            max_palabras=max_palabras,
+            instrucciones_adicionales=instrucciones_adicionales,
+            cache_semantico=cache_semantico
+        )
+        resultado = await self._ainvoke_llm(
+            messages, usar_cache=usar_cache, semantica=semantica, timeout=timeout,
+            plazo=plazo, accion="resumir"
+        )
+        return self._sumar_parciales(resultado, parciales, inicio) if parciales else resultado
+    
+    def estimar_solicitud(
+        self,
+        accion: str,
+        contenido: str,
+        max_palabras: int = 200,
+        instrucciones_adicionales: str = ""
+    ) -> Dict[str, any]:
+        """
+        Predice los tokens, el costo y la latencia de una solicitud sin llamar al proveedor.
+        
+        Args:
+            accion: 'generar', 'corregir' o 'resumir'
+            contenido: Tema (generar) o texto original (corregir y resumir)
+            max_palabras: Número máximo de palabras (generar y resumir)
+            instrucciones_adicionales: Instrucciones adicionales opcionales
+        
+        Returns:
+            Dict con tokens_entrada, tokens_salida, costo (None si el modelo no tiene precio
+            en el catálogo), latencia_segundos, contexto y excede_contexto (ver model_pricing).
+            Un resumen por fragmentos suma los resúmenes parciales y el final, e incluye 'fragmentos'.
+        """
+        if accion == "resumir" and self._plan_fragmentos(contenido):
+            return self._estimar_resumen_fragmentos(contenido, max_palabras, instrucciones_adicionales)
+        if accion == "corregir":
+            messages, _ = self._preparar_corregir(contenido, instrucciones_adicionales, False)
+            # La corrección tiene más o menos la longitud del texto original
+            tokens_salida = estimar_tokens(contenido, self.provider, self.model_name)
+        elif accion == "resumir":
+            messages, _ = self._preparar_resumir(contenido, max_palabras, instrucciones_adicionales, False)
+            tokens_salida = round(max_palabras * TOKENS_POR_PALABRA)
+        else:
+            messages, _ = self._preparar_generar(contenido, max_palabras, instrucciones_adicionales, False)
+            tokens_salida = round(max_palabras * TOKENS_POR_PALABRA)
+        return estimar_solicitud(self.provider, self.model_name, messages, tokens_salida)
+    
+    def _estimar_resumen_fragmentos(
+        self,
+        texto: str,
+        max_palabras: int,
+        instrucciones_adicionales: str
+    ) -> Dict[str, any]:
+        """
+        Estima un resumen por fragmentos: los parciales (en paralelo) más el resumen final.
+        
+        Solo considera un nivel de resúmenes parciales y supone que todos llaman al proveedor.
+        """
+        fragmentos = dividir_en_fragmentos(texto, self._plan_fragmentos(texto))
+        # Todas las llamadas son al mismo modelo: la velocidad observada se busca una sola vez
+        velocidad = velocidad_observada(self.provider, self.model_name)
+        parciales = []
+        for fragmento in fragmentos:
+            messages = self._preparar_resumen_parcial(fragmento, instrucciones_adicionales)
+            palabras_parcial = max(60, min(250, contar_palabras(fragmento) // 4))
+            parciales.append(estimar_solicitud(
+                self.provider, self.model_name, messages, round(palabras_parcial * TOKENS_POR_PALABRA), velocidad
+            ))
+        
+        # El resumen final recibe los resúmenes parciales en lugar del texto
+        messages, _ = self._preparar_resumir("", max_palabras, instrucciones_adicionales, False)
+        final = estimar_solicitud(
+            self.provider, self.model_name, messages, round(max_palabras * TOKENS_POR_PALABRA), velocidad
+        )
+        final["tokens_entrada"] += sum(parcial["tokens_salida"] for parcial in parciales)
+        if final["costo"] is not None:
+            final["costo"] = calcular_costo(
+                self.provider, self.model_name, final["tokens_entrada"], final["tokens_salida"]
+            )
+        if final["contexto"]:
+            final["excede_contexto"] = final["tokens_entrada"] + final["tokens_salida"] > final["contexto"]
+        
+        estimacion = dict(final)
+        for campo in ("tokens_entrada", "tokens_salida"):
+            estimacion[campo] += sum(parcial[campo] for parcial in parciales)
+        costos = [parcial["costo"] for parcial in parciales] + [final["costo"]]
+        estimacion["costo"] = None if None in costos else sum(costos)
+        # Los parciales corren en paralelo
+        estimacion["latencia_segundos"] = final["latencia_segundos"] + max(
+            parcial["latencia_segundos"] for parcial in parciales
+        )
+        estimacion["excede_contexto"] = any(parcial["excede_contexto"] for parcial in parciales + [final])
+        estimacion["fragmentos"] = len(fragmentos)
+        return estimacion
+    
+    def _preparar_item_lote(self, item: Dict) -> Tuple[List, Optional[Dict]]:
+        """Construye los mensajes de un elemento de `procesar_lote` según su acción."""
+        accion = item.get("accion", "generar")
+        instrucciones = item.get("instrucciones", "")
+        cache_semantico = item.get("cache_semantico", False)
+        if accion == "generar":
+            return self._preparar_generar(
+                tema=item.get("tema", ""),
+                max_palabras=int(item.get("max_palabras", 200)),
+                instrucciones_adicionales=instrucciones,
+                cache_semantico=cache_semantico
+            )
+        if accion == "corregir":
+            return self._preparar_corregir(
+                texto=item.get("texto", ""),
+                instrucciones_adicionales=instrucciones,
+                cache_semantico=cache_semantico
+            )
+        if accion == "resumir":
+            return self._preparar_resumir(
+                texto=item.get("texto", ""),
+                max_palabras=int(item.get("max_palabras", 100)),
+                instrucciones_adicionales=instrucciones,
+                cache_semantico=cache_semantico
+            )
+        raise ValueError(f"Acción '{accion}' no válida. Usa: generar, corregir o resumir")
+    
+    def _iniciar_lote(
+        self,
+        items: List[Dict],
+        usar_cache: bool
+    ) -> Tuple[List[Union[Dict, LLMError, None]], List[Tuple[int, List, Dict]]]:
+        """
+        Prepara un lote: resuelve desde la caché lo que se pueda y deja el resto pendiente.
+        
+        Returns:
+            Tupla (resultados, pendientes). `resultados` tiene un lugar por elemento
+            (None si falta llamar al modelo) y `pendientes` tiene (posición, mensajes, contexto de caché)
+        """
+        resultados: List[Union[Dict, LLMError, None]] = [None] * len(items)
+        pendientes = []
+        for i, item in enumerate(items):
+            try:
+                messages, semantica = self._preparar_item_lote(item)
+            except Exception as e:
+                resultados[i] = SolicitudInvalidaError(str(e), provider=self.provider)
+                continue
+            guardado, contexto = self._consultar_caches(messages, usar_cache, semantica)
+            if guardado is not None:
+                resultados[i] = guardado
+            else:
+                pendientes.append((i, messages, contexto))
+        return resultados, pendientes
+    
+    def _completar_lote(
+        self,
+        resultados: List[Union[Dict, LLMError, None]],
+        pendientes: List[Tuple[int, List, Dict]],
+        respuestas: List,
+        cb=None
+    ) -> Tuple[List[Tuple[int, List, Dict]], List[Tuple[int, List, Dict]]]:
+        """
+        Convierte las respuestas de `batch`/`abatch` en resultados y los guarda en la caché.
+        
+        Los errores se convierten por elemento en LLMError, con el mismo mapeo que `_invoke_llm`.
+        
+        Returns:
+            Tupla (reintentables, individuales): los pendientes que fallaron con un error
+            reintentable y los que el cliente no pudo responder por lotes (AttributeError/TypeError,
+            como el error conocido de langchain-cohere), que quedan sin resultado para
+            enviarlos uno por uno con `_intentar_llamada`
+        """
+        exitosos = []
+        individuales = []
+        for pendiente, respuesta in zip(pendientes, respuestas):
+            i = pendiente[0]
+            if isinstance(respuesta, (AttributeError, TypeError)):
+                # Mismo caso especial que la llamada normal (por ejemplo, langchain-cohere)
+                if self.provider == "cohere" and cohere_adapter.es_error_compatibilidad(respuesta):
+                    cohere_adapter.marcar_incompatible()
+                individuales.append(pendiente)
+            elif isinstance(respuesta, Exception):
+                resultados[i] = self._error_tipado(respuesta)
+            else:
+                resultados[i] = self._procesar_respuesta(respuesta)
+                exitosos.append((i, respuesta))
+        
+        # En OpenAI el callback solo entrega el total del lote: repartir el costo según los tokens
+        if self.provider == "openai":
+            tokens_por_item = {}
+            for i, respuesta in exitosos:
+                usage = getattr(respuesta, 'usage_metadata', None) or {}
+                tokens_por_item[i] = usage.get('total_tokens', 0) or 0
+                resultados[i]["tokens_usados"] = tokens_por_item[i]
+            total_tokens = sum(tokens_por_item.values())
+            if cb and cb.total_cost and total_tokens:
+                for i, tokens in tokens_por_item.items():
+                    resultados[i]["costo"] = cb.total_cost * tokens / total_tokens
+        
+        reintentables = []
+        sin_respuesta = {i for i, _, _ in individuales}
+        for pendiente in pendientes:
+            i, messages, contexto = pendiente
+            if i in sin_respuesta:
+                continue
+            if isinstance(resultados[i], LLMError):
+                if resultados[i].reintentable:
+                    reintentables.append(pendiente)
+            else:
+                resultados[i] = self._guardar_en_caches(contexto, resultados[i])
+        return reintentables, individuales
+    
+    def _completar_individual(
+        self,
+        resultados: List[Union[Dict, LLMError, None]],
+        pendiente: Tuple[int, List, Dict],
+        resultado: Union[Dict, LLMError]
+    ) -> bool:
+        """
+        Guarda el resultado de un elemento del lote enviado por separado.
+        
+        Returns:
+            True si falló con un error reintentable
+        """
+        i, _, contexto = pendiente
+        if isinstance(resultado, LLMError):
+            resultados[i] = resultado
+            return resultado.reintentable
+        resultados[i] = self._guardar_en_caches(contexto, resultado)
+        return False
+    
+    def _error_del_lote(self, resultados: List, pendientes: List[Tuple[int, List, Dict]]) -> Optional[LLMError]:
+        """Resultado de un envío por lotes para el circuito: el primer error si no respondió ningún elemento."""
+        errores = [resultados[i] for i, _, _ in pendientes if isinstance(resultados[i], LLMError)]
+        if len(errores) < len(pendientes):
+            return None
+        return next((error for error in errores if error.cambiar_proveedor), errores[0])
+    
+    def _error_para_reintento(self, resultados: List, reintentables: List[Tuple[int, List, Dict]]) -> LLMError:
+        """Elige el error de un lote que decide la espera: el que pidió esperar más (Retry-After)."""
+        return max(
+            (resultados[i] for i, _, _ in reintentables),
+            key=lambda error: error.retry_after or 0.0
+        )
+    
+    def procesar_lote(
+        self,
+        items: List[Dict],
+        max_concurrencia: Optional[int] = None,
+        usar_cache: bool = True
+    ) -> List[Union[Dict[str, any], LLMError]]:
+        """
+        Procesa varias solicitudes en una sola llamada por lotes al proveedor (`llm.batch`).
+        
+        Los elementos que fallan con un error transitorio se vuelven a enviar juntos,
+        según la política de reintentos del proveedor, y los que aun así fallan por
+        cuota, caída o timeout se envían a la cadena de respaldo (ver fallback_chain).
+        
+        Args:
+            items: Lista de Dict con 'accion' (generar, corregir o resumir), 'tema' o 'texto'
+                y opcionalmente 'max_palabras', 'instrucciones' y 'cache_semantico'
+            max_concurrencia: Solicitudes simultáneas al proveedor (por defecto el límite adaptativo actual)
+            usar_cache: Si es False, ignora la caché de respuestas
+        
+        Returns:
+            Lista con un resultado por elemento de `items`, en el mismo orden: un Dict con el
+            mismo formato que `_invoke_llm` o, si ese elemento falló, el LLMError correspondiente
+            (un error en un elemento no afecta al resto)
+        """
+        inicio = time.monotonic()
+        resultados = self._procesar_lote_proveedor(items, max_concurrencia, usar_cache)
+        
+        fallidos = [i for i, resultado in enumerate(resultados) if permite_respaldo(resultado)]
+        if fallidos:
+            for alternativo in self._get_alternativos(resultados[fallidos[0]]):
+                respaldo = alternativo._procesar_lote_proveedor([items[i] for i in fallidos], max_concurrencia, usar_cache)
+                for i, resultado in zip(fallidos, respaldo):
+                    if not isinstance(resultado, LLMError):
+                        resultado = self._marcar_respaldo(resultado, resultados[i])
+                    resultados[i] = resultado
+                fallidos = [i for i in fallidos if permite_respaldo(resultados[i])]
+                if not fallidos:
+                    break
+        return self._registrar_uso_lote(items, resultados, inicio)
+    
+    def _registrar_uso_lote(
+        self,
+        items: List[Dict],
+        resultados: List[Union[Dict, LLMError]],
+        inicio: float
+    ) -> List[Union[Dict, LLMError]]:
+        """Registra el uso de cada elemento del lote (todos con la latencia del lote completo)."""
+        registrados = []
+        for item, resultado in zip(items, resultados):
+            accion = item.get("accion", "generar")
+            if isinstance(resultado, LLMError):
+                self._registrar_uso(accion, inicio, error=resultado)
+                registrados.append(resultado)
+            else:
+                registrados.append(self._registrar_uso(accion, inicio, resultado))
+        return registrados
+    
+    def _procesar_lote_proveedor(
+        self,
+        items: List[Dict],
+        max_concurrencia: Optional[int] = None,
+        usar_cache: bool = True
+    ) -> List[Union[Dict[str, any], LLMError]]:
+        """Procesa un lote con el proveedor configurado (con caché y reintentos, sin respaldo)."""
+        resultados, pendientes = self._iniciar_lote(items, usar_cache)
+        politica = get_politica_reintentos(self.provider)
+        circuito = get_circuito(self.provider, self.model_name)
+        inicio = time.monotonic()
+        intento = 0
+        while pendientes:
+            intento += 1
+            reintentables = []
+            porciones = self._porciones_lote(pendientes)
+            for n, porcion in enumerate(porciones):
+                try:
+                    reintentables.extend(self._enviar_porcion_lote(resultados, porcion, max_concurrencia, circuito))
+                except LLMError as e:
+                    # El circuito o el limitador rechazaron el envío: el resto del lote tampoco sale
+                    restantes = [pendiente for resto in porciones[n:] for pendiente in resto]
+                    self._completar_lote(resultados, restantes, [e] * len(restantes))
+                    return resultados
+            
+            if not reintentables or not politica.esperar_reintento(
+                intento, self._error_para_reintento(resultados, reintentables), inicio
+            ):
+                break
+            pendientes = reintentables
+        return resultados
+    
+    def _porciones_lote(self, pendientes: List[Tuple[int, List, Dict]]) -> List[List[Tuple[int, List, Dict]]]:
+        """
+        Divide los pendientes de un lote en porciones que caben en el límite por minuto
+        del proveedor (solicitudes y tokens), para que cada una espere su propio turno
+        en lugar de enviar todo el lote de una vez.
+        """
+        max_solicitudes, max_tokens = get_rate_limiter().get_capacidad(self.provider, self.model_name)
+        porciones = []
+        porcion, tokens_porcion = [], 0
+        for pendiente in pendientes:
+            tokens = self._tokens_estimados(pendiente[1]) if max_tokens else 0
+            if porcion and (
+                (max_solicitudes and len(porcion) >= max_solicitudes)
+                or (max_tokens and tokens_porcion + tokens > max_tokens)
+            ):
+                porciones.append(porcion)
+                porcion, tokens_porcion = [], 0
+            porcion.append(pendiente)
+            tokens_porcion += tokens
+        if porcion:
+            porciones.append(porcion)
+        return porciones
+    
+    def _enviar_porcion_lote(
+        self,
+        resultados: List[Union[Dict, LLMError, None]],
+        porcion: List[Tuple[int, List, Dict]],
+        max_concurrencia: Optional[int],
+        circuito: Circuito
+    ) -> List[Tuple[int, List, Dict]]:
+        """
+        Envía una porción del lote al proveedor (`llm.batch`) y completa sus resultados.
+        
+        Returns:
+            Los pendientes de la porción que fallaron con un error reintentable
+        
+        Raises:
+            LLMError: Si el circuito está abierto, no hubo turno o no hubo lugar (no se envió nada)
+        """
+        limitador = get_limitador_concurrencia(self.provider)
+        lugares = min(len(porcion), max_concurrencia or limitador.get_estado()["limite"])
+        config = {"max_concurrency": lugares}
+        lote_mensajes = [messages for _, messages, _ in porcion]
+        prueba = circuito.permitir(self.provider)
+        try:
+            tokens_estimados = self._esperar_turno(lote_mensajes)
+            try:
+                # La porción ocupa un lugar por llamada simultánea, igual que las llamadas sueltas
+                limitador.adquirir(self.provider, cantidad=lugares)
+            except LLMError:
+                get_rate_limiter().devolver(self.provider, self.model_name, len(lote_mensajes), tokens_estimados)
+                raise
+        except LLMError as e:
+            circuito.registrar(e, prueba)
+            raise
+        
+        inicio = time.monotonic()
+        try:
+            with get_openai_callback() as cb:
+                try:
+                    if self._cohere_directo():
+                        respuestas = cohere_adapter.invocar_lote(
+                            self.model_name, lote_mensajes, self.temperature,
+                            lugares, self._timeout_directo(None)
+                        )
+                    else:
+                        respuestas = self.llm.batch(lote_mensajes, config=config, return_exceptions=True)
+                except Exception as e:
+                    respuestas = [e] * len(porcion)
+            reintentables, individuales = self._completar_lote(
+                resultados, porcion, respuestas, cb if self.provider == "openai" else None
+            )
+        finally:
+            self._liberar_porcion(limitador, lugares, inicio, resultados, porcion)
+        self._ajustar_tokens(tokens_estimados, [resultados[i] for i, _, _ in porcion if isinstance(resultados[i], dict)])
+        circuito.registrar(self._error_del_lote(resultados, porcion), prueba)
+        
+        # Los que el cliente no pudo responder por lotes pasan por el camino normal
+        # (limitador de tasa, límite de concurrencia y circuito)
+        for pendiente in individuales:
+            try:
+                resultado = self._intentar_llamada(pendiente[1])
+            except LLMError as e:
+                resultado = e
+            if self._completar_individual(resultados, pendiente, resultado):
+                reintentables.append(pendiente)
+        return reintentables
+    
+    @staticmethod
+    def _liberar_porcion(
+        limitador: LimitadorAdaptativo,
+        lugares: int,
+        inicio: float,
+        resultados: List[Union[Dict, LLMError, None]],
+        porcion: List[Tuple[int, List, Dict]]
+    ):
+        """
+        Libera los lugares de una porción del lote e informa su resultado al límite de concurrencia.
+        
+        Una sobrecarga en cualquier elemento cuenta como sobrecarga de la porción. La latencia
+        informada es la de una llamada: cada lugar hizo en promedio porción / lugares llamadas seguidas.
+        """
+        clasificaciones = {clasificar_resultado(resultados[i]) for i, _, _ in porcion}
+        resultado = RESULTADO_ERROR
+        for candidato in (RESULTADO_SOBRECARGA, RESULTADO_OK):
+            if candidato in clasificaciones:
+                resultado = candidato
+                break
+        latencia = (time.monotonic() - inicio) / math.ceil(len(porcion) / lugares)
+        limitador.liberar(latencia, resultado, lugares)
+    
+    async def aprocesar_lote(
+        self,
+        items: List[Dict],
+        max_concurrencia: Optional[int] = None,
+        usar_cache: bool = True
+    ) -> List[Union[Dict[str, any], LLMError]]:
+        """
+        Versión asíncrona de `procesar_lote` (`llm.abatch`).
+        
+        Args:
+            items: Lista de Dict con 'accion' (generar, corregir o resumir), 'tema' o 'texto'
+                y opcionalmente 'max_palabras', 'instrucciones' y 'cache_semantico'
+            max_concurrencia: Solicitudes simultáneas al proveedor (por defecto el límite adaptativo actual)
+            usar_cache: Si es False, ignora la caché de respuestas
+        
+        Returns:
+            Lista con un Dict o un LLMError por elemento de `items`, en el mismo orden
+        """
+        inicio = time.monotonic()
+        resultados = await self._aprocesar_lote_proveedor(items, max_concurrencia, usar_cache)
+        
+        fallidos = [i for i, resultado in enumerate(resultados) if permite_respaldo(resultado)]
+        if fallidos:
+            for alternativo in self._get_alternativos(resultados[fallidos[0]]):
+                respaldo = await alternativo._aprocesar_lote_proveedor([items[i] for i in fallidos], max_concurrencia, usar_cache)
+                for i, resultado in zip(fallidos, respaldo):
+                    if not isinstance(resultado, LLMError):
+                        resultado = self._marcar_respaldo(resultado, resultados[i])
+                    resultados[i] = resultado
+                fallidos = [i for i in fallidos if permite_respaldo(resultados[i])]
+                if not fallidos:
+                    break
+        return self._registrar_uso_lote(items, resultados, inicio)
+    
+    async def _aprocesar_lote_proveedor(
+        self,
+        items: List[Dict],
+        max_concurrencia: Optional[int] = None,
+        usar_cache: bool = True
+    ) -> List[Union[Dict[str, any], LLMError]]:
+        """Versión asíncrona de `_procesar_lote_proveedor`."""
+        resultados, pendientes = self._iniciar_lote(items, usar_cache)
+        politica = get_politica_reintentos(self.provider)
+        circuito = get_circuito(self.provider, self.model_name)
+        inicio = time.monotonic()
+        intento = 0
+        while pendientes:
+            intento += 1
+            reintentables = []
+            porciones = self._porciones_lote(pendientes)
+            for n, porcion in enumerate(porciones):
+                try:
+                    reintentables.extend(await self._aenviar_porcion_lote(resultados, porcion, max_concurrencia, circuito))
+                except LLMError as e:
+                    restantes = [pendiente for resto in porciones[n:] for pendiente in resto]
+                    self._completar_lote(resultados, restantes, [e] * len(restantes))
+                    return resultados
+            
+            if not reintentables or not await politica.aesperar_reintento(
+                intento, self._error_para_reintento(resultados, reintentables), inicio
+            ):
+                break
+            pendientes = reintentables
+        return resultados
+    
+    async def _aenviar_porcion_lote(
+        self,
+        resultados: List[Union[Dict, LLMError, None]],
+        porcion: List[Tuple[int, List, Dict]],
+        max_concurrencia: Optional[int],
+        circuito: Circuito
+    ) -> List[Tuple[int, List, Dict]]:
+        """Versión asíncrona de `_enviar_porcion_lote` (`llm.abatch`)."""
+        limitador = get_limitador_concurrencia(self.provider)
+        lugares = min(len(porcion), max_concurrencia or limitador.get_estado()["limite"])
+        config = {"max_concurrency": lugares}
+        lote_mensajes = [messages for _, messages, _ in porcion]
+        prueba = circuito.permitir(self.provider)
         try:
-            from langchain_huggingface import ChatHuggingFace
-            huggingface_available = True
-        except ImportError:
+            tokens_estimados = await asyncio.to_thread(self._esperar_turno, lote_mensajes)
             try:
-                from langchain_community.chat_models import ChatHuggingFace
-                huggingface_available = True
-            except ImportError:
-                huggingface_available = HUGGINGFACE_AVAILABLE
-        if huggingface_available:
-            providers.append("huggingface")
+                await limitador.aadquirir(self.provider, cantidad=lugares)
+            except LLMError:
+                get_rate_limiter().devolver(self.provider, self.model_name, len(lote_mensajes), tokens_estimados)
+                raise
+        except LLMError as e:
+            circuito.registrar(e, prueba)
+            raise
+        
+        inicio = time.monotonic()
+        try:
+            with get_openai_callback() as cb:
+                try:
+                    if self._cohere_directo():
+                        respuestas = await asyncio.to_thread(
+                            cohere_adapter.invocar_lote,
+                            self.model_name, lote_mensajes, self.temperature,
+                            lugares, self._timeout_directo(None)
+                        )
+                    else:
+                        respuestas = await self.llm.abatch(lote_mensajes, config=config, return_exceptions=True)
+                except Exception as e:
+                    respuestas = [e] * len(porcion)
+            reintentables, individuales = self._completar_lote(
+                resultados, porcion, respuestas, cb if self.provider == "openai" else None
+            )
+        finally:
+            self._liberar_porcion(limitador, lugares, inicio, resultados, porcion)
+        self._ajustar_tokens(tokens_estimados, [resultados[i] for i, _, _ in porcion if isinstance(resultados[i], dict)])
+        circuito.registrar(self._error_del_lote(resultados, porcion), prueba)
         
-        return providers
+        for pendiente in individuales:
+            try:
+                resultado = await self._aintentar_llamada(pendiente[1], self.TIMEOUT_ASYNC_SEGUNDOS)
+            except LLMError as e:
+                resultado = e
+            if self._completar_individual(resultados, pendiente, resultado):
+                reintentables.append(pendiente)
+        return reintentables
+    
+    @staticmethod
+    def get_available_providers() -> List[str]:
+        """Retorna la lista de proveedores disponibles (solo los que tienen paquetes instalados)."""
+        # find_spec no importa los paquetes y se consulta en cada llamada, así se
+        # detectan paquetes instalados después de iniciar la app
+        return get_proveedores_disponibles()
     
     @staticmethod
     def get_available_models(provider: str) -> Dict[str, str]:
@@ -903,7 +3020,7 @@ Por favor, proporciona el resumen:"""
         Returns:
             Lista de nombres de modelos disponibles
         """
-        if not GEMINI_GENAI_AVAILABLE:
+        if not paquete_instalado("google.generativeai"):
             return []
         
         api_key = os.getenv("GOOGLE_API_KEY")
@@ -911,6 +3028,7 @@ Por favor, proporciona el resumen:"""
             return []
         
         try:
+            genai = importar_modulo("google.generativeai")
             genai.configure(api_key=api_key)
             models = genai.list_models()
             
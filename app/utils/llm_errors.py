@@ -0,0 +1,243 @@
+"""
+Errores tipados de las llamadas al LLM.
+Convierte las excepciones de cada SDK (OpenAI, Gemini, Groq, Cohere...) en una
+jerarquía común que indica si vale la pena reintentar y cuánto pidió esperar
+el proveedor (cabecera Retry-After o mensaje equivalente).
+"""
+
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+class LLMError(Exception):
+    """Error de una llamada al LLM."""
+    
+    # Si un nuevo intento puede tener éxito
+    reintentable = False
+    # Si indica que el proveedor está saturado (el control de concurrencia reduce el límite)
+    sobrecarga = False
+    # Si otro proveedor de la cadena de respaldo podría responder (ver fallback_chain)
+    cambiar_proveedor = False
+    
+    def __init__(
+        self,
+        mensaje: str,
+        provider: str = "",
+        codigo: Optional[int] = None,
+        retry_after: Optional[float] = None
+    ):
+        """
+        Inicializa el error.
+        
+        Args:
+            mensaje: Mensaje para el usuario
+            provider: Proveedor que produjo el error
+            codigo: Código HTTP de la respuesta, si se conoce
+            retry_after: Segundos que el proveedor pidió esperar antes de reintentar
+        """
+        super().__init__(mensaje)
+        self.provider = provider
+        self.codigo = codigo
+        self.retry_after = retry_after
+
+
+class LimiteTasaError(LLMError):
+    """El proveedor rechazó la solicitud por límite de uso (429)."""
+    reintentable = True
+    sobrecarga = True
+    cambiar_proveedor = True
+
+
+class CuotaAgotadaError(LLMError):
+    """La cuenta no tiene cuota o saldo disponible (reintentar no sirve)."""
+    cambiar_proveedor = True
+
+
+class ServicioNoDisponibleError(LLMError):
+    """Error del servidor del proveedor (5xx), sobrecarga o falla de conexión."""
+    reintentable = True
+    sobrecarga = True
+    cambiar_proveedor = True
+
+
+class TiempoAgotadoError(LLMError):
+    """El proveedor no respondió a tiempo."""
+    reintentable = True
+    sobrecarga = True
+    cambiar_proveedor = True
+
+
+class AutenticacionError(LLMError):
+    """API key inválida o sin permisos (401/403)."""
+
+
+class ModeloNoDisponibleError(LLMError):
+    """El modelo no existe o la cuenta no tiene acceso (404)."""
+    cambiar_proveedor = True
+
+
+class SolicitudInvalidaError(LLMError):
+    """El proveedor rechazó el contenido de la solicitud (400/422)."""
+
+
+# Nombres de clases de excepción de los SDK, por tipo de error
+_CLASES_POR_NOMBRE = {
+    "RateLimitError": LimiteTasaError,
+    "TooManyRequests": LimiteTasaError,
+    "TooManyRequestsError": LimiteTasaError,
+    "ResourceExhausted": LimiteTasaError,
+    "APITimeoutError": TiempoAgotadoError,
+    "Timeout": TiempoAgotadoError,
+    "TimeoutException": TiempoAgotadoError,
+    "ReadTimeout": TiempoAgotadoError,
+    "DeadlineExceeded": TiempoAgotadoError,
+    "TimeoutError": TiempoAgotadoError,
+    "APIConnectionError": ServicioNoDisponibleError,
+    "ConnectError": ServicioNoDisponibleError,
+    "ConnectionError": ServicioNoDisponibleError,
+    "RemoteProtocolError": ServicioNoDisponibleError,
+    "InternalServerError": ServicioNoDisponibleError,
+    "ServiceUnavailable": ServicioNoDisponibleError,
+    "ServiceUnavailableError": ServicioNoDisponibleError,
+    "AuthenticationError": AutenticacionError,
+    "PermissionDeniedError": AutenticacionError,
+    "PermissionDenied": AutenticacionError,
+    "Unauthenticated": AutenticacionError,
+    "NotFoundError": ModeloNoDisponibleError,
+    "NotFound": ModeloNoDisponibleError,
+    "BadRequestError": SolicitudInvalidaError,
+    "InvalidArgument": SolicitudInvalidaError,
+    "UnprocessableEntityError": SolicitudInvalidaError
+}
+
+# Fragmentos del mensaje de error, por tipo de error (si no hay código HTTP ni clase conocida)
+_SENALES_POR_TIPO = [
+    (CuotaAgotadaError, ["insufficient_quota", "billing", "credit balance"]),
+    (LimiteTasaError, ["rate limit", "rate_limit", "too many requests", "resource exhausted", "resource_exhausted", "quota"]),
+    (TiempoAgotadoError, ["timed out", "timeout", "deadline exceeded"]),
+    (ServicioNoDisponibleError, ["overloaded", "service unavailable", "bad gateway", "internal server error", "connection error", "connection reset"]),
+    (AutenticacionError, ["invalid api key", "invalid_api_key", "incorrect api key", "unauthorized", "permission denied"]),
+    (ModeloNoDisponibleError, ["model_not_found", "does not exist", "was removed", "not found", "not supported"])
+]
+
+_PATRON_CODIGO = re.compile(r'(?:^|error code:?\s*|status(?:_code)?[=:\s]+|\bhttp\s*)([45]\d\d)\b', re.IGNORECASE)
+_PATRON_ESPERA = re.compile(
+    r'(?:try again in|retry in|retry after|retry_delay\s*\{\s*seconds:)\s*([\d.]+)\s*(ms|s|sec|seconds|segundos)?',
+    re.IGNORECASE
+)
+
+
+def _codigo_http(e: BaseException) -> Optional[int]:
+    """Busca el código HTTP en la excepción, en su respuesta o en el mensaje."""
+    for objeto in (e, getattr(e, "response", None)):
+        for atributo in ("status_code", "http_status", "code", "status"):
+            valor = getattr(objeto, atributo, None)
+            # `int` incluye HTTPStatus (google.api_core); se ignoran métodos como grpc `code()`
+            if isinstance(valor, int) and 400 <= valor < 600:
+                return int(valor)
+    coincidencia = _PATRON_CODIGO.search(str(e))
+    return int(coincidencia.group(1)) if coincidencia else None
+
+
+def _segundos_desde_cabecera(valor: str) -> Optional[float]:
+    """Interpreta Retry-After: segundos o fecha HTTP."""
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def extraer_retry_after(e: BaseException) -> Optional[float]:
+    """
+    Obtiene cuántos segundos pidió esperar el proveedor antes de reintentar.
+    
+    Revisa las cabeceras `retry-after-ms` y `retry-after` de la respuesta y, si no
+    están, mensajes como "Please try again in 20s" o "retry_delay { seconds: 30 }".
+    
+    Args:
+        e: Excepción lanzada por el proveedor
+    
+    Returns:
+        Segundos a esperar, o None si el proveedor no lo indicó
+    """
+    cabeceras = getattr(getattr(e, "response", None), "headers", None) or getattr(e, "headers", None)
+    if cabeceras:
+        try:
+            valor_ms = cabeceras.get("retry-after-ms")
+            if valor_ms:
+                return max(0.0, float(valor_ms) / 1000)
+        except (AttributeError, TypeError, ValueError):
+            pass
+        try:
+            valor = cabeceras.get("retry-after")
+            if valor:
+                segundos = _segundos_desde_cabecera(str(valor))
+                if segundos is not None:
+                    return segundos
+        except (AttributeError, TypeError):
+            pass
+    
+    coincidencia = _PATRON_ESPERA.search(str(e))
+    if coincidencia:
+        segundos = float(coincidencia.group(1))
+        return segundos / 1000 if (coincidencia.group(2) or "").lower() == "ms" else segundos
+    return None
+
+
+def clasificar_error(e: BaseException, provider: str = "", mensaje: Optional[str] = None) -> LLMError:
+    """
+    Convierte una excepción de cualquier SDK en un LLMError tipado.
+    
+    Args:
+        e: Excepción lanzada por el proveedor
+        provider: Proveedor que produjo el error
+        mensaje: Mensaje para el usuario (por defecto el de la excepción)
+    
+    Returns:
+        Instancia de la subclase de LLMError que corresponde (la misma si ya lo era)
+    """
+    if isinstance(e, LLMError):
+        return e
+    
+    texto = str(e).lower()
+    codigo = _codigo_http(e)
+    clase = None
+    
+    if any(senal in texto for senal in _SENALES_POR_TIPO[0][1]):
+        # Una cuota agotada también llega como 429, pero reintentar no sirve
+        clase = CuotaAgotadaError
+    elif codigo == 429:
+        clase = LimiteTasaError
+    elif codigo in (408, 504):
+        clase = TiempoAgotadoError
+    elif codigo is not None and codigo >= 500:
+        clase = ServicioNoDisponibleError
+    elif codigo in (401, 403):
+        clase = AutenticacionError
+    elif codigo == 404:
+        clase = ModeloNoDisponibleError
+    elif codigo in (400, 422):
+        clase = SolicitudInvalidaError
+    else:
+        for tipo in type(e).__mro__:
+            if tipo.__name__ in _CLASES_POR_NOMBRE:
+                clase = _CLASES_POR_NOMBRE[tipo.__name__]
+                break
+    if clase is None:
+        clase = next(
+            (tipo for tipo, senales in _SENALES_POR_TIPO if any(senal in texto for senal in senales)),
+            LLMError
+        )
+    
+    return clase(
+        mensaje or str(e),
+        provider=provider,
+        codigo=codigo,
+        retry_after=extraer_retry_after(e)
+    )
@@ -0,0 +1,155 @@
+"""
+Módulo del pool de clientes LLM.
+Comparte entre todas las sesiones del proceso los clientes de LangChain (y sus
+conexiones HTTP) por proveedor y modelo, en lugar de crear uno por sesión.
+"""
+
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+# Proveedores cuyo cliente acepta la temperatura por llamada (`.bind(temperature=...)`).
+# En el resto la temperatura forma parte de la clave del pool.
+PROVEEDORES_TEMPERATURA_POR_LLAMADA = ["openai", "groq", "together"]
+
+# Temperatura con la que se crea el cliente compartido cuando se aplica por llamada
+TEMPERATURA_BASE = 0.7
+
+
+class LLMPool:
+    """Pool de clientes LLM con desalojo de los clientes inactivos."""
+    
+    def __init__(self, max_inactivo_segundos: int = 1800):
+        """
+        Inicializa el pool.
+        
+        Args:
+            max_inactivo_segundos: Tiempo sin uso tras el cual se descarta un cliente
+        """
+        self.max_inactivo_segundos = max_inactivo_segundos
+        
+        # {clave: [cliente, ultimo_uso]}
+        self._clientes: Dict[Tuple, list] = {}
+        # Un lock por clave para no crear dos veces el mismo cliente sin bloquear a los demás
+        self._locks_creacion: Dict[Tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+        
+        self.creados = 0
+        self.reutilizados = 0
+        self.desalojados = 0
+    
+    @staticmethod
+    def _clave(provider: str, model_name: str, temperature: float) -> Tuple:
+        if provider in PROVEEDORES_TEMPERATURA_POR_LLAMADA:
+            return (provider, model_name)
+        return (provider, model_name, round(float(temperature), 3))
+    
+    def _desalojar_inactivos(self, ahora: float):
+        """Elimina los clientes sin uso reciente (se llama con el lock tomado)."""
+        for clave, (_, ultimo_uso) in list(self._clientes.items()):
+            if ahora - ultimo_uso > self.max_inactivo_segundos:
+                del self._clientes[clave]
+                self._locks_creacion.pop(clave, None)
+                self.desalojados += 1
+    
+    def obtener(
+        self,
+        provider: str,
+        model_name: str,
+        temperature: float,
+        crear: Callable[[float], Any]
+    ) -> Any:
+        """
+        Obtiene un cliente del pool o lo crea si no existe.
+        
+        Args:
+            provider: Proveedor de IA
+            model_name: Nombre del modelo
+            temperature: Temperatura pedida por la sesión
+            crear: Función que recibe la temperatura y crea el cliente (solo se llama si no está en el pool)
+        
+        Returns:
+            Cliente de LangChain listo para usar, con la temperatura aplicada
+        """
+        clave = self._clave(provider, model_name, temperature)
+        
+        with self._lock:
+            ahora = time.time()
+            self._desalojar_inactivos(ahora)
+            entrada = self._clientes.get(clave)
+            if entrada is None:
+                lock_creacion = self._locks_creacion.setdefault(clave, threading.Lock())
+            else:
+                entrada[1] = ahora
+                self.reutilizados += 1
+        
+        if entrada is None:
+            with lock_creacion:
+                # Otro hilo pudo haberlo creado mientras se esperaba el lock
+                with self._lock:
+                    entrada = self._clientes.get(clave)
+                    if entrada is not None:
+                        entrada[1] = time.time()
+                        self.reutilizados += 1
+                if entrada is None:
+                    # Si la creación falla (API key, modelo...), el error llega a quien llamó y no se guarda nada
+                    temperatura_cliente = TEMPERATURA_BASE if len(clave) == 2 else temperature
+                    cliente = crear(temperatura_cliente)
+                    entrada = [cliente, time.time()]
+                    with self._lock:
+                        self._clientes[clave] = entrada
+                        self.creados += 1
+        
+        cliente = entrada[0]
+        if len(clave) == 2:
+            return cliente.bind(temperature=temperature)
+        return cliente
+    
+    def limpiar(self):
+        """Descarta todos los clientes del pool."""
+        with self._lock:
+            self._clientes.clear()
+            self._locks_creacion.clear()
+    
+    def get_metricas(self) -> Dict:
+        """
+        Retorna las métricas de uso del pool.
+        
+        Returns:
+            Dict con clientes activos, creados, reutilizados y desalojados
+        """
+        with self._lock:
+            return {
+                "clientes": len(self._clientes),
+                "creados": self.creados,
+                "reutilizados": self.reutilizados,
+                "desalojados": self.desalojados
+            }
+
+
+# Instancia global compartida por todas las sesiones del proceso
+_llm_pool_instance: Optional[LLMPool] = None
+_llm_pool_lock = threading.Lock()
+
+
+def get_llm_pool() -> LLMPool:
+    """
+    Obtiene la instancia global del pool de clientes LLM.
+    
+    El tiempo de inactividad se configura con LLM_POOL_MAX_INACTIVO_SEGUNDOS.
+    
+    Returns:
+        Instancia de LLMPool
+    """
+    global _llm_pool_instance
+    if _llm_pool_instance is None:
+        with _llm_pool_lock:
+            if _llm_pool_instance is None:
+                try:
+                    max_inactivo = int(os.getenv("LLM_POOL_MAX_INACTIVO_SEGUNDOS", "1800"))
+                except ValueError:
+                    max_inactivo = 1800
+                _llm_pool_instance = LLMPool(max_inactivo_segundos=max_inactivo)
+    return _llm_pool_instance
@@ -0,0 +1,171 @@
+"""
+Catálogo de proveedores y modelos.
+Revisa una sola vez por proceso qué proveedores están instalados y guarda en
+disco (con TTL) las listas de modelos que se consultan por red, actualizándolas
+en segundo plano para que el sidebar nunca espere por importaciones ni por la red.
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from app.utils.logger import logger
+from app.utils.provider_registry import get_proveedores_disponibles
+
+
+# Una lista vacía (sin API key, error de red...) se vuelve a consultar antes que una con modelos
+REINTENTO_LISTA_VACIA_SEGUNDOS = 300
+
+
+class ModelCatalog:
+    """Catálogo de proveedores disponibles y modelos remotos con caché en disco."""
+    
+    def __init__(
+        self,
+        cache_path: Optional[str] = None,
+        ttl_segundos: int = 86400,
+        consultas_remotas: Optional[Dict[str, Callable[[], List[str]]]] = None
+    ):
+        """
+        Inicializa el catálogo.
+        
+        Args:
+            cache_path: Ruta al archivo JSON de la caché. Si es None, usa data/cache/modelos.json
+            ttl_segundos: Tiempo tras el cual una lista de modelos se vuelve a consultar
+            consultas_remotas: Función que consulta los modelos de cada proveedor por red
+        """
+        if cache_path is None:
+            project_root = Path(__file__).parent.parent.parent
+            cache_path = project_root / "data" / "cache" / "modelos.json"
+        
+        self.cache_path = Path(cache_path)
+        self.ttl_segundos = ttl_segundos
+        self.consultas_remotas = consultas_remotas or {}
+        
+        self._proveedores: Optional[List[str]] = None
+        self._actualizando: set = set()
+        self._lock = threading.Lock()
+        self._modelos = self._cargar_cache()
+    
+    def _cargar_cache(self) -> Dict[str, Dict]:
+        """Lee la caché de modelos desde disco: {proveedor: {'modelos': [...], 'actualizado': ts}}."""
+        if not self.cache_path.exists():
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            return datos if isinstance(datos, dict) else {}
+        except (OSError, json.JSONDecodeError):
+            return {}
+    
+    def _guardar_cache(self):
+        """Escribe la caché en disco (se llama con el lock tomado)."""
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temporal = self.cache_path.with_suffix(".tmp")
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(self._modelos, f, ensure_ascii=False, indent=2)
+            os.replace(temporal, self.cache_path)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar la caché de modelos: {e}")
+    
+    def get_proveedores_disponibles(self, forzar: bool = False) -> List[str]:
+        """
+        Retorna los proveedores instalados, revisándolos solo la primera vez.
+        
+        Args:
+            forzar: Si es True, vuelve a revisar los paquetes instalados
+        
+        Returns:
+            Lista de proveedores con algún adaptador instalado
+        """
+        with self._lock:
+            if self._proveedores is None or forzar:
+                self._proveedores = get_proveedores_disponibles()
+            return list(self._proveedores)
+    
+    def get_modelos_remotos(self, provider: str) -> List[str]:
+        """
+        Retorna la lista de modelos consultada por red, sin esperar a la red.
+        
+        Si la lista no existe o expiró, se actualiza en segundo plano y mientras
+        tanto se retorna la versión guardada (o una lista vacía la primera vez).
+        
+        Args:
+            provider: Proveedor de IA
+        
+        Returns:
+            Lista de nombres de modelos
+        """
+        if provider not in self.consultas_remotas:
+            return []
+        
+        with self._lock:
+            entrada = self._modelos.get(provider)
+            vigente = False
+            if entrada is not None:
+                ttl = self.ttl_segundos if entrada.get("modelos") else min(self.ttl_segundos, REINTENTO_LISTA_VACIA_SEGUNDOS)
+                vigente = time.time() - entrada.get("actualizado", 0) < ttl
+            if not vigente and provider not in self._actualizando:
+                self._actualizando.add(provider)
+                threading.Thread(
+                    target=self._actualizar,
+                    args=(provider,),
+                    name=f"catalogo-{provider}",
+                    daemon=True
+                ).start()
+            return list(entrada.get("modelos", [])) if entrada else []
+    
+    def _actualizar(self, provider: str):
+        """Consulta los modelos de un proveedor y guarda el resultado (en un hilo aparte)."""
+        try:
+            modelos = self.consultas_remotas[provider]()
+            with self._lock:
+                if modelos or provider not in self._modelos:
+                    self._modelos[provider] = {"modelos": list(modelos), "actualizado": time.time()}
+                else:
+                    # Una consulta fallida (lista vacía) no borra la última lista buena:
+                    # se conserva y se vuelve a intentar en REINTENTO_LISTA_VACIA_SEGUNDOS
+                    self._modelos[provider]["actualizado"] = (
+                        time.time() - self.ttl_segundos + min(self.ttl_segundos, REINTENTO_LISTA_VACIA_SEGUNDOS)
+                    )
+                self._guardar_cache()
+        except Exception as e:
+            logger.warning(f"No se pudo actualizar la lista de modelos de {provider}: {e}")
+        finally:
+            with self._lock:
+                self._actualizando.discard(provider)
+
+
+# Instancia global compartida por todas las sesiones del proceso
+_model_catalog_instance: Optional[ModelCatalog] = None
+_model_catalog_lock = threading.Lock()
+
+
+def get_model_catalog() -> ModelCatalog:
+    """
+    Obtiene la instancia global del catálogo de modelos.
+    
+    El TTL de las listas de modelos se configura con LLM_CATALOGO_TTL_SEGUNDOS.
+    
+    Returns:
+        Instancia de ModelCatalog
+    """
+    global _model_catalog_instance
+    if _model_catalog_instance is None:
+        with _model_catalog_lock:
+            if _model_catalog_instance is None:
+                # Importación local para evitar una importación circular con langchain_agent
+                from app.utils.langchain_agent import LangChainAgent
+                try:
+                    ttl = int(os.getenv("LLM_CATALOGO_TTL_SEGUNDOS", "86400"))
+                except ValueError:
+                    ttl = 86400
+                _model_catalog_instance = ModelCatalog(
+                    ttl_segundos=ttl,
+                    consultas_remotas={"gemini": LangChainAgent.list_available_gemini_models}
+                )
+    return _model_catalog_instance
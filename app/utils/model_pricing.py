@@ -0,0 +1,312 @@
+"""
+Catálogo de precios y capacidades de los modelos.
+Para cada modelo de las tablas de LangChainAgent (OPENAI_MODELS, GROQ_MODELS...)
+registra la ventana de contexto, el precio por millón de tokens de entrada y de
+salida y la velocidad aproximada de generación. Con un estimador local de tokens
+predice el costo y la latencia de una solicitud antes de enviarla, y calcula el
+costo de los proveedores que no lo informan en la respuesta.
+"""
+
+import os
+import json
+import time
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.logger import logger
+from app.utils.provider_registry import importar_modulo, paquete_instalado
+from app.utils.usage_ledger import get_registro_uso
+
+
+# Precios de lista en USD por millón de tokens (entrada / salida, y entrada_cache para los
+# tokens del prefijo que el proveedor toma de su caché), ventana de contexto en tokens,
+# segundos hasta el primer token y tokens de salida por segundo (valores de referencia).
+# Se pueden corregir sin tocar el código con config/precios_modelos.json (mismo formato).
+PRECIOS_MODELOS: Dict[str, Dict[str, Dict]] = {
+    "openai": {
+        "gpt-4o-mini": {"contexto": 128000, "entrada": 0.15, "entrada_cache": 0.075, "salida": 0.60, "primer_token": 0.5, "tokens_por_segundo": 80},
+        "gpt-4o": {"contexto": 128000, "entrada": 2.50, "entrada_cache": 1.25, "salida": 10.00, "primer_token": 0.6, "tokens_por_segundo": 60},
+        "gpt-3.5-turbo": {"contexto": 16385, "entrada": 0.50, "salida": 1.50, "primer_token": 0.4, "tokens_por_segundo": 90}
+    },
+    "gemini": {
+        "gemini-flash-latest": {"contexto": 1048576, "entrada": 0.30, "entrada_cache": 0.075, "salida": 2.50, "primer_token": 0.8, "tokens_por_segundo": 150}
+    },
+    "groq": {
+        "llama2-70b-4096": {"contexto": 4096, "entrada": 0.70, "salida": 0.80, "primer_token": 0.3, "tokens_por_segundo": 250},
+        "mixtral-8x7b-32768": {"contexto": 32768, "entrada": 0.24, "salida": 0.24, "primer_token": 0.3, "tokens_por_segundo": 500},
+        "gemma-7b-it": {"contexto": 8192, "entrada": 0.07, "salida": 0.07, "primer_token": 0.2, "tokens_por_segundo": 800},
+        "llama-3.1-70b-versatile": {"contexto": 131072, "entrada": 0.59, "salida": 0.79, "primer_token": 0.3, "tokens_por_segundo": 250},
+        "llama-3.1-8b-instant": {"contexto": 131072, "entrada": 0.05, "salida": 0.08, "primer_token": 0.2, "tokens_por_segundo": 750}
+    },
+    "together": {
+        "meta-llama/Llama-2-70b-chat-hf": {"contexto": 4096, "entrada": 0.90, "salida": 0.90, "primer_token": 0.6, "tokens_por_segundo": 40},
+        "mistralai/Mixtral-8x7B-Instruct-v0.1": {"contexto": 32768, "entrada": 0.60, "salida": 0.60, "primer_token": 0.5, "tokens_por_segundo": 90},
+        "meta-llama/Llama-2-13b-chat-hf": {"contexto": 4096, "entrada": 0.22, "salida": 0.22, "primer_token": 0.4, "tokens_por_segundo": 70},
+        "meta-llama/Llama-2-7b-chat-hf": {"contexto": 4096, "entrada": 0.20, "salida": 0.20, "primer_token": 0.4, "tokens_por_segundo": 90}
+    },
+    "cohere": {
+        "command-nightly": {"contexto": 128000, "entrada": 2.50, "salida": 10.00, "primer_token": 0.8, "tokens_por_segundo": 50}
+    },
+    "huggingface": {
+        # API de inferencia gratuita (con límites de uso)
+        "meta-llama/Llama-2-7b-chat-hf": {"contexto": 4096, "entrada": 0.0, "salida": 0.0, "primer_token": 2.0, "tokens_por_segundo": 20},
+        "mistralai/Mistral-7B-Instruct-v0.1": {"contexto": 8192, "entrada": 0.0, "salida": 0.0, "primer_token": 2.0, "tokens_por_segundo": 20},
+        "google/flan-t5-xxl": {"contexto": 512, "entrada": 0.0, "salida": 0.0, "primer_token": 2.0, "tokens_por_segundo": 20},
+        "microsoft/DialoGPT-large": {"contexto": 1024, "entrada": 0.0, "salida": 0.0, "primer_token": 2.0, "tokens_por_segundo": 20}
+    }
+}
+
+# Valores para un modelo que no está en el catálogo (el costo queda como desconocido)
+MODELO_DESCONOCIDO = {"contexto": None, "entrada": None, "entrada_cache": None, "salida": None, "primer_token": 1.0, "tokens_por_segundo": 50}
+
+# Tokens por palabra en español (para convertir 'max_palabras' en tokens de salida)
+TOKENS_POR_PALABRA = 1.4
+
+# Llamadas recientes necesarias para estimar la latencia con el registro de uso en lugar del catálogo
+MUESTRAS_MINIMAS_LATENCIA = 5
+
+# Segundos que se reutiliza la velocidad observada de un modelo antes de volver a calcularla
+VIGENCIA_VELOCIDAD_SEGUNDOS = 10.0
+
+_precios_archivo: Optional[Dict[str, Dict[str, Dict]]] = None
+_codificadores: Dict[str, object] = {}
+# {(proveedor, modelo): (momento del cálculo, velocidad)}
+_velocidades: Dict[Tuple[str, str], Tuple[float, Optional[float]]] = {}
+_lock = threading.Lock()
+
+
+def _cargar_precios_archivo() -> Dict[str, Dict[str, Dict]]:
+    """Lee (una sola vez) las correcciones de precios de config/precios_modelos.json."""
+    global _precios_archivo
+    if _precios_archivo is None:
+        with _lock:
+            if _precios_archivo is None:
+                ruta = Path(os.getenv(
+                    "LLM_PRECIOS_PATH",
+                    Path(__file__).parent.parent.parent / "config" / "precios_modelos.json"
+                ))
+                datos = {}
+                if ruta.exists():
+                    try:
+                        with open(ruta, "r", encoding="utf-8") as f:
+                            datos = json.load(f)
+                    except (OSError, json.JSONDecodeError) as e:
+                        logger.warning(f"⚠️ No se pudo leer {ruta}: {e}")
+                _precios_archivo = datos if isinstance(datos, dict) else {}
+    return _precios_archivo
+
+
+def get_info_modelo(provider: str, model_name: str) -> Dict:
+    """
+    Retorna los precios y capacidades de un modelo.
+    
+    Args:
+        provider: Proveedor de IA
+        model_name: Modelo
+    
+    Returns:
+        Dict con contexto, entrada y salida (USD por millón de tokens), primer_token,
+        tokens_por_segundo y conocido (False si el modelo no está en el catálogo)
+    """
+    info = PRECIOS_MODELOS.get(provider, {}).get(model_name)
+    correccion = _cargar_precios_archivo().get(provider, {}).get(model_name)
+    if info is None and correccion is None:
+        return {**MODELO_DESCONOCIDO, "conocido": False}
+    return {**MODELO_DESCONOCIDO, **(info or {}), **(correccion or {}), "conocido": True}
+
+
+def _proveedores_gratuitos() -> List[str]:
+    """Proveedores que no cobran (por ejemplo, por usar su plan gratuito), según LLM_PROVEEDORES_GRATUITOS."""
+    return [p.strip().lower() for p in os.getenv("LLM_PROVEEDORES_GRATUITOS", "").split(",") if p.strip()]
+
+
+def calcular_costo(
+    provider: str,
+    model_name: str,
+    tokens_entrada: int,
+    tokens_salida: int,
+    tokens_cache: int = 0
+) -> float:
+    """
+    Calcula el costo de una llamada con los precios del catálogo.
+    
+    Args:
+        provider: Proveedor de IA
+        model_name: Modelo
+        tokens_entrada: Tokens del prompt (incluidos los de la caché del proveedor)
+        tokens_salida: Tokens de la respuesta
+        tokens_cache: Tokens del prompt que el proveedor tomó de su caché de prefijos
+    
+    Returns:
+        Costo en USD (0.0 si el modelo no tiene precio conocido o el proveedor es gratuito)
+    """
+    info = get_info_modelo(provider, model_name)
+    if info["entrada"] is None or provider in _proveedores_gratuitos():
+        return 0.0
+    # Sin precio propio, los tokens de la caché se cobran como entrada normal
+    precio_cache = info["entrada_cache"] if info["entrada_cache"] is not None else info["entrada"]
+    tokens_cache = min(tokens_cache, tokens_entrada)
+    return (
+        (tokens_entrada - tokens_cache) * info["entrada"]
+        + tokens_cache * precio_cache
+        + tokens_salida * (info["salida"] or 0.0)
+    ) / 1_000_000
+
+
+def _codificador_openai(model_name: str):
+    """Codificador de tiktoken del modelo (si tiktoken está instalado), o None."""
+    if model_name not in _codificadores:
+        codificador = None
+        if paquete_instalado("tiktoken"):
+            tiktoken = importar_modulo("tiktoken")
+            try:
+                codificador = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                codificador = tiktoken.get_encoding("o200k_base")
+        _codificadores[model_name] = codificador
+    return _codificadores[model_name]
+
+
+def estimar_tokens(texto: str, provider: str = "", model_name: str = "") -> int:
+    """
+    Estima los tokens de un texto sin llamar al proveedor.
+    
+    En OpenAI usa tiktoken si está instalado; en el resto (y si no lo está) usa una
+    aproximación por caracteres y palabras calibrada para español.
+    
+    Args:
+        texto: Texto a estimar
+        provider: Proveedor de IA
+        model_name: Modelo
+    
+    Returns:
+        Tokens estimados
+    """
+    if not texto:
+        return 0
+    if provider == "openai":
+        codificador = _codificador_openai(model_name)
+        if codificador is not None:
+            return len(codificador.encode(texto))
+    return max(1, round(max(len(texto) / 4, len(texto.split()) * TOKENS_POR_PALABRA)))
+
+
+def estimar_tokens_mensajes(messages: List, provider: str = "", model_name: str = "") -> int:
+    """Estima los tokens de entrada de una lista de mensajes (incluye unos pocos por mensaje de formato)."""
+    return sum(
+        estimar_tokens(str(getattr(mensaje, "content", mensaje)), provider, model_name) + 4
+        for mensaje in messages
+    )
+
+
+def velocidad_observada(provider: str, model_name: str) -> Optional[float]:
+    """
+    Tokens de salida por segundo (mediana) de las llamadas de la última semana, según el registro de uso.
+    
+    El valor se reutiliza durante VIGENCIA_VELOCIDAD_SEGUNDOS: la estimación se muestra
+    en cada interacción de la interfaz y no hace falta consultar el registro cada vez.
+    
+    Args:
+        provider: Proveedor de IA
+        model_name: Modelo
+    
+    Returns:
+        Tokens por segundo, o None si no hay suficientes llamadas registradas
+    """
+    clave = (provider, model_name)
+    ahora = time.monotonic()
+    guardada = _velocidades.get(clave)
+    if guardada is not None and ahora - guardada[0] < VIGENCIA_VELOCIDAD_SEGUNDOS:
+        return guardada[1]
+    
+    velocidad = None
+    registro = get_registro_uso()
+    if registro is not None:
+        desde = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
+        mediana, muestras = registro.mediana_velocidad(provider, model_name, desde)
+        if muestras >= MUESTRAS_MINIMAS_LATENCIA:
+            velocidad = mediana
+    _velocidades[clave] = (ahora, velocidad)
+    return velocidad
+
+
+def estimar_solicitud(
+    provider: str,
+    model_name: str,
+    messages: List,
+    tokens_salida: int,
+    velocidad: Optional[float] = None
+) -> Dict:
+    """
+    Predice el costo y la latencia de una solicitud antes de enviarla.
+    
+    Args:
+        provider: Proveedor de IA
+        model_name: Modelo
+        messages: Mensajes que se van a enviar
+        tokens_salida: Tokens esperados de la respuesta
+        velocidad: Velocidad observada ya calculada (ver `velocidad_observada`), para
+            estimar varias solicitudes del mismo modelo sin volver a buscarla
+    
+    Returns:
+        Dict con tokens_entrada, tokens_salida, costo (None si el precio es desconocido),
+        latencia_segundos, contexto y excede_contexto
+    """
+    info = get_info_modelo(provider, model_name)
+    tokens_entrada = estimar_tokens_mensajes(messages, provider, model_name)
+    
+    if velocidad is None:
+        velocidad = velocidad_observada(provider, model_name)
+    if velocidad:
+        # La velocidad observada ya incluye la espera del primer token
+        latencia = tokens_salida / velocidad
+    else:
+        latencia = info["primer_token"] + tokens_salida / info["tokens_por_segundo"]
+    
+    return {
+        "tokens_entrada": tokens_entrada,
+        "tokens_salida": tokens_salida,
+        "costo": calcular_costo(provider, model_name, tokens_entrada, tokens_salida) if info["conocido"] else None,
+        "latencia_segundos": latencia,
+        "contexto": info["contexto"],
+        "excede_contexto": bool(info["contexto"]) and tokens_entrada + tokens_salida > info["contexto"]
+    }
+
+
+def revisar_presupuesto(costo_estimado: Optional[float]) -> List[str]:
+    """
+    Compara el costo estimado de una solicitud con los presupuestos configurados.
+    
+    Se configuran con LLM_PRESUPUESTO_SOLICITUD_USD (por solicitud) y
+    LLM_PRESUPUESTO_DIARIO_USD (suma del día, según el registro de uso).
+    
+    Args:
+        costo_estimado: Costo estimado de la solicitud (None si es desconocido)
+    
+    Returns:
+        Lista de avisos (vacía si la solicitud está dentro del presupuesto)
+    """
+    if not costo_estimado:
+        return []
+    avisos = []
+    try:
+        por_solicitud = float(os.getenv("LLM_PRESUPUESTO_SOLICITUD_USD", "0"))
+        diario = float(os.getenv("LLM_PRESUPUESTO_DIARIO_USD", "0"))
+    except ValueError:
+        por_solicitud, diario = 0.0, 0.0
+    
+    if por_solicitud and costo_estimado > por_solicitud:
+        avisos.append(
+            f"El costo estimado (${costo_estimado:.4f}) supera el presupuesto por solicitud (${por_solicitud:.4f})."
+        )
+    if diario:
+        registro = get_registro_uso()
+        hoy = datetime.now().strftime("%Y-%m-%d")
+        gastado = sum(fila["costo"] for fila in registro.resumir(por="dia", desde=hoy)) if registro else 0.0
+        if gastado + costo_estimado > diario:
+            avisos.append(
+                f"Con esta solicitud el gasto de hoy (${gastado:.4f}) superaría el presupuesto diario (${diario:.2f})."
+            )
+    return avisos
@@ -0,0 +1,182 @@
+"""
+Registro de proveedores de IA.
+Cada adaptador de LangChain se importa solo la primera vez que se usa su
+proveedor; para saber si está instalado se consulta `importlib.util.find_spec`,
+que no importa el paquete.
+"""
+
+import time
+import importlib
+import importlib.util
+import threading
+from typing import Dict, List, Optional
+
+from app.utils.logger import logger
+
+
+# Adaptadores por proveedor, en orden de preferencia.
+# Cada uno es (módulo, clase, paquetes que deben estar instalados).
+ADAPTADORES = {
+    "openai": [
+        ("langchain_openai", "ChatOpenAI", ["langchain_openai"])
+    ],
+    "gemini": [
+        ("langchain_google_genai", "ChatGoogleGenerativeAI", ["langchain_google_genai"])
+    ],
+    "groq": [
+        ("langchain_groq", "ChatGroq", ["langchain_groq"]),
+        ("langchain_community.chat_models", "ChatGroq", ["langchain_community", "groq"])
+    ],
+    "together": [
+        ("langchain_together", "ChatTogether", ["langchain_together"]),
+        ("langchain_community.chat_models", "ChatTogether", ["langchain_community", "together"])
+    ],
+    "cohere": [
+        ("langchain_cohere", "ChatCohere", ["langchain_cohere"]),
+        ("langchain_community.chat_models", "ChatCohere", ["langchain_community", "cohere"])
+    ],
+    "huggingface": [
+        ("langchain_huggingface", "ChatHuggingFace", ["langchain_huggingface"]),
+        ("langchain_community.chat_models", "ChatHuggingFace", ["langchain_community", "huggingface_hub"])
+    ]
+}
+
+# Mensaje de instalación cuando no hay ningún adaptador disponible
+MENSAJES_INSTALACION = {
+    "openai": "langchain-openai no está instalado. Instálelo con: pip install langchain-openai",
+    "gemini": "langchain-google-genai no está instalado. Instálelo con: pip install langchain-google-genai",
+    "groq": "langchain-groq no está instalado. Instálelo con: pip install langchain-groq",
+    "together": "langchain-together no está instalado. Instálelo con: pip install langchain-together",
+    "cohere": "langchain-cohere no está instalado. Instálelo con: pip install langchain-cohere cohere",
+    "huggingface": (
+        "langchain-community o langchain-huggingface no está instalado. "
+        "Instálelo con: pip install langchain-community langchain-huggingface"
+    )
+}
+
+PROVEEDORES = list(ADAPTADORES.keys())
+
+# Clases ya importadas y tiempo (en segundos) que tomó importar cada una
+_clases: Dict[str, type] = {}
+_tiempos_importacion: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def paquete_instalado(nombre: str) -> bool:
+    """
+    Verifica si un paquete está instalado sin importarlo.
+    
+    Args:
+        nombre: Nombre del paquete o módulo (por ejemplo, 'langchain_openai')
+    
+    Returns:
+        True si el paquete se puede importar
+    """
+    try:
+        return importlib.util.find_spec(nombre) is not None
+    except (ImportError, ValueError):
+        # find_spec importa los paquetes padre de un nombre con puntos, y eso puede fallar
+        return False
+
+
+def proveedor_disponible(provider: str) -> bool:
+    """
+    Verifica si algún adaptador del proveedor está instalado, sin importarlo.
+    
+    Args:
+        provider: Proveedor de IA
+    
+    Returns:
+        True si el proveedor se puede usar
+    """
+    if provider in _clases:
+        return True
+    return any(
+        all(paquete_instalado(paquete) for paquete in requisitos)
+        for _, _, requisitos in ADAPTADORES.get(provider, [])
+    )
+
+
+def get_proveedores_disponibles() -> List[str]:
+    """Retorna los proveedores que tienen algún adaptador instalado."""
+    return [provider for provider in PROVEEDORES if proveedor_disponible(provider)]
+
+
+def importar_modulo(modulo: str, etiqueta: Optional[str] = None):
+    """
+    Importa un módulo y registra cuánto tardó la importación.
+    
+    Args:
+        modulo: Módulo a importar
+        etiqueta: Nombre con el que se registra el tiempo (por defecto el del módulo)
+    
+    Returns:
+        El módulo importado
+    """
+    inicio = time.perf_counter()
+    resultado = importlib.import_module(modulo)
+    duracion = time.perf_counter() - inicio
+    _tiempos_importacion[etiqueta or modulo] = duracion
+    logger.info(f"Importado {modulo} en {duracion * 1000:.0f} ms")
+    return resultado
+
+
+def importar_clase(modulo: str, clase: str, etiqueta: Optional[str] = None) -> type:
+    """
+    Importa una clase y registra cuánto tardó la importación.
+    
+    Args:
+        modulo: Módulo a importar
+        clase: Nombre de la clase dentro del módulo
+        etiqueta: Nombre con el que se registra el tiempo (por defecto 'modulo.clase')
+    
+    Returns:
+        La clase importada
+    """
+    return getattr(importar_modulo(modulo, etiqueta or f"{modulo}.{clase}"), clase)
+
+
+def cargar_adaptador(provider: str) -> type:
+    """
+    Obtiene la clase de chat de LangChain de un proveedor, importándola la primera vez.
+    
+    Args:
+        provider: Proveedor de IA
+    
+    Returns:
+        Clase de chat de LangChain del proveedor
+    
+    Raises:
+        ImportError: Si ningún adaptador del proveedor está instalado
+    """
+    if provider in _clases:
+        return _clases[provider]
+    
+    with _lock:
+        if provider in _clases:
+            return _clases[provider]
+        
+        ultimo_error = None
+        for modulo, clase, requisitos in ADAPTADORES.get(provider, []):
+            if not all(paquete_instalado(paquete) for paquete in requisitos):
+                continue
+            try:
+                _clases[provider] = importar_clase(modulo, clase, etiqueta=provider)
+                return _clases[provider]
+            except (ImportError, AttributeError) as e:
+                ultimo_error = e
+        
+        mensaje = MENSAJES_INSTALACION.get(provider, f"Proveedor '{provider}' no soportado")
+        if ultimo_error is not None:
+            mensaje += f"\nError original: {ultimo_error}"
+        raise ImportError(mensaje)
+
+
+def get_tiempos_importacion() -> Dict[str, float]:
+    """
+    Retorna el tiempo de importación de cada adaptador cargado hasta ahora.
+    
+    Returns:
+        Dict {proveedor o módulo: segundos}
+    """
+    return dict(_tiempos_importacion)
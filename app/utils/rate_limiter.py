@@ -0,0 +1,325 @@
+"""
+Módulo de limitación de tasa de llamadas al LLM.
+Regula las solicitudes y los tokens por minuto de cada proveedor y modelo con
+cubetas de tokens compartidas por todo el proceso, para esperar un turno antes
+de llamar al proveedor en lugar de recibir errores 429.
+"""
+
+import os
+import re
+import time
+import threading
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+from app.utils.llm_errors import LLMError
+from app.utils.deadlines import CanceladoError, TokenCancelacion
+
+
+# Cada cuánto revisa una solicitud en espera si se canceló
+INTERVALO_REVISION_SEGUNDOS = 0.5
+
+
+class EsperaExcedidaError(LLMError):
+    """La solicitud tendría que esperar más que el máximo permitido para tener turno."""
+    cambiar_proveedor = True
+
+
+class _Cubeta:
+    """Cubeta de tokens: se recarga de forma continua hasta su capacidad por minuto."""
+    
+    def __init__(self, capacidad_por_minuto: float):
+        self.capacidad = float(capacidad_por_minuto)
+        self.tasa = self.capacidad / 60.0
+        self.disponible = self.capacidad
+        self.actualizado = time.monotonic()
+    
+    def _recargar(self, ahora: float):
+        self.disponible = min(self.capacidad, self.disponible + (ahora - self.actualizado) * self.tasa)
+        self.actualizado = ahora
+    
+    def espera_para(self, cantidad: float, ahora: float) -> float:
+        """
+        Segundos que faltan para poder consumir `cantidad`. Lo que supera la capacidad
+        no cabe nunca en la cubeta: basta con que esté llena, y `consumir` lo deja en deuda.
+        """
+        self._recargar(ahora)
+        faltante = min(cantidad, self.capacidad) - self.disponible
+        return 0.0 if faltante <= 0 else faltante / self.tasa
+    
+    def consumir(self, cantidad: float):
+        # Puede quedar en negativo (una solicitud mayor que la capacidad o el ajuste
+        # de tokens reales): las siguientes esperan hasta pagar la deuda
+        self.disponible = min(self.capacidad, self.disponible - cantidad)
+
+
+class _Limite:
+    """Cubetas y cola de espera (FIFO) de un proveedor y modelo."""
+    
+    def __init__(self, rpm: int, tpm: int):
+        self.solicitudes = _Cubeta(rpm) if rpm > 0 else None
+        self.tokens = _Cubeta(tpm) if tpm > 0 else None
+        self.condicion = threading.Condition()
+        self.cola: deque = deque()
+        
+        self.atendidas = 0
+        self.rechazadas = 0
+        self.espera_total = 0.0
+        self.max_cola = 0
+    
+    def espera_para(self, solicitudes: int, tokens: int, ahora: float) -> float:
+        espera = 0.0
+        if self.solicitudes is not None:
+            espera = max(espera, self.solicitudes.espera_para(solicitudes, ahora))
+        if self.tokens is not None and tokens > 0:
+            espera = max(espera, self.tokens.espera_para(tokens, ahora))
+        return espera
+    
+    def consumir(self, solicitudes: int, tokens: int):
+        if self.solicitudes is not None:
+            self.solicitudes.consumir(solicitudes)
+        if self.tokens is not None and tokens > 0:
+            self.tokens.consumir(tokens)
+
+
+def _nombre_variable(texto: str) -> str:
+    """Convierte un nombre de proveedor o modelo en parte de un nombre de variable de entorno."""
+    return re.sub(r'[^A-Z0-9]+', '_', texto.upper()).strip('_')
+
+
+class RateLimiter:
+    """Limitador de solicitudes y tokens por minuto, por proveedor y modelo."""
+    
+    def __init__(self, rpm_por_defecto: int = 30, tpm_por_defecto: int = 0, max_espera_segundos: float = 30.0):
+        """
+        Inicializa el limitador.
+        
+        Args:
+            rpm_por_defecto: Solicitudes por minuto si no hay un límite específico (0 = sin límite)
+            tpm_por_defecto: Tokens por minuto si no hay un límite específico (0 = sin límite)
+            max_espera_segundos: Tiempo máximo que una solicitud espera su turno
+        """
+        self.rpm_por_defecto = rpm_por_defecto
+        self.tpm_por_defecto = tpm_por_defecto
+        self.max_espera_segundos = max_espera_segundos
+        self._limites: Dict[Tuple[str, str], _Limite] = {}
+        self._lock = threading.Lock()
+    
+    def _leer_limite(self, tipo: str, provider: str, model_name: str, por_defecto: int) -> int:
+        """
+        Lee un límite de las variables de entorno, del más específico al más general:
+        LLM_<TIPO>_<PROVEEDOR>_<MODELO>, LLM_<TIPO>_<PROVEEDOR> y el valor por defecto.
+        """
+        for variable in (
+            f"LLM_{tipo}_{_nombre_variable(provider)}_{_nombre_variable(model_name)}",
+            f"LLM_{tipo}_{_nombre_variable(provider)}"
+        ):
+            valor = os.getenv(variable)
+            if valor:
+                try:
+                    return int(valor)
+                except ValueError:
+                    pass
+        return por_defecto
+    
+    def _get_limite(self, provider: str, model_name: str) -> _Limite:
+        clave = (provider, model_name)
+        with self._lock:
+            if clave not in self._limites:
+                self._limites[clave] = _Limite(
+                    rpm=self._leer_limite("RPM", provider, model_name, self.rpm_por_defecto),
+                    tpm=self._leer_limite("TPM", provider, model_name, self.tpm_por_defecto)
+                )
+            return self._limites[clave]
+    
+    def get_capacidad(self, provider: str, model_name: str) -> Tuple[int, int]:
+        """
+        Retorna las solicitudes y los tokens por minuto de un proveedor y modelo.
+        
+        Un envío por lotes mayor que esta capacidad se debe dividir: aunque el limitador
+        cobra el exceso como deuda, el lote completo saldría de una sola vez.
+        
+        Returns:
+            Tupla (rpm, tpm), con 0 si no hay límite
+        """
+        limite = self._get_limite(provider, model_name)
+        return (
+            int(limite.solicitudes.capacidad) if limite.solicitudes else 0,
+            int(limite.tokens.capacidad) if limite.tokens else 0
+        )
+    
+    def adquirir(
+        self,
+        provider: str,
+        model_name: str,
+        solicitudes: int = 1,
+        tokens: int = 0,
+        max_espera: Optional[float] = None,
+        token: Optional[TokenCancelacion] = None
+    ) -> float:
+        """
+        Espera (en orden de llegada) hasta que haya cupo para la solicitud y lo consume.
+        
+        Una solicitud mayor que la capacidad espera a que la cubeta esté llena y consume
+        todo lo pedido: la deuda la pagan las siguientes (ver `get_capacidad`).
+        
+        Args:
+            provider: Proveedor de IA
+            model_name: Nombre del modelo
+            solicitudes: Número de solicitudes que se van a hacer
+            tokens: Tokens estimados de la llamada
+            max_espera: Segundos máximos de espera (por defecto max_espera_segundos)
+            token: Token de cancelación; interrumpe la espera
+        
+        Returns:
+            Segundos que se esperó
+        
+        Raises:
+            EsperaExcedidaError: Si el turno no llegaría dentro del tiempo máximo de espera
+            CanceladoError: Si se canceló la solicitud mientras esperaba
+        """
+        limite = self._get_limite(provider, model_name)
+        if limite.solicitudes is None and limite.tokens is None:
+            return 0.0
+        
+        max_espera = self.max_espera_segundos if max_espera is None else max_espera
+        inicio = time.monotonic()
+        fin = inicio + max_espera
+        turno = object()
+        
+        with limite.condicion:
+            limite.cola.append(turno)
+            limite.max_cola = max(limite.max_cola, len(limite.cola))
+            try:
+                while True:
+                    if token is not None and token.cancelado:
+                        raise CanceladoError("Se canceló la solicitud", provider=provider)
+                    ahora = time.monotonic()
+                    restante = fin - ahora
+                    if limite.cola[0] is turno:
+                        espera = limite.espera_para(solicitudes, tokens, ahora)
+                        if espera <= 0:
+                            limite.consumir(solicitudes, tokens)
+                            break
+                        if espera > restante:
+                            limite.rechazadas += 1
+                            raise EsperaExcedidaError(
+                                f"Límite de uso de {provider}/{model_name} alcanzado: "
+                                f"habría que esperar {espera:.0f} segundos. Intenta de nuevo en unos momentos."
+                            )
+                        limite.condicion.wait(timeout=self._intervalo(espera, token))
+                    else:
+                        if restante <= 0:
+                            limite.rechazadas += 1
+                            raise EsperaExcedidaError(
+                                f"Demasiadas solicitudes en espera para {provider}/{model_name}. "
+                                f"Intenta de nuevo en unos momentos."
+                            )
+                        # Esperar a que la solicitud de adelante obtenga su turno
+                        limite.condicion.wait(timeout=self._intervalo(restante, token))
+            finally:
+                limite.cola.remove(turno)
+                limite.condicion.notify_all()
+            
+            esperado = time.monotonic() - inicio
+            limite.atendidas += 1
+            limite.espera_total += esperado
+        return esperado
+    
+    @staticmethod
+    def _intervalo(segundos: float, token: Optional[TokenCancelacion]) -> float:
+        """Acota una espera para revisar la cancelación cada tanto."""
+        return segundos if token is None else min(segundos, INTERVALO_REVISION_SEGUNDOS)
+    
+    def ajustar_tokens(self, provider: str, model_name: str, tokens_estimados: int, tokens_reales: int):
+        """
+        Corrige el consumo de tokens una vez conocido el uso real de la llamada.
+        
+        Args:
+            provider: Proveedor de IA
+            model_name: Nombre del modelo
+            tokens_estimados: Tokens que se consumieron al adquirir
+            tokens_reales: Tokens que informó el proveedor
+        """
+        limite = self._get_limite(provider, model_name)
+        if limite.tokens is None or not tokens_reales:
+            return
+        with limite.condicion:
+            limite.tokens.consumir(tokens_reales - tokens_estimados)
+            limite.condicion.notify_all()
+    
+    def devolver(self, provider: str, model_name: str, solicitudes: int = 1, tokens: int = 0):
+        """
+        Devuelve el cupo de un turno que se consumió pero no llegó a usarse
+        (por ejemplo, si después no hubo lugar en el limitador de concurrencia).
+        
+        Args:
+            provider: Proveedor de IA
+            model_name: Nombre del modelo
+            solicitudes: Solicitudes que se descontaron al adquirir
+            tokens: Tokens que se descontaron al adquirir
+        """
+        limite = self._get_limite(provider, model_name)
+        with limite.condicion:
+            if limite.solicitudes is not None:
+                limite.solicitudes.consumir(-solicitudes)
+            if limite.tokens is not None and tokens > 0:
+                limite.tokens.consumir(-tokens)
+            limite.condicion.notify_all()
+    
+    def get_metricas(self) -> Dict[str, Dict]:
+        """
+        Retorna las métricas de cada proveedor y modelo.
+        
+        Returns:
+            Dict {'proveedor/modelo': {en_cola, max_cola, atendidas, rechazadas, espera_promedio, ...}}
+        """
+        with self._lock:
+            limites = dict(self._limites)
+        metricas = {}
+        for (provider, model_name), limite in limites.items():
+            with limite.condicion:
+                metricas[f"{provider}/{model_name}"] = {
+                    "en_cola": len(limite.cola),
+                    "max_cola": limite.max_cola,
+                    "atendidas": limite.atendidas,
+                    "rechazadas": limite.rechazadas,
+                    "espera_promedio": (limite.espera_total / limite.atendidas) if limite.atendidas else 0.0,
+                    "rpm": limite.solicitudes.capacidad if limite.solicitudes else 0,
+                    "tpm": limite.tokens.capacidad if limite.tokens else 0
+                }
+        return metricas
+
+
+# Instancia global compartida por todas las sesiones del proceso
+_rate_limiter_instance: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Obtiene la instancia global del limitador de tasa.
+    
+    Se configura con MAX_REQUESTS_PER_MINUTE (solicitudes por minuto por defecto),
+    LLM_TPM (tokens por minuto por defecto, 0 = sin límite), LLM_RPM_<PROVEEDOR>[_<MODELO>],
+    LLM_TPM_<PROVEEDOR>[_<MODELO>] y LLM_RATE_MAX_ESPERA_SEGUNDOS.
+    
+    Returns:
+        Instancia de RateLimiter
+    """
+    global _rate_limiter_instance
+    if _rate_limiter_instance is None:
+        with _rate_limiter_lock:
+            if _rate_limiter_instance is None:
+                try:
+                    rpm = int(os.getenv("MAX_REQUESTS_PER_MINUTE", "30"))
+                    tpm = int(os.getenv("LLM_TPM", "0"))
+                    max_espera = float(os.getenv("LLM_RATE_MAX_ESPERA_SEGUNDOS", "30"))
+                except ValueError:
+                    rpm, tpm, max_espera = 30, 0, 30.0
+                _rate_limiter_instance = RateLimiter(
+                    rpm_por_defecto=rpm,
+                    tpm_por_defecto=tpm,
+                    max_espera_segundos=max_espera
+                )
+    return _rate_limiter_instance
@@ -0,0 +1,229 @@
+"""
+Módulo de caché de respuestas del LLM.
+Guarda en disco (SQLite) las respuestas ya generadas para no repetir llamadas
+pagadas cuando se pide exactamente lo mismo con la misma configuración.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class ResponseCache:
+    """Caché de respuestas exactas con expiración (TTL) y desalojo LRU."""
+    
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        ttl_segundos: int = 86400,
+        max_entradas: int = 500
+    ):
+        """
+        Inicializa la caché de respuestas.
+        
+        Args:
+            db_path: Ruta al archivo SQLite. Si es None, usa data/cache/respuestas.sqlite3
+            ttl_segundos: Tiempo de vida de cada entrada en segundos
+            max_entradas: Número máximo de entradas antes de desalojar las menos usadas
+        """
+        if db_path is None:
+            project_root = Path(__file__).parent.parent.parent
+            db_path = project_root / "data" / "cache" / "respuestas.sqlite3"
+        
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        
+        # Una sola conexión compartida entre hilos, protegida por el lock
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=5)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS respuestas (
+                clave TEXT PRIMARY KEY,
+                valor TEXT NOT NULL,
+                creado REAL NOT NULL,
+                ultimo_acceso REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ultimo_acceso ON respuestas (ultimo_acceso)")
+        self._conn.commit()
+    
+    @staticmethod
+    def generar_clave(
+        provider: str,
+        model_name: str,
+        temperature: float,
+        messages: List,
+        config_version: str = ""
+    ) -> str:
+        """
+        Genera la clave de caché para una llamada al LLM.
+        
+        Args:
+            provider: Proveedor de IA
+            model_name: Nombre del modelo
+            temperature: Temperatura usada
+            messages: Mensajes de LangChain enviados al modelo
+            config_version: Versión de la configuración de la empresa
+        
+        Returns:
+            Hash SHA-256 que identifica la llamada
+        """
+        mensajes_normalizados = []
+        for msg in messages:
+            tipo = str(getattr(msg, 'type', type(msg).__name__))
+            contenido = getattr(msg, 'content', msg)
+            if not isinstance(contenido, str):
+                contenido = json.dumps(contenido, ensure_ascii=False, sort_keys=True, default=str)
+            # Normalizar espacios para que diferencias de formato no generen otra clave
+            mensajes_normalizados.append([tipo, " ".join(contenido.split())])
+        
+        payload = json.dumps(
+            {
+                "provider": provider,
+                "model": model_name,
+                "temperature": round(float(temperature), 3),
+                "messages": mensajes_normalizados,
+                "config_version": config_version
+            },
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def obtener(self, clave: str) -> Optional[Dict]:
+        """
+        Obtiene una respuesta de la caché.
+        
+        Args:
+            clave: Clave generada con generar_clave
+        
+        Returns:
+            Dict con la respuesta guardada o None si no existe o expiró
+        """
+        ahora = time.time()
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT valor, creado FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+            
+            if fila is None:
+                self.misses += 1
+                return None
+            
+            valor, creado = fila
+            if ahora - creado > self.ttl_segundos:
+                self._conn.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            
+            self._conn.execute(
+                "UPDATE respuestas SET ultimo_acceso = ? WHERE clave = ?", (ahora, clave)
+            )
+            self._conn.commit()
+            self.hits += 1
+        
+        try:
+            return json.loads(valor)
+        except json.JSONDecodeError:
+            return None
+    
+    def guardar(self, clave: str, resultado: Dict):
+        """
+        Guarda una respuesta en la caché y desaloja las entradas menos usadas si hace falta.
+        
+        Args:
+            clave: Clave generada con generar_clave
+            resultado: Dict con el resultado de la llamada al LLM
+        """
+        ahora = time.time()
+        valor = json.dumps(resultado, ensure_ascii=False, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, valor, creado, ultimo_acceso) VALUES (?, ?, ?, ?)",
+                (clave, valor, ahora, ahora)
+            )
+            # Eliminar expiradas y, si se supera el tamaño, las de acceso más antiguo
+            self._conn.execute("DELETE FROM respuestas WHERE creado < ?", (ahora - self.ttl_segundos,))
+            total = self._conn.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+            if total > self.max_entradas:
+                self._conn.execute(
+                    "DELETE FROM respuestas WHERE clave IN "
+                    "(SELECT clave FROM respuestas ORDER BY ultimo_acceso ASC LIMIT ?)",
+                    (total - self.max_entradas,)
+                )
+            self._conn.commit()
+    
+    def invalidar(self, clave: str):
+        """Elimina una entrada de la caché."""
+        with self._lock:
+            self._conn.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+            self._conn.commit()
+    
+    def limpiar(self):
+        """Elimina todas las entradas de la caché."""
+        with self._lock:
+            self._conn.execute("DELETE FROM respuestas")
+            self._conn.commit()
+    
+    def get_metricas(self) -> Dict:
+        """
+        Retorna las métricas de uso de la caché.
+        
+        Returns:
+            Dict con aciertos, fallos, entradas y tasa de aciertos
+        """
+        with self._lock:
+            entradas = self._conn.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entradas": entradas,
+                "tasa_aciertos": (self.hits / total * 100) if total > 0 else 0
+            }
+
+
+# Instancia global compartida por todas las sesiones del proceso
+_response_cache_instance: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Obtiene la instancia global de la caché de respuestas.
+    
+    Se configura con las variables de entorno LLM_CACHE_HABILITADO,
+    LLM_CACHE_TTL_SEGUNDOS y LLM_CACHE_MAX_ENTRADAS.
+    
+    Returns:
+        Instancia de ResponseCache, o None si la caché está deshabilitada o no se pudo crear
+    """
+    global _response_cache_instance
+    if os.getenv("LLM_CACHE_HABILITADO", "true").lower() in ("false", "0", "no"):
+        return None
+    
+    if _response_cache_instance is None:
+        with _response_cache_lock:
+            if _response_cache_instance is None:
+                try:
+                    _response_cache_instance = ResponseCache(
+                        ttl_segundos=int(os.getenv("LLM_CACHE_TTL_SEGUNDOS", "86400")),
+                        max_entradas=int(os.getenv("LLM_CACHE_MAX_ENTRADAS", "500"))
+                    )
+                except (sqlite3.Error, OSError, ValueError):
+                    # Sin disco disponible la app sigue funcionando, solo que sin caché
+                    return None
+    return _response_cache_instance
@@ -0,0 +1,247 @@
+"""
+Módulo de reintentos de llamadas al LLM.
+Reintenta los errores transitorios (429, 5xx y timeouts) con espera exponencial
+y jitter, respetando el Retry-After del proveedor y un plazo total por llamada.
+"""
+
+import os
+import time
+import random
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.utils.logger import logger
+from app.utils.llm_errors import LLMError
+from app.utils.deadlines import Plazo
+
+
+T = TypeVar("T")
+
+
+class PoliticaReintentos:
+    """Política de reintentos de un proveedor."""
+    
+    def __init__(
+        self,
+        max_reintentos: int = 3,
+        espera_base: float = 1.0,
+        espera_maxima: float = 30.0,
+        plazo_segundos: float = 120.0
+    ):
+        """
+        Inicializa la política.
+        
+        Args:
+            max_reintentos: Reintentos después del primer intento (0 = no reintentar)
+            espera_base: Espera máxima antes del primer reintento; se duplica en cada uno
+            espera_maxima: Tope de la espera exponencial entre reintentos
+            plazo_segundos: Tiempo total máximo de la llamada, contando intentos y esperas
+        """
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.plazo_segundos = plazo_segundos
+        
+        self._lock = threading.Lock()
+        self.reintentos = 0
+        self.agotados = 0
+    
+    def calcular_espera(
+        self,
+        intento: int,
+        error: LLMError,
+        inicio: float,
+        plazo: Optional[Plazo] = None
+    ) -> Optional[float]:
+        """
+        Calcula cuánto esperar antes de reintentar tras un error.
+        
+        Usa "full jitter" (un valor al azar entre 0 y la espera exponencial) para que
+        las sesiones que fallaron a la vez no reintenten a la vez. Si el proveedor
+        indicó Retry-After, se espera al menos eso.
+        
+        Args:
+            intento: Número de intentos hechos hasta ahora (1 tras el primero)
+            error: Error del último intento
+            inicio: Momento (time.monotonic) en que empezó la llamada
+            plazo: Plazo de la acción (acota el tiempo total de los reintentos)
+        
+        Returns:
+            Segundos a esperar, o None si no se debe reintentar
+        """
+        if not getattr(error, "reintentable", False) or intento > self.max_reintentos:
+            return None
+        
+        espera = random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** (intento - 1)))
+        if getattr(error, "retry_after", None):
+            espera = max(espera, error.retry_after)
+        
+        restante = self.plazo_segundos - (time.monotonic() - inicio)
+        if plazo is not None:
+            restante = plazo.limitar(restante)
+        if espera >= restante:
+            # El reintento no alcanzaría a terminar dentro del plazo
+            with self._lock:
+                self.agotados += 1
+            return None
+        return espera
+    
+    def _registrar_reintento(self, intento: int, error: LLMError, espera: float):
+        with self._lock:
+            self.reintentos += 1
+        logger.warning(
+            f"⚠️ {type(error).__name__} en {error.provider or 'el proveedor'}"
+            f"{f' (HTTP {error.codigo})' if error.codigo else ''}: "
+            f"reintento {intento}/{self.max_reintentos} en {espera:.1f}s"
+        )
+    
+    def esperar_reintento(
+        self,
+        intento: int,
+        error: LLMError,
+        inicio: float,
+        plazo: Optional[Plazo] = None
+    ) -> bool:
+        """
+        Espera antes de reintentar, si corresponde.
+        
+        Args:
+            intento: Número de intentos hechos hasta ahora
+            error: Error del último intento
+            inicio: Momento (time.monotonic) en que empezó la llamada
+            plazo: Plazo de la acción (la espera se interrumpe si se cancela)
+        
+        Returns:
+            True si se debe reintentar, False si hay que propagar el error
+        
+        Raises:
+            CanceladoError: Si la solicitud se canceló durante la espera
+        """
+        espera = self.calcular_espera(intento, error, inicio, plazo)
+        if espera is None:
+            return False
+        self._registrar_reintento(intento, error, espera)
+        if plazo is not None:
+            plazo.dormir(espera, error.provider)
+        else:
+            time.sleep(espera)
+        return True
+    
+    async def aesperar_reintento(
+        self,
+        intento: int,
+        error: LLMError,
+        inicio: float,
+        plazo: Optional[Plazo] = None
+    ) -> bool:
+        """Versión asíncrona de `esperar_reintento`."""
+        espera = self.calcular_espera(intento, error, inicio, plazo)
+        if espera is None:
+            return False
+        self._registrar_reintento(intento, error, espera)
+        if plazo is not None:
+            await plazo.adormir(espera, error.provider)
+        else:
+            await asyncio.sleep(espera)
+        return True
+    
+    def ejecutar(self, funcion: Callable[[], T], plazo: Optional[Plazo] = None) -> T:
+        """
+        Ejecuta una llamada reintentando los errores transitorios.
+        
+        Args:
+            funcion: Función sin argumentos que hace un intento (lanza LLMError si falla)
+            plazo: Plazo de la acción (acota y permite cancelar los reintentos)
+        
+        Returns:
+            Lo que retorne el primer intento exitoso
+        
+        Raises:
+            LLMError: Si el error no es reintentable, se agotaron los reintentos o el plazo
+        """
+        inicio = time.monotonic()
+        intento = 0
+        while True:
+            intento += 1
+            try:
+                return funcion()
+            except LLMError as e:
+                if not self.esperar_reintento(intento, e, inicio, plazo):
+                    raise
+    
+    async def aejecutar(self, funcion: Callable[[], Awaitable[T]], plazo: Optional[Plazo] = None) -> T:
+        """Versión asíncrona de `ejecutar` (`funcion` retorna una corrutina por intento)."""
+        inicio = time.monotonic()
+        intento = 0
+        while True:
+            intento += 1
+            try:
+                return await funcion()
+            except LLMError as e:
+                if not await self.aesperar_reintento(intento, e, inicio, plazo):
+                    raise
+    
+    def get_metricas(self) -> Dict:
+        """Retorna los reintentos hechos y las llamadas que agotaron el plazo."""
+        with self._lock:
+            return {"reintentos": self.reintentos, "agotados": self.agotados}
+
+
+def _leer_numero(variables, por_defecto: float) -> float:
+    """Lee el primer número válido de una lista de variables de entorno."""
+    for variable in variables:
+        valor = os.getenv(variable)
+        if valor:
+            try:
+                return max(0.0, float(valor))
+            except ValueError:
+                pass
+    return por_defecto
+
+
+# Una política por proveedor, compartida por todo el proceso
+_politicas: Dict[str, PoliticaReintentos] = {}
+_politicas_lock = threading.Lock()
+
+
+def get_politica_reintentos(provider: str) -> PoliticaReintentos:
+    """
+    Obtiene la política de reintentos de un proveedor.
+    
+    Se configura con LLM_REINTENTOS, LLM_REINTENTO_ESPERA_BASE, LLM_REINTENTO_ESPERA_MAXIMA
+    y LLM_REINTENTO_PLAZO_SEGUNDOS; cada una admite el sufijo _<PROVEEDOR>.
+    
+    Args:
+        provider: Proveedor de IA
+    
+    Returns:
+        Instancia de PoliticaReintentos
+    """
+    if provider not in _politicas:
+        with _politicas_lock:
+            if provider not in _politicas:
+                sufijo = provider.upper()
+                
+                def leer(nombre: str, por_defecto: float) -> float:
+                    return _leer_numero([f"{nombre}_{sufijo}", nombre], por_defecto)
+                
+                _politicas[provider] = PoliticaReintentos(
+                    max_reintentos=int(leer("LLM_REINTENTOS", 3)),
+                    espera_base=leer("LLM_REINTENTO_ESPERA_BASE", 1.0),
+                    espera_maxima=leer("LLM_REINTENTO_ESPERA_MAXIMA", 30.0),
+                    plazo_segundos=leer("LLM_REINTENTO_PLAZO_SEGUNDOS", 120.0)
+                )
+    return _politicas[provider]
+
+
+def get_metricas_reintentos() -> Dict[str, Dict]:
+    """
+    Retorna las métricas de reintentos de cada proveedor usado hasta ahora.
+    
+    Returns:
+        Dict {proveedor: {reintentos, agotados}}
+    """
+    with _politicas_lock:
+        politicas = dict(_politicas)
+    return {provider: politica.get_metricas() for provider, politica in politicas.items()}
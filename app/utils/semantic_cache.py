@@ -0,0 +1,382 @@
+"""
+Módulo de caché semántica de respuestas del LLM.
+Reutiliza respuestas de solicitudes casi idénticas (por ejemplo, el mismo tema
+escrito con otras palabras) usando vectores locales, sin llamadas de red.
+"""
+
+import os
+import re
+import json
+import math
+import time
+import random
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+
+# Umbral mínimo de similitud (coseno) por acción para reutilizar una respuesta.
+# Corregir y resumir trabajan sobre el texto completo, por eso exigen casi igualdad.
+UMBRALES_POR_ACCION = {
+    "generar": 0.75,
+    "corregir": 0.97,
+    "resumir": 0.95
+}
+
+# Palabras que no aportan significado al tema
+_PALABRAS_VACIAS = {
+    'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'lo',
+    'de', 'del', 'a', 'al', 'en', 'por', 'para', 'con', 'sin',
+    'y', 'o', 'e', 'que', 'se', 'su', 'sus'
+}
+
+
+def _normalizar(texto: str) -> str:
+    """Pasa el texto a minúsculas y elimina tildes."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def vectorizar(texto: str, dimensiones: int = 512) -> List[float]:
+    """
+    Convierte un texto en un vector normalizado usando el truco del hashing
+    sobre palabras y trigramas de caracteres (tolera variaciones de escritura).
+    
+    Args:
+        texto: Texto a vectorizar
+        dimensiones: Tamaño del vector
+    
+    Returns:
+        Vector de longitud `dimensiones` con norma 1 (o ceros si el texto está vacío)
+    """
+    vector = [0.0] * dimensiones
+    palabras = [p for p in re.findall(r'\w+', _normalizar(texto or "")) if p not in _PALABRAS_VACIAS]
+    
+    caracteristicas = []
+    for palabra in palabras:
+        caracteristicas.append((f"p:{palabra}", 1.0))
+        relleno = f" {palabra} "
+        for i in range(len(relleno) - 2):
+            caracteristicas.append((f"c:{relleno[i:i + 3]}", 0.5))
+    
+    for caracteristica, peso in caracteristicas:
+        h = int(hashlib.md5(caracteristica.encode("utf-8")).hexdigest(), 16)
+        signo = 1.0 if (h >> 64) & 1 else -1.0
+        vector[h % dimensiones] += signo * peso
+    
+    norma = math.sqrt(sum(x * x for x in vector))
+    if norma == 0:
+        return vector
+    return [x / norma for x in vector]
+
+
+def extraer_datos_exactos(texto: str) -> FrozenSet[str]:
+    """
+    Obtiene los datos de una consulta que deben coincidir exactamente para reutilizar
+    una respuesta: cifras ("10", "2024", "3,5") y nombres propios (palabras con
+    mayúscula que no empiezan una oración).
+    
+    La similitud de vectores casi no cambia entre "Aniversario 10 años" y
+    "Aniversario 20 años", pero la respuesta de una no sirve para la otra.
+    
+    Args:
+        texto: Tema o texto de la solicitud
+    
+    Returns:
+        Conjunto de cifras y nombres propios normalizados
+    """
+    datos = set(re.findall(r'\d+(?:[.,]\d+)*', texto or ""))
+    for oracion in re.split(r'(?<=[.!?…:])\s+|\n+', texto or ""):
+        for palabra in re.findall(r'\w+', oracion)[1:]:
+            if palabra[0].isupper():
+                datos.add(_normalizar(palabra))
+    return frozenset(datos)
+
+
+def similitud_coseno(a: List[float], b: List[float]) -> float:
+    """Similitud coseno entre dos vectores ya normalizados."""
+    return sum(x * y for x, y in zip(a, b))
+
+
+class _IndiceLSH:
+    """Índice aproximado de vecinos cercanos con hiperplanos aleatorios (LSH)."""
+    
+    def __init__(self, dimensiones: int, n_tablas: int = 12, n_bits: int = 6, semilla: int = 42):
+        rng = random.Random(semilla)
+        self.planos = [
+            [[rng.gauss(0, 1) for _ in range(dimensiones)] for _ in range(n_bits)]
+            for _ in range(n_tablas)
+        ]
+        self.tablas: List[Dict[int, List[int]]] = [{} for _ in range(n_tablas)]
+    
+    def _firmas(self, vector: List[float]) -> List[int]:
+        firmas = []
+        for planos in self.planos:
+            firma = 0
+            for bit, plano in enumerate(planos):
+                if sum(p * x for p, x in zip(plano, vector)) >= 0:
+                    firma |= 1 << bit
+            firmas.append(firma)
+        return firmas
+    
+    def agregar(self, id_entrada: int, vector: List[float]):
+        for tabla, firma in zip(self.tablas, self._firmas(vector)):
+            tabla.setdefault(firma, []).append(id_entrada)
+    
+    def quitar(self, id_entrada: int, vector: List[float]):
+        for tabla, firma in zip(self.tablas, self._firmas(vector)):
+            ids = tabla.get(firma)
+            if ids and id_entrada in ids:
+                ids.remove(id_entrada)
+                if not ids:
+                    del tabla[firma]
+    
+    def candidatos(self, vector: List[float]) -> set:
+        encontrados = set()
+        for tabla, firma in zip(self.tablas, self._firmas(vector)):
+            encontrados.update(tabla.get(firma, []))
+        return encontrados
+
+
+class SemanticCache:
+    """Caché de respuestas por similitud semántica de la consulta, con expiración (TTL) y desalojo LRU."""
+    
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        ttl_segundos: int = 86400,
+        dimensiones: int = 512,
+        umbrales: Optional[Dict[str, float]] = None,
+        max_entradas: int = 500
+    ):
+        """
+        Inicializa la caché semántica.
+        
+        Args:
+            db_path: Ruta al archivo SQLite. Si es None, usa data/cache/semantica.sqlite3
+            ttl_segundos: Tiempo de vida de cada entrada en segundos
+            dimensiones: Tamaño de los vectores de la consulta
+            umbrales: Umbral de similitud por acción (por defecto UMBRALES_POR_ACCION)
+            max_entradas: Número máximo de entradas antes de desalojar las menos usadas
+        """
+        if db_path is None:
+            project_root = Path(__file__).parent.parent.parent
+            db_path = project_root / "data" / "cache" / "semantica.sqlite3"
+        
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_segundos = ttl_segundos
+        self.dimensiones = dimensiones
+        self.umbrales = {**UMBRALES_POR_ACCION, **(umbrales or {})}
+        self.max_entradas = max_entradas
+        
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=5)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entradas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ambito TEXT NOT NULL,
+                accion TEXT NOT NULL,
+                consulta TEXT NOT NULL,
+                vector TEXT NOT NULL,
+                resultado TEXT NOT NULL,
+                creado REAL NOT NULL
+            )
+            """
+        )
+        # Archivos creados antes del desalojo LRU no tienen la columna
+        columnas = {fila[1] for fila in self._conn.execute("PRAGMA table_info(entradas)")}
+        if "ultimo_acceso" not in columnas:
+            self._conn.execute("ALTER TABLE entradas ADD COLUMN ultimo_acceso REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entradas_acceso ON entradas (ultimo_acceso)")
+        self._conn.commit()
+        
+        # Índice en memoria por ámbito: {ambito: (_IndiceLSH, {id: (vector, creado, datos exactos)})}
+        self._indices: Dict[str, Tuple[_IndiceLSH, Dict[int, Tuple[List[float], float, FrozenSet[str]]]]] = {}
+        for id_entrada, ambito, consulta, vector, creado in self._conn.execute(
+            "SELECT id, ambito, consulta, vector, creado FROM entradas"
+        ).fetchall():
+            self._indexar(ambito, id_entrada, json.loads(vector), creado, extraer_datos_exactos(consulta))
+        with self._lock:
+            self._purgar(time.time())
+    
+    def _indexar(self, ambito: str, id_entrada: int, vector: List[float], creado: float, datos: FrozenSet[str]):
+        if ambito not in self._indices:
+            self._indices[ambito] = (_IndiceLSH(self.dimensiones), {})
+        indice, vectores = self._indices[ambito]
+        indice.agregar(id_entrada, vector)
+        vectores[id_entrada] = (vector, creado, datos)
+    
+    def _desindexar(self, ambito: str, id_entrada: int):
+        if ambito not in self._indices:
+            return
+        indice, vectores = self._indices[ambito]
+        guardado = vectores.pop(id_entrada, None)
+        if guardado is not None:
+            indice.quitar(id_entrada, guardado[0])
+        if not vectores:
+            del self._indices[ambito]
+    
+    def _purgar(self, ahora: float):
+        """Elimina (del archivo y del índice) las entradas expiradas y, si se supera el tamaño, las de acceso más antiguo."""
+        eliminadas = self._conn.execute(
+            "SELECT id, ambito FROM entradas WHERE creado < ?", (ahora - self.ttl_segundos,)
+        ).fetchall()
+        total = self._conn.execute("SELECT COUNT(*) FROM entradas").fetchone()[0] - len(eliminadas)
+        if total > self.max_entradas:
+            eliminadas += self._conn.execute(
+                "SELECT id, ambito FROM entradas WHERE creado >= ? ORDER BY ultimo_acceso ASC, id ASC LIMIT ?",
+                (ahora - self.ttl_segundos, total - self.max_entradas)
+            ).fetchall()
+        if not eliminadas:
+            return
+        self._conn.executemany("DELETE FROM entradas WHERE id = ?", [(id_entrada,) for id_entrada, _ in eliminadas])
+        self._conn.commit()
+        for id_entrada, ambito in eliminadas:
+            self._desindexar(ambito, id_entrada)
+    
+    def get_umbral(self, accion: str) -> float:
+        """Retorna el umbral de similitud configurado para una acción."""
+        return self.umbrales.get(accion, max(self.umbrales.values()))
+    
+    def buscar(self, ambito: str, accion: str, consulta: str) -> Optional[Dict]:
+        """
+        Busca una respuesta guardada para una consulta parecida.
+        
+        Args:
+            ambito: Identificador de la configuración (proveedor, modelo, parámetros...)
+            accion: Acción realizada (generar, corregir, resumir)
+            consulta: Tema o texto de la solicitud
+        
+        Returns:
+            Dict con 'resultado', 'similitud' y 'consulta_original', o None si no hay coincidencia
+            (las cifras y los nombres propios tienen que coincidir exactamente)
+        """
+        vector = vectorizar(consulta, self.dimensiones)
+        datos = extraer_datos_exactos(consulta)
+        umbral = self.get_umbral(accion)
+        ahora = time.time()
+        
+        with self._lock:
+            mejor_id, mejor_similitud = None, 0.0
+            if ambito in self._indices:
+                indice, vectores = self._indices[ambito]
+                for id_entrada in indice.candidatos(vector):
+                    vector_guardado, creado, datos_guardados = vectores[id_entrada]
+                    if ahora - creado > self.ttl_segundos or datos_guardados != datos:
+                        continue
+                    similitud = similitud_coseno(vector, vector_guardado)
+                    if similitud > mejor_similitud:
+                        mejor_id, mejor_similitud = id_entrada, similitud
+            
+            if mejor_id is None or mejor_similitud < umbral:
+                self.misses += 1
+                return None
+            
+            fila = self._conn.execute(
+                "SELECT consulta, resultado FROM entradas WHERE id = ?", (mejor_id,)
+            ).fetchone()
+            if fila is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entradas SET ultimo_acceso = ? WHERE id = ?", (ahora, mejor_id))
+            self._conn.commit()
+            self.hits += 1
+        
+        return {
+            "resultado": json.loads(fila[1]),
+            "similitud": round(mejor_similitud, 3),
+            "consulta_original": fila[0]
+        }
+    
+    def guardar(self, ambito: str, accion: str, consulta: str, resultado: Dict):
+        """
+        Guarda la respuesta de una consulta para reutilizarla en consultas parecidas
+        y desaloja las entradas expiradas o menos usadas si hace falta.
+        
+        Args:
+            ambito: Identificador de la configuración (proveedor, modelo, parámetros...)
+            accion: Acción realizada (generar, corregir, resumir)
+            consulta: Tema o texto de la solicitud
+            resultado: Dict con el resultado de la llamada al LLM
+        """
+        vector = vectorizar(consulta, self.dimensiones)
+        if not any(vector):
+            return
+        ahora = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO entradas (ambito, accion, consulta, vector, resultado, creado, ultimo_acceso) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    ambito,
+                    accion,
+                    consulta,
+                    json.dumps([round(x, 5) for x in vector]),
+                    json.dumps(resultado, ensure_ascii=False, default=str),
+                    ahora,
+                    ahora
+                )
+            )
+            self._conn.commit()
+            self._indexar(ambito, cursor.lastrowid, vector, ahora, extraer_datos_exactos(consulta))
+            self._purgar(ahora)
+    
+    def get_metricas(self) -> Dict:
+        """
+        Retorna las métricas de uso de la caché semántica.
+        
+        Returns:
+            Dict con aciertos, fallos, entradas y tasa de aciertos
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entradas": sum(len(vectores) for _, vectores in self._indices.values()),
+                "tasa_aciertos": (self.hits / total * 100) if total > 0 else 0
+            }
+
+
+# Instancia global compartida por todas las sesiones del proceso
+_semantic_cache_instance: Optional[SemanticCache] = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """
+    Obtiene la instancia global de la caché semántica.
+    
+    Los umbrales por acción se pueden ajustar con variables de entorno
+    LLM_CACHE_SEMANTICO_UMBRAL_GENERAR, _CORREGIR y _RESUMIR, y el tamaño
+    con LLM_CACHE_SEMANTICO_MAX_ENTRADAS.
+    
+    Returns:
+        Instancia de SemanticCache, o None si no se pudo crear
+    """
+    global _semantic_cache_instance
+    if _semantic_cache_instance is None:
+        with _semantic_cache_lock:
+            if _semantic_cache_instance is None:
+                try:
+                    umbrales = {}
+                    for accion in UMBRALES_POR_ACCION:
+                        valor = os.getenv(f"LLM_CACHE_SEMANTICO_UMBRAL_{accion.upper()}")
+                        if valor:
+                            umbrales[accion] = float(valor)
+                    _semantic_cache_instance = SemanticCache(
+                        ttl_segundos=int(os.getenv("LLM_CACHE_TTL_SEGUNDOS", "86400")),
+                        umbrales=umbrales,
+                        max_entradas=int(os.getenv("LLM_CACHE_SEMANTICO_MAX_ENTRADAS", "500"))
+                    )
+                except (sqlite3.Error, OSError, ValueError):
+                    return None
+    return _semantic_cache_instance
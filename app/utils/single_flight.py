@@ -0,0 +1,206 @@
+"""
+Módulo de llamadas compartidas (single-flight).
+Si llegan a la vez varias solicitudes idénticas (mismo proveedor, modelo,
+temperatura y mensajes), solo la primera llama al proveedor; las demás esperan
+su resultado en lugar de pagar otra llamada igual.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import CancelledError, Future, TimeoutError as FuturesTimeoutError
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from app.utils.deadlines import CanceladoError, Plazo, PlazoVencidoError
+
+
+T = TypeVar("T")
+
+# Cada cuánto revisa quien espera si su propia solicitud se canceló
+INTERVALO_REVISION_SEGUNDOS = 0.5
+
+# Errores propios de la solicitud del líder (su cancelación o su plazo): no se comparten
+_ERRORES_DEL_LIDER = (CanceladoError, PlazoVencidoError)
+
+
+class GrupoLlamadas:
+    """Llamadas en curso por clave, compartidas por hilos y tareas asyncio."""
+    
+    def __init__(self):
+        """Inicializa el grupo sin llamadas en curso."""
+        self._en_curso: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        
+        self.llamadas = 0
+        self.compartidas = 0
+    
+    def _unirse(self, clave: str) -> Tuple[Future, bool]:
+        """Retorna la llamada en curso para la clave y si quien llama debe hacerla (líder)."""
+        with self._lock:
+            futuro = self._en_curso.get(clave)
+            if futuro is not None:
+                return futuro, False
+            futuro = Future()
+            self._en_curso[clave] = futuro
+            self.llamadas += 1
+            return futuro, True
+    
+    def _terminar(self, clave: str, futuro: Future, resultado=None, error: Optional[BaseException] = None):
+        """Publica el resultado del líder a quienes esperan y libera la clave."""
+        with self._lock:
+            if self._en_curso.get(clave) is futuro:
+                del self._en_curso[clave]
+        if isinstance(error, Exception) and not isinstance(error, _ERRORES_DEL_LIDER):
+            futuro.set_exception(error)
+        elif error is not None:
+            # El líder se canceló o se le venció el plazo: quienes esperan hacen su propia llamada
+            futuro.cancel()
+        else:
+            futuro.set_result(resultado)
+    
+    def _contar_compartida(self):
+        with self._lock:
+            self.compartidas += 1
+    
+    @staticmethod
+    def _esperar(futuro: Future, plazo: Optional[Plazo], provider: str):
+        """Espera el resultado del líder sin pasar el plazo ni ignorar la cancelación de quien espera."""
+        if plazo is None:
+            return futuro.result()
+        while True:
+            plazo.verificar(provider)
+            try:
+                return futuro.result(timeout=plazo.limitar(INTERVALO_REVISION_SEGUNDOS))
+            except FuturesTimeoutError:
+                continue
+    
+    def ejecutar(
+        self,
+        clave: str,
+        funcion: Callable[[], T],
+        plazo: Optional[Plazo] = None,
+        provider: str = ""
+    ) -> Tuple[T, bool]:
+        """
+        Ejecuta la llamada o, si ya hay una idéntica en curso, espera su resultado.
+        
+        Args:
+            clave: Identifica la llamada (por ejemplo, la clave de la caché de respuestas)
+            funcion: Función sin argumentos que hace la llamada
+            plazo: Plazo de esta solicitud; acota la espera de la llamada de otra solicitud
+            provider: Proveedor (para los errores de cancelación y plazo)
+        
+        Returns:
+            Tupla (resultado, compartida): compartida es True si el resultado vino
+            de la llamada de otra solicitud
+        
+        Raises:
+            Exception: El mismo error de la llamada compartida
+            CanceladoError: Si esta solicitud se canceló mientras esperaba
+            PlazoVencidoError: Si a esta solicitud se le venció el plazo mientras esperaba
+        """
+        while True:
+            futuro, lider = self._unirse(clave)
+            if lider:
+                break
+            try:
+                resultado = self._esperar(futuro, plazo, provider)
+            except _ERRORES_DEL_LIDER:
+                # Error de esta solicitud, no de la llamada compartida
+                raise
+            except CancelledError:
+                continue
+            except Exception:
+                self._contar_compartida()
+                raise
+            self._contar_compartida()
+            return resultado, True
+        
+        try:
+            resultado = funcion()
+        except BaseException as e:
+            self._terminar(clave, futuro, error=e)
+            raise
+        self._terminar(clave, futuro, resultado)
+        return resultado, False
+    
+    async def _aesperar(self, futuro: Future, plazo: Optional[Plazo], provider: str):
+        """Versión asíncrona de `_esperar`."""
+        # shield: si se cancela esta tarea o vence su espera, la llamada compartida sigue para el resto
+        espera = asyncio.wrap_future(futuro)
+        if plazo is None:
+            return await asyncio.shield(espera)
+        while True:
+            plazo.verificar(provider)
+            try:
+                return await asyncio.wait_for(asyncio.shield(espera), plazo.limitar(INTERVALO_REVISION_SEGUNDOS))
+            except asyncio.TimeoutError:
+                continue
+    
+    async def aejecutar(
+        self,
+        clave: str,
+        funcion: Callable[[], Awaitable[T]],
+        plazo: Optional[Plazo] = None,
+        provider: str = ""
+    ) -> Tuple[T, bool]:
+        """Versión asíncrona de `ejecutar` (`funcion` retorna una corrutina)."""
+        while True:
+            futuro, lider = self._unirse(clave)
+            if lider:
+                break
+            try:
+                resultado = await self._aesperar(futuro, plazo, provider)
+            except _ERRORES_DEL_LIDER:
+                raise
+            except asyncio.CancelledError:
+                if futuro.cancelled():
+                    continue
+                raise
+            except Exception:
+                self._contar_compartida()
+                raise
+            self._contar_compartida()
+            return resultado, True
+        
+        try:
+            resultado = await funcion()
+        except BaseException as e:
+            self._terminar(clave, futuro, error=e)
+            raise
+        self._terminar(clave, futuro, resultado)
+        return resultado, False
+    
+    def get_metricas(self) -> Dict:
+        """
+        Retorna las métricas de llamadas compartidas.
+        
+        Returns:
+            Dict con llamadas (hechas al proveedor), compartidas (solicitudes que
+            esperaron otra llamada) y en_curso
+        """
+        with self._lock:
+            return {
+                "llamadas": self.llamadas,
+                "compartidas": self.compartidas,
+                "en_curso": len(self._en_curso)
+            }
+
+
+# Instancia global compartida por todas las sesiones del proceso
+_grupo_llamadas_instance: Optional[GrupoLlamadas] = None
+_grupo_llamadas_lock = threading.Lock()
+
+
+def get_grupo_llamadas() -> GrupoLlamadas:
+    """
+    Obtiene la instancia global del grupo de llamadas compartidas.
+    
+    Returns:
+        Instancia de GrupoLlamadas
+    """
+    global _grupo_llamadas_instance
+    if _grupo_llamadas_instance is None:
+        with _grupo_llamadas_lock:
+            if _grupo_llamadas_instance is None:
+                _grupo_llamadas_instance = GrupoLlamadas()
+    return _grupo_llamadas_instance
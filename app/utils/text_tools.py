@@ -4,7 +4,9 @@ Incluye funciones para contar palabras, limpiar texto, etc.
 """
 
 import re
-from typing import List, Dict
+import math
+import hashlib
+from typing import List, Dict, Tuple
 
 
 def contar_palabras(texto: str) -> int:
@@ -238,3 +240,239 @@ def generar_titulo_resumido(tema: str, max_caracteres: int = 50) -> str:
         titulo = titulo.rstrip() + "..."
     
     return titulo
+
+
+# Palabras vacías que no aportan al parecido entre oraciones
+_PALABRAS_VACIAS = {
+    'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'lo',
+    'de', 'del', 'a', 'al', 'en', 'por', 'para', 'con', 'sin',
+    'sobre', 'entre', 'hasta', 'desde', 'y', 'o', 'e', 'u', 'ni',
+    'pero', 'que', 'se', 'su', 'sus', 'es', 'son', 'como', 'más',
+    'muy', 'ya', 'si', 'no', 'nos', 'les', 'le', 'este', 'esta',
+    'estos', 'estas', 'cada', 'también', 'porque', 'cuando'
+}
+
+# Caché de referencias comprimidas: (hash del texto, max_palabras) -> texto comprimido
+_cache_referencias: Dict[tuple, str] = {}
+_MAX_CACHE_REFERENCIAS = 256
+
+
+def _palabras_significativas(oracion: str) -> List[str]:
+    """Extrae las palabras de una oración en minúsculas, sin palabras vacías."""
+    return [
+        palabra for palabra in re.findall(r'\w+', oracion.lower())
+        if palabra not in _PALABRAS_VACIAS and len(palabra) > 2
+    ]
+
+
+def _similitud_oraciones(a: List[str], b: List[str]) -> float:
+    """Similitud de TextRank: palabras compartidas normalizadas por la longitud."""
+    if len(a) < 2 or len(b) < 2:
+        return 0.0
+    comunes = len(set(a) & set(b))
+    if not comunes:
+        return 0.0
+    return comunes / (math.log(len(a)) + math.log(len(b)))
+
+
+def _ubicar_oraciones(texto: str) -> List[Tuple[int, int]]:
+    """
+    Ubica las oraciones de un texto junto con su puntuación final (".", "!", "?", "…").
+    
+    A diferencia de `extraer_oraciones`, no descarta los signos ni los saltos de línea:
+    las posiciones permiten volver a armar el texto tal como estaba escrito.
+    
+    Returns:
+        Lista de (inicio, fin) de cada oración en `texto`, sin espacios en los extremos
+    """
+    posiciones = []
+    for coincidencia in re.finditer(r'[^.!?…]+[.!?…]*', texto):
+        segmento = coincidencia.group()
+        if not re.search(r'\w', segmento):
+            continue
+        inicio = coincidencia.start() + len(segmento) - len(segmento.lstrip())
+        fin = coincidencia.end() - (len(segmento) - len(segmento.rstrip()))
+        posiciones.append((inicio, fin))
+    return posiciones
+
+
+def _unir_oraciones(texto: str, posiciones: List[Tuple[int, int]], indices: List[int]) -> str:
+    """
+    Une las oraciones elegidas en su orden original, conservando los párrafos.
+    
+    Las oraciones que estaban seguidas mantienen el separador original; entre las
+    que no, se usa un salto de párrafo si lo había en el texto omitido, o un espacio.
+    """
+    partes = []
+    anterior = None
+    for i in sorted(indices):
+        inicio, fin = posiciones[i]
+        if anterior is not None:
+            separador = texto[posiciones[anterior][1]:inicio]
+            if i != anterior + 1:
+                separador = "\n\n" if re.search(r'\n\s*\n', separador) else " "
+            partes.append(separador)
+        partes.append(texto[inicio:fin])
+        anterior = i
+    return "".join(partes)
+
+
+def resumir_extractivo(texto: str, max_palabras: int = 120, iteraciones: int = 30) -> str:
+    """
+    Reduce un texto seleccionando sus oraciones más representativas (TextRank).
+    No hace llamadas al LLM: puntúa las oraciones con un grafo de similitud y
+    conserva las mejores tal como estaban escritas (puntuación y párrafos), en su
+    orden original.
+    
+    Args:
+        texto: Texto a comprimir
+        max_palabras: Longitud objetivo aproximada en palabras
+        iteraciones: Iteraciones máximas del cálculo de puntuaciones
+    
+    Returns:
+        Texto comprimido (o el original si ya es suficientemente corto)
+    """
+    if not texto:
+        return ""
+    
+    if contar_palabras(texto) <= max_palabras:
+        return texto
+    
+    posiciones = _ubicar_oraciones(texto)
+    if len(posiciones) <= 1:
+        return truncar_texto(texto, max_palabras)
+    oraciones = [texto[inicio:fin] for inicio, fin in posiciones]
+    
+    palabras = [_palabras_significativas(o) for o in oraciones]
+    n = len(oraciones)
+    
+    # Matriz de similitud y peso total saliente de cada oración
+    pesos = [[_similitud_oraciones(palabras[i], palabras[j]) if i != j else 0.0 for j in range(n)] for i in range(n)]
+    salientes = [sum(fila) for fila in pesos]
+    
+    # PageRank con factor de amortiguación 0.85
+    amortiguacion = 0.85
+    puntuaciones = [1.0 / n] * n
+    for _ in range(iteraciones):
+        nuevas = []
+        for i in range(n):
+            rango = sum(
+                pesos[j][i] / salientes[j] * puntuaciones[j]
+                for j in range(n) if pesos[j][i] and salientes[j]
+            )
+            nuevas.append((1 - amortiguacion) / n + amortiguacion * rango)
+        convergio = max(abs(a - b) for a, b in zip(nuevas, puntuaciones)) < 1e-6
+        puntuaciones = nuevas
+        if convergio:
+            break
+    
+    # Elegir las mejores oraciones hasta completar el objetivo de palabras
+    seleccionadas = []
+    total = 0
+    for i in sorted(range(n), key=lambda k: puntuaciones[k], reverse=True):
+        longitud = contar_palabras(oraciones[i])
+        if seleccionadas and total + longitud > max_palabras:
+            continue
+        seleccionadas.append(i)
+        total += longitud
+        if total >= max_palabras:
+            break
+    
+    return _unir_oraciones(texto, posiciones, seleccionadas)
+
+
+def comprimir_referencia(texto: str, max_palabras: int = 120) -> str:
+    """
+    Comprime un texto de referencia de estilo, con caché por hash del contenido.
+    
+    Args:
+        texto: Texto de referencia
+        max_palabras: Longitud objetivo aproximada en palabras
+    
+    Returns:
+        Texto de referencia comprimido
+    """
+    if not texto:
+        return ""
+    
+    clave = (hashlib.sha256(texto.encode("utf-8")).hexdigest(), max_palabras)
+    comprimido = _cache_referencias.get(clave)
+    if comprimido is None:
+        comprimido = resumir_extractivo(texto, max_palabras)
+        if len(_cache_referencias) >= _MAX_CACHE_REFERENCIAS:
+            # Descartar la entrada más antigua (los dict conservan el orden de inserción)
+            _cache_referencias.pop(next(iter(_cache_referencias)))
+        _cache_referencias[clave] = comprimido
+    return comprimido
+
+
+def combinar_textos_referencia(*listas: List[str]) -> List[str]:
+    """
+    Une listas de textos de referencia sin repetidos, conservando el orden.
+    
+    El orden decide qué textos entran en el prefijo de estilo (ver
+    LangChainAgent._get_style_context), así que debe ser el mismo en cada ejecución
+    para que los proveedores y las cachés reconozcan el prefijo.
+    
+    Args:
+        *listas: Listas de textos, en orden de prioridad
+    
+    Returns:
+        Lista con cada texto una sola vez, en el orden en que aparece por primera vez
+    """
+    return list(dict.fromkeys(texto for lista in listas for texto in lista if texto))
+
+
+# Uno de cada N párrafos (según su contenido) cierra un fragmento que ya superó la mitad del máximo
+_DIVISOR_CORTE_FRAGMENTO = 4
+
+
+def dividir_en_fragmentos(texto: str, max_palabras: int = 1500) -> List[str]:
+    """
+    Divide un texto largo en fragmentos de hasta `max_palabras` palabras, cortando
+    entre párrafos y, si un párrafo es demasiado largo, entre oraciones.
+    
+    Los cortes dependen del contenido de cada párrafo y no solo de su posición: si se
+    edita una parte del texto, los fragmentos del resto quedan iguales (y sus
+    resúmenes parciales se pueden reutilizar desde la caché).
+    
+    Args:
+        texto: Texto a dividir
+        max_palabras: Palabras máximas por fragmento
+    
+    Returns:
+        Lista de fragmentos (vacía si el texto está vacío)
+    """
+    max_palabras = max(1, max_palabras)
+    
+    # Unidades: párrafos, o las oraciones (o trozos) de los párrafos demasiado largos
+    unidades = []
+    for parrafo in re.split(r'\n\s*\n', texto or ""):
+        parrafo = parrafo.strip()
+        if not parrafo:
+            continue
+        if contar_palabras(parrafo) <= max_palabras:
+            unidades.append(parrafo)
+            continue
+        for oracion in re.split(r'(?<=[.!?…])\s+', parrafo):
+            palabras = oracion.split()
+            for i in range(0, len(palabras), max_palabras):
+                unidades.append(" ".join(palabras[i:i + max_palabras]))
+    
+    fragmentos = []
+    actual: List[str] = []
+    palabras_actual = 0
+    for unidad in unidades:
+        longitud = contar_palabras(unidad)
+        if actual and palabras_actual + longitud > max_palabras:
+            fragmentos.append("\n\n".join(actual))
+            actual, palabras_actual = [], 0
+        actual.append(unidad)
+        palabras_actual += longitud
+        huella = int(hashlib.sha256(unidad.encode("utf-8")).hexdigest()[:8], 16)
+        if palabras_actual >= max_palabras // 2 and huella % _DIVISOR_CORTE_FRAGMENTO == 0:
+            fragmentos.append("\n\n".join(actual))
+            actual, palabras_actual = [], 0
+    if actual:
+        fragmentos.append("\n\n".join(actual))
+    return fragmentos
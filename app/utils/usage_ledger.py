@@ -0,0 +1,405 @@
+"""
+Módulo del registro de uso de las llamadas al LLM.
+Cada solicitud (generar, corregir, resumir) agrega una línea a un archivo JSONL
+mensual con el proveedor, el modelo, los tokens de entrada y salida, la latencia,
+si vino de la caché y el costo. El archivo solo crece: los resúmenes por día,
+modelo o usuario se calculan con totales por día que se actualizan leyendo solo
+las líneas nuevas desde la última lectura.
+"""
+
+import os
+import json
+import math
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.utils.logger import logger
+from app.utils.empresa_config import EMPRESA_PRINCIPAL
+
+
+# Campos por los que se pueden agrupar los resúmenes
+AGRUPACIONES = {
+    "dia": lambda registro: registro.get("fecha", "")[:10],
+    "modelo": lambda registro: f"{registro.get('proveedor', '')}/{registro.get('modelo', '')}",
+    "usuario": lambda registro: registro.get("usuario") or "anonimo",
+    "accion": lambda registro: registro.get("accion") or "-",
+    "empresa": lambda registro: registro.get("empresa") or EMPRESA_PRINCIPAL
+}
+
+# Métricas de una solicitud que se guardan junto al resultado (ver IOManager.guardar_resultado)
+CAMPOS_METRICAS = (
+    "tokens_entrada", "tokens_salida", "tokens_cache", "tokens_usados", "costo",
+    "latencia_segundos", "primer_fragmento_segundos", "cache_hit"
+)
+
+
+def extraer_metricas(resultado: Dict) -> Dict:
+    """
+    Toma del resultado del agente los tokens, el costo, la latencia y si vino de la caché.
+    
+    Args:
+        resultado: Dict de resultado del agente
+    
+    Returns:
+        Dict solo con los campos de CAMPOS_METRICAS presentes en el resultado
+    """
+    return {campo: resultado[campo] for campo in CAMPOS_METRICAS if campo in resultado}
+
+
+# Campos que se suman en los resúmenes
+CAMPOS_SUMA = ("tokens_entrada", "tokens_salida", "tokens_cache", "tokens_usados", "costo")
+
+# Archivos mensuales cuyos totales se conservan en memoria (los usados más recientemente)
+MAX_MESES_EN_MEMORIA = 3
+
+# Resúmenes (agrupación y período) que se guardan hasta que cambie el registro
+MAX_RESUMENES_GUARDADOS = 16
+
+
+def _valor_en_posicion(contador: Counter, posicion: int) -> float:
+    """Valor en la posición `posicion` (desde 0) de los valores del contador ordenados, con repeticiones."""
+    for valor in sorted(contador):
+        posicion -= contador[valor]
+        if posicion < 0:
+            return valor
+    return 0.0
+
+
+class _TotalesMes:
+    """Totales de un archivo mensual por día y grupo; se actualizan a medida que el archivo crece."""
+    
+    def __init__(self):
+        self.leidos = 0
+        # {(día, agrupación, clave): {solicitudes, ..., costo, latencias: Counter}}
+        self.grupos: Dict[Tuple[str, str, str], Dict] = {}
+        # {(día, 'proveedor/modelo'): Counter de tokens de salida por segundo}
+        self.velocidades: Dict[Tuple[str, str], Counter] = {}
+    
+    def agregar(self, registro: Dict):
+        """Suma un registro a los totales de su día."""
+        dia = registro.get("fecha", "")[:10]
+        # Las respuestas de la caché y los errores no miden al proveedor
+        del_proveedor = not registro.get("cache_hit") and "error" not in registro
+        latencia = registro.get("latencia_segundos", 0.0) or 0.0
+        
+        for por, clave_de in AGRUPACIONES.items():
+            clave = (dia, por, clave_de(registro))
+            total = self.grupos.get(clave)
+            if total is None:
+                total = self.grupos[clave] = {
+                    "solicitudes": 0,
+                    "aciertos_cache": 0,
+                    "errores": 0,
+                    **{campo: 0.0 if campo == "costo" else 0 for campo in CAMPOS_SUMA},
+                    "latencias": Counter()
+                }
+            total["solicitudes"] += 1
+            total["aciertos_cache"] += int(bool(registro.get("cache_hit")))
+            total["errores"] += int("error" in registro)
+            for campo in CAMPOS_SUMA:
+                total[campo] += registro.get(campo, 0) or 0
+            if del_proveedor:
+                total["latencias"][latencia] += 1
+        
+        if del_proveedor and registro.get("tokens_salida") and latencia:
+            modelo = AGRUPACIONES["modelo"](registro)
+            self.velocidades.setdefault((dia, modelo), Counter())[round(registro["tokens_salida"] / latencia, 1)] += 1
+
+
+class RegistroUso:
+    """Registro de uso (append-only) en archivos JSONL mensuales."""
+    
+    def __init__(self, base_dir: str = "data/uso"):
+        """
+        Inicializa el registro.
+        
+        Args:
+            base_dir: Directorio de los archivos <YYYY-MM>.jsonl
+        """
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        # {archivo: totales} para no releer todo el mes en cada resumen; en orden de uso
+        self._totales: Dict[Path, _TotalesMes] = {}
+        # {(agrupación, desde, hasta): (tamaño de los archivos, resumen)}: la barra lateral
+        # pide los mismos resúmenes en cada interacción y casi siempre no hubo cambios
+        self._resumenes: Dict[Tuple[str, Optional[str], Optional[str]], Tuple[Tuple, List[Dict]]] = {}
+    
+    def _get_archivo_mes(self, mes: Optional[str] = None) -> Path:
+        """Ruta del archivo del mes (YYYY-MM, por defecto el actual)."""
+        return self.base_dir / f"{mes or datetime.now().strftime('%Y-%m')}.jsonl"
+    
+    def registrar(
+        self,
+        accion: str,
+        provider: str,
+        model_name: str,
+        resultado: Optional[Dict] = None,
+        latencia_segundos: float = 0.0,
+        usuario: Optional[str] = None,
+        error: Optional[BaseException] = None,
+        empresa: Optional[str] = None
+    ) -> Dict:
+        """
+        Agrega una solicitud al registro.
+        
+        Args:
+            accion: Acción (generar, corregir, resumir)
+            provider: Proveedor configurado
+            model_name: Modelo configurado
+            resultado: Dict de resultado del agente (None si la solicitud falló)
+            latencia_segundos: Tiempo total de la solicitud
+            usuario: Quién hizo la solicitud
+            error: Error de la solicitud, si falló
+            empresa: Empresa con cuya configuración se hizo la solicitud (None = la principal)
+        
+        Returns:
+            El registro agregado
+        """
+        resultado = resultado or {}
+        # Si respondió un proveedor de respaldo, se registra el que respondió
+        proveedor_usado = resultado.get("proveedor_usado") or f"{provider}/{model_name}"
+        provider, _, model_name = proveedor_usado.partition("/")
+        
+        registro = {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "usuario": usuario or "anonimo",
+            "accion": accion,
+            "proveedor": provider,
+            "modelo": model_name,
+            "tokens_entrada": resultado.get("tokens_entrada", 0) or 0,
+            "tokens_salida": resultado.get("tokens_salida", 0) or 0,
+            "tokens_cache": resultado.get("tokens_cache", 0) or 0,
+            "tokens_usados": resultado.get("tokens_usados", 0) or 0,
+            "latencia_segundos": round(latencia_segundos, 3),
+            "cache_hit": bool(resultado.get("cache_hit")),
+            "costo": resultado.get("costo", 0.0) or 0.0
+        }
+        if resultado.get("primer_fragmento_segundos") is not None:
+            registro["primer_fragmento_segundos"] = resultado["primer_fragmento_segundos"]
+        if resultado.get("llamada_compartida"):
+            registro["compartida"] = True
+        if resultado.get("parcial"):
+            registro["parcial"] = True
+        if error is not None:
+            registro["error"] = type(error).__name__
+        if empresa and empresa != EMPRESA_PRINCIPAL:
+            registro["empresa"] = empresa
+        
+        linea = json.dumps(registro, ensure_ascii=False) + "\n"
+        try:
+            with self._lock:
+                with open(self._get_archivo_mes(), "a", encoding="utf-8") as f:
+                    f.write(linea)
+        except OSError as e:
+            # El registro de uso nunca debe hacer fallar la solicitud
+            logger.warning(f"⚠️ No se pudo escribir el registro de uso: {e}")
+        return registro
+    
+    @staticmethod
+    def _parsear(datos: bytes) -> Iterator[Dict]:
+        """Produce los registros de un bloque de líneas completas (ignora las que no son JSON)."""
+        for linea in datos.decode("utf-8", errors="replace").splitlines():
+            try:
+                yield json.loads(linea)
+            except json.JSONDecodeError:
+                continue
+    
+    def _archivos(self, desde: Optional[str], hasta: Optional[str]) -> List[Path]:
+        """Archivos mensuales que pueden tener registros del período."""
+        return [
+            archivo for archivo in sorted(self.base_dir.glob("*.jsonl"))
+            if not ((desde and archivo.stem < desde[:7]) or (hasta and archivo.stem > hasta[:7]))
+        ]
+    
+    @staticmethod
+    def _tamano(archivo: Path) -> int:
+        """Tamaño del archivo en bytes (-1 si no se puede leer)."""
+        try:
+            return archivo.stat().st_size
+        except OSError:
+            return -1
+    
+    def _get_totales(self, archivo: Path) -> Optional[_TotalesMes]:
+        """
+        Retorna los totales de un archivo, sumando solo lo agregado desde la última lectura
+        (con el lock tomado). Solo los MAX_MESES_EN_MEMORIA archivos usados más
+        recientemente quedan en memoria.
+        """
+        try:
+            tamano = archivo.stat().st_size
+        except OSError:
+            return None
+        
+        totales = self._totales.pop(archivo, None)
+        if totales is None or tamano < totales.leidos:
+            # Primera lectura, o el archivo se truncó o reemplazó: leerlo de nuevo
+            totales = _TotalesMes()
+        if tamano > totales.leidos:
+            with open(archivo, "rb") as f:
+                f.seek(totales.leidos)
+                nuevo = f.read()
+            # Una línea a medio escribir se deja para la próxima lectura
+            completo = nuevo[:nuevo.rfind(b"\n") + 1]
+            for registro in self._parsear(completo):
+                totales.agregar(registro)
+            totales.leidos += len(completo)
+        
+        self._totales[archivo] = totales
+        while len(self._totales) > MAX_MESES_EN_MEMORIA:
+            self._totales.pop(next(iter(self._totales)))
+        return totales
+    
+    def cargar(self, desde: Optional[str] = None, hasta: Optional[str] = None) -> List[Dict]:
+        """
+        Carga los registros de un período (lee los archivos completos; para totales usar `resumir`).
+        
+        Args:
+            desde: Fecha inicial YYYY-MM-DD (incluida). Si es None, desde el primer registro.
+            hasta: Fecha final YYYY-MM-DD (incluida). Si es None, hasta hoy.
+        
+        Returns:
+            Lista de registros en orden de llegada
+        """
+        registros = []
+        for archivo in self._archivos(desde, hasta):
+            try:
+                datos = archivo.read_bytes()
+            except OSError:
+                continue
+            for registro in self._parsear(datos[:datos.rfind(b"\n") + 1]):
+                dia = registro.get("fecha", "")[:10]
+                if (desde and dia < desde) or (hasta and dia > hasta):
+                    continue
+                registros.append(registro)
+        return registros
+    
+    def resumir(
+        self,
+        por: str = "dia",
+        desde: Optional[str] = None,
+        hasta: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Agrupa los registros y suma llamadas, tokens, costo y latencia.
+        
+        Args:
+            por: 'dia', 'modelo', 'usuario', 'accion' o 'empresa'
+            desde: Fecha inicial YYYY-MM-DD (incluida)
+            hasta: Fecha final YYYY-MM-DD (incluida)
+        
+        Returns:
+            Lista de Dict (uno por grupo, ordenados por clave) con solicitudes,
+            aciertos_cache, errores, tokens_entrada, tokens_salida, tokens_cache, tokens_usados, costo,
+            latencia_media y latencia_p95 (estas dos solo de las llamadas al proveedor)
+        
+        Raises:
+            ValueError: Si la agrupación no existe
+        """
+        if por not in AGRUPACIONES:
+            raise ValueError(f"Agrupación '{por}' no válida. Usa: {', '.join(AGRUPACIONES)}")
+        
+        archivos = self._archivos(desde, hasta)
+        firma = tuple((archivo.name, self._tamano(archivo)) for archivo in archivos)
+        clave_resumen = (por, desde, hasta)
+        guardado = self._resumenes.get(clave_resumen)
+        if guardado is not None and guardado[0] == firma:
+            return [dict(fila) for fila in guardado[1]]
+        
+        grupos: Dict[str, Dict] = {}
+        latencias: Dict[str, Counter] = {}
+        with self._lock:
+            for archivo in archivos:
+                totales = self._get_totales(archivo)
+                if totales is None:
+                    continue
+                for (dia, agrupacion, clave), total in totales.grupos.items():
+                    if agrupacion != por or (desde and dia < desde) or (hasta and dia > hasta):
+                        continue
+                    grupo = grupos.setdefault(clave, {
+                        por: clave,
+                        "solicitudes": 0,
+                        "aciertos_cache": 0,
+                        "errores": 0,
+                        **{campo: 0.0 if campo == "costo" else 0 for campo in CAMPOS_SUMA}
+                    })
+                    for campo in ("solicitudes", "aciertos_cache", "errores") + CAMPOS_SUMA:
+                        grupo[campo] += total[campo]
+                    latencias.setdefault(clave, Counter()).update(total["latencias"])
+        
+        for clave, grupo in grupos.items():
+            contador = latencias[clave]
+            cantidad = sum(contador.values())
+            grupo["latencia_media"] = sum(valor * veces for valor, veces in contador.items()) / cantidad if cantidad else 0.0
+            grupo["latencia_p95"] = _valor_en_posicion(contador, max(0, math.ceil(0.95 * cantidad) - 1)) if cantidad else 0.0
+        resumen = [grupos[clave] for clave in sorted(grupos)]
+        
+        with self._lock:
+            if len(self._resumenes) >= MAX_RESUMENES_GUARDADOS:
+                self._resumenes.pop(next(iter(self._resumenes)))
+            self._resumenes[clave_resumen] = (firma, resumen)
+        return [dict(fila) for fila in resumen]
+    
+    def mediana_velocidad(self, provider: str, model_name: str, desde: Optional[str] = None) -> Tuple[Optional[float], int]:
+        """
+        Tokens de salida por segundo (mediana) de las llamadas de un modelo al proveedor.
+        
+        Args:
+            provider: Proveedor de IA
+            model_name: Modelo
+            desde: Fecha inicial YYYY-MM-DD (incluida)
+        
+        Returns:
+            Tupla (mediana o None si no hay llamadas, número de llamadas)
+        """
+        modelo = f"{provider}/{model_name}"
+        velocidades: Counter = Counter()
+        with self._lock:
+            for archivo in self._archivos(desde, None):
+                totales = self._get_totales(archivo)
+                if totales is None:
+                    continue
+                for (dia, clave), contador in totales.velocidades.items():
+                    if clave == modelo and not (desde and dia < desde):
+                        velocidades.update(contador)
+        
+        cantidad = sum(velocidades.values())
+        if not cantidad:
+            return None, 0
+        mitad = cantidad // 2
+        if cantidad % 2:
+            return _valor_en_posicion(velocidades, mitad), cantidad
+        return (_valor_en_posicion(velocidades, mitad - 1) + _valor_en_posicion(velocidades, mitad)) / 2, cantidad
+
+
+# Instancia global compartida por todas las sesiones del proceso
+_registro_uso_instance: Optional[RegistroUso] = None
+_registro_uso_lock = threading.Lock()
+
+
+def get_registro_uso() -> Optional[RegistroUso]:
+    """
+    Obtiene la instancia global del registro de uso.
+    
+    Se desactiva con LLM_REGISTRO_USO=false; el directorio se cambia con
+    LLM_REGISTRO_USO_DIR (por defecto data/uso).
+    
+    Returns:
+        Instancia de RegistroUso, o None si está desactivado o no se pudo crear
+    """
+    global _registro_uso_instance
+    if os.getenv("LLM_REGISTRO_USO", "true").lower() in ("false", "0", "no"):
+        return None
+    if _registro_uso_instance is None:
+        with _registro_uso_lock:
+            if _registro_uso_instance is None:
+                try:
+                    _registro_uso_instance = RegistroUso(os.getenv("LLM_REGISTRO_USO_DIR", "data/uso"))
+                except OSError as e:
+                    logger.warning(f"⚠️ No se pudo crear el registro de uso: {e}")
+                    return None
+    return _registro_uso_instance
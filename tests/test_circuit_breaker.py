@@ -0,0 +1,140 @@
+"""Pruebas del cortocircuito por proveedor/modelo."""
+
+import time
+
+import pytest
+
+from app.utils.circuit_breaker import (
+    ABIERTO,
+    CERRADO,
+    SEMIABIERTO,
+    Circuito,
+    CircuitoAbiertoError,
+    cuenta_como_falla,
+)
+from app.utils.deadlines import CanceladoError
+from app.utils.llm_errors import AutenticacionError, ServicioNoDisponibleError, SolicitudInvalidaError
+from app.utils.rate_limiter import EsperaExcedidaError
+
+
+def _fallar(circuito, veces=1):
+    for _ in range(veces):
+        prueba = circuito.permitir()
+        circuito.registrar(ServicioNoDisponibleError("503"), prueba)
+
+
+def _circuito_abierto():
+    circuito = Circuito("p/m", umbral_fallas=2, ventana_segundos=60, espera_segundos=0.1)
+    _fallar(circuito, 2)
+    return circuito
+
+
+def test_cuenta_como_falla():
+    assert cuenta_como_falla(ServicioNoDisponibleError("503"))
+    assert not cuenta_como_falla(None)
+    assert not cuenta_como_falla(AutenticacionError("api key"))
+    assert not cuenta_como_falla(EsperaExcedidaError("cola llena"))
+    assert not cuenta_como_falla(CanceladoError("cancelado"))
+    assert not cuenta_como_falla(ValueError("otro"))
+
+
+def test_se_abre_al_llegar_al_umbral():
+    circuito = Circuito("p/m", umbral_fallas=3, ventana_segundos=60, espera_segundos=30)
+    _fallar(circuito, 2)
+    assert circuito.get_estado()["estado"] == CERRADO
+    
+    _fallar(circuito)
+    assert circuito.get_estado()["estado"] == ABIERTO
+    assert not circuito.disponible()
+    with pytest.raises(CircuitoAbiertoError) as error:
+        circuito.permitir("groq")
+    assert error.value.cambiar_proveedor
+    assert error.value.retry_after > 0
+    assert circuito.get_estado()["rechazadas"] == 1
+
+
+def test_fallas_fuera_de_la_ventana_no_suman():
+    circuito = Circuito("p/m", umbral_fallas=2, ventana_segundos=0.05, espera_segundos=30)
+    _fallar(circuito)
+    time.sleep(0.1)
+    _fallar(circuito)
+    assert circuito.get_estado()["estado"] == CERRADO
+
+
+def test_errores_de_la_solicitud_no_abren():
+    circuito = Circuito("p/m", umbral_fallas=1)
+    for error in (AutenticacionError("api key"), SolicitudInvalidaError("contenido"), EsperaExcedidaError("cola")):
+        circuito.registrar(error, circuito.permitir())
+    assert circuito.get_estado()["estado"] == CERRADO
+
+
+def test_semiabierto_deja_pasar_una_sola_prueba():
+    circuito = _circuito_abierto()
+    time.sleep(0.15)
+    assert circuito.disponible()
+    
+    assert circuito.permitir() is True
+    assert circuito.get_estado()["estado"] == SEMIABIERTO
+    assert not circuito.disponible()
+    # Mientras la prueba está en curso el resto se rechaza
+    with pytest.raises(CircuitoAbiertoError):
+        circuito.permitir()
+
+
+def test_prueba_exitosa_cierra():
+    circuito = _circuito_abierto()
+    time.sleep(0.15)
+    circuito.registrar(None, circuito.permitir())
+    
+    estado = circuito.get_estado()
+    assert estado["estado"] == CERRADO
+    assert estado["fallas"] == 0
+    assert circuito.permitir() is False
+
+
+def test_prueba_con_error_de_la_solicitud_cierra():
+    circuito = _circuito_abierto()
+    time.sleep(0.15)
+    # El proveedor respondió, aunque rechazó la solicitud
+    circuito.registrar(SolicitudInvalidaError("contenido"), circuito.permitir())
+    assert circuito.get_estado()["estado"] == CERRADO
+
+
+def test_prueba_fallida_reabre():
+    circuito = _circuito_abierto()
+    time.sleep(0.15)
+    _fallar(circuito)
+    
+    estado = circuito.get_estado()
+    assert estado["estado"] == ABIERTO
+    assert estado["aperturas"] == 2
+    assert estado["proxima_prueba"] > 0
+    with pytest.raises(CircuitoAbiertoError):
+        circuito.permitir()
+
+
+def test_prueba_cancelada_libera_la_prueba():
+    circuito = _circuito_abierto()
+    time.sleep(0.15)
+    circuito.registrar(CanceladoError("cancelado"), circuito.permitir())
+    
+    # Sigue semiabierto y la siguiente llamada puede ser la prueba
+    assert circuito.get_estado()["estado"] == SEMIABIERTO
+    assert circuito.permitir() is True
+
+
+def test_proteger_registra_el_resultado():
+    circuito = Circuito("p/m", umbral_fallas=2, ventana_segundos=60, espera_segundos=0.1)
+    for _ in range(2):
+        with pytest.raises(ServicioNoDisponibleError):
+            with circuito.proteger():
+                raise ServicioNoDisponibleError("503")
+    assert circuito.get_estado()["estado"] == ABIERTO
+    with pytest.raises(CircuitoAbiertoError):
+        with circuito.proteger():
+            pass
+    
+    time.sleep(0.15)
+    with circuito.proteger():
+        pass
+    assert circuito.get_estado()["estado"] == CERRADO
@@ -0,0 +1,204 @@
+"""Pruebas del limitador adaptativo de concurrencia (AIMD por proveedor)."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.utils.concurrency_limiter import (
+    LimitadorAdaptativo,
+    RESULTADO_ERROR,
+    RESULTADO_OK,
+    RESULTADO_SOBRECARGA,
+    clasificar_resultado,
+)
+from app.utils.deadlines import CanceladoError, TokenCancelacion
+from app.utils.llm_errors import AutenticacionError, LimiteTasaError, TiempoAgotadoError
+from app.utils.rate_limiter import EsperaExcedidaError
+
+
+def _llamar(limitador, resultado, latencia=0.01):
+    limitador.adquirir()
+    limitador.liberar(latencia, resultado)
+
+
+def test_clasificar_resultado():
+    assert clasificar_resultado({"respuesta": "hola"}) == RESULTADO_OK
+    assert clasificar_resultado({"error": "falló"}) == RESULTADO_ERROR
+    assert clasificar_resultado(None) == RESULTADO_ERROR
+    assert clasificar_resultado(LimiteTasaError("429")) == RESULTADO_SOBRECARGA
+    assert clasificar_resultado(TiempoAgotadoError("timeout")) == RESULTADO_SOBRECARGA
+    assert clasificar_resultado(AutenticacionError("api key")) == RESULTADO_ERROR
+
+
+def test_aumento_aditivo_hasta_el_maximo():
+    limitador = LimitadorAdaptativo(limite_inicial=2, limite_maximo=4)
+    for _ in range(3):
+        _llamar(limitador, RESULTADO_OK)
+    assert limitador.get_estado()["limite"] == 3
+    
+    for _ in range(50):
+        _llamar(limitador, RESULTADO_OK)
+    assert limitador.get_estado()["limite"] == 4
+
+
+def test_respuestas_lentas_no_aumentan_el_limite():
+    limitador = LimitadorAdaptativo(limite_inicial=2, factor_latencia=3.0)
+    _llamar(limitador, RESULTADO_OK, latencia=0.01)
+    limite = limitador.limite
+    
+    for _ in range(10):
+        _llamar(limitador, RESULTADO_OK, latencia=1.0)
+    assert limitador.limite == limite
+
+
+def test_un_solo_recorte_por_rafaga():
+    limitador = LimitadorAdaptativo(limite_inicial=8, limite_maximo=8)
+    for _ in range(8):
+        limitador.adquirir()
+    
+    # Las 8 llamadas en curso fallan juntas: el límite se reduce a la mitad una sola vez
+    for _ in range(8):
+        limitador.liberar(0.5, RESULTADO_SOBRECARGA)
+    estado = limitador.get_estado()
+    assert estado["limite"] == 4
+    assert estado["recortes"] == 1
+    assert estado["sobrecargas"] == 8
+
+
+def test_nueva_rafaga_vuelve_a_recortar():
+    limitador = LimitadorAdaptativo(limite_inicial=8, limite_maximo=8)
+    # La ventana de la ráfaga es la latencia mínima observada (20 ms)
+    _llamar(limitador, RESULTADO_OK, latencia=0.02)
+    
+    _llamar(limitador, RESULTADO_SOBRECARGA)
+    time.sleep(0.1)
+    _llamar(limitador, RESULTADO_SOBRECARGA)
+    estado = limitador.get_estado()
+    assert estado["recortes"] == 2
+    assert estado["limite"] == 2
+
+
+def test_el_limite_no_baja_del_minimo():
+    limitador = LimitadorAdaptativo(limite_inicial=4, limite_minimo=2)
+    _llamar(limitador, RESULTADO_OK, latencia=0.01)
+    for _ in range(5):
+        time.sleep(0.05)
+        _llamar(limitador, RESULTADO_SOBRECARGA)
+    assert limitador.get_estado()["limite"] == 2
+
+
+def test_espera_en_orden_y_liberar_da_lugar():
+    limitador = LimitadorAdaptativo(limite_inicial=1, limite_maximo=1)
+    limitador.adquirir()
+    
+    orden = []
+    hilos = []
+    for i in range(3):
+        hilo = threading.Thread(target=lambda i=i: (limitador.adquirir(), orden.append(i)))
+        hilo.start()
+        hilos.append(hilo)
+        time.sleep(0.02)
+    assert limitador.get_estado()["en_espera"] == 3
+    
+    for _ in range(3):
+        limitador.liberar(0.01, RESULTADO_OK)
+        time.sleep(0.05)
+    for hilo in hilos:
+        hilo.join(5)
+    
+    assert orden == [0, 1, 2]
+    assert limitador.get_estado()["en_curso"] == 1
+
+
+def test_espera_maxima():
+    limitador = LimitadorAdaptativo(limite_inicial=1, limite_maximo=1)
+    limitador.adquirir()
+    
+    with pytest.raises(EsperaExcedidaError):
+        limitador.adquirir("groq", timeout=0.1)
+    estado = limitador.get_estado()
+    assert estado["en_espera"] == 0
+    assert estado["en_curso"] == 1
+
+
+def test_espera_asincrona_y_cancelacion():
+    limitador = LimitadorAdaptativo(limite_inicial=1, limite_maximo=1)
+    
+    async def probar():
+        await limitador.aadquirir()
+        
+        # Una llamada en espera recibe el lugar cuando otra lo libera desde un hilo
+        espera = asyncio.ensure_future(limitador.aadquirir())
+        await asyncio.sleep(0.02)
+        threading.Timer(0.05, limitador.liberar, args=(0.01, RESULTADO_OK)).start()
+        await asyncio.wait_for(espera, 5)
+        
+        # Cancelar una llamada en espera la saca de la cola sin ocupar lugar
+        cancelada = asyncio.ensure_future(limitador.aadquirir())
+        await asyncio.sleep(0.02)
+        cancelada.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelada
+    
+    asyncio.run(probar())
+    estado = limitador.get_estado()
+    assert estado["en_curso"] == 1
+    assert estado["en_espera"] == 0
+
+
+def test_cancelacion_interrumpe_la_espera():
+    limitador = LimitadorAdaptativo(limite_inicial=1, limite_maximo=1)
+    limitador.adquirir()
+    
+    token = TokenCancelacion()
+    threading.Timer(0.1, token.cancelar).start()
+    inicio = time.monotonic()
+    with pytest.raises(CanceladoError):
+        limitador.adquirir("groq", timeout=10, token=token)
+    assert time.monotonic() - inicio < 1.0
+    assert limitador.get_estado()["en_espera"] == 0
+
+
+def test_cancelacion_interrumpe_la_espera_asincrona():
+    limitador = LimitadorAdaptativo(limite_inicial=1, limite_maximo=1)
+    limitador.adquirir()
+    token = TokenCancelacion()
+    
+    async def probar():
+        threading.Timer(0.1, token.cancelar).start()
+        with pytest.raises(CanceladoError):
+            await limitador.aadquirir("groq", timeout=10, token=token)
+        with pytest.raises(EsperaExcedidaError):
+            await limitador.aadquirir("groq", timeout=0.1)
+    
+    inicio = time.monotonic()
+    asyncio.run(probar())
+    assert time.monotonic() - inicio < 1.5
+    assert limitador.get_estado()["en_espera"] == 0
+
+
+def test_varios_lugares_a_la_vez():
+    limitador = LimitadorAdaptativo(limite_inicial=4, limite_maximo=4)
+    limitador.adquirir()
+    
+    # Un envío por lotes de 4 espera a que se liberen los lugares ocupados
+    ocupado = threading.Event()
+    hilo = threading.Thread(target=lambda: (limitador.adquirir(cantidad=4), ocupado.set()))
+    hilo.start()
+    time.sleep(0.05)
+    assert not ocupado.is_set()
+    # Y las llamadas que llegan después esperan detrás de él
+    with pytest.raises(EsperaExcedidaError):
+        limitador.adquirir(timeout=0.05)
+    
+    limitador.liberar(0.01, RESULTADO_OK)
+    hilo.join(5)
+    assert ocupado.is_set()
+    assert limitador.get_estado()["en_curso"] == 4
+    
+    limitador.liberar(0.01, RESULTADO_OK, cantidad=4)
+    estado = limitador.get_estado()
+    assert estado["en_curso"] == 0
+    assert estado["exitosas"] == 5
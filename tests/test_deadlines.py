@@ -0,0 +1,29 @@
+"""Pruebas de los plazos y tokens de cancelación."""
+
+from app.utils.deadlines import Plazo, TokenCancelacion
+
+
+def test_token_derivado():
+    token = TokenCancelacion()
+    derivado = token.derivar()
+    
+    # Cancelar el derivado no cancela la solicitud
+    derivado.cancelar()
+    assert derivado.cancelado
+    assert not token.cancelado
+    
+    # Cancelar la solicitud cancela sus derivados, incluso los creados después
+    otro = token.derivar()
+    token.cancelar()
+    assert otro.cancelado
+    assert token.derivar().cancelado
+
+
+def test_plazo_derivado_conserva_el_vencimiento():
+    plazo = Plazo(30)
+    derivado = plazo.derivar()
+    
+    assert derivado.vence == plazo.vence
+    assert derivado.segundos == 30
+    plazo.token.cancelar()
+    assert derivado.cancelado
@@ -0,0 +1,226 @@
+"""Pruebas de LangChainAgent con un cliente de LLM simulado (sin llamar a ningún proveedor)."""
+
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from langchain_core.messages import AIMessage
+
+from app.utils import circuit_breaker, concurrency_limiter, langchain_agent, model_pricing, rate_limiter, usage_ledger
+from app.utils.concurrency_limiter import LimitadorAdaptativo, get_limitador_concurrencia
+from app.utils.deadlines import CanceladoError, Plazo, TokenCancelacion
+from app.utils.empresa_config import get_empresa_config
+from app.utils.llm_errors import ServicioNoDisponibleError
+from app.utils.langchain_agent import LangChainAgent
+from app.utils.rate_limiter import EsperaExcedidaError, RateLimiter
+
+
+@pytest.fixture
+def agente(monkeypatch, tmp_path):
+    monkeypatch.setenv("LLM_REGISTRO_USO_DIR", str(tmp_path))
+    monkeypatch.setattr(usage_ledger, "_registro_uso_instance", None)
+    monkeypatch.setattr(concurrency_limiter, "_limitadores", {})
+    monkeypatch.setattr(circuit_breaker, "_circuitos", {})
+    monkeypatch.setattr(rate_limiter, "_rate_limiter_instance", RateLimiter(rpm_por_defecto=60, tpm_por_defecto=60000))
+    
+    agente = LangChainAgent.__new__(LangChainAgent)
+    agente.provider = "prueba"
+    agente.model_name = "modelo"
+    agente.temperature = 0.7
+    agente.reference_texts = []
+    agente._alternativos = {}
+    agente.empresa_config = get_empresa_config()
+    agente.llm = None
+    agente.usuario = "pruebas"
+    return agente
+
+
+def _cupo(agente):
+    limite = rate_limiter.get_rate_limiter()._get_limite(agente.provider, agente.model_name)
+    return limite.solicitudes.disponible, limite.tokens.disponible
+
+
+def _limitador_ocupado() -> LimitadorAdaptativo:
+    limitador = LimitadorAdaptativo(limite_inicial=1, limite_maximo=1, max_espera_segundos=60)
+    limitador.adquirir()
+    return limitador
+
+
+def test_espera_de_lugar_acotada_por_el_plazo_devuelve_el_turno(agente):
+    limitador = _limitador_ocupado()
+    mensajes = agente._mensajes_con_prefijo("Eres un asistente.", "Hola")
+    plazo = Plazo(0.3)
+    
+    antes = _cupo(agente)
+    tokens_estimados = agente._esperar_turno([mensajes], plazo)
+    inicio = time.monotonic()
+    with pytest.raises(EsperaExcedidaError):
+        agente._ocupar_lugar(limitador, tokens_estimados, plazo)
+    
+    # Se esperó lo que quedaba del plazo, no los 60 segundos del limitador
+    assert time.monotonic() - inicio < 1.0
+    # El turno tomado en el limitador de tasa no se usó: se devuelve
+    assert _cupo(agente) == antes
+
+
+def test_cancelar_interrumpe_la_espera_de_lugar(agente):
+    limitador = _limitador_ocupado()
+    token = TokenCancelacion()
+    plazo = Plazo(30, token)
+    
+    token.cancelar()
+    with pytest.raises(CanceladoError):
+        agente._ocupar_lugar(limitador, 0, plazo)
+    assert limitador.get_estado()["en_espera"] == 0
+    
+    plazo = Plazo(30, TokenCancelacion())
+    threading.Timer(0.1, plazo.token.cancelar).start()
+    inicio = time.monotonic()
+    with pytest.raises(CanceladoError):
+        agente._ocupar_lugar(limitador, 0, plazo)
+    assert time.monotonic() - inicio < 1.0
+
+
+_SCRIPT_PREFIJO = """
+from app.utils.empresa_config import get_empresa_config
+from app.utils.langchain_agent import LangChainAgent
+from app.utils.text_tools import combinar_textos_referencia
+
+agente = LangChainAgent.__new__(LangChainAgent)
+agente.empresa_config = get_empresa_config()
+agente._alternativos = {}
+agente.set_reference_texts(combinar_textos_referencia(
+    [f"Texto guardado número {i}. Tiene varias oraciones de ejemplo." for i in range(6)],
+    ["Texto guardado número 2. Tiene varias oraciones de ejemplo.", "Texto aprobado por el equipo."]
+))
+print(agente._mensajes_con_prefijo("Eres un asistente.", "Tema")[0].content)
+"""
+
+
+def test_prefijo_identico_entre_procesos():
+    # El orden de un set cambia con PYTHONHASHSEED; el prefijo no debe cambiar
+    prefijos = set()
+    for semilla in ("1", "2", "3"):
+        entorno = dict(os.environ, PYTHONHASHSEED=semilla)
+        salida = subprocess.run(
+            [sys.executable, "-c", _SCRIPT_PREFIJO],
+            capture_output=True, text=True, env=entorno, check=True,
+            cwd=Path(__file__).resolve().parent.parent
+        )
+        prefijos.add(salida.stdout)
+    assert len(prefijos) == 1
+    assert "Texto guardado número 0" in prefijos.pop()
+
+
+def test_estimar_resumen_por_fragmentos_busca_la_velocidad_una_vez(agente, monkeypatch):
+    consultas = []
+    monkeypatch.setattr(
+        langchain_agent, "velocidad_observada",
+        lambda provider, model_name: consultas.append(model_name) or 100.0
+    )
+    monkeypatch.setattr(model_pricing, "velocidad_observada", lambda *args: pytest.fail("se buscó otra vez"))
+    texto = "\n\n".join(f"Párrafo {i}. " + "palabra " * 300 for i in range(20))
+    
+    estimacion = agente.estimar_solicitud("resumir", texto, 150)
+    assert estimacion["fragmentos"] > 1
+    assert consultas == ["modelo"]
+
+
+class _ClienteLote:
+    """Cliente que responde por lotes; anota cuántos lugares estaban ocupados al llamarlo."""
+    
+    def __init__(self, respuestas):
+        self.respuestas = respuestas
+        self.en_curso = []
+    
+    def batch(self, lote, config=None, return_exceptions=False):
+        self.en_curso.append(get_limitador_concurrencia("prueba").get_estado()["en_curso"])
+        return self.respuestas[:len(lote)]
+
+
+def test_porcion_del_lote_ocupa_lugares_e_informa_sobrecargas(agente):
+    limitador = get_limitador_concurrencia("prueba")
+    limite_inicial = limitador.get_estado()["limite"]
+    agente.llm = _ClienteLote([AIMessage(content="ok")] * 2 + [Exception("429 Too Many Requests")] * 4)
+    resultados, pendientes = agente._iniciar_lote([{"tema": f"tema {i}"} for i in range(6)], False)
+    
+    reintentables = agente._enviar_porcion_lote(
+        resultados, pendientes, None, circuit_breaker.get_circuito("prueba", "modelo")
+    )
+    
+    # El envío ocupó un lugar por llamada simultánea y los liberó al terminar
+    assert agente.llm.en_curso == [min(6, limite_inicial)]
+    estado = limitador.get_estado()
+    assert estado["en_curso"] == 0
+    # Los 429 del lote reducen el límite (una sola vez) como los de las llamadas sueltas
+    assert estado["recortes"] == 1
+    assert estado["limite"] == limite_inicial // 2
+    assert len(reintentables) == 4
+
+
+def _texto_largo():
+    parrafos = [f"Párrafo {i}. " + "palabra " * 40 for i in range(8)]
+    parrafos[0] = "FALLA. " + parrafos[0]
+    return "\n\n".join(parrafos)
+
+
+def _fragmento_falla(messages) -> bool:
+    return "FALLA" in messages[-1].content
+
+
+def test_fragmento_fallido_cancela_los_demas(agente, monkeypatch):
+    cortados = []
+    
+    def invocar(messages, usar_cache=True, plazo=None, accion=""):
+        if _fragmento_falla(messages):
+            raise ServicioNoDisponibleError("503")
+        # Los demás fragmentos tardan hasta que se los cancela
+        if plazo.token.esperar(5):
+            cortados.append(1)
+        return {"texto": "parcial"}
+    
+    monkeypatch.setattr(agente, "_invoke_llm", invocar)
+    plazo = Plazo(30)
+    inicio = time.monotonic()
+    with pytest.raises(ServicioNoDisponibleError):
+        agente._agotar(agente._resumir_fragmentos(_texto_largo(), 50, "", plazo))
+    
+    assert time.monotonic() - inicio < 2.0
+    time.sleep(0.1)
+    assert cortados
+    # La solicitud en sí no quedó cancelada
+    assert not plazo.cancelado
+
+
+def test_fragmento_fallido_cancela_los_demas_asincrono(agente, monkeypatch):
+    terminados = []
+    
+    async def ainvocar(messages, usar_cache=True, timeout=None, plazo=None, accion=""):
+        if _fragmento_falla(messages):
+            await asyncio.sleep(0.05)
+            raise ServicioNoDisponibleError("503")
+        await asyncio.sleep(5)
+        terminados.append(1)
+        return {"texto": "parcial"}
+    
+    monkeypatch.setattr(agente, "_ainvoke_llm", ainvocar)
+    plazo = Plazo(30)
+    
+    async def probar():
+        with pytest.raises(ServicioNoDisponibleError):
+            await agente._aresumir_fragmentos(_texto_largo(), 50, "", plazo)
+        await asyncio.sleep(0.1)
+        return [tarea for tarea in asyncio.all_tasks() if tarea is not asyncio.current_task()]
+    
+    inicio = time.monotonic()
+    pendientes = asyncio.run(probar())
+    assert time.monotonic() - inicio < 2.0
+    assert not pendientes
+    assert not terminados
+    assert not plazo.cancelado
@@ -0,0 +1,52 @@
+"""Pruebas de la estimación de costo y latencia de las solicitudes."""
+
+import pytest
+
+from app.utils import model_pricing
+from app.utils.model_pricing import estimar_solicitud, velocidad_observada
+
+
+class _RegistroFalso:
+    """Registro de uso que cuenta cuántas veces se le pide la velocidad."""
+    
+    def __init__(self, velocidad, muestras):
+        self.respuesta = (velocidad, muestras)
+        self.consultas = 0
+    
+    def mediana_velocidad(self, provider, model_name, desde=None):
+        self.consultas += 1
+        return self.respuesta
+
+
+@pytest.fixture
+def registro(monkeypatch):
+    registro = _RegistroFalso(100.0, 10)
+    monkeypatch.setattr(model_pricing, "get_registro_uso", lambda: registro)
+    monkeypatch.setattr(model_pricing, "_velocidades", {})
+    return registro
+
+
+def test_velocidad_observada_se_reutiliza(registro, monkeypatch):
+    assert velocidad_observada("groq", "m") == 100.0
+    assert velocidad_observada("groq", "m") == 100.0
+    assert registro.consultas == 1
+    
+    # Vencida la vigencia se vuelve a consultar el registro
+    monkeypatch.setattr(model_pricing, "VIGENCIA_VELOCIDAD_SEGUNDOS", 0.0)
+    velocidad_observada("groq", "m")
+    assert registro.consultas == 2
+
+
+def test_pocas_muestras_usan_el_catalogo(registro):
+    registro.respuesta = (100.0, model_pricing.MUESTRAS_MINIMAS_LATENCIA - 1)
+    assert velocidad_observada("groq", "m") is None
+    
+    info = model_pricing.get_info_modelo("groq", "m")
+    estimacion = estimar_solicitud("groq", "m", ["hola"], 100)
+    assert estimacion["latencia_segundos"] == pytest.approx(info["primer_token"] + 100 / info["tokens_por_segundo"])
+
+
+def test_velocidad_indicada_no_consulta_el_registro(registro):
+    estimacion = estimar_solicitud("groq", "m", ["hola"], 100, velocidad=50.0)
+    assert estimacion["latencia_segundos"] == pytest.approx(2.0)
+    assert registro.consultas == 0
@@ -0,0 +1,97 @@
+"""Pruebas del limitador de tasa (cubetas de tokens por proveedor y modelo)."""
+
+import threading
+import time
+
+import pytest
+
+from app.utils.deadlines import CanceladoError, TokenCancelacion
+from app.utils.rate_limiter import EsperaExcedidaError, RateLimiter
+
+
+def test_cubeta_llena_no_espera_y_luego_se_recarga():
+    limitador = RateLimiter(rpm_por_defecto=600)
+    assert limitador.adquirir("p", "m", solicitudes=600) < 0.05
+    
+    # Vacía: la siguiente espera ~0.1 s (600 por minuto = 10 por segundo)
+    esperado = limitador.adquirir("p", "m")
+    assert 0.05 < esperado < 0.5
+
+
+def test_sin_limite_no_espera():
+    limitador = RateLimiter(rpm_por_defecto=0)
+    assert limitador.adquirir("p", "m", solicitudes=10000) == 0.0
+    assert limitador.get_capacidad("p", "m") == (0, 0)
+
+
+def test_lote_mayor_que_la_capacidad_se_cobra_completo():
+    limitador = RateLimiter(rpm_por_defecto=60)
+    limitador.adquirir("p", "m", solicitudes=200)
+    
+    # Quedaron 140 solicitudes de deuda: no hay turno en los próximos segundos
+    with pytest.raises(EsperaExcedidaError):
+        limitador.adquirir("p", "m", max_espera=5)
+    assert limitador.get_capacidad("p", "m") == (60, 0)
+
+
+def test_orden_de_llegada():
+    limitador = RateLimiter(rpm_por_defecto=600)
+    limitador.adquirir("p", "m", solicitudes=600)
+    
+    orden = []
+    hilos = []
+    for i in range(5):
+        hilo = threading.Thread(target=lambda i=i: (limitador.adquirir("p", "m"), orden.append(i)))
+        hilo.start()
+        hilos.append(hilo)
+        time.sleep(0.02)
+    for hilo in hilos:
+        hilo.join(5)
+    
+    assert orden == list(range(5))
+    assert limitador.get_metricas()["p/m"]["max_cola"] >= 2
+
+
+def test_espera_maxima():
+    limitador = RateLimiter(rpm_por_defecto=60)
+    limitador.adquirir("p", "m", solicitudes=60)
+    
+    inicio = time.monotonic()
+    with pytest.raises(EsperaExcedidaError):
+        limitador.adquirir("p", "m", max_espera=0.2)
+    assert time.monotonic() - inicio < 0.2
+    assert limitador.get_metricas()["p/m"]["rechazadas"] == 1
+
+
+def test_cancelacion_interrumpe_la_espera():
+    limitador = RateLimiter(rpm_por_defecto=60)
+    limitador.adquirir("p", "m", solicitudes=60)
+    
+    token = TokenCancelacion()
+    threading.Timer(0.1, token.cancelar).start()
+    inicio = time.monotonic()
+    with pytest.raises(CanceladoError):
+        limitador.adquirir("p", "m", max_espera=10, token=token)
+    assert time.monotonic() - inicio < 1.0
+    # La solicitud cancelada deja la cola
+    assert limitador.get_metricas()["p/m"]["en_cola"] == 0
+
+
+def test_ajuste_de_tokens_reales():
+    limitador = RateLimiter(rpm_por_defecto=0, tpm_por_defecto=6000)
+    limitador.adquirir("p", "m", tokens=1000)
+    
+    # La llamada usó 5000 tokens más de lo estimado: la cubeta queda en 0
+    limitador.ajustar_tokens("p", "m", tokens_estimados=1000, tokens_reales=6000)
+    esperado = limitador.adquirir("p", "m", tokens=100, max_espera=5)
+    assert esperado > 0.5
+
+
+def test_limites_por_proveedor_y_modelo(monkeypatch):
+    monkeypatch.setenv("LLM_RPM_GROQ", "10")
+    monkeypatch.setenv("LLM_RPM_GROQ_LLAMA_3_1_8B", "20")
+    limitador = RateLimiter(rpm_por_defecto=30)
+    
+    assert limitador.get_capacidad("groq", "llama-3.1-8b")[0] == 20
+    assert limitador.get_capacidad("groq", "otro")[0] == 10
+    assert limitador.get_capacidad("openai", "gpt-4o-mini")[0] == 30
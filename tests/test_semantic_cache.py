@@ -0,0 +1,76 @@
+"""Pruebas de la caché semántica."""
+
+import time
+
+import pytest
+
+from app.utils.semantic_cache import SemanticCache, extraer_datos_exactos, similitud_coseno, vectorizar
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SemanticCache(db_path=str(tmp_path / "semantica.sqlite3"))
+
+
+def test_reutiliza_una_consulta_parecida(cache):
+    cache.guardar("a", "generar", "Lanzamiento del nuevo producto de ahorro", {"texto": "uno"})
+    
+    encontrado = cache.buscar("a", "generar", "lanzamiento nuevo producto ahorro")
+    assert encontrado is not None
+    assert encontrado["resultado"] == {"texto": "uno"}
+    assert cache.buscar("otro ambito", "generar", "lanzamiento nuevo producto ahorro") is None
+
+
+@pytest.mark.parametrize("guardada, consulta", [
+    ("Aniversario 10 años", "Aniversario 20 años"),
+    ("Resultados del trimestre 2023", "Resultados del trimestre 2024"),
+    ("Descuento de 3,5% en créditos", "Descuento de 4,5% en créditos")
+])
+def test_cifras_distintas_no_reutilizan(cache, guardada, consulta):
+    # Los vectores son casi iguales: solo la cifra los distingue
+    assert similitud_coseno(vectorizar(guardada), vectorizar(consulta)) > cache.get_umbral("generar")
+    
+    cache.guardar("a", "generar", guardada, {"texto": guardada})
+    assert cache.buscar("a", "generar", consulta) is None
+    assert cache.buscar("a", "generar", guardada) is not None
+
+
+def test_nombres_propios_distintos_no_reutilizan(cache):
+    cache.guardar("a", "generar", "Inauguración de la sucursal en Santiago", {"texto": "uno"})
+    assert cache.buscar("a", "generar", "Inauguración de la sucursal en Valparaíso") is None
+
+
+def test_datos_exactos():
+    assert extraer_datos_exactos("Aniversario 10 años de Banco Sur. Gracias a Todos") == {
+        "10", "banco", "sur", "todos"
+    }
+    assert extraer_datos_exactos("tema sin datos") == frozenset()
+
+
+def test_desalojo_lru(tmp_path):
+    cache = SemanticCache(db_path=str(tmp_path / "semantica.sqlite3"), max_entradas=2)
+    cache.guardar("a", "generar", "campaña de verano para jóvenes", {"texto": "uno"})
+    time.sleep(0.01)
+    cache.guardar("a", "generar", "reunión anual de accionistas", {"texto": "dos"})
+    time.sleep(0.01)
+    # Usar la primera: la menos usada pasa a ser la segunda
+    assert cache.buscar("a", "generar", "campaña de verano para jóvenes") is not None
+    time.sleep(0.01)
+    cache.guardar("a", "generar", "nueva política de teletrabajo", {"texto": "tres"})
+    
+    assert cache.get_metricas()["entradas"] == 2
+    assert cache.buscar("a", "generar", "reunión anual de accionistas") is None
+    assert cache.buscar("a", "generar", "campaña de verano para jóvenes") is not None
+
+
+def test_expiradas_se_purgan_del_archivo_y_del_indice(tmp_path):
+    ruta = str(tmp_path / "semantica.sqlite3")
+    cache = SemanticCache(db_path=ruta, ttl_segundos=1)
+    cache.guardar("a", "generar", "campaña de verano para jóvenes", {"texto": "uno"})
+    time.sleep(1.1)
+    cache.guardar("b", "generar", "reunión anual de accionistas", {"texto": "dos"})
+    
+    assert "a" not in cache._indices
+    assert cache.get_metricas()["entradas"] == 1
+    # Al reabrir el archivo solo queda la entrada vigente
+    assert SemanticCache(db_path=ruta, ttl_segundos=1).get_metricas()["entradas"] == 1
@@ -0,0 +1,146 @@
+"""Pruebas de las llamadas compartidas (single-flight)."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.utils.deadlines import CanceladoError, Plazo, PlazoVencidoError, TokenCancelacion
+from app.utils.llm_errors import ServicioNoDisponibleError
+from app.utils.single_flight import GrupoLlamadas
+
+
+def _lider_en_curso(grupo: GrupoLlamadas, clave: str, funcion):
+    """Arranca un líder en otro hilo y espera a que tome la clave."""
+    resultado = {}
+    
+    def correr():
+        try:
+            resultado["valor"] = grupo.ejecutar(clave, funcion)
+        except BaseException as e:
+            resultado["error"] = e
+    
+    hilo = threading.Thread(target=correr)
+    hilo.start()
+    while not grupo.get_metricas()["en_curso"]:
+        time.sleep(0.01)
+    return hilo, resultado
+
+
+def test_seguidor_recibe_el_resultado_del_lider():
+    grupo = GrupoLlamadas()
+    liberar = threading.Event()
+    hilo, lider = _lider_en_curso(grupo, "k", lambda: liberar.wait(2) and "texto")
+    
+    seguidor = {}
+    hilo_seguidor = threading.Thread(target=lambda: seguidor.update(valor=grupo.ejecutar("k", lambda: "otro")))
+    hilo_seguidor.start()
+    time.sleep(0.05)
+    liberar.set()
+    hilo.join(2)
+    hilo_seguidor.join(2)
+    
+    assert lider["valor"] == ("texto", False)
+    assert seguidor["valor"] == ("texto", True)
+    assert grupo.get_metricas() == {"llamadas": 1, "compartidas": 1, "en_curso": 0}
+
+
+def test_error_del_proveedor_se_comparte():
+    grupo = GrupoLlamadas()
+    liberar = threading.Event()
+    
+    def fallar():
+        liberar.wait(2)
+        raise ServicioNoDisponibleError("caído")
+    
+    hilo, lider = _lider_en_curso(grupo, "k", fallar)
+    seguidor = {}
+    
+    def esperar():
+        try:
+            grupo.ejecutar("k", lambda: "otro")
+        except ServicioNoDisponibleError as e:
+            seguidor["error"] = e
+    
+    hilo_seguidor = threading.Thread(target=esperar)
+    hilo_seguidor.start()
+    time.sleep(0.05)
+    liberar.set()
+    hilo.join(2)
+    hilo_seguidor.join(2)
+    
+    assert seguidor["error"] is lider["error"]
+    assert grupo.get_metricas()["llamadas"] == 1
+
+
+@pytest.mark.parametrize("error", [CanceladoError("cancelado"), PlazoVencidoError("vencido")])
+def test_cancelacion_del_lider_no_se_comparte(error):
+    grupo = GrupoLlamadas()
+    liberar = threading.Event()
+    
+    def cancelar():
+        liberar.wait(2)
+        raise error
+    
+    hilo, lider = _lider_en_curso(grupo, "k", cancelar)
+    seguidor = {}
+    hilo_seguidor = threading.Thread(target=lambda: seguidor.update(valor=grupo.ejecutar("k", lambda: "propio")))
+    hilo_seguidor.start()
+    time.sleep(0.05)
+    liberar.set()
+    hilo.join(2)
+    hilo_seguidor.join(2)
+    
+    assert lider["error"] is error
+    # El seguidor hace su propia llamada en lugar de recibir el error del líder
+    assert seguidor["valor"] == ("propio", False)
+
+
+def test_seguidor_respeta_su_plazo():
+    grupo = GrupoLlamadas()
+    liberar = threading.Event()
+    hilo, _ = _lider_en_curso(grupo, "k", lambda: liberar.wait(5) and "tarde")
+    
+    inicio = time.monotonic()
+    with pytest.raises(PlazoVencidoError):
+        grupo.ejecutar("k", lambda: "otro", plazo=Plazo(0.2))
+    assert time.monotonic() - inicio < 1.5
+    
+    liberar.set()
+    hilo.join(2)
+    assert grupo.get_metricas()["compartidas"] == 0
+
+
+def test_seguidor_se_puede_cancelar():
+    grupo = GrupoLlamadas()
+    liberar = threading.Event()
+    hilo, _ = _lider_en_curso(grupo, "k", lambda: liberar.wait(5) and "tarde")
+    
+    token = TokenCancelacion()
+    threading.Timer(0.1, token.cancelar).start()
+    with pytest.raises(CanceladoError):
+        grupo.ejecutar("k", lambda: "otro", plazo=Plazo(10, token))
+    
+    liberar.set()
+    hilo.join(2)
+
+
+def test_aejecutar_comparte_y_respeta_el_plazo():
+    grupo = GrupoLlamadas()
+    
+    async def lento():
+        await asyncio.sleep(0.3)
+        return "texto"
+    
+    async def escenario():
+        lider = asyncio.create_task(grupo.aejecutar("k", lento))
+        await asyncio.sleep(0.05)
+        seguidor = asyncio.create_task(grupo.aejecutar("k", lento))
+        with pytest.raises(PlazoVencidoError):
+            await grupo.aejecutar("k", lento, plazo=Plazo(0.1))
+        return await lider, await seguidor
+    
+    lider, seguidor = asyncio.run(escenario())
+    assert lider == ("texto", False)
+    assert seguidor == ("texto", True)
@@ -0,0 +1,57 @@
+"""Pruebas de las herramientas de texto."""
+
+from app.utils.text_tools import (
+    combinar_textos_referencia,
+    contar_palabras,
+    dividir_en_fragmentos,
+    resumir_extractivo,
+)
+
+
+TEXTO = """¿Qué celebramos hoy? ¡Diez años junto a nuestros clientes! Nuestro banco creció con ustedes.
+
+Gracias a cada cliente por su confianza. Seguiremos innovando en productos digitales para los clientes… Y también en atención presencial para los clientes del banco.
+
+Atentamente,
+El equipo del banco."""
+
+
+def test_resumen_extractivo_conserva_puntuacion_y_parrafos():
+    resumen = resumir_extractivo(TEXTO, max_palabras=30)
+    
+    assert contar_palabras(resumen) < contar_palabras(TEXTO)
+    assert "¿Qué celebramos hoy?" in resumen
+    assert "¡Diez años junto a nuestros clientes!" in resumen
+    # Los párrafos del original se mantienen y no se agregan puntos
+    assert "\n\n" in resumen
+    assert ".." not in resumen and "?." not in resumen and "!." not in resumen
+
+
+def test_resumen_extractivo_texto_corto_no_cambia():
+    assert resumir_extractivo("Hola. ¿Cómo estás?", max_palabras=30) == "Hola. ¿Cómo estás?"
+
+
+def test_fragmentos_respetan_el_maximo_y_el_contenido():
+    parrafos = [" ".join(f"palabra{i}_{j}" for j in range(80)) + "." for i in range(20)]
+    texto = "\n\n".join(parrafos)
+    fragmentos = dividir_en_fragmentos(texto, max_palabras=300)
+    
+    assert all(contar_palabras(fragmento) <= 300 for fragmento in fragmentos)
+    assert "\n\n".join(fragmentos) == texto
+
+
+def test_fragmentos_no_cambian_fuera_de_la_edicion():
+    parrafos = [" ".join(f"palabra{i}_{j}" for j in range(80)) + "." for i in range(40)]
+    antes = dividir_en_fragmentos("\n\n".join(parrafos), max_palabras=300)
+    parrafos[20] = "Cambio. " + parrafos[20]
+    despues = dividir_en_fragmentos("\n\n".join(parrafos), max_palabras=300)
+    
+    # Solo cambian los fragmentos cercanos al párrafo editado
+    assert len(set(antes) & set(despues)) >= len(antes) - 3
+
+
+def test_combinar_textos_referencia_conserva_el_orden():
+    guardados = ["Texto C", "Texto A", "Texto B"]
+    aprobados = ["Texto A", "Texto D", ""]
+    
+    assert combinar_textos_referencia(guardados, aprobados) == ["Texto C", "Texto A", "Texto B", "Texto D"]
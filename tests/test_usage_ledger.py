@@ -0,0 +1,108 @@
+"""Pruebas del registro de uso (archivos JSONL mensuales y sus resúmenes)."""
+
+import json
+
+import pytest
+
+from app.utils import usage_ledger
+from app.utils.usage_ledger import RegistroUso
+
+
+def _escribir(registro_uso, mes, registros, extra=""):
+    with open(registro_uso.base_dir / f"{mes}.jsonl", "a", encoding="utf-8") as f:
+        for registro in registros:
+            f.write(json.dumps(registro) + "\n")
+        f.write(extra)
+
+
+def _registro(fecha, latencia=1.0, tokens_salida=100, **campos):
+    return {
+        "fecha": f"{fecha}T10:00:00", "usuario": "ana", "accion": "generar", "proveedor": "groq",
+        "modelo": "m", "tokens_entrada": 10, "tokens_salida": tokens_salida, "tokens_cache": 0,
+        "tokens_usados": 10 + tokens_salida, "latencia_segundos": latencia, "cache_hit": False,
+        "costo": 0.5, **campos
+    }
+
+
+def test_resumen_por_dia_y_grupo(tmp_path):
+    registro_uso = RegistroUso(str(tmp_path))
+    _escribir(registro_uso, "2026-10", [
+        _registro("2026-10-01", latencia=1.0),
+        _registro("2026-10-01", latencia=3.0, usuario="bob"),
+        _registro("2026-10-02", latencia=0.0, cache_hit=True),
+        _registro("2026-10-02", latencia=9.0, error="TiempoAgotadoError")
+    ])
+    
+    dias = registro_uso.resumir("dia")
+    assert [fila["dia"] for fila in dias] == ["2026-10-01", "2026-10-02"]
+    assert dias[0]["solicitudes"] == 2
+    assert dias[0]["costo"] == pytest.approx(1.0)
+    assert dias[0]["latencia_media"] == pytest.approx(2.0)
+    assert dias[0]["latencia_p95"] == 3.0
+    # Ni la caché ni los errores cuentan para la latencia
+    assert dias[1]["aciertos_cache"] == 1
+    assert dias[1]["errores"] == 1
+    assert dias[1]["latencia_media"] == 0.0
+    
+    usuarios = registro_uso.resumir("usuario", desde="2026-10-01", hasta="2026-10-01")
+    assert [(fila["usuario"], fila["solicitudes"]) for fila in usuarios] == [("ana", 1), ("bob", 1)]
+    with pytest.raises(ValueError):
+        registro_uso.resumir("mes")
+
+
+def test_lee_solo_lo_nuevo_y_deja_lineas_incompletas(tmp_path):
+    registro_uso = RegistroUso(str(tmp_path))
+    _escribir(registro_uso, "2026-10", [_registro("2026-10-01")], extra='{"fecha": "2026-10-01T1')
+    assert registro_uso.resumir("dia")[0]["solicitudes"] == 1
+    
+    # Se completa la línea a medio escribir y se agrega otra
+    _escribir(registro_uso, "2026-10", [], extra='1:00:00", "costo": 1.0}\n')
+    _escribir(registro_uso, "2026-10", [_registro("2026-10-01")])
+    assert registro_uso.resumir("dia")[0]["solicitudes"] == 3
+    
+    # Un archivo reemplazado por uno más corto se vuelve a leer
+    (tmp_path / "2026-10.jsonl").write_text(json.dumps(_registro("2026-10-05")) + "\n", encoding="utf-8")
+    assert [(fila["dia"], fila["solicitudes"]) for fila in registro_uso.resumir("dia")] == [("2026-10-05", 1)]
+
+
+def test_solo_algunos_meses_en_memoria(tmp_path, monkeypatch):
+    monkeypatch.setattr(usage_ledger, "MAX_MESES_EN_MEMORIA", 2)
+    registro_uso = RegistroUso(str(tmp_path))
+    for mes in ("2026-06", "2026-07", "2026-08", "2026-09", "2026-10"):
+        _escribir(registro_uso, mes, [_registro(f"{mes}-15")])
+    
+    assert len(registro_uso.resumir("dia")) == 5
+    assert [archivo.stem for archivo in registro_uso._totales] == ["2026-09", "2026-10"]
+    # Un mes descartado se vuelve a leer si se pide
+    assert registro_uso.resumir("dia", desde="2026-06-01", hasta="2026-06-30")[0]["solicitudes"] == 1
+
+
+def test_mediana_velocidad(tmp_path):
+    registro_uso = RegistroUso(str(tmp_path))
+    _escribir(registro_uso, "2026-10", [
+        _registro("2026-10-01", latencia=1.0, tokens_salida=10),
+        _registro("2026-10-10", latencia=1.0, tokens_salida=20),
+        _registro("2026-10-10", latencia=1.0, tokens_salida=40),
+        _registro("2026-10-10", latencia=1.0, tokens_salida=500, cache_hit=True),
+        _registro("2026-10-10", latencia=1.0, tokens_salida=80, modelo="otro")
+    ])
+    
+    assert registro_uso.mediana_velocidad("groq", "m") == (20.0, 3)
+    assert registro_uso.mediana_velocidad("groq", "m", desde="2026-10-05") == (30.0, 2)
+    assert registro_uso.mediana_velocidad("openai", "m") == (None, 0)
+
+
+def test_resumen_guardado_hasta_que_cambia_el_registro(tmp_path, monkeypatch):
+    registro_uso = RegistroUso(str(tmp_path))
+    _escribir(registro_uso, "2026-10", [_registro("2026-10-01")])
+    assert registro_uso.resumir("dia")[0]["solicitudes"] == 1
+    
+    # Sin cambios en el archivo no se vuelven a sumar los totales
+    monkeypatch.setattr(registro_uso, "_get_totales", lambda archivo: pytest.fail("se recalculó"))
+    primero = registro_uso.resumir("dia")
+    primero[0]["solicitudes"] = 99
+    assert registro_uso.resumir("dia")[0]["solicitudes"] == 1
+    
+    monkeypatch.undo()
+    _escribir(registro_uso, "2026-10", [_registro("2026-10-01")])
+    assert registro_uso.resumir("dia")[0]["solicitudes"] == 2